@@ -1,4 +1,4 @@
-import { apiEndpoints, defaultHeaders } from '@/lib/config';
+import { apiEndpoints, cacheHeaders, conditionalHeaders } from '@/lib/config';
 
 export async function GET(
   request: Request,
@@ -9,9 +9,13 @@ export async function GET(
     
     const response = await fetch(apiEndpoints.visualizeResults(jobId), {
       method: 'GET',
-      headers: defaultHeaders,
+      headers: conditionalHeaders(request),
     });
 
+    if (response.status === 304) {
+      return new Response(null, { status: 304, headers: cacheHeaders(response) });
+    }
+
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
       throw new Error(errorData.detail || `API responded with status ${response.status}`);
@@ -19,7 +23,7 @@ export async function GET(
 
     const data = await response.json();
     
-    return Response.json(data, { status: 200 });
+    return Response.json(data, { status: 200, headers: cacheHeaders(response) });
   } catch (error) {
     console.error('Job results request failed:', error);
     return Response.json(
@@ -1,4 +1,4 @@
-import { apiEndpoints, defaultHeaders } from '@/lib/config';
+import { apiEndpoints, cacheHeaders, conditionalHeaders } from '@/lib/config';
 
 export async function POST(request: Request) {
   try {
@@ -6,10 +6,14 @@ export async function POST(request: Request) {
     
     const response = await fetch(apiEndpoints.visualize, {
       method: 'POST',
-      headers: defaultHeaders,
+      headers: conditionalHeaders(request),
       body: JSON.stringify(body),
     });
 
+    if (response.status === 304) {
+      return new Response(null, { status: 304, headers: cacheHeaders(response) });
+    }
+
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
       throw new Error(errorData.message || `API responded with status ${response.status}`);
@@ -17,7 +21,7 @@ export async function POST(request: Request) {
 
     const data = await response.json();
     
-    return Response.json(data, { status: 200 });
+    return Response.json(data, { status: 200, headers: cacheHeaders(response) });
   } catch (error) {
     console.error('Visualization request failed:', error);
     return Response.json(
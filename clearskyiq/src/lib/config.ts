@@ -21,3 +21,22 @@ export const defaultHeaders = {
   'Content-Type': 'application/json',
   'Authorization': `Bearer ${config.apiToken}`,
 } as const;
+
+// Validators the Harmony API sets on rendered outputs, passed through to the browser / CDN
+const passThroughHeaders = ['etag', 'cache-control'] as const;
+
+export function conditionalHeaders(request: Request): HeadersInit {
+  const ifNoneMatch = request.headers.get('if-none-match');
+  return ifNoneMatch ? { ...defaultHeaders, 'If-None-Match': ifNoneMatch } : defaultHeaders;
+}
+
+export function cacheHeaders(response: Response): Record<string, string> {
+  const headers: Record<string, string> = {};
+  for (const name of passThroughHeaders) {
+    const value = response.headers.get(name);
+    if (value) {
+      headers[name] = value;
+    }
+  }
+  return headers;
+}
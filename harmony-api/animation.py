@@ -0,0 +1,315 @@
+"""
+Animation Module for Harmony API
+Renders time-series animations (GIF / WebP / MP4) from consecutive TEMPO scans
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from array_cache import resolve_array
+from color_scale import RobustLimits
+from bbox_clip import map_extent, swath_window
+from natural_earth import NATURAL_EARTH_SCALE
+
+ANIMATION_FORMATS = {
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "mp4": "video/mp4"
+}
+DEFAULT_EXTENT = [-150, -40, 14, 65]
+
+# TEMPO granule names look like TEMPO_NO2_L2_V03_20231230T223027Z_S012G05.nc
+GRANULE_NAME_PATTERN = re.compile(r"_(\d{8}T\d{6})Z_S(\d{3})G(\d{2})")
+
+# Per-process state of frame render workers (basemap figure reused across frames)
+_worker_state: Dict[str, Any] = {}
+
+_frame_pool: Optional[ProcessPoolExecutor] = None
+_frame_pool_lock = threading.Lock()
+
+def group_granules_by_scan(file_paths: List[str]) -> List[Tuple[str, List[str]]]:
+    """Group granule files into scans ordered by time - each scan becomes one frame"""
+    scans: Dict[str, Dict[str, Any]] = {}
+    for file_path in sorted(file_paths):
+        match = GRANULE_NAME_PATTERN.search(os.path.basename(file_path))
+        if match:
+            timestamp, scan_number = match.group(1), match.group(2)
+            scan_key = f"{timestamp[:8]}_S{scan_number}"
+            label = f"{timestamp[:4]}-{timestamp[4:6]}-{timestamp[6:8]} {timestamp[9:11]}:{timestamp[11:13]}Z"
+        else:
+            timestamp = scan_key = label = os.path.basename(file_path)
+        
+        # The first (earliest) granule of a scan orders and labels its frame
+        scan = scans.setdefault(scan_key, {"timestamp": timestamp, "label": label, "files": []})
+        scan["files"].append(file_path)
+    
+    ordered = sorted(scans.values(), key=lambda scan: scan["timestamp"])
+    return [(scan["label"], scan["files"]) for scan in ordered]
+
+def read_granule_arrays(file_path: str, variable_name: str, array_cache=None) -> Tuple[Any, Any, Any, Optional[str]]:
+    """
+    Read longitude, latitude and a variable from one granule, then close it
+    
+    With an array_cache the arrays are decoded once for the color-limit pass and the
+    frame pass, and may come back as SharedArray handles the frame workers map.
+    """
+    import xarray as xr
+    
+    datatree = xr.open_datatree(file_path)
+    try:
+        da = datatree[variable_name]
+        if array_cache is not None:
+            lon, lat, data = (array_cache.get_shared(file_path, name, dtype="float32")
+                              for name in ("geolocation/longitude", "geolocation/latitude", variable_name))
+        else:
+            lon = np.asarray(datatree["geolocation/longitude"], dtype=np.float32)
+            lat = np.asarray(datatree["geolocation/latitude"], dtype=np.float32)
+            data = np.asarray(da, dtype=np.float32)
+        units = da.attrs.get("units")
+        label = da.attrs.get("long_name", variable_name)
+        return lon, lat, data, f"{label} [{units}]" if units else label
+    finally:
+        datatree.close()
+
+def iter_scan_frames(scans: List[Tuple[str, List[str]]], variable_name: str,
+                     array_cache=None) -> Iterator[Tuple[str, List[Tuple[Any, Any, Any]], Optional[str]]]:
+    """Yield one scan at a time so only a single frame's arrays are held in memory"""
+    for scan_label, file_paths in scans:
+        granules = []
+        label = None
+        for file_path in file_paths:
+            try:
+                lon, lat, data, label = read_granule_arrays(file_path, variable_name, array_cache)
+                granules.append((lon, lat, data))
+            except Exception as e:
+                logging.error(f"Error reading granule {file_path}: {e}")
+        if granules:
+            yield scan_label, granules, label
+
+def clip_granule(lon, lat, data, bbox: Optional[List[float]], margin: float):
+    """A granule's arrays cut to the bbox window (plus margin) of its swath"""
+    lon, lat, data = resolve_array(lon), resolve_array(lat), resolve_array(data)
+    window = swath_window(lat, lon, bbox, margin)
+    if window is None:
+        return lon, lat, data
+    return lon[window], lat[window], data[window]
+
+def compute_color_limits(scans: List[Tuple[str, List[str]]], variable_name: str,
+                         low_percentile: float = 2, high_percentile: float = 98,
+                         array_cache=None, bbox: Optional[List[float]] = None,
+                         clip_margin: float = 0.0) -> Tuple[float, float]:
+    """Robust color limits shared by every frame, computed in one streaming pass over the bbox"""
+    limits = RobustLimits(low_percentile, high_percentile)
+    for _, granules, _ in iter_scan_frames(scans, variable_name, array_cache):
+        for lon, lat, data in granules:
+            limits.add(clip_granule(lon, lat, data, bbox, clip_margin)[2])
+    return limits.limits()
+
+def _init_frame_worker(natural_earth_dir: str):
+    """Configure a frame render process"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import cartopy
+    cartopy.config["data_dir"] = natural_earth_dir
+
+def _get_basemap(extent, vmin, vmax, label, figsize):
+    """Build the map figure once per worker and reuse it for every frame with the same layout"""
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
+    import cartopy.feature as cfeature
+    from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
+    from matplotlib.cm import ScalarMappable
+    from matplotlib.colors import Normalize
+    
+    key = (tuple(extent), vmin, vmax, label, figsize)
+    state = _worker_state.get("basemap")
+    if state and state["key"] == key:
+        return state
+    
+    if state:
+        plt.close(state["fig"])
+    
+    fig, ax = plt.subplots(figsize=figsize, subplot_kw={"projection": ccrs.PlateCarree()})
+    ax.add_feature(cfeature.STATES.with_scale(NATURAL_EARTH_SCALE), color="gray", lw=0.1)
+    ax.coastlines(resolution=NATURAL_EARTH_SCALE, color="gray", linewidth=0.5)
+    ax.set_extent(extent, crs=ccrs.PlateCarree())
+    grid = ax.gridlines(draw_labels=["left", "bottom"], dms=True)
+    grid.xformatter = LONGITUDE_FORMATTER
+    grid.yformatter = LATITUDE_FORMATTER
+    
+    # Fixed norm and levels so colors mean the same thing in every frame
+    norm = Normalize(vmin=vmin, vmax=vmax)
+    cb = fig.colorbar(ScalarMappable(norm=norm, cmap="viridis"), ax=ax, shrink=0.8)
+    if label:
+        cb.set_label(label)
+    
+    state = {
+        "key": key,
+        "fig": fig,
+        "ax": ax,
+        "levels": np.linspace(vmin, vmax, 51),
+        "artists": []
+    }
+    _worker_state["basemap"] = state
+    return state
+
+def render_frame(frame_path: str, granules, title: str, extent, vmin: float, vmax: float,
+                 label: Optional[str], dpi: int = 100, figsize=(12, 8),
+                 bbox: Optional[List[float]] = None, clip_margin: float = 0.0) -> str:
+    """Render one frame onto the worker's basemap and save it as PNG"""
+    import cartopy.crs as ccrs
+    
+    state = _get_basemap(extent, vmin, vmax, label, figsize)
+    ax = state["ax"]
+    
+    # Swap the data artists of the previous frame for this frame's
+    for artist in state["artists"]:
+        artist.remove()
+    state["artists"] = []
+    
+    for lon, lat, data in granules:
+        # Only the part of the swath inside the frame is contoured
+        lon, lat, data = clip_granule(lon, lat, data, bbox, clip_margin)
+        state["artists"].append(ax.contourf(
+            lon, lat, data,
+            levels=state["levels"],
+            cmap="viridis",
+            extend="both",
+            zorder=2,
+            transform=ccrs.PlateCarree()
+        ))
+    
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    # No tight bbox - every frame must have identical pixel dimensions
+    state["fig"].savefig(frame_path, format="png", dpi=dpi)
+    return frame_path
+
+def supported_formats() -> List[str]:
+    """Output formats this server can produce (MP4 needs ffmpeg)"""
+    return [fmt for fmt in ANIMATION_FORMATS if fmt != "mp4" or shutil.which("ffmpeg")]
+
+def get_frame_pool(workers: int, natural_earth_dir: str) -> ProcessPoolExecutor:
+    """Process pool shared by all animation requests"""
+    global _frame_pool
+    with _frame_pool_lock:
+        if _frame_pool is None:
+            _frame_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_frame_worker,
+                initargs=(natural_earth_dir,)
+            )
+        return _frame_pool
+
+def shutdown_frame_pool():
+    global _frame_pool
+    with _frame_pool_lock:
+        if _frame_pool is not None:
+            _frame_pool.shutdown(wait=False, cancel_futures=True)
+            _frame_pool = None
+
+def encode_frames(frame_paths: List[str], output_format: str, fps: int, work_dir: str) -> bytes:
+    """Encode rendered PNG frames into a GIF, WebP or MP4"""
+    if output_format == "mp4":
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("MP4 output requires ffmpeg to be installed on the server")
+        
+        output_path = os.path.join(work_dir, "animation.mp4")
+        subprocess.run(
+            [
+                ffmpeg, "-y", "-loglevel", "error",
+                "-framerate", str(fps),
+                "-i", os.path.join(work_dir, "frame_%05d.png"),
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                "-c:v", "libx264", "-pix_fmt", "yuv420p",
+                output_path
+            ],
+            check=True
+        )
+        with open(output_path, "rb") as f:
+            return f.read()
+    
+    from PIL import Image
+    
+    output_path = os.path.join(work_dir, f"animation.{output_format}")
+    frames = (Image.open(path).convert("RGB") for path in frame_paths[1:])
+    with Image.open(frame_paths[0]) as first:
+        first.convert("RGB").save(
+            output_path,
+            format=output_format.upper(),
+            save_all=True,
+            append_images=frames,
+            duration=int(1000 / fps),
+            loop=0
+        )
+    with open(output_path, "rb") as f:
+        return f.read()
+
+def render_animation(file_paths: List[str], variable_name: str, output_format: str = "gif",
+                     fps: int = 2, bbox: Optional[List[float]] = None,
+                     vmin: Optional[float] = None, vmax: Optional[float] = None,
+                     natural_earth_dir: str = "", workers: int = 2, dpi: int = 100,
+                     max_frames: int = 96, array_cache=None, clip_margin: float = 0.25) -> Tuple[bytes, Dict[str, Any]]:
+    """Render an animation with one frame per scan, streaming granules through a process pool"""
+    scans = group_granules_by_scan(file_paths)
+    if not scans:
+        raise ValueError("No data files found for the specified parameters")
+    if len(scans) > max_frames:
+        raise ValueError(f"Time range covers {len(scans)} scans, more than the limit of {max_frames} frames")
+    
+    if vmin is None or vmax is None:
+        auto_vmin, auto_vmax = compute_color_limits(scans, variable_name, array_cache=array_cache,
+                                                    bbox=bbox, clip_margin=clip_margin)
+        vmin = auto_vmin if vmin is None else vmin
+        vmax = auto_vmax if vmax is None else vmax
+    
+    # bbox is [west, south, east, north]; the cartopy extent is [west, east, south, north]
+    extent = map_extent(bbox, DEFAULT_EXTENT)
+    
+    pool = get_frame_pool(workers, natural_earth_dir)
+    max_in_flight = workers * 2
+    work_dir = tempfile.mkdtemp(prefix="tempo_animation_")
+    
+    try:
+        frame_paths = []
+        in_flight = set()
+        
+        for frame_index, (scan_label, granules, label) in enumerate(iter_scan_frames(scans, variable_name, array_cache)):
+            # Bound the number of scans held in memory / queued for the workers
+            while len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            
+            frame_path = os.path.join(work_dir, f"frame_{frame_index:05d}.png")
+            frame_paths.append(frame_path)
+            in_flight.add(pool.submit(
+                render_frame, frame_path, granules, f"TEMPO {variable_name} {scan_label}",
+                extent, vmin, vmax, label, dpi, bbox=bbox, clip_margin=clip_margin
+            ))
+        
+        for future in in_flight:
+            future.result()
+        
+        if not frame_paths:
+            raise ValueError(f"No granule contained {variable_name}")
+        
+        content = encode_frames(frame_paths, output_format, fps, work_dir)
+        return content, {
+            "frames": len(frame_paths),
+            "vmin": vmin,
+            "vmax": vmax
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,323 @@
+"""
+Array Cache Module for Harmony API
+Decoded granule arrays shared across plot types, jobs and render processes
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+GEOLOCATION_VARIABLES = ["geolocation/latitude", "geolocation/longitude"]
+# Temporary files older than this were left by a writer that died mid-write
+STALE_TEMP_SECONDS = 300
+
+def _subset_key(subset: Optional[Dict[str, slice]]) -> Optional[tuple]:
+    """Hashable form of an isel-style {dim: slice} subset"""
+    if not subset:
+        return None
+    return tuple(sorted((dim, s.start, s.stop, s.step) for dim, s in subset.items()))
+
+def decode_array(file_path: str, variable_name: str, subset: Optional[Dict[str, slice]] = None,
+                 dtype: Optional[str] = None) -> np.ndarray:
+    """Read one variable (or a subset of it) from a granule, then close it"""
+    import xarray as xr
+    
+    datatree = xr.open_datatree(file_path)
+    try:
+        da = datatree[variable_name]
+        if subset:
+            da = da.isel({dim: s for dim, s in subset.items() if dim in da.dims})
+        return np.asarray(da, dtype=dtype)
+    finally:
+        datatree.close()
+
+class SharedArray:
+    """
+    Picklable handle to a cached array in the shared directory
+    
+    Sent to render processes instead of the array itself, which then map the file
+    rather than receiving a pickled copy. If the entry was evicted in the meantime
+    the array is decoded from the granule again.
+    """
+    
+    __slots__ = ("path", "source", "variable_name", "subset", "dtype")
+    
+    def __init__(self, path: str, source: str, variable_name: str,
+                 subset: Optional[Dict[str, slice]], dtype: Optional[str]):
+        self.path = path
+        self.source = source
+        self.variable_name = variable_name
+        self.subset = subset
+        self.dtype = dtype
+    
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+    
+    def load(self) -> np.ndarray:
+        try:
+            return np.load(self.path, mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            return decode_array(self.source, self.variable_name, self.subset, self.dtype)
+
+def resolve_array(value: Any) -> Any:
+    """The array behind a SharedArray handle (anything else is returned as is)"""
+    return value.load() if isinstance(value, SharedArray) else value
+
+class DecodedArrayCache:
+    """
+    Byte-bounded LRU cache of decoded granule arrays keyed by (granule, variable, subset)
+    
+    Arrays are read-only. With a shared_dir (ideally on tmpfs, e.g. /dev/shm) they are
+    stored as .npy files and memory-mapped, so every worker process on the host, and
+    render processes given a SharedArray, read the same pages instead of decoding or
+    copying them.
+    """
+    
+    def __init__(self, max_mb: float = 512, shared_dir: Optional[str] = None):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.shared_dir = shared_dir
+        self.lock = threading.Lock()
+        # key -> (array, path of its .npy file or None)
+        self.entries: "OrderedDict[tuple, Tuple[np.ndarray, Optional[str]]]" = OrderedDict()
+        self.cached_bytes = 0
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "decoded_bytes": 0}
+        
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+    
+    @staticmethod
+    def _key(source: str, variable_name: str, subset: Optional[Dict[str, slice]],
+             dtype: Optional[str]) -> tuple:
+        return source, os.path.getmtime(source), variable_name, _subset_key(subset), dtype
+    
+    def _shared_path(self, key: tuple) -> Optional[str]:
+        if not self.shared_dir:
+            return None
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.shared_dir, f"{digest}.npy")
+    
+    def _store_shared(self, array: np.ndarray, path: str) -> np.ndarray:
+        """Write the array next to its final path, rename it into place and map it"""
+        fd, temp_path = tempfile.mkstemp(dir=self.shared_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return np.load(path, mmap_mode="r")
+    
+    def _lookup(self, key: tuple) -> Optional[np.ndarray]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+        if entry is not None:
+            self._touch(entry[1])
+            return entry[0]
+        
+        # Another worker process may have decoded it already
+        path = self._shared_path(key)
+        if path is not None:
+            try:
+                array = np.load(path, mmap_mode="r")
+            except (FileNotFoundError, ValueError):
+                return None
+            self._touch(path)
+            self._insert(key, array, path)
+            with self.lock:
+                self.stats["shared_hits"] += 1
+            return array
+        return None
+    
+    def _insert(self, key: tuple, array: np.ndarray, path: Optional[str]) -> None:
+        if array.nbytes > self.max_bytes:
+            return
+        evicted = []
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = (array, path)
+            self.cached_bytes += array.nbytes
+            while self.cached_bytes > self.max_bytes:
+                _, (old, old_path) = self.entries.popitem(last=False)
+                self.cached_bytes -= old.nbytes
+                self.stats["evictions"] += 1
+                if old_path is not None:
+                    evicted.append(old_path)
+        
+        # Existing maps of an unlinked file stay valid
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+    
+    def get(self, source: str, variable_name: str, subset: Optional[Dict[str, slice]] = None,
+            dtype: Optional[str] = None, loader: Optional[Callable[[], Any]] = None) -> np.ndarray:
+        """
+        Decoded (read-only) array of a granule variable, decoding it on a miss
+        
+        loader, if given, produces the array from an already open datatree instead of
+        reopening the file; it must honour subset and dtype.
+        """
+        key = self._key(source, variable_name, subset, dtype)
+        array = self._lookup(key)
+        if array is not None:
+            return array
+        
+        with self.lock:
+            self.stats["misses"] += 1
+        array = np.asarray(loader() if loader is not None else decode_array(source, variable_name, subset, dtype),
+                           dtype=dtype)
+        with self.lock:
+            self.stats["decoded_bytes"] += array.nbytes
+        
+        path = self._shared_path(key)
+        if path is not None and array.nbytes <= self.max_bytes:
+            try:
+                array = self._store_shared(array, path)
+            except OSError as e:
+                logging.warning(f"Keeping {variable_name} of {source} in process memory: {e}")
+                path = None
+        else:
+            path = None
+        if path is None:
+            array = array.view()
+            array.flags.writeable = False
+        
+        self._insert(key, array, path)
+        return array
+    
+    def get_shared(self, source: str, variable_name: str, subset: Optional[Dict[str, slice]] = None,
+                   dtype: Optional[str] = None) -> Any:
+        """A SharedArray handle for render processes, or the array itself without a shared_dir"""
+        array = self.get(source, variable_name, subset, dtype)
+        if not self.shared_dir or not isinstance(array, np.memmap):
+            return array
+        return SharedArray(array.filename, source, variable_name, subset, dtype)
+    
+    def attach(self, datatree, variable_names: List[str]):
+        """
+        Back the given variables of an open datatree with cached arrays
+        
+        Every renderer (and regridder) reading these variables from the datatree then
+        shares one decoded copy, across plot types and across jobs on the same granule.
+        """
+        source = datatree.encoding.get("source")
+        if source is None:
+            return datatree
+        
+        for variable_name in variable_names:
+            try:
+                da = datatree[variable_name]
+            except KeyError:
+                continue
+            data = self.get(source, variable_name, loader=lambda: np.asarray(da))
+            datatree[variable_name] = da.copy(data=data)
+        return datatree
+    
+    def clear(self) -> None:
+        with self.lock:
+            paths = [path for _, path in self.entries.values() if path is not None]
+            self.entries.clear()
+            self.cached_bytes = 0
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    
+    @staticmethod
+    def _touch(path: Optional[str]) -> None:
+        """Mark a shared file as just used, so sweeps remove it last"""
+        if path is None:
+            return
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+    
+    def _shared_files(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every file in the shared directory, least recently used first"""
+        if not self.shared_dir or not os.path.isdir(self.shared_dir):
+            return []
+        files = []
+        for entry in os.scandir(self.shared_dir):
+            if not entry.name.endswith((".npy", ".tmp")):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        return files
+    
+    def shared_usage(self) -> int:
+        """Bytes in the shared directory, written by any process"""
+        return sum(size for _, size, _ in self._shared_files())
+    
+    def oldest_shared_access(self) -> Optional[float]:
+        files = self._shared_files()
+        return files[0][0] if files else None
+    
+    def remove_shared(self, limit: int, unused_since: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Delete up to limit least recently used files from the shared directory
+        
+        With unused_since, only files not used since then (and temporary files a
+        crashed writer left behind) are removed. Files of any process qualify; maps
+        of a removed file stay valid and handles to it decode the array again.
+        Returns the number of files removed and the bytes freed.
+        """
+        now = time.time()
+        removed, freed = [], 0
+        for mtime, size, path in self._shared_files():
+            if len(removed) >= limit:
+                break
+            if path.endswith(".tmp"):
+                # Possibly still being written - only sweep leftovers
+                if now - mtime < STALE_TEMP_SECONDS:
+                    continue
+            elif unused_since is not None and mtime >= unused_since:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed.append(path)
+            freed += size
+        
+        # Stop mapping removed files here so their pages are released
+        if removed:
+            gone = set(removed)
+            with self.lock:
+                for key in [k for k, (_, path) in self.entries.items() if path in gone]:
+                    array, _ = self.entries.pop(key)
+                    self.cached_bytes -= array.nbytes
+                    self.stats["evictions"] += 1
+        return len(removed), freed
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **self.stats,
+                "cached_arrays": len(self.entries),
+                "cached_mb": round(self.cached_bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "shared_dir": self.shared_dir
+            }
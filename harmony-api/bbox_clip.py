@@ -0,0 +1,131 @@
+"""
+BBox Clip Module for Harmony API
+Cuts swath arrays down to the requested bounding box (plus a margin) before rendering
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+def valid_bbox(bbox: Optional[Sequence[float]]) -> bool:
+    """True for a [west, south, east, north] box with west < east and south < north"""
+    return bbox is not None and len(bbox) == 4 and bbox[0] < bbox[2] and bbox[1] < bbox[3]
+
+def map_extent(bbox: Optional[Sequence[float]], default: Sequence[float]) -> List[float]:
+    """Cartopy extent [west, east, south, north] of a bbox, or the default without a usable one"""
+    if not valid_bbox(bbox):
+        return list(default)
+    west, south, east, north = (float(value) for value in bbox)
+    return [max(west, -180.0), min(east, 180.0), max(south, -90.0), min(north, 90.0)]
+
+def swath_window(lat: np.ndarray, lon: np.ndarray, bbox: Optional[Sequence[float]],
+                 margin: float = 0.0) -> Optional[Tuple[slice, slice]]:
+    """
+    Row and column slices of the smallest window holding every pixel within bbox + margin
+    
+    None when there is nothing to cut: no usable bbox, the whole swath is inside, or no
+    pixel is (the swath is then kept rather than rendering an empty array).
+    """
+    if not valid_bbox(bbox) or np.ndim(lat) != 2:
+        return None
+    
+    west, south, east, north = bbox
+    with np.errstate(invalid="ignore"):
+        inside = ((lat >= south - margin) & (lat <= north + margin) &
+                  (lon >= west - margin) & (lon <= east + margin))
+    rows = np.flatnonzero(inside.any(axis=1))
+    cols = np.flatnonzero(inside.any(axis=0))
+    if rows.size == 0:
+        return None
+    
+    window = (slice(int(rows[0]), int(rows[-1]) + 1), slice(int(cols[0]), int(cols[-1]) + 1))
+    if window[0].stop - window[0].start == lat.shape[0] and window[1].stop - window[1].start == lat.shape[1]:
+        return None
+    return window
+
+class SwathClipper:
+    """Per-granule cache of bbox windows, and datatrees cut to them"""
+    
+    def __init__(self, margin: float = 0.25, max_entries: int = 256):
+        # Degrees kept around the bbox so contours run to the map edge
+        self.margin = margin
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # (source, mtime, bbox) -> window or None
+        self.windows: "OrderedDict[tuple, Optional[Tuple[slice, slice]]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "clipped": 0, "unclipped": 0, "pixels_total": 0, "pixels_kept": 0}
+    
+    @staticmethod
+    def _window_key(datatree, bbox: Sequence[float]) -> Optional[tuple]:
+        source = datatree.encoding.get("source")
+        if source is None:
+            return None
+        try:
+            return source, os.path.getmtime(source), tuple(float(value) for value in bbox)
+        except OSError:
+            return None
+    
+    def get_window(self, datatree, bbox: Optional[Sequence[float]]) -> Optional[Tuple[slice, slice]]:
+        """Window of the granule's swath covering bbox + margin (None to keep it whole)"""
+        if not valid_bbox(bbox):
+            return None
+        
+        key = self._window_key(datatree, bbox)
+        if key is not None:
+            with self.lock:
+                if key in self.windows:
+                    self.windows.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return self.windows[key]
+                self.stats["misses"] += 1
+        
+        window = swath_window(
+            np.asarray(datatree["geolocation/latitude"]),
+            np.asarray(datatree["geolocation/longitude"]),
+            bbox, self.margin
+        )
+        
+        if key is not None:
+            with self.lock:
+                self.windows[key] = window
+                while len(self.windows) > self.max_entries:
+                    self.windows.popitem(last=False)
+        return window
+    
+    def clip_datatree(self, datatree, bbox: Optional[Sequence[float]]):
+        """
+        Datatree with every swath variable cut to the bbox window (the datatree itself if nothing is cut)
+        
+        Clip after quality masking: the clipped tree drops its source, so caches keyed
+        by granule (quality masks, regrid geometry) never mistake a window for the whole
+        granule.
+        """
+        window = self.get_window(datatree, bbox)
+        lat = datatree["geolocation/latitude"]
+        with self.lock:
+            self.stats["pixels_total"] += lat.size
+            if window is None:
+                self.stats["unclipped"] += 1
+                self.stats["pixels_kept"] += lat.size
+                return datatree
+            self.stats["clipped"] += 1
+            self.stats["pixels_kept"] += (window[0].stop - window[0].start) * (window[1].stop - window[1].start)
+        
+        rows_dim, cols_dim = lat.dims
+        clipped = datatree.isel({rows_dim: window[0], cols_dim: window[1]}, missing_dims="ignore")
+        clipped.encoding = {key: value for key, value in datatree.encoding.items() if key != "source"}
+        return clipped
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.stats["pixels_total"]
+            return {
+                **self.stats,
+                "cached_windows": len(self.windows),
+                "margin_degrees": self.margin,
+                # Share of swath pixels that still reach the renderers
+                "kept_ratio": round(self.stats["pixels_kept"] / total, 4) if total else None
+            }
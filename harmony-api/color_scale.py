@@ -0,0 +1,144 @@
+"""
+Color Scale Module for Harmony API
+Robust, precomputed color scales shared by every plot of a variable, region and day
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+@dataclass(frozen=True)
+class ColorScale:
+    """Fixed limits and contour levels; values outside them use the colorbar's extensions"""
+    vmin: float
+    vmax: float
+    n_levels: int = 50
+    
+    @property
+    def levels(self) -> np.ndarray:
+        return np.linspace(self.vmin, self.vmax, self.n_levels + 1)
+    
+    def norm(self):
+        """Normalization for raster renders (imshow), matching the contour levels' range"""
+        from matplotlib.colors import Normalize
+        return Normalize(vmin=self.vmin, vmax=self.vmax)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"vmin": self.vmin, "vmax": self.vmax, "n_levels": self.n_levels}
+    
+    @classmethod
+    def from_dict(cls, value: Dict[str, Any]) -> "ColorScale":
+        return cls(float(value["vmin"]), float(value["vmax"]), int(value.get("n_levels", 50)))
+
+class RobustLimits:
+    """
+    Streaming percentile limits over any number of arrays
+    
+    Each array contributes a strided sample of at most max_samples finite values,
+    so memory stays bounded however many granules are added and the percentiles
+    come from one pass over the data.
+    """
+    
+    def __init__(self, low_percentile: float = 2, high_percentile: float = 98, max_samples: int = 100000):
+        self.low_percentile = low_percentile
+        self.high_percentile = high_percentile
+        self.max_samples = max_samples
+        self.samples: List[np.ndarray] = []
+    
+    def add(self, array) -> None:
+        values = np.asarray(array).ravel()
+        stride = max(1, values.size // self.max_samples)
+        sample = values[::stride]
+        sample = sample[np.isfinite(sample)]
+        if sample.size:
+            self.samples.append(sample.astype(np.float64))
+    
+    def limits(self) -> Tuple[float, float]:
+        """(vmin, vmax); (0, 1) if no finite value was seen"""
+        if not self.samples:
+            return 0.0, 1.0
+        low, high = np.percentile(np.concatenate(self.samples), [self.low_percentile, self.high_percentile])
+        vmin, vmax = float(low), float(high)
+        if vmax <= vmin:
+            vmax = vmin + (abs(vmin) if vmin else 1.0)
+        return vmin, vmax
+
+class ColorScaleService:
+    """
+    Color scales per variable, region, day and quality filter, computed once and shared by all workers
+    
+    The first render of a variable over a region on a given day computes robust
+    percentile limits from its data; every later render (other plot types, scans,
+    previews, animations, other workers) reuses them, so images are comparable
+    and no render scans its full array for levels. Data masked by a quality flag
+    threshold has its own range, so each threshold gets its own scale.
+    """
+    
+    def __init__(self, store, namespace: str = "color_scales", ttl: Optional[float] = None,
+                 low_percentile: float = 2, high_percentile: float = 98, n_levels: int = 50,
+                 region_precision: float = 1.0, max_samples: int = 100000):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.low_percentile = low_percentile
+        self.high_percentile = high_percentile
+        self.n_levels = n_levels
+        # Bounding boxes are snapped to this many degrees, so nearby requests share a scale
+        self.region_precision = region_precision
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+    
+    def region_key(self, bbox: Optional[List[float]]) -> str:
+        if not bbox:
+            return "full"
+        step = self.region_precision
+        return ",".join(f"{round(value / step) * step:g}" for value in bbox)
+    
+    def key(self, variable_name: str, bbox: Optional[List[float]], time: Optional[str],
+            max_quality_flag: Optional[int] = None) -> str:
+        day = time[:10] if time else "any"
+        quality = "all" if max_quality_flag is None else f"q{max_quality_flag}"
+        return f"{variable_name}|{self.region_key(bbox)}|{day}|{quality}"
+    
+    def limits(self, arrays: Iterable[Any]) -> RobustLimits:
+        accumulator = RobustLimits(self.low_percentile, self.high_percentile, self.max_samples)
+        for array in arrays:
+            accumulator.add(array)
+        return accumulator
+    
+    def get(self, variable_name: str, bbox: Optional[List[float]], time: Optional[str],
+            max_quality_flag: Optional[int] = None) -> Optional[ColorScale]:
+        value = self.store.get(self.namespace, self.key(variable_name, bbox, time, max_quality_flag))
+        with self.lock:
+            self.stats["hits" if value is not None else "misses"] += 1
+        return ColorScale.from_dict(value) if value is not None else None
+    
+    def put(self, variable_name: str, bbox: Optional[List[float]], time: Optional[str],
+            vmin: float, vmax: float, max_quality_flag: Optional[int] = None) -> ColorScale:
+        scale = ColorScale(float(vmin), float(vmax), self.n_levels)
+        self.store.set(self.namespace, self.key(variable_name, bbox, time, max_quality_flag), scale.to_dict(),
+                       ttl=self.ttl)
+        return scale
+    
+    def scale_for(self, variable_name: str, bbox: Optional[List[float]], time: Optional[str],
+                  arrays: Callable[[], Iterable[Any]], max_quality_flag: Optional[int] = None) -> ColorScale:
+        """The cached scale, or one computed from arrays() (masked at max_quality_flag) and cached for later renders"""
+        scale = self.get(variable_name, bbox, time, max_quality_flag)
+        if scale is None:
+            vmin, vmax = self.limits(arrays()).limits()
+            scale = self.put(variable_name, bbox, time, vmin, vmax, max_quality_flag)
+        return scale
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "cached_scales": self.store.count(self.namespace),
+            "percentiles": [self.low_percentile, self.high_percentile],
+            "levels": self.n_levels,
+            "region_precision": self.region_precision
+        }
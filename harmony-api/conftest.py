@@ -0,0 +1,17 @@
+"""
+Shared setup for the tests that import the server (main)
+
+Loaded by pytest before any test module, so main reads this configuration.
+"""
+
+import os
+import tempfile
+
+# Keep the server's state out of the source tree
+STATE_DIR = tempfile.mkdtemp(prefix="harmony_api_test_")
+for name in ("CACHE_DIR", "DATA_DIR", "DOWNLOAD_DIR"):
+    os.environ.setdefault(name, os.path.join(STATE_DIR, name.lower()))
+os.environ.setdefault("STATE_BACKEND", "memory")
+
+# Authorization header the server accepts
+AUTH = {"Authorization": f"Bearer {os.getenv('SECRET_KEY', 'default-token')}"}
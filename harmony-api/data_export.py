@@ -0,0 +1,274 @@
+"""
+Data Export Module for Harmony API
+Streams subsetted TEMPO variable arrays as Arrow IPC, NPY (npz) or Zarr
+"""
+
+import io
+import os
+import json
+import zipfile
+import tempfile
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from quality_mask import quality_masker
+
+EXPORT_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "npy": ("application/zip", "npz"),
+    "zarr": ("application/zip", "zarr.zip")
+}
+DEFAULT_EXPORT_VARIABLES = ["product/vertical_column"]
+STREAM_CHUNK_ROWS = 262144  # Rows per Arrow record batch / NPY member
+FILE_CHUNK_BYTES = 1024 * 1024
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose buffered bytes are drained as response chunks"""
+    
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self.position
+    
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def get_variable(datatree, variable_name: str):
+    """Look up a variable by path, returning None if the granule does not have it"""
+    try:
+        return datatree[variable_name]
+    except KeyError:
+        return None
+
+def column_name(variable_name: str) -> str:
+    """Column name for a variable path, e.g. product/vertical_column -> vertical_column"""
+    return variable_name.split("/")[-1]
+
+def subset_granule(file_path: str, variables: List[str], bbox: Optional[List[float]] = None,
+                   start_time: Optional[str] = None, end_time: Optional[str] = None,
+                   max_quality_flag: Optional[int] = None,
+                   quality_column: bool = False) -> Optional[Dict[str, np.ndarray]]:
+    """Read only the pixels of one granule inside bbox/time (and quality) as flat columns
+    
+    With quality_column set, low-quality pixels are kept and flagged in a boolean
+    "quality_ok" column instead of being dropped.
+    """
+    import xarray as xr
+    
+    datatree = xr.open_datatree(file_path)
+    try:
+        lat = datatree["geolocation/latitude"].values
+        lon = datatree["geolocation/longitude"].values
+        mask = np.isfinite(lat) & np.isfinite(lon)
+        
+        if bbox and len(bbox) == 4:
+            west, south, east, north = bbox
+            mask &= (lon >= west) & (lon <= east) & (lat >= south) & (lat <= north)
+        
+        # Per-scanline times let us subset within a granule, not just per granule
+        time_da = get_variable(datatree, "geolocation/time") if (start_time or end_time) else None
+        if time_da is not None:
+            times = time_da.values
+            if np.issubdtype(times.dtype, np.datetime64) and times.ndim == 1 and times.shape[0] == lat.shape[0]:
+                time_mask = np.ones(times.shape, dtype=bool)
+                if start_time:
+                    time_mask &= times >= np.datetime64(datetime.fromisoformat(start_time.replace('Z', '')))
+                if end_time:
+                    time_mask &= times <= np.datetime64(datetime.fromisoformat(end_time.replace('Z', '')))
+                mask &= time_mask[:, None]
+        
+        if not mask.any():
+            return None
+        
+        # Only decode the window of rows/columns that contains selected pixels
+        rows = np.flatnonzero(mask.any(axis=1))
+        cols = np.flatnonzero(mask.any(axis=0))
+        window = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+        mask = mask[window]
+        
+        quality_mask = quality_masker.get_mask(datatree, max_quality_flag) if max_quality_flag is not None else None
+        if quality_mask is not None and not quality_column:
+            mask &= quality_mask[window]
+            if not mask.any():
+                return None
+        
+        columns = {
+            "latitude": lat[window][mask],
+            "longitude": lon[window][mask]
+        }
+        if quality_mask is not None and quality_column:
+            columns["quality_ok"] = quality_mask[window][mask]
+        for variable_name in variables:
+            da = get_variable(datatree, variable_name)
+            if da is None:
+                logging.warning(f"Variable {variable_name} not found in {os.path.basename(file_path)}")
+                continue
+            if da.shape != lat.shape:
+                logging.warning(f"Skipping {variable_name}: not on the {lat.shape} pixel grid")
+                continue
+            columns[column_name(variable_name)] = da[window].values[mask]
+        
+        return columns
+    finally:
+        datatree.close()
+
+def iter_granule_subsets(file_paths: List[str], **subset_kwargs) -> Iterator[tuple]:
+    """Subset granules one at a time so only one granule is held in memory"""
+    for granule_index, file_path in enumerate(file_paths):
+        try:
+            columns = subset_granule(file_path, **subset_kwargs)
+        except Exception as e:
+            logging.error(f"Error subsetting granule {file_path}: {e}")
+            continue
+        if columns:
+            yield granule_index, columns
+
+def _chunks(columns: Dict[str, np.ndarray], chunk_rows: int) -> Iterator[Dict[str, np.ndarray]]:
+    total_rows = len(columns["latitude"])
+    for start in range(0, total_rows, chunk_rows):
+        yield {name: values[start:start + chunk_rows] for name, values in columns.items()}
+
+def stream_arrow(file_paths: List[str], metadata: Dict[str, Any], chunk_rows: int = STREAM_CHUNK_ROWS,
+                 **subset_kwargs) -> Iterator[bytes]:
+    """Stream subsetted pixels as an Arrow IPC stream, one record batch per chunk"""
+    import pyarrow as pa
+    
+    sink = _DrainableSink()
+    writer = None
+    schema = None
+    
+    for granule_index, columns in iter_granule_subsets(file_paths, **subset_kwargs):
+        for chunk in _chunks(columns, chunk_rows):
+            arrays = {"granule": np.full(len(chunk["latitude"]), granule_index, dtype=np.uint16), **chunk}
+            
+            if writer is None:
+                # The first granule fixes the schema for the whole stream
+                schema = pa.schema(
+                    [(name, pa.from_numpy_dtype(values.dtype)) for name, values in arrays.items()],
+                    metadata={"tempo": json.dumps(metadata)}
+                )
+                writer = pa.ipc.new_stream(sink, schema)
+            
+            batch = pa.record_batch(
+                [pa.array(arrays[field.name], type=field.type) if field.name in arrays
+                 else pa.nulls(len(chunk["latitude"]), type=field.type)
+                 for field in schema],
+                schema=schema
+            )
+            writer.write_batch(batch)
+            yield sink.drain()
+    
+    if writer is None:
+        # No pixels selected - still emit a valid, empty stream
+        schema = pa.schema([("granule", pa.uint16()), ("latitude", pa.float64()), ("longitude", pa.float64())],
+                           metadata={"tempo": json.dumps(metadata)})
+        writer = pa.ipc.new_stream(sink, schema)
+    
+    writer.close()
+    yield sink.drain()
+
+def stream_npz(file_paths: List[str], metadata: Dict[str, Any], chunk_rows: int = STREAM_CHUNK_ROWS,
+               **subset_kwargs) -> Iterator[bytes]:
+    """Stream subsetted pixels as an uncompressed .npz archive (one .npy member per column chunk)"""
+    sink = _DrainableSink()
+    
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        archive.writestr("metadata.json", json.dumps(metadata))
+        yield sink.drain()
+        
+        for granule_index, columns in iter_granule_subsets(file_paths, **subset_kwargs):
+            for chunk_index, chunk in enumerate(_chunks(columns, chunk_rows)):
+                for name, values in chunk.items():
+                    member = f"g{granule_index:04d}_c{chunk_index:04d}_{name}.npy"
+                    with archive.open(member, mode="w", force_zip64=True) as f:
+                        np.lib.format.write_array(f, np.ascontiguousarray(values))
+                    yield sink.drain()
+    
+    yield sink.drain()
+
+def stream_zarr(file_paths: List[str], metadata: Dict[str, Any], chunk_rows: int = STREAM_CHUNK_ROWS,
+                **subset_kwargs) -> Iterator[bytes]:
+    """Write subsetted pixels to a zipped Zarr store on disk, then stream it in chunks"""
+    import zarr
+    
+    fd, zip_path = tempfile.mkstemp(prefix="tempo_export_", suffix=".zarr.zip")
+    os.close(fd)
+    
+    try:
+        store = zarr.storage.ZipStore(zip_path, mode="w")
+        # Attributes are set at creation - the zip store cannot rewrite zarr.json later
+        root = zarr.open_group(store=store, mode="w", attributes=metadata)
+        
+        for granule_index, columns in iter_granule_subsets(file_paths, **subset_kwargs):
+            group = root.create_group(f"granule_{granule_index:04d}")
+            for name, values in columns.items():
+                group.create_array(name, data=values, chunks=(min(chunk_rows, max(len(values), 1)),))
+        store.close()
+        
+        with open(zip_path, "rb") as f:
+            while True:
+                chunk = f.read(FILE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
+
+EXPORT_STREAMERS = {
+    "arrow": stream_arrow,
+    "npy": stream_npz,
+    "zarr": stream_zarr
+}
+
+def check_export_format(output_format: str) -> Optional[str]:
+    """Return an error message if a format is unknown or its library is not installed"""
+    if output_format not in EXPORT_FORMATS:
+        return f"Invalid format: {output_format}. Use 'arrow', 'npy' or 'zarr'"
+    
+    module = {"arrow": "pyarrow", "zarr": "zarr"}.get(output_format)
+    if module:
+        try:
+            __import__(module)
+        except ImportError:
+            return f"Format '{output_format}' requires the '{module}' package on the server"
+    return None
+
+def stream_export(output_format: str, file_paths: List[str], variables: Optional[List[str]] = None,
+                  bbox: Optional[List[float]] = None, start_time: Optional[str] = None,
+                  end_time: Optional[str] = None, max_quality_flag: Optional[int] = None) -> Iterator[bytes]:
+    """Stream the requested variables of the given granules in a binary format"""
+    variables = variables or DEFAULT_EXPORT_VARIABLES
+    metadata = {
+        "granules": [os.path.basename(p) for p in file_paths],
+        "variables": variables,
+        "bbox": bbox,
+        "start_time": start_time,
+        "end_time": end_time,
+        "max_quality_flag": max_quality_flag
+    }
+    
+    return EXPORT_STREAMERS[output_format](
+        file_paths,
+        metadata,
+        variables=variables,
+        bbox=bbox,
+        start_time=start_time,
+        end_time=end_time,
+        max_quality_flag=max_quality_flag
+    )
@@ -0,0 +1,423 @@
+"""
+Download Manager Module for Harmony API
+Downloads Harmony job outputs into per-job directories with bounded parallelism, resume and verification
+"""
+
+import os
+import time
+import shutil
+import hashlib
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import requests
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows - single worker only
+    fcntl = None
+
+PARTIAL_SUFFIX = ".part"
+LOCK_SUFFIX = ".lock"
+EDL_HOST = "urs.earthdata.nasa.gov"
+
+class DownloadError(Exception):
+    """A granule could not be downloaded or failed verification"""
+
+class DownloadCancelled(DownloadError):
+    """The job's downloads were cancelled"""
+
+class EarthdataSession(requests.Session):
+    """
+    Session that keeps Earthdata Login credentials through the redirects of a download
+    
+    Harmony result URLs redirect through EDL before landing on the data. requests drops
+    the Authorization header on every host change; this keeps it on hops to or from EDL
+    only, so it never reaches the data host (S3 rejects presigned URLs that carry it).
+    """
+    
+    def __init__(self, auth: Optional[Tuple[str, str]] = None):
+        super().__init__()
+        self.auth = auth
+    
+    def rebuild_auth(self, prepared_request, response):
+        headers = prepared_request.headers
+        if "Authorization" in headers:
+            original = urlparse(response.request.url).hostname
+            redirect = urlparse(prepared_request.url).hostname
+            if original != redirect and EDL_HOST not in (original, redirect):
+                del headers["Authorization"]
+
+def download_filename(url: str) -> str:
+    """Local file name of a Harmony result: the last segment of its URL path"""
+    return unquote(os.path.basename(urlparse(url).path))
+
+class DownloadManager:
+    """Shared, bounded pool that downloads each Harmony job into its own directory"""
+    
+    def __init__(self, base_dir: str, max_workers: int = 4, retries: int = 3,
+                 chunk_size: int = 1024 * 1024, history: int = 50,
+                 session_factory: Optional[Callable[[], requests.Session]] = None):
+        self.base_dir = base_dir
+        self.max_workers = max(1, max_workers)
+        self.retries = max(1, retries)
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        # Earthdata Login credentials for downloads, set once the Harmony client is configured
+        self.auth: Optional[Tuple[str, str]] = None
+        self.session_factory = session_factory or (lambda: EarthdataSession(self.auth))
+        
+        # One pool for all jobs, so concurrent requests cannot oversubscribe the link to Harmony
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="download")
+        
+        self.active: Dict[str, Dict[str, Any]] = {}
+        # Equivalent requests may download the same job at once - one writer per file
+        self.file_locks: Dict[str, threading.Lock] = {}
+        # Jobs whose downloads should stop, and the queued downloads of each job
+        self.cancelled = set()
+        self.job_futures: Dict[str, List[Any]] = {}
+        self.recent = deque(maxlen=history)
+        self.stats = {
+            "downloads": 0,
+            "reused": 0,
+            "resumed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "bytes": 0,
+            "seconds": 0.0
+        }
+    
+    def set_credentials(self, username: str, password: str) -> None:
+        """Use these Earthdata Login credentials for every download from now on"""
+        self.auth = (username, password)
+    
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.base_dir, job_id)
+    
+    def download_job(self, client, job_id: str, urls: Optional[List[str]] = None) -> List[str]:
+        """Download every output of a finished Harmony job, in result order"""
+        directory = self.job_dir(job_id)
+        os.makedirs(directory, exist_ok=True)
+        self.touch_job(job_id)
+        
+        if urls is None:
+            urls = list(client.result_urls(job_id))
+        with self.lock:
+            # A new request for the job supersedes an earlier cancellation
+            self.cancelled.discard(job_id)
+            futures = [self.executor.submit(self.download_file, url, directory) for url in urls]
+            self.job_futures.setdefault(job_id, []).extend(futures)
+        
+        try:
+            return [future.result() for future in futures]
+        except CancelledError:
+            raise DownloadCancelled(f"Downloads of job {job_id} were cancelled")
+        finally:
+            with self.lock:
+                remaining = [f for f in self.job_futures.get(job_id, []) if f not in futures]
+                if remaining:
+                    self.job_futures[job_id] = remaining
+                else:
+                    self.job_futures.pop(job_id, None)
+    
+    def cancel_job(self, job_id: str) -> int:
+        """Drop a job's queued downloads and abort its in-flight ones; returns the number dropped"""
+        with self.lock:
+            self.cancelled.add(job_id)
+            dropped = sum(1 for future in self.job_futures.get(job_id, []) if future.cancel())
+            self.stats["cancelled"] += dropped
+        return dropped
+    
+    def _check_cancelled(self, directory: str) -> None:
+        job_id = os.path.basename(directory)
+        with self.lock:
+            if job_id in self.cancelled:
+                raise DownloadCancelled(f"Downloads of job {job_id} were cancelled")
+    
+    def download_file(self, url: str, directory: str) -> str:
+        """Download one file, resuming a partial download and retrying transient failures"""
+        filename = os.path.join(directory, download_filename(url))
+        with self.lock:
+            file_lock = self.file_locks.setdefault(filename, threading.Lock())
+        
+        with file_lock, self._process_lock(filename):
+            if os.path.isfile(filename):
+                with self.lock:
+                    self.stats["reused"] += 1
+                return filename
+            
+            last_error = None
+            for attempt in range(self.retries):
+                try:
+                    self._check_cancelled(directory)
+                    self._fetch(url, filename)
+                    return filename
+                except DownloadCancelled:
+                    with self.lock:
+                        self.stats["cancelled"] += 1
+                    raise
+                except Exception as e:
+                    last_error = e
+                    logging.warning(f"Download of {os.path.basename(filename)} failed (attempt {attempt + 1}/{self.retries}): {e}")
+                    if attempt + 1 < self.retries:
+                        time.sleep(min(2 ** attempt, 10))
+            
+            with self.lock:
+                self.stats["failed"] += 1
+            raise DownloadError(f"Failed to download {url}: {last_error}")
+    
+    @staticmethod
+    @contextmanager
+    def _process_lock(filename: str):
+        """Lock file so worker processes sharing the download directory never write the same file"""
+        if fcntl is None:
+            yield
+            return
+        lock_path = filename + LOCK_SUFFIX
+        with open(lock_path, "a+") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                # Once the file exists nobody writes it again, so the lock file is no longer needed
+                if os.path.isfile(filename):
+                    try:
+                        os.remove(lock_path)
+                    except FileNotFoundError:
+                        pass
+                fcntl.flock(handle, fcntl.LOCK_UN)
+    
+    def _fetch(self, url: str, filename: str) -> None:
+        partial = filename + PARTIAL_SUFFIX
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        
+        started = time.time()
+        name = os.path.basename(filename)
+        with self.lock:
+            self.active[name] = {"started": started, "bytes": 0, "resumed_from": offset}
+        
+        try:
+            # A fresh session per file: it collects the EDL cookies of this download's redirects
+            with self.session_factory() as session:
+                with session.get(url, stream=True, headers=headers, timeout=(30, 300)) as response:
+                    if offset and response.status_code == 416:
+                        # Nothing left to fetch - the partial file may already hold the whole object
+                        self._verify_satisfied(response, partial, offset)
+                        received = 0
+                        with self.lock:
+                            self.stats["resumed"] += 1
+                    else:
+                        offset, received = self._stream(response, partial, filename, offset)
+        finally:
+            with self.lock:
+                self.active.pop(name, None)
+        
+        os.replace(partial, filename)
+        
+        elapsed = max(time.time() - started, 1e-6)
+        record = {
+            "file": name,
+            "bytes": received,
+            "resumed_from": offset,
+            "seconds": round(elapsed, 3),
+            "bytes_per_second": round(received / elapsed)
+        }
+        logging.info(f"Downloaded {name}: {received} bytes in {elapsed:.2f}s ({received / elapsed / 1e6:.1f} MB/s)")
+        with self.lock:
+            self.recent.append(record)
+            self.stats["downloads"] += 1
+            self.stats["bytes"] += received
+            self.stats["seconds"] += elapsed
+    
+    def _stream(self, response, partial: str, filename: str, offset: int) -> Tuple[int, int]:
+        """Write a response body to the partial file; returns the offset written from and bytes received"""
+        if offset and response.status_code == 206:
+            mode = "ab"
+            with self.lock:
+                self.stats["resumed"] += 1
+        else:
+            # Server ignored the range (or there was nothing to resume) - start over
+            response.raise_for_status()
+            offset = 0
+            mode = "wb"
+        
+        expected_size = self._expected_size(response, offset)
+        digest = self._resume_digest(partial, offset) if self._etag_md5(response) else None
+        
+        name = os.path.basename(filename)
+        received = 0
+        with open(partial, mode) as f:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if not chunk:
+                    continue
+                # Keep the partial file so a later request resumes it
+                self._check_cancelled(os.path.dirname(filename))
+                f.write(chunk)
+                received += len(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                with self.lock:
+                    self.active[name]["bytes"] = received
+        
+        self._verify(partial, expected_size, digest, self._etag_md5(response))
+        return offset, received
+    
+    def _verify_satisfied(self, response, partial: str, offset: int) -> None:
+        """Accept a 416 reply to a resume only when the partial file is the whole object"""
+        content_range = response.headers.get("Content-Range", "")
+        total = content_range.rsplit("/", 1)[1] if "/" in content_range else ""
+        if not total.isdigit() or int(total) != offset:
+            # The partial file does not match the object - the next attempt starts over
+            os.remove(partial)
+            raise DownloadError(f"Range not satisfiable for a {offset} byte partial download")
+        
+        expected_md5 = self._etag_md5(response)
+        digest = self._resume_digest(partial, offset) if expected_md5 else None
+        self._verify(partial, offset, digest, expected_md5)
+    
+    @staticmethod
+    def _expected_size(response, offset: int) -> Optional[int]:
+        """Full size of the file from Content-Range or Content-Length"""
+        content_range = response.headers.get("Content-Range", "")
+        if "/" in content_range and not content_range.endswith("/*"):
+            return int(content_range.rsplit("/", 1)[1])
+        content_length = response.headers.get("Content-Length")
+        if content_length is not None and response.headers.get("Content-Encoding") in (None, "identity"):
+            return offset + int(content_length)
+        return None
+    
+    @staticmethod
+    def _etag_md5(response) -> Optional[str]:
+        """The MD5 of the object when the ETag is one (single-part S3 uploads)"""
+        etag = response.headers.get("ETag", "").strip('"')
+        if len(etag) == 32 and all(c in "0123456789abcdef" for c in etag.lower()):
+            return etag.lower()
+        return None
+    
+    def _resume_digest(self, partial: str, offset: int):
+        digest = hashlib.md5()
+        if offset:
+            with open(partial, "rb") as f:
+                for block in iter(lambda: f.read(self.chunk_size), b""):
+                    digest.update(block)
+        return digest
+    
+    @staticmethod
+    def _verify(partial: str, expected_size: Optional[int], digest, expected_md5: Optional[str]) -> None:
+        size = os.path.getsize(partial)
+        if expected_size is not None and size != expected_size:
+            # Keep the partial file - the next attempt resumes from here
+            raise DownloadError(f"Incomplete download: {size} of {expected_size} bytes")
+        if digest is not None and expected_md5 and digest.hexdigest() != expected_md5:
+            os.remove(partial)
+            raise DownloadError("Checksum mismatch")
+    
+    def remove_job(self, job_id: str) -> None:
+        """Delete a job's directory once its granules are no longer needed"""
+        directory = self.job_dir(job_id)
+        shutil.rmtree(directory, ignore_errors=True)
+        with self.lock:
+            for filename in [f for f in self.file_locks if os.path.dirname(f) == directory]:
+                del self.file_locks[filename]
+            self.cancelled.discard(job_id)
+    
+    def remove_stale(self, keep_job_ids: List[str], max_age: float) -> int:
+        """Delete job directories older than max_age that are not in use"""
+        if not os.path.isdir(self.base_dir):
+            return 0
+        
+        removed = 0
+        cutoff = time.time() - max_age
+        keep = set(keep_job_ids)
+        for entry in os.scandir(self.base_dir):
+            if entry.is_dir() and entry.name not in keep and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        return removed
+    
+    def touch_job(self, job_id: str) -> None:
+        """Mark a job's granules as just used, so garbage collection evicts them last"""
+        try:
+            os.utime(self.job_dir(job_id))
+        except FileNotFoundError:
+            pass
+    
+    def job_usage(self) -> List[Dict[str, Any]]:
+        """Size and last use of every job directory, least recently used first"""
+        if not os.path.isdir(self.base_dir):
+            return []
+        
+        jobs = []
+        for entry in os.scandir(self.base_dir):
+            if not entry.is_dir():
+                continue
+            size, last_used = 0, entry.stat().st_mtime
+            try:
+                for file_entry in os.scandir(entry.path):
+                    if file_entry.is_file():
+                        stat = file_entry.stat()
+                        size += stat.st_size
+                        last_used = max(last_used, stat.st_mtime)
+            except FileNotFoundError:
+                continue
+            jobs.append({"job_id": entry.name, "bytes": size, "last_used": last_used})
+        jobs.sort(key=lambda job: job["last_used"])
+        return jobs
+    
+    def remove_idle(self, limit: int, min_idle: float, keep_job_ids: Iterable[str] = ()) -> Tuple[int, int]:
+        """
+        Delete up to limit job directories unused for min_idle seconds, oldest first
+        
+        Jobs in keep_job_ids or still downloading are skipped. Returns the number of
+        directories removed and the bytes freed.
+        """
+        with self.lock:
+            keep = set(keep_job_ids) | set(self.job_futures)
+        
+        removed, freed = 0, 0
+        cutoff = time.time() - min_idle
+        for job in self.job_usage():
+            if removed >= limit or job["last_used"] >= cutoff:
+                break
+            if job["job_id"] in keep:
+                continue
+            self.remove_job(job["job_id"])
+            removed += 1
+            freed += job["bytes"]
+        return removed, freed
+    
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get download statistics, including per-file throughput of recent downloads"""
+        with self.lock:
+            now = time.time()
+            active = [
+                {
+                    "file": name,
+                    "bytes": info["bytes"],
+                    "resumed_from": info["resumed_from"],
+                    "bytes_per_second": round(info["bytes"] / max(now - info["started"], 1e-6))
+                }
+                for name, info in self.active.items()
+            ]
+            stats = dict(self.stats)
+            recent = list(self.recent)
+        
+        return {
+            **stats,
+            "seconds": round(stats["seconds"], 3),
+            "average_bytes_per_second": round(stats["bytes"] / stats["seconds"]) if stats["seconds"] else None,
+            "max_workers": self.max_workers,
+            "directory": self.base_dir,
+            "active": active,
+            "recent": recent
+        }
@@ -0,0 +1,190 @@
+"""
+Figure Pool Module for Harmony API
+Reusable pre-built matplotlib / cartopy figure templates so renders only swap the data
+"""
+
+import io
+import time
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+class FigureTemplate:
+    """A figure with its axes (and colorbar axes) built once and reset between renders"""
+    
+    def __init__(self, fig, ax, colorbar_shrink: Optional[float] = None):
+        from matplotlib.colorbar import make_axes_gridspec
+        
+        self.fig = fig
+        self.ax = ax
+        self.cax = None
+        self.colorbar_kw: Dict[str, Any] = {}
+        if colorbar_shrink is not None:
+            # Same layout fig.colorbar(ax=ax, shrink=...) would give, but the axes outlive the colorbar
+            self.cax, self.colorbar_kw = make_axes_gridspec(ax, shrink=colorbar_shrink)
+            self.cax_position = self.cax.get_position(original=True)
+        
+        # Everything present now is part of the template; anything added later is render data
+        self.base_artists = set(ax.get_children())
+        self.limits = (ax.get_xlim(), ax.get_ylim())
+        self.autoscale = (ax.get_autoscalex_on(), ax.get_autoscaley_on())
+        self.labels = (ax.get_xlabel(), ax.get_ylabel())
+        self.uses = 0
+    
+    def colorbar(self, mappable, **kwargs):
+        """Draw the colorbar for this render's data artist into the template's colorbar axes"""
+        if self.cax is None:
+            raise ValueError("Figure template was built without a colorbar")
+        return self.fig.colorbar(mappable, cax=self.cax, **self.colorbar_kw, **kwargs)
+    
+    def to_png(self, dpi: int = 150, bbox_inches: Optional[str] = "tight") -> bytes:
+        buffer = io.BytesIO()
+        self.fig.savefig(buffer, format="png", dpi=dpi, bbox_inches=bbox_inches)
+        return buffer.getvalue()
+    
+    def reset(self) -> None:
+        """Remove the last render's data, colorbar, labels and limits"""
+        ax = self.ax
+        for artist in ax.get_children():
+            if artist not in self.base_artists:
+                artist.remove()
+        
+        # Line colors would otherwise continue the previous render's color cycle
+        ax.set_prop_cycle(None)
+        ax.set_title("")
+        ax.set_xlabel(self.labels[0])
+        ax.set_ylabel(self.labels[1])
+        # Restoring the limits also undoes invert_xaxis() and set_ylim() from the last render
+        ax.set_xlim(self.limits[0])
+        ax.set_ylim(self.limits[1])
+        ax.set_autoscalex_on(self.autoscale[0])
+        ax.set_autoscaley_on(self.autoscale[1])
+        if any(self.autoscale):
+            ax.relim()
+        
+        if self.cax is not None:
+            self.cax.cla()
+            # A colorbar wraps the axes' locator in its own; drop it so they do not nest across renders
+            self.cax.set_axes_locator(None)
+            self.cax.set_position(self.cax_position)
+        
+        self.uses += 1
+
+class FigureTemplatePool:
+    """Per-process pool of idle figure templates keyed by plot kind, size and extent"""
+    
+    def __init__(self, max_idle_per_key: int = 4, max_keys: int = 32):
+        self.max_idle_per_key = max_idle_per_key
+        # Map extents follow request bboxes, so only the most recently used keys keep templates
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.idle: "OrderedDict[tuple, List[FigureTemplate]]" = OrderedDict()
+        self.stats = {
+            "built": 0,
+            "reused": 0,
+            "discarded": 0,
+            "build_seconds": 0.0,
+            "new_renders": 0,
+            "new_render_seconds": 0.0,
+            "reused_renders": 0,
+            "reused_render_seconds": 0.0
+        }
+    
+    @staticmethod
+    def _key(kind: str, figsize: Sequence[float], extent: Optional[Sequence[float]],
+             colorbar_shrink: Optional[float]) -> tuple:
+        return kind, tuple(figsize), tuple(extent) if extent is not None else None, colorbar_shrink
+    
+    def _build(self, figsize: Sequence[float], setup: Callable[[Any], Any],
+               colorbar_shrink: Optional[float]) -> FigureTemplate:
+        # Figures are not registered with pyplot, so render threads never share its state
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        
+        fig = Figure(figsize=tuple(figsize))
+        FigureCanvasAgg(fig)
+        ax = setup(fig)
+        return FigureTemplate(fig, ax, colorbar_shrink)
+    
+    @contextmanager
+    def template(self, kind: str, figsize: Sequence[float], setup: Callable[[Any], Any],
+                 extent: Optional[Sequence[float]] = None, colorbar_shrink: Optional[float] = None):
+        """
+        Borrow a template, building it with setup(fig) -> ax if none is idle
+        
+        setup must only depend on kind, figsize and extent, which form the pool key.
+        The template is reset and returned to the pool afterwards, or dropped if the
+        render raised.
+        """
+        key = self._key(kind, figsize, extent, colorbar_shrink)
+        with self.lock:
+            idle = self.idle.get(key)
+            template = idle.pop() if idle else None
+        
+        reused = template is not None
+        if template is None:
+            started = time.perf_counter()
+            template = self._build(figsize, setup, colorbar_shrink)
+            with self.lock:
+                self.stats["built"] += 1
+                self.stats["build_seconds"] += time.perf_counter() - started
+        
+        started = time.perf_counter()
+        healthy = False
+        try:
+            yield template
+            healthy = True
+        finally:
+            elapsed = time.perf_counter() - started
+            if healthy:
+                try:
+                    template.reset()
+                except Exception as e:
+                    logging.warning(f"Discarding {kind} figure template that failed to reset: {e}")
+                    healthy = False
+            
+            with self.lock:
+                prefix = "reused" if reused else "new"
+                self.stats[f"{prefix}_renders"] += 1
+                self.stats[f"{prefix}_render_seconds"] += elapsed
+                if reused:
+                    self.stats["reused"] += 1
+                
+                idle = self.idle.setdefault(key, [])
+                self.idle.move_to_end(key)
+                if healthy and len(idle) < self.max_idle_per_key:
+                    idle.append(template)
+                else:
+                    self.stats["discarded"] += 1
+                while len(self.idle) > self.max_keys:
+                    _, dropped = self.idle.popitem(last=False)
+                    self.stats["discarded"] += len(dropped)
+    
+    def clear(self) -> None:
+        with self.lock:
+            self.idle.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = self.stats
+            built = stats["built"]
+            new_renders = stats["new_renders"]
+            reused_renders = stats["reused_renders"]
+            avg_build = stats["build_seconds"] / built if built else None
+            avg_new = stats["new_render_seconds"] / new_renders if new_renders else None
+            avg_reused = stats["reused_render_seconds"] / reused_renders if reused_renders else None
+            
+            return {
+                "templates_built": built,
+                "templates_reused": stats["reused"],
+                "templates_discarded": stats["discarded"],
+                "idle_templates": {"/".join(str(part) for part in key if part is not None): len(idle)
+                                   for key, idle in self.idle.items()},
+                "avg_build_seconds": round(avg_build, 4) if avg_build is not None else None,
+                "avg_new_template_render_seconds": round(avg_new, 4) if avg_new is not None else None,
+                "avg_reused_template_render_seconds": round(avg_reused, 4) if avg_reused is not None else None,
+                # Time a reused render saves over building a template and rendering on it
+                "speedup": round((avg_build + avg_new) / avg_reused, 2) if avg_build and avg_new and avg_reused else None
+            }
@@ -0,0 +1,102 @@
+"""
+HTTP Cache Module for Harmony API
+Content-addressed ETags, If-None-Match handling and Cache-Control for rendered outputs
+"""
+
+import datetime as dt
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+def compute_etag(content: bytes) -> str:
+    """Strong ETag derived from the response body"""
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def parse_end_time(end_time: Optional[str]) -> Optional[dt.datetime]:
+    """Request end time as an aware UTC datetime (naive times are UTC)"""
+    if not end_time:
+        return None
+    try:
+        parsed = dt.datetime.fromisoformat(end_time.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt.timezone.utc)
+    return parsed
+
+class HTTPCachePolicy:
+    """Decides how long clients, the Next.js proxy and CDNs may keep a response"""
+    
+    def __init__(self, immutable_after_hours: float = 48, immutable_max_age: int = 31536000,
+                 recent_max_age: int = 0):
+        # Scans that ended this long ago are final and never re-rendered differently
+        self.immutable_after = dt.timedelta(hours=immutable_after_hours)
+        self.immutable_max_age = immutable_max_age
+        self.recent_max_age = recent_max_age
+        self.lock = threading.Lock()
+        self.stats = {"responses": 0, "not_modified": 0, "immutable": 0}
+    
+    def is_immutable(self, end_time: Optional[str]) -> bool:
+        parsed = parse_end_time(end_time)
+        return parsed is not None and parsed <= dt.datetime.now(dt.timezone.utc) - self.immutable_after
+    
+    def cache_control(self, end_time: Optional[str]) -> str:
+        """Long-lived for historical time ranges, revalidate-every-time otherwise"""
+        if self.is_immutable(end_time):
+            return f"public, max-age={self.immutable_max_age}, immutable"
+        if self.recent_max_age:
+            return f"public, max-age={self.recent_max_age}, must-revalidate"
+        return "no-cache"
+    
+    def conditional(self, response: Response, if_none_match: Optional[str],
+                    end_time: Optional[str] = None) -> Response:
+        """
+        Add ETag and Cache-Control to a response, or replace it with 304 Not Modified
+        
+        The body must already be rendered (Response, JSONResponse), since the
+        ETag is computed from it.
+        """
+        etag = compute_etag(response.body)
+        cache_control = self.cache_control(end_time)
+        
+        with self.lock:
+            self.stats["responses"] += 1
+            if cache_control.endswith("immutable"):
+                self.stats["immutable"] += 1
+            not_modified = etag_matches(if_none_match, etag)
+            if not_modified:
+                self.stats["not_modified"] += 1
+        
+        if not_modified:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+        
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = cache_control
+        return response
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **self.stats,
+                "immutable_after_hours": self.immutable_after.total_seconds() / 3600,
+                "immutable_max_age": self.immutable_max_age,
+                "recent_max_age": self.recent_max_age
+            }
@@ -0,0 +1,189 @@
+"""
+Job Index Module for Harmony API
+Persistent index from normalized Harmony request parameters to Harmony jobs and their result URLs
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, List, Optional
+
+# Finished jobs whose results are complete; anything else is never reused
+REUSABLE_STATUSES = ("running", "successful")
+
+class HarmonyJobIndex:
+    """SQLite index of submitted Harmony jobs so equivalent requests reuse them"""
+    
+    def __init__(self, db_path: str, ttl_hours: float = 720, data_latency_hours: float = 24,
+                 open_window_ttl_seconds: float = 900):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_hours * 3600
+        # A job submitted before its time window's data could all be available (window stop
+        # + latency) saw only part of the granules, so it is reused only briefly
+        self.data_latency_seconds = data_latency_hours * 3600
+        self.open_window_ttl_seconds = open_window_ttl_seconds
+        self.lock = threading.RLock()
+        self.stats = {"reused": 0, "submitted": 0}
+        
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._init_database()
+        self.cleanup_expired()
+    
+    def _init_database(self):
+        """Initialize SQLite table for the job index"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS harmony_jobs (
+                    request_key TEXT PRIMARY KEY,
+                    job_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result_urls TEXT,
+                    created_at REAL NOT NULL,
+                    window_stop REAL
+                )
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(harmony_jobs)")]
+            if "window_stop" not in columns:
+                # Jobs indexed before window tracking count as submitted while their window was open
+                conn.execute("ALTER TABLE harmony_jobs ADD COLUMN window_stop REAL")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_harmony_jobs_job_id ON harmony_jobs(job_id)
+            """)
+    
+    def window_open_at(self, window_stop: Optional[float], at: float) -> bool:
+        """Whether granules of a time window ending at window_stop may still arrive after time at"""
+        return window_stop is None or window_stop + self.data_latency_seconds > at
+    
+    def reuse_ttl(self, window_stop: Optional[float], created_at: float) -> float:
+        """How long a job created at created_at may be reused"""
+        if self.window_open_at(window_stop, created_at):
+            return min(self.open_window_ttl_seconds, self.ttl_seconds)
+        return self.ttl_seconds
+    
+    def lookup(self, request_key: str) -> Optional[Dict[str, Any]]:
+        """Job of an equivalent earlier request that finished cleanly and saw its whole time window"""
+        with self.lock:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    row = conn.execute(
+                        "SELECT job_id, status, result_urls, created_at, window_stop FROM harmony_jobs "
+                        "WHERE request_key = ?",
+                        (request_key,)
+                    ).fetchone()
+            except Exception as e:
+                logging.error(f"Error looking up Harmony job for {request_key}: {e}")
+                return None
+            
+            if not row:
+                return None
+            
+            job_id, job_status, result_urls, created_at, window_stop = row
+            if job_status not in REUSABLE_STATUSES:
+                return None
+            if time.time() - created_at > self.reuse_ttl(window_stop, created_at):
+                self.forget(job_id)
+                return None
+            
+            self.stats["reused"] += 1
+        
+        return {
+            "job_id": job_id,
+            "status": job_status,
+            "result_urls": json.loads(result_urls) if result_urls else None,
+            "created_at": created_at
+        }
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Index entry of a job by its Harmony job ID"""
+        with self.lock:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    row = conn.execute(
+                        "SELECT status, result_urls FROM harmony_jobs WHERE job_id = ?", (job_id,)
+                    ).fetchone()
+            except Exception as e:
+                logging.error(f"Error reading Harmony job {job_id}: {e}")
+                return None
+        
+        if not row:
+            return None
+        return {
+            "job_id": job_id,
+            "status": row[0],
+            "result_urls": json.loads(row[1]) if row[1] else None
+        }
+    
+    def record_submitted(self, request_key: str, job_id: str, window_stop: Optional[float] = None) -> None:
+        """Index a newly submitted job so equivalent requests wait on it instead of resubmitting"""
+        with self.lock:
+            self.stats["submitted"] += 1
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO harmony_jobs "
+                        "(request_key, job_id, status, result_urls, created_at, window_stop) "
+                        "VALUES (?, ?, 'running', NULL, ?, ?)",
+                        (request_key, job_id, time.time(), window_stop)
+                    )
+            except Exception as e:
+                logging.error(f"Error recording Harmony job {job_id}: {e}")
+    
+    def record_results(self, job_id: str, result_urls: List[str], job_status: str = "successful") -> None:
+        """Record a finished job's status and result URLs (only "successful" jobs are reused)"""
+        with self.lock:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.execute(
+                        "UPDATE harmony_jobs SET status = ?, result_urls = ? WHERE job_id = ?",
+                        (job_status, json.dumps(result_urls), job_id)
+                    )
+            except Exception as e:
+                logging.error(f"Error recording results of Harmony job {job_id}: {e}")
+    
+    def forget(self, job_id: str) -> None:
+        """Drop a job that failed or whose results are gone"""
+        with self.lock:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.execute("DELETE FROM harmony_jobs WHERE job_id = ?", (job_id,))
+            except Exception as e:
+                logging.error(f"Error forgetting Harmony job {job_id}: {e}")
+    
+    def cleanup_expired(self) -> None:
+        """Remove jobs whose results Harmony no longer keeps, or that saw only part of their window"""
+        now = time.time()
+        with self.lock:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.execute(
+                        "DELETE FROM harmony_jobs WHERE created_at < ? OR (created_at < ? AND "
+                        "(window_stop IS NULL OR window_stop + ? > created_at))",
+                        (now - self.ttl_seconds, now - self.open_window_ttl_seconds, self.data_latency_seconds)
+                    )
+            except Exception as e:
+                logging.error(f"Error cleaning up Harmony job index: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get job index statistics"""
+        with self.lock:
+            try:
+                with sqlite3.connect(self.db_path) as conn:
+                    counts = dict(conn.execute(
+                        "SELECT status, COUNT(*) FROM harmony_jobs GROUP BY status"
+                    ).fetchall())
+            except Exception as e:
+                logging.error(f"Error getting job index stats: {e}")
+                counts = {}
+        
+        return {
+            **self.stats,
+            "indexed_jobs": sum(counts.values()),
+            "running_jobs": counts.get("running", 0),
+            "ttl_hours": round(self.ttl_seconds / 3600, 1),
+            "data_latency_hours": round(self.data_latency_seconds / 3600, 1),
+            "open_window_ttl_seconds": self.open_window_ttl_seconds,
+            "db_path": self.db_path
+        }
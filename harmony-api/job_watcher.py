@@ -0,0 +1,199 @@
+"""
+Job Watcher Module for Harmony API
+Polls the status of all outstanding Harmony jobs from one asyncio task with adaptive backoff
+"""
+
+import asyncio
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+DONE_STATUSES = ("successful", "complete_with_errors")
+FAILED_STATUSES = ("failed", "canceled", "paused")
+# Poll errors worth retrying (timeouts, throttling); any other 4xx means the job cannot be polled
+RETRYABLE_HTTP_STATUSES = (408, 425, 429)
+
+class HarmonyJobError(Exception):
+    """A Harmony job ended without results"""
+
+class HarmonyJobWatcher:
+    """Single poller for every Harmony job the server is waiting on"""
+    
+    def __init__(self, get_client: Callable[[], Any], min_interval: float = 2.0,
+                 max_interval: float = 30.0, backoff: float = 1.5, max_poll_errors: int = 10):
+        self.get_client = get_client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_poll_errors = max_poll_errors
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        
+        # job_id -> {"future", "progress", "status", "interval", "next_poll", "errors", "listeners", "waiters"}
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"polls": 0, "poll_errors": 0, "completed": 0, "failed": 0}
+    
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and self.loop.is_running()
+    
+    async def run(self) -> None:
+        """Poll due jobs forever; sleeps until the next job is due or a new job is added"""
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        
+        try:
+            while True:
+                now = time.monotonic()
+                due = [job_id for job_id, job in self.jobs.items() if job["next_poll"] <= now]
+                if due:
+                    results = await asyncio.gather(*(self._poll(job_id) for job_id in due), return_exceptions=True)
+                    # One job's failure must not stop polling the others
+                    for job_id, result in zip(due, results):
+                        if isinstance(result, Exception):
+                            logging.error(f"Watching Harmony job {job_id} failed: {result}")
+                            self._fail(job_id, result)
+                
+                next_poll = min((job["next_poll"] for job in self.jobs.values()), default=None)
+                timeout = self.max_interval if next_poll is None else max(0.0, next_poll - time.monotonic())
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.loop = None
+            for job in self.jobs.values():
+                if not job["future"].done():
+                    job["future"].cancel()
+            self.jobs.clear()
+    
+    async def _poll(self, job_id: str) -> None:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        
+        self.stats["polls"] += 1
+        try:
+            progress, job_status, message = await asyncio.to_thread(self.get_client().progress, job_id)
+        except Exception as e:
+            self.stats["poll_errors"] += 1
+            job["errors"] += 1
+            status_code = getattr(getattr(e, "response", None), "status_code", None)
+            permanent = isinstance(status_code, int) and 400 <= status_code < 500 \
+                and status_code not in RETRYABLE_HTTP_STATUSES
+            if permanent or job["errors"] >= self.max_poll_errors:
+                # Unknown job, bad credentials or a persistent outage - let waiters give up
+                logging.error(f"Giving up on Harmony job {job_id} after {job['errors']} poll errors: {e}")
+                self._fail(job_id, HarmonyJobError(f"Harmony job {job_id} cannot be polled: {e}"), job)
+                return
+            logging.warning(f"Polling Harmony job {job_id} failed: {e}")
+            job["interval"] = min(job["interval"] * self.backoff, self.max_interval)
+            job["next_poll"] = time.monotonic() + job["interval"]
+            return
+        
+        if job["future"].done():
+            # Every waiter gave up while this poll was in flight
+            return
+        job["errors"] = 0
+        # Poll quickly while the job is moving, back off while it is not
+        if progress != job["progress"] or job_status != job["status"]:
+            job["interval"] = self.min_interval
+        else:
+            job["interval"] = min(job["interval"] * self.backoff, self.max_interval)
+        job["progress"], job["status"] = progress, job_status
+        job["next_poll"] = time.monotonic() + job["interval"]
+        
+        if job["listeners"]:
+            # Listeners write job state, which can block (e.g. on a SQLite lock), so keep them off the loop
+            await asyncio.to_thread(self._notify, job_id, list(job["listeners"]), progress, job_status)
+        
+        if job_status in DONE_STATUSES:
+            self.stats["completed"] += 1
+            if self.jobs.get(job_id) is job:
+                self.jobs.pop(job_id)
+            if not job["future"].done():
+                job["future"].set_result(job_status)
+        elif job_status in FAILED_STATUSES:
+            self._fail(job_id, HarmonyJobError(f"Harmony job {job_id} {job_status}: {message}"), job)
+    
+    def _fail(self, job_id: str, error: Exception, job: Optional[Dict[str, Any]] = None) -> None:
+        """Stop polling a job and fail its waiters, unless they already gave up"""
+        job = job or self.jobs.get(job_id)
+        if job is None:
+            return
+        self.stats["failed"] += 1
+        if self.jobs.get(job_id) is job:
+            self.jobs.pop(job_id)
+        if not job["future"].done():
+            job["future"].set_exception(error)
+    
+    @staticmethod
+    def _notify(job_id: str, listeners: List[Callable[[int, str], None]], progress: int, job_status: str) -> None:
+        for listener in listeners:
+            try:
+                listener(progress, job_status)
+            except Exception as e:
+                logging.error(f"Progress listener for Harmony job {job_id} failed: {e}")
+    
+    async def wait(self, job_id: str, on_progress: Optional[Callable[[int, str], None]] = None) -> str:
+        """Wait until a job finishes, reporting (progress, status) on every poll"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            job = {
+                "future": asyncio.get_running_loop().create_future(),
+                "progress": None,
+                "status": None,
+                "interval": self.min_interval,
+                "next_poll": time.monotonic(),
+                "errors": 0,
+                "listeners": [],
+                "waiters": 0
+            }
+            self.jobs[job_id] = job
+            self.wakeup.set()
+        if on_progress:
+            job["listeners"].append(on_progress)
+        job["waiters"] += 1
+        try:
+            return await asyncio.shield(job["future"])
+        except asyncio.CancelledError:
+            # Stop polling a job nobody is waiting on any more
+            if on_progress in job["listeners"]:
+                job["listeners"].remove(on_progress)
+            if job["waiters"] == 1 and self.jobs.get(job_id) is job:
+                self.jobs.pop(job_id)
+                job["future"].cancel()
+            raise
+        finally:
+            job["waiters"] -= 1
+    
+    def wait_sync(self, job_id: str, on_progress: Optional[Callable[[int, str], None]] = None,
+                  timeout: Optional[float] = None) -> str:
+        """Block a worker thread until the watcher reports the job finished"""
+        loop = self.loop
+        if loop is None or not loop.is_running():
+            raise RuntimeError("Job watcher is not running")
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            raise RuntimeError("wait_sync cannot be called from the event loop thread")
+        return asyncio.run_coroutine_threadsafe(self.wait(job_id, on_progress), loop).result(timeout)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        jobs: List[Dict[str, Any]] = [
+            {
+                "job_id": job_id,
+                "progress": job["progress"],
+                "status": job["status"],
+                "poll_interval": round(job["interval"], 1)
+            }
+            for job_id, job in list(self.jobs.items())
+        ]
+        return {
+            **self.stats,
+            "running": self.running,
+            "outstanding_jobs": jobs
+        }
@@ -5,32 +5,28 @@ A modern, secure FastAPI backend for fetching NASA TEMPO data
 
 import os
 import datetime as dt
-import io
 import base64
 import asyncio
 import uuid
 import hashlib
 import time
-from typing import Optional, List, Dict, Any
+import tempfile
+import socket
+from typing import Optional, List, Dict, Any, Tuple, Callable
 from contextlib import asynccontextmanager
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import CancelledError
 import threading
 
 import numpy as np
-import xarray as xr
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs
-import cartopy.feature as cfeature
-from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
-from xarray.plot.utils import label_from_attrs
-
-from fastapi import FastAPI, HTTPException, Depends, status, BackgroundTasks
+
+from fastapi import FastAPI, HTTPException, Depends, Header, Request as FastAPIRequest, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.exception_handlers import request_validation_exception_handler
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, StreamingResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field, model_validator
 from dotenv import load_dotenv
 import httpx
 import json
@@ -38,6 +34,28 @@ import json
 from harmony import BBox, Client, Collection, Request
 from harmony.config import Environment
 
+from prefetch import PrefetchScheduler
+from animation import ANIMATION_FORMATS, render_animation, shutdown_frame_pool, supported_formats
+from data_export import EXPORT_FORMATS, check_export_format, stream_export
+from regrid import grid_for_data, regridder
+from point_query import POINT_METHODS, point_index_cache, points_bbox
+from region_stats import compute_region_statistics, polygon_bbox
+from quality_mask import QUALITY_FLAG_VARIABLE, quality_masker, with_quality_flag
+from download_manager import DownloadManager, DownloadCancelled
+from job_index import HarmonyJobIndex
+from job_watcher import HarmonyJobWatcher, DONE_STATUSES
+from scheduler import WorkScheduler, SchedulerBusy
+from shared_state import LeaderLock, create_state_store
+from figure_pool import FigureTemplatePool
+from http_cache import HTTPCachePolicy
+from response_encoding import ResponseEncoder, dumps
+from array_cache import DecodedArrayCache, GEOLOCATION_VARIABLES
+from color_scale import ColorScaleService
+from bbox_clip import SwathClipper, map_extent
+from natural_earth import DEFAULT_NATURAL_EARTH_DIR, NATURAL_EARTH_SCALE, preload_natural_earth
+from persistent_storage import DataStorage, PersistentCache
+from storage_gc import ArrayCacheSource, DataStorageSource, GranuleSource, PersistentCacheSource, StorageGC
+
 # Load environment variables
 load_dotenv()
 
@@ -51,7 +69,9 @@ class TempoDataRequest(BaseModel):
     end_time: str = Field(..., description="End time in ISO format (YYYY-MM-DDTHH:MM:SS)")
     bbox: Optional[List[float]] = Field(None, description="Bounding box [west, south, east, north]")
     variables: Optional[List[str]] = Field(None, description="Specific variables to retrieve")
-    
+    format: Optional[str] = Field(None, description="Return the variable arrays as 'arrow', 'npy' or 'zarr' instead of file info")
+    max_quality_flag: Optional[int] = Field(None, description="Drop pixels whose main_data_quality_flag is above this value")
+
 class TempoDataResponse(BaseModel):
     """Response model for TEMPO data"""
     success: bool
@@ -65,8 +85,10 @@ class VisualizationRequest(BaseModel):
     end_time: str = Field(..., description="End time in ISO format (YYYY-MM-DDTHH:MM:SS)")
     bbox: Optional[List[float]] = Field(None, description="Bounding box [west, south, east, north]")
     variables: Optional[List[str]] = Field(None, description="Specific variables to visualize")
-    plot_type: str = Field("map", description="Type of plot: 'map', 'zonal_mean', or 'contour'")
+    plot_type: str = Field("map", description="Type of plot: 'map', 'zonal_mean', 'contour' or 'gridded_map'")
+    max_quality_flag: Optional[int] = Field(None, description="Mask pixels whose main_data_quality_flag is above this value")
     collection_id: str = Field("C2930730944-LARC_CLOUD", description="Collection ID for TEMPO data")
+    progressive: bool = Field(False, description="Return a fast low-resolution preview; the full image follows as a job (/tempo/visualize only)")
 
 class HealthResponse(BaseModel):
     """Health check response"""
@@ -74,13 +96,79 @@ class HealthResponse(BaseModel):
     timestamp: str
     version: str
 
+class TimeWindow(BaseModel):
+    """A single time slice of a batch visualization request"""
+    start_time: str = Field(..., description="Start time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+    end_time: str = Field(..., description="End time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+
+class BatchVisualizationRequest(BaseModel):
+    """Request model for batch visualization of variables x plot types x time windows"""
+    time_windows: List[TimeWindow] = Field(..., description="Time windows to visualize")
+    bbox: Optional[List[float]] = Field(None, description="Bounding box [west, south, east, north]")
+    variables: List[str] = Field(["product/vertical_column"], description="Variables to visualize")
+    plot_types: List[str] = Field(["map", "zonal_mean", "contour"], description="List of plot types: 'map', 'zonal_mean', 'contour', 'gridded_map'")
+    max_quality_flag: Optional[int] = Field(None, description="Mask pixels whose main_data_quality_flag is above this value")
+    collection_id: str = Field("C2930730944-LARC_CLOUD", description="Collection ID for TEMPO data")
+
+class AnimationRequest(BaseModel):
+    """Request model for time-series animations"""
+    start_time: str = Field(..., description="Start time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+    end_time: str = Field(..., description="End time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+    bbox: Optional[List[float]] = Field(None, description="Bounding box [west, south, east, north]")
+    variable: str = Field("product/vertical_column", description="Variable to animate")
+    format: str = Field("gif", description="Output format: 'gif', 'webp' or 'mp4'")
+    fps: int = Field(2, ge=1, le=30, description="Frames per second")
+    vmin: Optional[float] = Field(None, description="Fixed color scale minimum (robust percentile if omitted)")
+    vmax: Optional[float] = Field(None, description="Fixed color scale maximum (robust percentile if omitted)")
+    collection_id: str = Field("C2930730944-LARC_CLOUD", description="Collection ID for TEMPO data")
+    
+    @model_validator(mode="after")
+    def check_color_limits(self):
+        if (self.vmin is None) != (self.vmax is None):
+            raise ValueError("vmin and vmax must be given together")
+        if self.vmin is not None and self.vmin >= self.vmax:
+            raise ValueError(f"vmin ({self.vmin}) must be less than vmax ({self.vmax})")
+        return self
+
+class PointQueryRequest(BaseModel):
+    """Request model for point / time-series queries"""
+    start_time: str = Field(..., description="Start time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+    end_time: str = Field(..., description="End time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+    points: List[List[float]] = Field(..., description="Points as [latitude, longitude] pairs")
+    variables: List[str] = Field(["product/vertical_column"], description="Variables to sample")
+    method: str = Field("nearest", description="Sampling method: 'nearest' or 'idw' (inverse-distance weighted)")
+    max_distance_km: float = Field(10.0, gt=0, description="Ignore pixels farther than this from a point")
+    max_quality_flag: Optional[int] = Field(None, description="Ignore pixels whose main_data_quality_flag is above this value")
+    bbox: Optional[List[float]] = Field(None, description="Bounding box for the Harmony request (defaults to the points' extent)")
+    collection_id: str = Field("C2930730944-LARC_CLOUD", description="Collection ID for TEMPO data")
+
+class RegionStatisticsRequest(BaseModel):
+    """Request model for region statistics"""
+    start_time: str = Field(..., description="Start time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+    end_time: str = Field(..., description="End time in ISO format (YYYY-MM-DDTHH:MM:SS)")
+    bbox: Optional[List[float]] = Field(None, description="Bounding box [west, south, east, north]")
+    polygon: Optional[List[List[float]]] = Field(None, description="Region polygon as [longitude, latitude] vertices")
+    variables: List[str] = Field(["product/vertical_column"], description="Variables to summarize")
+    max_quality_flag: Optional[int] = Field(None, description="Ignore pixels whose main_data_quality_flag is above this value")
+    percentiles: List[float] = Field([5, 25, 50, 75, 95], description="Percentiles to compute")
+    bins: int = Field(20, ge=1, le=256, description="Number of histogram bins")
+    collection_id: str = Field("C2930730944-LARC_CLOUD", description="Collection ID for TEMPO data")
+
+class ReadinessResponse(BaseModel):
+    """Readiness check response"""
+    status: str  # "ready", "warming", "failed"
+    ready: bool
+    harmony_client: bool
+    warmup: Dict[str, Any]
+
 class ParallelVisualizationRequest(BaseModel):
     """Request model for parallel data visualization"""
     start_time: str = Field(..., description="Start time in ISO format (YYYY-MM-DDTHH:MM:SS)")
     end_time: str = Field(..., description="End time in ISO format (YYYY-MM-DDTHH:MM:SS)")
     bbox: Optional[List[float]] = Field(None, description="Bounding box [west, south, east, north]")
     variables: Optional[List[str]] = Field(None, description="Specific variables to visualize")
-    plot_types: List[str] = Field(..., description="List of plot types: 'map', 'zonal_mean', 'contour'")
+    plot_types: List[str] = Field(..., description="List of plot types: 'map', 'zonal_mean', 'contour', 'gridded_map'")
+    max_quality_flag: Optional[int] = Field(None, description="Mask pixels whose main_data_quality_flag is above this value")
     collection_id: str = Field("C2930730944-LARC_CLOUD", description="Collection ID for TEMPO data")
 
 class JobStatus(BaseModel):
@@ -92,22 +180,239 @@ class JobStatus(BaseModel):
     failed_plots: List[str]
     results: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    harmony_progress: Optional[int] = None  # Harmony job progress 0-100
+    harmony_status: Optional[str] = None
 
 # Global variables
 harmony_client: Optional[Client] = None
 
 # Job queue and processing system
 job_queue = {}
-job_results = {}
 job_lock = threading.Lock()
-executor = ThreadPoolExecutor(max_workers=4)  # Limit concurrent processing
+# Per parallel job run by this worker: background task, render futures and the Harmony job it holds
+job_controls: Dict[str, Dict[str, Any]] = {}
+# Harmony job id -> requests currently waiting on or downloading it
+harmony_job_users: Dict[str, int] = {}
+
+# Render work runs on one priority scheduler: interactive requests first, then
+# background parallel/batch jobs, then prefetch. Requests are refused with 429 once
+# too many requests of their class or a higher one are in flight - a global cap, as
+# every caller shares the one SECRET_KEY. Interactive requests are admitted only
+# while they render, not while they wait on Harmony.
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "4"))
+scheduler = WorkScheduler(
+    workers=RENDER_WORKERS,
+    max_active={
+        "interactive": int(os.getenv("MAX_ACTIVE_INTERACTIVE", "8")),
+        "background": int(os.getenv("MAX_ACTIVE_BACKGROUND", "12"))
+    }
+)
+
+# Heavy scientific stack (xarray, matplotlib, cartopy) - imported on first use
+# by load_render_modules() so the API process starts and serves /health fast
+xr = None
+plt = None
+ccrs = None
+cfeature = None
+LONGITUDE_FORMATTER = None
+LATITUDE_FORMATTER = None
+label_from_attrs = None
+# Set once the modules above are imported; read and written only under render_modules_lock
+render_modules_loaded = False
+render_modules_lock = threading.Lock()
+
+# Local Natural Earth cache so map renders never download shapefiles on demand
+NATURAL_EARTH_DIR = os.getenv("NATURAL_EARTH_DIR", DEFAULT_NATURAL_EARTH_DIR)
+
+# Map layout shared by the map renderers
+MAP_EXTENT = [-150, -40, 14, 65]
+MAP_FIGSIZE = (12, 8)
 
-# Caching system
-cache = {}
-cache_lock = threading.Lock()
+# Pre-built figures per plot kind, size and extent; renders only swap the data artists.
+# Each render thread holds at most one template, so RENDER_WORKERS idle ones per key suffice
+figure_pool = FigureTemplatePool(max_idle_per_key=RENDER_WORKERS)
+
+# Render warmup state reported by /ready
+warmup_state = {
+    "status": "pending",  # "pending", "warming", "ready", "failed"
+    "started_at": None,
+    "completed_at": None,
+    "duration_seconds": None,
+    "error": None
+}
+
+# Caching system - responses live in the shared state store
+RESPONSE_CACHE = "responses"
 CACHE_TTL = 3600  # Cache for 1 hour (3600 seconds)
 CACHE_MAX_SIZE = 100  # Maximum number of cached items
 
+# HTTP caching - rendered outputs carry a content ETag; scans that ended more than
+# HTTP_IMMUTABLE_AFTER_HOURS ago are final, so browsers, the Next.js proxy and CDNs
+# may keep them for HTTP_IMMUTABLE_MAX_AGE; anything newer is revalidated
+http_cache = HTTPCachePolicy(
+    immutable_after_hours=float(os.getenv("HTTP_IMMUTABLE_AFTER_HOURS", "48")),
+    immutable_max_age=int(os.getenv("HTTP_IMMUTABLE_MAX_AGE", "31536000")),
+    recent_max_age=int(os.getenv("HTTP_RECENT_MAX_AGE", "0"))
+)
+
+# Response compression (brotli when installed, else gzip) for JSON bodies of at least
+# RESPONSE_COMPRESSION_MIN_BYTES; compressed variants are kept per ETag in memory
+response_encoder = ResponseEncoder(
+    min_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024")),
+    max_cache_mb=float(os.getenv("COMPRESSED_CACHE_MB", "64"))
+)
+
+# Granule downloads - one directory per Harmony job under DOWNLOAD_DIR
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", os.path.join(tempfile.gettempdir(), "tempo_granules"))
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))  # Concurrent file downloads across all jobs
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+download_manager = DownloadManager(DOWNLOAD_DIR, max_workers=DOWNLOAD_WORKERS, retries=DOWNLOAD_RETRIES)
+
+# Persistent state (job index) - /app/cache is a volume in the Docker deployments
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+
+# Harmony keeps job outputs for 30 days; equivalent requests reuse a job until then, unless
+# it was submitted before its time window's granules could all be available (window stop +
+# HARMONY_DATA_LATENCY_HOURS) - such a job is reused for HARMONY_OPEN_WINDOW_TTL_SECONDS only
+HARMONY_RESULT_TTL_HOURS = float(os.getenv("HARMONY_RESULT_TTL_HOURS", "720"))
+HARMONY_DATA_LATENCY_HOURS = float(os.getenv("HARMONY_DATA_LATENCY_HOURS", "24"))
+HARMONY_OPEN_WINDOW_TTL_SECONDS = float(os.getenv("HARMONY_OPEN_WINDOW_TTL_SECONDS", "900"))
+harmony_job_index = HarmonyJobIndex(
+    os.path.join(CACHE_DIR, "harmony_jobs.db"),
+    ttl_hours=HARMONY_RESULT_TTL_HOURS,
+    data_latency_hours=HARMONY_DATA_LATENCY_HOURS,
+    open_window_ttl_seconds=HARMONY_OPEN_WINDOW_TTL_SECONDS
+)
+
+# Response cache and parallel job state shared by all worker processes on this host
+# ("sqlite"), or kept in this process ("memory", single worker only)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")
+JOB_STATE = "jobs"
+JOB_STATE_TTL = int(os.getenv("JOB_STATE_TTL", "86400"))  # Keep finished jobs' results for a day
+state_store = create_state_store(STATE_BACKEND, CACHE_DIR)
+WORKER_HOST = socket.gethostname()
+
+# Host-wide background work (prefetch) runs in whichever worker holds this lock
+prefetch_leader = LeaderLock(os.path.join(CACHE_DIR, "prefetch.lock"))
+
+# Harmony job status polling - fast while a job progresses, backing off while it does not
+HARMONY_POLL_MIN_SECONDS = float(os.getenv("HARMONY_POLL_MIN_SECONDS", "2"))
+HARMONY_POLL_MAX_SECONDS = float(os.getenv("HARMONY_POLL_MAX_SECONDS", "30"))
+HARMONY_POLL_MAX_ERRORS = int(os.getenv("HARMONY_POLL_MAX_ERRORS", "10"))  # Consecutive errors before giving up on a job
+HARMONY_PROGRESS_SHARE = 50  # Share of a parallel job's progress spent waiting on Harmony
+job_watcher = HarmonyJobWatcher(
+    lambda: harmony_client,
+    min_interval=HARMONY_POLL_MIN_SECONDS,
+    max_interval=HARMONY_POLL_MAX_SECONDS,
+    max_poll_errors=HARMONY_POLL_MAX_ERRORS
+)
+
+# Decoded granule arrays shared by every plot type and job on the same granule; with
+# ARRAY_CACHE_DIR (e.g. /dev/shm/tempo_arrays) they are memory-mapped files shared by all processes
+ARRAY_CACHE_MB = float(os.getenv("ARRAY_CACHE_MB", "512"))
+ARRAY_CACHE_DIR = os.getenv("ARRAY_CACHE_DIR") or None
+array_cache = DecodedArrayCache(max_mb=ARRAY_CACHE_MB, shared_dir=ARRAY_CACHE_DIR)
+
+# Color scales (robust percentile limits) per variable, region and day, shared by every
+# plot type, preview, animation and worker so images of the same data are comparable
+COLOR_SCALE_TTL_DAYS = float(os.getenv("COLOR_SCALE_TTL_DAYS", "7"))
+COLOR_SCALE_LOW_PERCENTILE = float(os.getenv("COLOR_SCALE_LOW_PERCENTILE", "2"))
+COLOR_SCALE_HIGH_PERCENTILE = float(os.getenv("COLOR_SCALE_HIGH_PERCENTILE", "98"))
+COLOR_SCALE_REGION_PRECISION = float(os.getenv("COLOR_SCALE_REGION_PRECISION", "1.0"))  # degrees
+color_scales = ColorScaleService(
+    state_store,
+    ttl=COLOR_SCALE_TTL_DAYS * 86400,
+    low_percentile=COLOR_SCALE_LOW_PERCENTILE,
+    high_percentile=COLOR_SCALE_HIGH_PERCENTILE,
+    region_precision=COLOR_SCALE_REGION_PRECISION
+)
+
+# Swaths are cut to the request bbox plus this margin (degrees) before rendering, and
+# maps are drawn over the bbox rather than the whole continent
+BBOX_CLIP_MARGIN = float(os.getenv("BBOX_CLIP_MARGIN", "0.25"))
+swath_clipper = SwathClipper(margin=BBOX_CLIP_MARGIN)
+
+# Regular lat/lon grid cell size (degrees) used by the gridded renderers
+REGRID_RESOLUTION = float(os.getenv("REGRID_RESOLUTION", "0.05"))
+
+# Progressive rendering - previews are raster renders of a decimated swath at low dpi
+PREVIEW_MAX_PIXELS = int(os.getenv("PREVIEW_MAX_PIXELS", "40000"))  # Swath pixels kept after decimation
+PREVIEW_RESOLUTION = float(os.getenv("PREVIEW_RESOLUTION", "0.2"))  # Grid cell size of map previews (degrees)
+PREVIEW_DPI = int(os.getenv("PREVIEW_DPI", "60"))
+PREVIEW_PLOT_TYPES = ("map", "gridded_map", "contour")  # Zonal means are fast enough to render in full
+
+# Downloaded granules by Harmony request, reused while the files are still on disk
+granule_cache = {}
+granule_cache_lock = threading.Lock()
+GRANULE_CACHE_TTL = int(os.getenv("GRANULE_CACHE_TTL", "21600"))  # 6 hours
+
+# Saved visualizations / query results (/app/data is a volume in the Docker deployments)
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+DATA_RETENTION_DAYS = float(os.getenv("DATA_RETENTION_DAYS", "30"))
+data_storage = DataStorage(DATA_DIR)
+persistent_cache = PersistentCache(CACHE_DIR)
+
+# Background storage GC - one worker keeps data, cache and granules under STORAGE_QUOTA_GB (0 = no quota)
+STORAGE_QUOTA_GB = float(os.getenv("STORAGE_QUOTA_GB", "0"))
+GC_INTERVAL_SECONDS = float(os.getenv("GC_INTERVAL_SECONDS", "300"))
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "200"))
+GC_MAX_BATCHES = int(os.getenv("GC_MAX_BATCHES", "20"))  # Per pass; the next pass continues
+GRANULE_MIN_IDLE_SECONDS = float(os.getenv("GRANULE_MIN_IDLE_SECONDS", "600"))
+storage_gc = StorageGC(
+    [
+        DataStorageSource(data_storage, DATA_RETENTION_DAYS),
+        PersistentCacheSource(persistent_cache),
+        GranuleSource(download_manager, GRANULE_CACHE_TTL, GRANULE_MIN_IDLE_SECONDS,
+                      in_use=lambda: harmony_jobs_in_use())
+    ],
+    quota_bytes=int(STORAGE_QUOTA_GB * 1024 ** 3),
+    interval=GC_INTERVAL_SECONDS,
+    batch_size=GC_BATCH_SIZE,
+    max_batches=GC_MAX_BATCHES
+)
+# The shared array directory is its own (tmpfs) volume: every process writes to it but each only
+# bounds its own arrays, so one worker also sweeps it by age and keeps it under its own quota
+ARRAY_CACHE_SHARED_MB = float(os.getenv("ARRAY_CACHE_SHARED_MB", str(ARRAY_CACHE_MB * 2)))
+ARRAY_CACHE_MAX_AGE_SECONDS = float(os.getenv("ARRAY_CACHE_MAX_AGE_SECONDS", "3600"))
+array_cache_gc = StorageGC(
+    [ArrayCacheSource(array_cache, ARRAY_CACHE_MAX_AGE_SECONDS)],
+    quota_bytes=int(ARRAY_CACHE_SHARED_MB * 1024 * 1024),
+    interval=GC_INTERVAL_SECONDS,
+    batch_size=GC_BATCH_SIZE,
+    max_batches=GC_MAX_BATCHES
+) if ARRAY_CACHE_DIR else None
+gc_leader = LeaderLock(os.path.join(CACHE_DIR, "gc.lock"))
+
+async def run_storage_gc() -> None:
+    """Reconcile the data index with its blobs (a crash may leave either behind), then collect"""
+    try:
+        repaired = await asyncio.to_thread(data_storage.repair_index)
+        if repaired["missing_blobs"] or repaired["orphaned_blobs"]:
+            print(f"🧹 Repaired data index ({repaired['missing_blobs']} missing, "
+                  f"{repaired['orphaned_blobs']} orphaned blobs)")
+    except Exception as e:
+        print(f"⚠️  Could not repair data index: {e}")
+    await storage_gc.run()
+
+# Prefetch / cache warming for popular regions
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_POLL_SECONDS = int(os.getenv("PREFETCH_POLL_SECONDS", "300"))
+PREFETCH_WINDOW_MINUTES = int(os.getenv("PREFETCH_WINDOW_MINUTES", "60"))
+PREFETCH_MAX_TARGETS = int(os.getenv("PREFETCH_MAX_TARGETS", "5"))
+PREFETCH_MIN_HITS = int(os.getenv("PREFETCH_MIN_HITS", "2"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "1"))
+PREFETCH_TARGETS = json.loads(os.getenv("PREFETCH_TARGETS", "[]"))  # [{"bbox": [...], "variable": "...", "plot_type": "map"}]
+
+# Batch visualization
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "60"))  # variables x plot types x time windows
+
+# Animations
+ANIMATION_WORKERS = int(os.getenv("ANIMATION_WORKERS", "2"))  # Frame render processes
+ANIMATION_MAX_FRAMES = int(os.getenv("ANIMATION_MAX_FRAMES", "96"))
+
+# Point queries
+POINT_QUERY_MAX_POINTS = int(os.getenv("POINT_QUERY_MAX_POINTS", "10000"))
+
 def generate_cache_key(request_data: Dict[str, Any], endpoint: str) -> str:
     """Generate a unique cache key based on request parameters"""
     # Create a deterministic string from the request data
@@ -117,9 +422,18 @@ def generate_cache_key(request_data: Dict[str, Any], endpoint: str) -> str:
         "end_time": request_data.get("end_time"),
         "bbox": request_data.get("bbox"),
         "variable": request_data.get("variable"),
+        "variables": request_data.get("variables"),
         "plot_type": request_data.get("plot_type"),
         "plot_types": request_data.get("plot_types"),
-        "collection_id": request_data.get("collection_id", "C2930730944-LARC_CLOUD")
+        "collection_id": request_data.get("collection_id", "C2930730944-LARC_CLOUD"),
+        "format": request_data.get("format"),
+        "fps": request_data.get("fps"),
+        "vmin": request_data.get("vmin"),
+        "vmax": request_data.get("vmax"),
+        "polygon": request_data.get("polygon"),
+        "max_quality_flag": request_data.get("max_quality_flag"),
+        "percentiles": request_data.get("percentiles"),
+        "bins": request_data.get("bins")
     }
     
     # Convert to JSON string and create hash
@@ -128,109 +442,199 @@ def generate_cache_key(request_data: Dict[str, Any], endpoint: str) -> str:
 
 def get_from_cache(cache_key: str) -> Optional[Dict[str, Any]]:
     """Get data from cache if it exists and is not expired"""
-    with cache_lock:
-        if cache_key in cache:
-            cached_item = cache[cache_key]
-            # Check if cache item is still valid
-            if time.time() - cached_item["timestamp"] < CACHE_TTL:
-                print(f"🎯 Cache HIT for key: {cache_key[:8]}...")
-                return cached_item["data"]
-            else:
-                # Remove expired item
-                del cache[cache_key]
-                print(f"⏰ Cache EXPIRED for key: {cache_key[:8]}...")
-        return None
+    data = state_store.get(RESPONSE_CACHE, cache_key)
+    if data is not None:
+        print(f"🎯 Cache HIT for key: {cache_key[:8]}...")
+    return data
 
-def store_in_cache(cache_key: str, data: Dict[str, Any]) -> None:
-    """Store data in cache with timestamp"""
-    with cache_lock:
-        # Remove oldest items if cache is full
-        if len(cache) >= CACHE_MAX_SIZE:
-            # Remove the oldest item
-            oldest_key = min(cache.keys(), key=lambda k: cache[k]["timestamp"])
-            del cache[oldest_key]
-            print(f"🗑️ Cache FULL - removed oldest item: {oldest_key[:8]}...")
-        
-        cache[cache_key] = {
-            "data": data,
-            "timestamp": time.time()
-        }
-        print(f"💾 Cache STORED for key: {cache_key[:8]}...")
+def get_cached_body(cache_key: str) -> Optional[bytes]:
+    """Get a cached response as the JSON bytes it was stored as"""
+    body = state_store.get_raw(RESPONSE_CACHE, cache_key)
+    if body is not None:
+        print(f"🎯 Cache HIT for key: {cache_key[:8]}...")
+    return body
+
+def store_in_cache(cache_key: str, data: Dict[str, Any]) -> bytes:
+    """Store data in cache pre-serialized; it expires after CACHE_TTL. Returns the stored bytes"""
+    body = dumps(data)
+    state_store.set_raw(RESPONSE_CACHE, cache_key, body, ttl=CACHE_TTL)
+    print(f"💾 Cache STORED for key: {cache_key[:8]}...")
+    
+    # Remove oldest items if cache is full
+    evicted = state_store.evict(RESPONSE_CACHE, CACHE_MAX_SIZE)
+    if evicted:
+        print(f"🗑️ Cache FULL - removed {evicted} oldest items")
+    return body
 
-def clear_expired_cache():
+def json_response(body: bytes, if_none_match: Optional[str], accept_encoding: Optional[str],
+                  end_time: Optional[str], cacheable: bool = True) -> Response:
+    """Serve serialized JSON with ETag and Cache-Control (304 if the client has it), compressed if accepted"""
+    response = Response(content=body, media_type="application/json")
+    if cacheable:
+        response = http_cache.conditional(response, if_none_match, end_time)
+    else:
+        response.headers["Cache-Control"] = "no-store"
+    return response_encoder.encode(response, accept_encoding)
+
+def model_response(response: TempoDataResponse, if_none_match: Optional[str], accept_encoding: Optional[str],
+                   end_time: Optional[str]) -> Response:
+    """Serve a freshly built response; failures are never cached"""
+    return json_response(dumps(response.dict()), if_none_match, accept_encoding, end_time, cacheable=response.success)
+
+def is_in_cache(cache_key: str) -> bool:
+    """Check for a live cache entry without touching it"""
+    return state_store.contains(RESPONSE_CACHE, cache_key)
+
+def clear_expired_cache() -> int:
     """Remove expired items from cache"""
-    with cache_lock:
-        current_time = time.time()
-        expired_keys = [
-            key for key, item in cache.items() 
-            if current_time - item["timestamp"] >= CACHE_TTL
-        ]
-        for key in expired_keys:
-            del cache[key]
-        if expired_keys:
-            print(f"🧹 Cache CLEANUP - removed {len(expired_keys)} expired items")
+    removed = state_store.cleanup_expired(RESPONSE_CACHE)
+    if removed:
+        print(f"🧹 Cache CLEANUP - removed {removed} expired items")
+    return removed
+
+def load_render_modules():
+    """Import xarray, matplotlib and cartopy on first use"""
+    global xr, plt, ccrs, cfeature, LONGITUDE_FORMATTER, LATITUDE_FORMATTER, label_from_attrs
+    global render_modules_loaded
+    
+    with render_modules_lock:
+        if render_modules_loaded:
+            return
+        
+        import xarray
+        import matplotlib
+        matplotlib.use('Agg')  # Use non-interactive backend
+        import matplotlib.pyplot as pyplot
+        import cartopy
+        import cartopy.crs as cartopy_crs
+        import cartopy.feature as cartopy_feature
+        from cartopy.mpl import gridliner
+        from xarray.plot.utils import label_from_attrs as xarray_label_from_attrs
+        
+        # Read (and, if missing, download) Natural Earth data from the local cache
+        cartopy.config["data_dir"] = NATURAL_EARTH_DIR
+        
+        xr = xarray
+        plt = pyplot
+        ccrs = cartopy_crs
+        cfeature = cartopy_feature
+        LONGITUDE_FORMATTER = gridliner.LONGITUDE_FORMATTER
+        LATITUDE_FORMATTER = gridliner.LATITUDE_FORMATTER
+        label_from_attrs = xarray_label_from_attrs
+        render_modules_loaded = True
+
+def warm_up_rendering():
+    """Load the plotting stack, Natural Earth data and font cache ahead of the first request"""
+    started = time.time()
+    warmup_state["status"] = "warming"
+    warmup_state["started_at"] = dt.datetime.utcnow().isoformat()
+    
+    try:
+        load_render_modules()
+        if preload_natural_earth(NATURAL_EARTH_DIR):
+            print(f"🗺️  Natural Earth cache ready in {NATURAL_EARTH_DIR}")
+        else:
+            print(f"⚠️  Natural Earth cache in {NATURAL_EARTH_DIR} is incomplete - map renders may download shapefiles")
+        
+        # Draw a basemap so projections, fonts and the Agg canvas are initialized;
+        # the template stays in the pool for the first map request
+        with map_template() as template:
+            template.to_png(dpi=30)
+        
+        warmup_state["status"] = "ready"
+        print(f"🔥 Rendering warm in {time.time() - started:.1f}s")
+    except Exception as e:
+        warmup_state["status"] = "failed"
+        warmup_state["error"] = str(e)
+        print(f"❌ Rendering warmup failed: {e}")
+    finally:
+        warmup_state["completed_at"] = dt.datetime.utcnow().isoformat()
+        warmup_state["duration_seconds"] = round(time.time() - started, 2)
 
 # Visualization helper functions
-def make_nice_map(axis):
+def make_nice_map(axis, extent=MAP_EXTENT):
     """Create a nice map with coastlines and gridlines"""
-    axis.add_feature(cfeature.STATES, color="gray", lw=0.1)
-    axis.coastlines(resolution="50m", color="gray", linewidth=0.5)
-    axis.set_extent([-150, -40, 14, 65], crs=ccrs.PlateCarree())
+    axis.add_feature(cfeature.STATES.with_scale(NATURAL_EARTH_SCALE), color="gray", lw=0.1)
+    axis.coastlines(resolution=NATURAL_EARTH_SCALE, color="gray", linewidth=0.5)
+    axis.set_extent(extent, crs=ccrs.PlateCarree())
     grid = axis.gridlines(draw_labels=["left", "bottom"], dms=True)
     grid.xformatter = LONGITUDE_FORMATTER
     grid.yformatter = LATITUDE_FORMATTER
 
-def create_map_visualization(datatree, variable_name="product/vertical_column", title="TEMPO Data"):
+def map_template(extent=MAP_EXTENT):
+    """Borrow a pooled basemap figure (map and gridded map renders share it)"""
+    def setup(fig):
+        ax = fig.add_subplot(projection=ccrs.PlateCarree())
+        make_nice_map(ax, extent)
+        return ax
+    
+    return figure_pool.template("map", MAP_FIGSIZE, setup, extent=extent, colorbar_shrink=0.8)
+
+def plain_template(kind, figsize, colorbar_shrink=None):
+    """Borrow a pooled figure with a single plain axes"""
+    return figure_pool.template(kind, figsize, lambda fig: fig.add_subplot(), colorbar_shrink=colorbar_shrink)
+
+def contour_style(color_scale=None):
+    """contourf arguments for continuous data: the shared scale's fixed levels, or levels fitted to this image"""
+    if color_scale is None:
+        return {"levels": 50, "vmin": 0}
+    return {"levels": color_scale.levels, "extend": "both"}
+
+def raster_style(color_scale=None):
+    """imshow arguments for continuous data: the shared scale's norm, or limits fitted to this image"""
+    if color_scale is None:
+        return {"vmin": 0}
+    return {"norm": color_scale.norm()}
+
+def raster_colorbar_style(color_scale=None):
+    """Colorbar arguments for a raster: arrows for values beyond a shared scale"""
+    return {"extend": "both"} if color_scale is not None else {}
+
+def create_map_visualization(datatree, variable_name="product/vertical_column", title="TEMPO Data", color_scale=None,
+                             bbox=None):
     """Create a map visualization of TEMPO data"""
     try:
+        load_render_modules()
+        
         # Get the data variable
         da = datatree[variable_name]
         
-        # Create figure and axis
-        fig, ax = plt.subplots(figsize=(12, 8), subplot_kw={"projection": ccrs.PlateCarree()})
-        
-        # Make nice map
-        make_nice_map(ax)
-        
-        # Handle different variable types
-        if variable_name == "product/main_data_quality_flag":
-            # For data quality flag, use discrete levels and colors
-            contour_handle = ax.contourf(
-                datatree["geolocation/longitude"],
-                datatree["geolocation/latitude"],
-                da,
-                levels=[-0.5, 0.5, 1.5, 2.5],
-                colors=['green', 'yellow', 'red'],
-                zorder=2,
-                transform=ccrs.PlateCarree()
-            )
-        else:
-            # For continuous data, use normal contour levels
-            contour_handle = ax.contourf(
-                datatree["geolocation/longitude"],
-                datatree["geolocation/latitude"],
-                da,
-                levels=50,
-                vmin=0,
-                zorder=2,
-                transform=ccrs.PlateCarree()
-            )
-        
-        # Add colorbar
-        cb = plt.colorbar(contour_handle, ax=ax, shrink=0.8)
-        cb.set_label(label_from_attrs(da))
-        
-        ax.set_title(title, fontsize=14, fontweight='bold')
-        
-        # Convert to base64
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-        plt.close(fig)
-        
-        return img_base64
-        
+        # Basemap, projection and colorbar axes come pre-built from the pool, framed on the bbox
+        with map_template(map_extent(bbox, MAP_EXTENT)) as template:
+            ax = template.ax
+            
+            # Handle different variable types
+            if variable_name == "product/main_data_quality_flag":
+                # For data quality flag, use discrete levels and colors
+                contour_handle = ax.contourf(
+                    datatree["geolocation/longitude"],
+                    datatree["geolocation/latitude"],
+                    da,
+                    levels=[-0.5, 0.5, 1.5, 2.5],
+                    colors=['green', 'yellow', 'red'],
+                    zorder=2,
+                    transform=ccrs.PlateCarree()
+                )
+            else:
+                # For continuous data, use the shared color scale's levels
+                contour_handle = ax.contourf(
+                    datatree["geolocation/longitude"],
+                    datatree["geolocation/latitude"],
+                    da,
+                    zorder=2,
+                    transform=ccrs.PlateCarree(),
+                    **contour_style(color_scale)
+                )
+            
+            # Add colorbar
+            cb = template.colorbar(contour_handle)
+            cb.set_label(label_from_attrs(da))
+            
+            ax.set_title(title, fontsize=14, fontweight='bold')
+            
+            # Convert to base64
+            return base64.b64encode(template.to_png(dpi=150)).decode()
+    
     except Exception as e:
         print(f"Error creating map visualization: {e}")
         return None
@@ -238,6 +642,8 @@ def create_map_visualization(datatree, variable_name="product/vertical_column",
 def create_zonal_mean_plot(datatree, variable_name="product/vertical_column", title="Zonal Mean"):
     """Create a zonal mean plot of TEMPO data"""
     try:
+        load_render_modules()
+        
         # Get the data variable
         da = datatree[variable_name]
         
@@ -250,167 +656,533 @@ def create_zonal_mean_plot(datatree, variable_name="product/vertical_column", ti
             datatree["geolocation/latitude"], lat_bins, labels=lat_centers
         ).mean(dim=xr.ALL_DIMS)
         
-        # Create figure
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Plot zonal mean
-        if variable_name == "product/main_data_quality_flag":
-            # For data quality flag, use bar plot with discrete colors
-            colors = ['green' if x <= 0.5 else 'yellow' if x <= 1.5 else 'red' for x in product_lat_mean.values]
-            product_lat_mean.plot.bar(ax=ax, color=colors)
-            ax.set_ylabel("Data Quality Flag")
-            ax.set_ylim(-0.5, 2.5)
-        else:
-            product_lat_mean.plot(ax=ax)
-            ax.set_ylabel(label_from_attrs(da))
-        
-        ax.invert_xaxis()
-        ax.set_title(title, fontsize=14, fontweight='bold')
-        ax.set_xlabel("Latitude")
-        
-        # Convert to base64
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-        plt.close(fig)
-        
-        return img_base64
-        
+        with plain_template("zonal_mean", (10, 6)) as template:
+            ax = template.ax
+            
+            # Plot zonal mean
+            if variable_name == "product/main_data_quality_flag":
+                # For data quality flag, use bar plot with discrete colors
+                colors = ['green' if x <= 0.5 else 'yellow' if x <= 1.5 else 'red' for x in product_lat_mean.values]
+                product_lat_mean.plot.bar(ax=ax, color=colors)
+                ax.set_ylabel("Data Quality Flag")
+                ax.set_ylim(-0.5, 2.5)
+            else:
+                product_lat_mean.plot(ax=ax)
+                ax.set_ylabel(label_from_attrs(da))
+            
+            ax.invert_xaxis()
+            ax.set_title(title, fontsize=14, fontweight='bold')
+            ax.set_xlabel("Latitude")
+            
+            # Convert to base64
+            return base64.b64encode(template.to_png(dpi=150)).decode()
+    
     except Exception as e:
         print(f"Error creating zonal mean plot: {e}")
         return None
 
-def create_contour_plot(datatree, variable_name="product/vertical_column", title="Contour Plot"):
+def create_contour_plot(datatree, variable_name="product/vertical_column", title="Contour Plot", color_scale=None):
     """Create a contour plot of TEMPO data"""
     try:
+        load_render_modules()
+        
         # Get the data variable
         da = datatree[variable_name]
         
-        # Create figure
-        fig, ax = plt.subplots(figsize=(12, 8))
+        # The colorbar goes into the template's colorbar axes rather than one xarray would add
+        with plain_template("contour", (12, 8), colorbar_shrink=1.0) as template:
+            ax = template.ax
+            
+            # Create contour plot
+            if variable_name == "product/main_data_quality_flag":
+                # For data quality flag, use discrete levels and colors
+                contour = da.plot.contourf(
+                    x="mirror_step", y="xtrack", 
+                    levels=[-0.5, 0.5, 1.5, 2.5],
+                    colors=['green', 'yellow', 'red'],
+                    ax=ax,
+                    add_colorbar=False
+                )
+            else:
+                # For continuous data, use the shared color scale's levels
+                contour = da.plot.contourf(
+                    x="mirror_step", y="xtrack", ax=ax, add_colorbar=False, **contour_style(color_scale)
+                )
+            
+            cb = template.colorbar(contour)
+            cb.set_label(label_from_attrs(da))
+            
+            ax.invert_xaxis()
+            ax.set_title(title, fontsize=14, fontweight='bold')
+            
+            # Convert to base64
+            return base64.b64encode(template.to_png(dpi=150)).decode()
+    
+    except Exception as e:
+        print(f"Error creating contour plot: {e}")
+        return None
+
+def create_gridded_map_visualization(datatree, variable_name="product/vertical_column", title="Gridded Map",
+                                     color_scale=None, bbox=None):
+    """Create a map of TEMPO data regridded onto a regular lat/lon grid (fast raster render)"""
+    try:
+        load_render_modules()
+        from matplotlib.colors import BoundaryNorm, ListedColormap
         
-        # Create contour plot
-        if variable_name == "product/main_data_quality_flag":
-            # For data quality flag, use discrete levels and colors
-            contour = da.plot.contourf(
-                x="mirror_step", y="xtrack", 
-                levels=[-0.5, 0.5, 1.5, 2.5],
-                colors=['green', 'yellow', 'red'],
-                ax=ax
-            )
-        else:
-            # For continuous data, use normal contour
-            contour = da.plot.contourf(
-                x="mirror_step", y="xtrack", vmin=0, ax=ax
-            )
+        # Index map is cached per swath geometry, so this is one gather after the first call
+        lat, lon, _ = regridder.datatree_geometry(datatree)
+        grid = grid_for_data(lat, lon, REGRID_RESOLUTION)
+        gridded = regridder.regrid(datatree, [variable_name], grid)[variable_name]
+        da = datatree[variable_name]
         
-        ax.invert_xaxis()
-        ax.set_title(title, fontsize=14, fontweight='bold')
+        # Same pooled basemap as the contour map
+        with map_template(map_extent(bbox, MAP_EXTENT)) as template:
+            ax = template.ax
+            
+            if variable_name == "product/main_data_quality_flag":
+                # For data quality flag, use discrete levels and colors
+                image = ax.imshow(
+                    gridded,
+                    origin="lower",
+                    extent=grid.extent,
+                    cmap=ListedColormap(['green', 'yellow', 'red']),
+                    norm=BoundaryNorm([-0.5, 0.5, 1.5, 2.5], 3),
+                    interpolation="nearest",
+                    zorder=2,
+                    transform=ccrs.PlateCarree()
+                )
+            else:
+                image = ax.imshow(
+                    gridded,
+                    origin="lower",
+                    extent=grid.extent,
+                    interpolation="nearest",
+                    zorder=2,
+                    transform=ccrs.PlateCarree(),
+                    **raster_style(color_scale)
+                )
+            
+            # Add colorbar
+            cb = template.colorbar(image, **raster_colorbar_style(color_scale))
+            cb.set_label(label_from_attrs(da))
+            
+            ax.set_title(title, fontsize=14, fontweight='bold')
+            
+            # Convert to base64
+            return base64.b64encode(template.to_png(dpi=150)).decode()
+    
+    except Exception as e:
+        print(f"Error creating gridded map visualization: {e}")
+        return None
+
+PLOT_TYPE_NAMES = {"map": "Map", "zonal_mean": "Zonal Mean", "contour": "Contour", "gridded_map": "Gridded Map"}
+ALL_PLOT_TYPES = ["map", "zonal_mean", "contour"]  # Rendered by /tempo/visualize/all
+DEFAULT_VARIABLE = "product/vertical_column"
+
+def render_plot(datatree, plot_type, variable_name, title=None, color_scale=None, bbox=None):
+    """Render a single plot type to a base64 PNG (None if rendering failed)"""
+    if plot_type not in PLOT_TYPE_NAMES:
+        raise ValueError(f"Unknown plot type: {plot_type}")
+    
+    if title is None:
+        title = f"TEMPO {variable_name} {PLOT_TYPE_NAMES[plot_type]}"
+    
+    if plot_type == "map":
+        return create_map_visualization(datatree, variable_name, title, color_scale, bbox)
+    elif plot_type == "zonal_mean":
+        return create_zonal_mean_plot(datatree, variable_name, title)
+    elif plot_type == "gridded_map":
+        return create_gridded_map_visualization(datatree, variable_name, title, color_scale, bbox)
+    else:
+        return create_contour_plot(datatree, variable_name, title, color_scale)
+
+def create_preview_visualization(datatree, plot_type, variable_name, title=None, color_scale=None, bbox=None):
+    """Render a quick low-resolution raster preview of a plot to a base64 PNG (None if rendering failed)"""
+    if plot_type not in PREVIEW_PLOT_TYPES:
+        raise ValueError(f"No preview for plot type: {plot_type}")
+    
+    if title is None:
+        title = f"TEMPO {variable_name} {PLOT_TYPE_NAMES[plot_type]} (preview)"
+    
+    try:
+        load_render_modules()
+        from matplotlib.colors import BoundaryNorm, ListedColormap
         
-        # Convert to base64
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        img_base64 = base64.b64encode(img_buffer.getvalue()).decode()
-        plt.close(fig)
+        da = datatree[variable_name]
         
-        return img_base64
+        # Keep every stride-th pixel along both swath dimensions
+        stride = max(1, int(np.ceil(np.sqrt(da.size / PREVIEW_MAX_PIXELS))))
         
+        # Same color scale as the full render, so the full image replaces the preview seamlessly
+        if variable_name == "product/main_data_quality_flag":
+            style = {"cmap": ListedColormap(['green', 'yellow', 'red']), "norm": BoundaryNorm([-0.5, 0.5, 1.5, 2.5], 3)}
+            colorbar_style = {}
+        else:
+            style = raster_style(color_scale)
+            colorbar_style = raster_colorbar_style(color_scale)
+        
+        if plot_type == "contour":
+            decimated = da.isel({dim: slice(None, None, stride) for dim in da.dims})
+            with plain_template("contour", (12, 8), colorbar_shrink=1.0) as template:
+                ax = template.ax
+                image = decimated.plot.imshow(
+                    x="mirror_step", y="xtrack", ax=ax, add_colorbar=False, **style
+                )
+                ax.invert_xaxis()
+                
+                cb = template.colorbar(image, **colorbar_style)
+                cb.set_label(label_from_attrs(da))
+                ax.set_title(title, fontsize=14, fontweight='bold')
+                return base64.b64encode(template.to_png(dpi=PREVIEW_DPI)).decode()
+        
+        # Maps: bin the decimated swath onto a coarse grid and draw it as one image
+        lat = np.asarray(datatree["geolocation/latitude"])[::stride, ::stride]
+        lon = np.asarray(datatree["geolocation/longitude"])[::stride, ::stride]
+        grid = grid_for_data(lat, lon, PREVIEW_RESOLUTION)
+        gridded = regridder.apply(np.asarray(da)[::stride, ::stride], regridder.get_index(lat, lon, grid))
+        
+        with map_template(map_extent(bbox, MAP_EXTENT)) as template:
+            ax = template.ax
+            image = ax.imshow(
+                gridded,
+                origin="lower",
+                extent=grid.extent,
+                interpolation="nearest",
+                zorder=2,
+                transform=ccrs.PlateCarree(),
+                **style
+            )
+            
+            cb = template.colorbar(image, **colorbar_style)
+            cb.set_label(label_from_attrs(da))
+            ax.set_title(title, fontsize=14, fontweight='bold')
+            return base64.b64encode(template.to_png(dpi=PREVIEW_DPI)).decode()
+    
     except Exception as e:
-        print(f"Error creating contour plot: {e}")
+        print(f"Error creating {plot_type} preview: {e}")
+        return None
+
+def resolve_variable_name(variables: Optional[List[str]]) -> str:
+    """Pick the variable to plot from the requested variables"""
+    if variables and variables[0]:
+        return variables[0]
+    return DEFAULT_VARIABLE
+
+def open_granule(file_path: str, variables: List[str]):
+    """Open a granule with the variables and geolocation backed by the shared decoded-array cache"""
+    return array_cache.attach(xr.open_datatree(file_path), variables + GEOLOCATION_VARIABLES)
+
+def color_scale_for(datatree, variable_name: str, bbox: Optional[List[float]], start_time: Optional[str],
+                    max_quality_flag: Optional[int] = None):
+    """
+    Shared color scale of a continuous variable (None for the quality flag, which has its own colors)
+    
+    datatree must already be masked at max_quality_flag, which is part of the scale's key.
+    """
+    if variable_name == QUALITY_FLAG_VARIABLE:
+        return None
+    try:
+        return color_scales.scale_for(variable_name, bbox, start_time, lambda: [datatree[variable_name]],
+                                      max_quality_flag)
+    except Exception as e:
+        print(f"⚠️ Color scale unavailable for {variable_name}, fitting levels per image: {e}")
         return None
 
-def process_single_visualization(datatree, plot_type, variable_name, job_id):
+def build_harmony_request(start_time: str, end_time: str, bbox: Optional[List[float]] = None,
+                          variables: Optional[List[str]] = None,
+                          collection_id: str = "C2930730944-LARC_CLOUD") -> Request:
+    """Build a Harmony request from API request parameters"""
+    # Parse datetime strings
+    start_dt = dt.datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+    end_dt = dt.datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+    
+    harmony_request = Request(
+        collection=Collection(id=collection_id),
+        temporal={
+            "start": start_dt,
+            "stop": end_dt,
+        },
+    )
+    
+    # Add spatial filter if provided
+    if bbox and len(bbox) == 4:
+        harmony_request.spatial = BBox(
+            bbox[0],  # west
+            bbox[1],  # south
+            bbox[2],  # east
+            bbox[3]   # north
+        )
+    
+    # Add variables if specified
+    if variables:
+        harmony_request.variables = variables
+    
+    return harmony_request
+
+def harmony_request_key(harmony_request: Request) -> str:
+    """Normalized key of the parameters that determine a Harmony job's output"""
+    spatial = harmony_request.spatial
+    key_data = {
+        "collection_id": harmony_request.collection.id,
+        "start": harmony_request.temporal["start"].isoformat(),
+        "stop": harmony_request.temporal["stop"].isoformat(),
+        "bbox": [spatial.w, spatial.s, spatial.e, spatial.n] if spatial else None,
+        "variables": sorted(harmony_request.variables) if harmony_request.variables else None
+    }
+    return hashlib.md5(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+def harmony_window_stop(harmony_request: Request) -> float:
+    """Unix time at which a Harmony request's time window ends (naive times are UTC)"""
+    stop = harmony_request.temporal["stop"]
+    if stop.tzinfo is None:
+        stop = stop.replace(tzinfo=dt.timezone.utc)
+    return stop.timestamp()
+
+def submit_harmony_job(client: Client, harmony_request: Request) -> Tuple[str, bool]:
+    """Submit a Harmony request, or reuse the job of an equivalent earlier request"""
+    request_key = harmony_request_key(harmony_request)
+    
+    indexed = harmony_job_index.lookup(request_key)
+    if indexed:
+        print(f"♻️  Reusing Harmony job {indexed['job_id']} ({indexed['status']})")
+        return indexed["job_id"], True
+    
+    job_id = client.submit(harmony_request)
+    harmony_job_index.record_submitted(request_key, job_id, harmony_window_stop(harmony_request))
+    return job_id, False
+
+def use_harmony_job(job_id: str) -> None:
+    """Count a request as depending on a Harmony job so it is not cancelled under it"""
+    with job_lock:
+        harmony_job_users[job_id] = harmony_job_users.get(job_id, 0) + 1
+
+def harmony_jobs_in_use() -> List[str]:
+    """Harmony jobs requests in this worker currently depend on"""
+    with job_lock:
+        return list(harmony_job_users)
+
+def release_harmony_job(job_id: str) -> int:
+    """Stop counting a request against a Harmony job; returns the remaining users"""
+    with job_lock:
+        remaining = harmony_job_users.get(job_id, 0) - 1
+        if remaining > 0:
+            harmony_job_users[job_id] = remaining
+        else:
+            harmony_job_users.pop(job_id, None)
+        return max(remaining, 0)
+
+def fetch_tempo_granules(client: Client, harmony_request: Request,
+                         on_progress: Optional[Callable[[int, str], None]] = None,
+                         count_user: bool = True) -> Tuple[str, List[str]]:
+    """Submit a Harmony request, wait for it and download the resulting granules"""
+    request_key = harmony_request_key(harmony_request)
+    
+    # Reuse granules downloaded for an identical request while they are still on disk; a
+    # window that was still receiving granules when they were fetched is refetched soon
+    with granule_cache_lock:
+        cached = granule_cache.get(request_key)
+        if cached and time.time() - cached["timestamp"] < cached["ttl"] \
+                and cached["files"] and all(os.path.exists(f) for f in cached["files"]):
+            print(f"📦 Granule cache HIT for job {cached['job_id']}")
+            download_manager.touch_job(cached["job_id"])
+            return cached["job_id"], list(cached["files"])
+    
+    job_id, reused = submit_harmony_job(client, harmony_request)
+    try:
+        result_files = download_job_granules(client, job_id, on_progress, count_user)
+    except Exception as e:
+        if not reused or isinstance(e, DownloadCancelled):
+            raise
+        # The reused job failed or its results are gone - submit a fresh one
+        print(f"⚠️  Reused Harmony job {job_id} unusable ({e}), resubmitting")
+        job_id, _ = submit_harmony_job(client, harmony_request)
+        result_files = download_job_granules(client, job_id, on_progress, count_user)
+    
+    cache_granules(harmony_request, job_id, result_files)
+    return job_id, result_files
+
+def cache_granules(harmony_request: Request, job_id: str, result_files: List[str]) -> None:
+    """Remember the granules downloaded for a Harmony request so identical requests reuse them"""
+    request_key = harmony_request_key(harmony_request)
+    with granule_cache_lock:
+        fetched_at = time.time()
+        window_open = harmony_job_index.window_open_at(harmony_window_stop(harmony_request), fetched_at)
+        granule_cache[request_key] = {
+            "job_id": job_id,
+            "files": result_files,
+            "timestamp": fetched_at,
+            "ttl": min(HARMONY_OPEN_WINDOW_TTL_SECONDS, GRANULE_CACHE_TTL) if window_open else GRANULE_CACHE_TTL
+        }
+        # Forget requests whose granules have expired and delete their files
+        expired = [k for k, v in granule_cache.items() if time.time() - v["timestamp"] >= GRANULE_CACHE_TTL]
+        for key in expired:
+            download_manager.remove_job(granule_cache.pop(key)["job_id"])
+
+def wait_for_harmony_job(client: Client, job_id: str,
+                         on_progress: Optional[Callable[[int, str], None]] = None) -> str:
+    """Wait for a Harmony job to finish, via the shared job watcher when it is running; returns its status"""
+    if job_watcher.running:
+        try:
+            return job_watcher.wait_sync(job_id, on_progress)
+        except RuntimeError as e:
+            if "event loop thread" not in str(e):
+                raise
+    
+    # No watcher (e.g. outside the server) - poll from this thread without a progress bar
+    client.wait_for_processing(job_id, show_progress=False)
+    _, job_status, _ = client.progress(job_id)
+    return job_status
+
+def download_job_granules(client: Client, job_id: str,
+                          on_progress: Optional[Callable[[int, str], None]] = None,
+                          count_user: bool = True) -> List[str]:
+    """Wait for a submitted Harmony job and download its granules"""
+    indexed = harmony_job_index.get_job(job_id)
+    result_urls = indexed["result_urls"] if indexed else None
+    
+    # Parallel jobs count themselves for their whole lifetime instead
+    if count_user:
+        use_harmony_job(job_id)
+    try:
+        if result_urls is None:
+            # Wait for processing; a job that completed with errors is used now but never reused
+            job_status = wait_for_harmony_job(client, job_id, on_progress)
+            result_urls = list(client.result_urls(job_id))
+            harmony_job_index.record_results(job_id, result_urls, job_status)
+        
+        # Download results into the job's own directory (files already there are kept)
+        return download_manager.download_job(client, job_id, result_urls)
+    except DownloadCancelled:
+        # The job's results are fine - only this download was stopped
+        raise
+    except Exception:
+        harmony_job_index.forget(job_id)
+        raise
+    finally:
+        if count_user:
+            release_harmony_job(job_id)
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Parallel job state, whichever worker runs the job"""
+    return state_store.get(JOB_STATE, job_id)
+
+def update_job(job_id: str, fn: Callable[[Dict[str, Any]], None]) -> Optional[Dict[str, Any]]:
+    """Atomically modify a job's state in place; returns the new state (None if the job is gone)"""
+    return state_store.update(JOB_STATE, job_id, fn)
+
+def is_job_cancelled(job_id: str) -> bool:
+    job_data = get_job(job_id)
+    return job_data is not None and job_data["status"] == "cancelled"
+
+def mark_job_failed(job_id: str, error: str) -> None:
+    """Fail a job unless it was cancelled meanwhile"""
+    def fail(job):
+        if job["status"] != "cancelled":
+            job["status"] = "failed"
+            job["error"] = error
+    update_job(job_id, fail)
+
+def is_worker_alive(job_data: Dict[str, Any]) -> bool:
+    """Whether the worker process running a job still exists (assumed so for other hosts)"""
+    if job_data.get("worker_host") != WORKER_HOST or not job_data.get("worker_pid"):
+        return True
+    try:
+        os.kill(job_data["worker_pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def process_single_visualization(datatree, plot_type, variable_name, job_id, color_scale=None, bbox=None):
     """Process a single visualization type"""
     try:
-        with job_lock:
-            if job_id in job_results:
-                job_results[job_id]["completed_plots"].append(plot_type)
-                completed_count = len(job_results[job_id]["completed_plots"])
-                total_count = len(job_results[job_id]["plot_types"])
-                job_results[job_id]["progress"] = int((completed_count / total_count) * 100)
+        def start_plot(job):
+            if job["status"] == "cancelled":
+                return
+            job["completed_plots"].append(plot_type)
+            completed_count = len(job["completed_plots"])
+            total_count = len(job["plot_types"])
+            job["progress"] = HARMONY_PROGRESS_SHARE + int((completed_count / total_count) * (100 - HARMONY_PROGRESS_SHARE))
+        
+        job_data = update_job(job_id, start_plot)
+        if job_data is None or job_data["status"] == "cancelled":
+            return False
         
         # Generate the visualization
-        if plot_type == "map":
-            img_base64 = create_map_visualization(
-                datatree, 
-                variable_name, 
-                f"TEMPO {variable_name} Map"
-            )
-        elif plot_type == "zonal_mean":
-            img_base64 = create_zonal_mean_plot(
-                datatree, 
-                variable_name, 
-                f"TEMPO {variable_name} Zonal Mean"
-            )
-        elif plot_type == "contour":
-            img_base64 = create_contour_plot(
-                datatree, 
-                variable_name, 
-                f"TEMPO {variable_name} Contour"
-            )
-        else:
-            raise ValueError(f"Unknown plot type: {plot_type}")
-        
-        # Update results
-        with job_lock:
-            if job_id in job_results:
-                if img_base64:
-                    job_results[job_id]["results"][plot_type] = {
-                        "image_base64": img_base64,
-                        "success": True
-                    }
-                else:
-                    job_results[job_id]["results"][plot_type] = {
-                        "success": False,
-                        "error": f"Failed to generate {plot_type} visualization"
-                    }
-                    job_results[job_id]["failed_plots"].append(plot_type)
-                
-                # Check if all plots are done
-                total_plots = len(job_results[job_id]["plot_types"])
-                completed = len(job_results[job_id]["completed_plots"])
-                if completed >= total_plots:
-                    job_results[job_id]["status"] = "completed"
-                    job_results[job_id]["progress"] = 100
+        img_base64 = render_plot(datatree, plot_type, variable_name, color_scale=color_scale, bbox=bbox)
+        
+        # Update results (a job cancelled meanwhile keeps only what it had)
+        def record_plot(job):
+            if job["status"] == "cancelled":
+                return
+            if img_base64:
+                job["results"][plot_type] = {
+                    "image_base64": img_base64,
+                    "success": True
+                }
+            else:
+                job["results"][plot_type] = {
+                    "success": False,
+                    "error": f"Failed to generate {plot_type} visualization"
+                }
+                job["failed_plots"].append(plot_type)
+            
+            # Check if all plots are done
+            if len(job["completed_plots"]) >= len(job["plot_types"]):
+                job["status"] = "completed"
+                job["progress"] = 100
         
+        update_job(job_id, record_plot)
         return True
-        
+    
     except Exception as e:
         print(f"Error processing {plot_type}: {e}")
-        with job_lock:
-            if job_id in job_results:
-                job_results[job_id]["results"][plot_type] = {
-                    "success": False,
-                    "error": str(e)
-                }
-                job_results[job_id]["failed_plots"].append(plot_type)
+        
+        def record_error(job):
+            if job["status"] == "cancelled":
+                return
+            job["results"][plot_type] = {
+                "success": False,
+                "error": str(e)
+            }
+            job["failed_plots"].append(plot_type)
+        
+        update_job(job_id, record_error)
         return False
 
-def process_visualization_job(job_id, datatree, plot_types, variable_name):
+def process_visualization_job(job_id, datatree, plot_types, variable_name, color_scale=None, bbox=None):
     """Process all visualizations for a job in parallel"""
     try:
-        with job_lock:
-            job_results[job_id]["status"] = "processing"
-            job_results[job_id]["results"] = {}
+        def start_processing(job):
+            if job["status"] != "cancelled":
+                job["status"] = "processing"
+                job["results"] = {}
         
-        # Submit all plot types to thread pool
-        futures = []
-        for plot_type in plot_types:
-            future = executor.submit(process_single_visualization, datatree, plot_type, variable_name, job_id)
-            futures.append(future)
+        job_data = update_job(job_id, start_processing)
+        if job_data is None or job_data["status"] == "cancelled":
+            return
+        
+        # Submit all plot types to the scheduler; cancellation drops the queued ones
+        with job_lock:
+            futures = []
+            for plot_type in plot_types:
+                future = scheduler.submit(process_single_visualization, datatree, plot_type, variable_name, job_id,
+                                          color_scale, bbox, priority="background")
+                futures.append(future)
+            if job_id in job_controls:
+                job_controls[job_id]["futures"] = futures
         
         # Wait for all to complete
         for future in futures:
-            future.result()
-            
+            try:
+                future.result()
+            except CancelledError:
+                pass
+    
     except Exception as e:
         print(f"Error in job processing: {e}")
-        with job_lock:
-            if job_id in job_results:
-                job_results[job_id]["status"] = "failed"
-                job_results[job_id]["error"] = str(e)
+        mark_job_failed(job_id, str(e))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -431,14 +1203,59 @@ async def lifespan(app: FastAPI):
                 env=Environment.PROD, 
                 auth=(username, password)
             )
+            download_manager.set_credentials(username, password)
             print("✅ Harmony client initialized successfully")
     except Exception as e:
         print(f"❌ Failed to initialize Harmony client: {e}")
         harmony_client = None
     
+    # Warm up the rendering stack in the background so /health is served immediately
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up_rendering))
+    
+    # Granules left behind by a previous run are past any use
+    removed = await asyncio.to_thread(download_manager.remove_stale, [], GRANULE_CACHE_TTL)
+    if removed:
+        print(f"🧹 Removed {removed} stale download directories")
+    
+    # One task polls every outstanding Harmony job
+    watcher_task = asyncio.create_task(job_watcher.run())
+    
+    # Keep the cache warm for popular regions as new scans arrive - in one worker only
+    prefetch_task = None
+    if PREFETCH_ENABLED and harmony_client is not None and prefetch_leader.acquire():
+        prefetch_task = asyncio.create_task(prefetch_scheduler.run())
+        print(f"🔮 Prefetch scheduler started (polling every {PREFETCH_POLL_SECONDS}s)")
+    
+    # Expire and evict stored data in small batches - in one worker only
+    gc_task = None
+    array_gc_task = None
+    if gc_leader.acquire():
+        gc_task = asyncio.create_task(run_storage_gc())
+        quota = f"{STORAGE_QUOTA_GB:g} GB quota" if STORAGE_QUOTA_GB else "no quota"
+        print(f"🧹 Storage GC started ({quota}, every {GC_INTERVAL_SECONDS:g}s)")
+        # The first pass sweeps arrays left by workers of a previous run
+        if array_cache_gc is not None:
+            array_gc_task = asyncio.create_task(array_cache_gc.run())
+            print(f"🧹 Array cache GC started ({ARRAY_CACHE_SHARED_MB:g} MB quota in {ARRAY_CACHE_DIR})")
+    
     yield
     
     # Cleanup
+    if not warmup_task.done():
+        warmup_task.cancel()
+    watcher_task.cancel()
+    if prefetch_task is not None:
+        prefetch_task.cancel()
+    prefetch_scheduler.shutdown()
+    prefetch_leader.release()
+    if gc_task is not None:
+        gc_task.cancel()
+    if array_gc_task is not None:
+        array_gc_task.cancel()
+    gc_leader.release()
+    scheduler.shutdown()
+    download_manager.shutdown()
+    shutdown_frame_pool()
     harmony_client = None
 
 # Create FastAPI app
@@ -458,6 +1275,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(RequestValidationError)
+async def model_check_failed(request: FastAPIRequest, exc: RequestValidationError):
+    """400 for a failed cross-field check of a request model; other validation errors stay 422"""
+    errors = exc.errors()
+    if errors and all(tuple(error["loc"]) == ("body",) and error["type"] == "value_error" for error in errors):
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"detail": "; ".join(str(error["ctx"]["error"]) for error in errors)}
+        )
+    return await request_validation_exception_handler(request, exc)
+
 # Dependency to get Harmony client
 def get_harmony_client() -> Client:
     if harmony_client is None:
@@ -467,6 +1295,14 @@ def get_harmony_client() -> Client:
         )
     return harmony_client
 
+def too_busy(e: SchedulerBusy) -> HTTPException:
+    """429 telling the client when to retry work the scheduler refused"""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 # Security dependency
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Simple token verification - replace with proper auth in production"""
@@ -499,6 +1335,20 @@ async def health_check():
         version=os.getenv("API_VERSION", "1.0.0")
     )
 
+@app.get("/ready", response_model=ReadinessResponse)
+async def readiness_check(response: Response):
+    """Readiness check - reports whether the rendering stack is warm"""
+    ready = warmup_state["status"] == "ready"
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    
+    return ReadinessResponse(
+        status="ready" if ready else warmup_state["status"],
+        ready=ready,
+        harmony_client=harmony_client is not None,
+        warmup=dict(warmup_state)
+    )
+
 @app.post("/tempo/data", response_model=TempoDataResponse)
 async def get_tempo_data(
     request: TempoDataRequest,
@@ -510,39 +1360,25 @@ async def get_tempo_data(
     
     This endpoint retrieves NASA TEMPO (Tropospheric Emissions: Monitoring of Pollution) data
     for the specified time range and optional spatial bounding box.
+    
+    With `format` set to 'arrow', 'npy' or 'zarr' the subsetted variable arrays
+    themselves are streamed back instead of the downloaded file information.
     """
+    if request.format is not None:
+        format_error = check_export_format(request.format)
+        if format_error:
+            return TempoDataResponse(success=False, message=format_error)
+        try:
+            scheduler.check("interactive")
+        except SchedulerBusy as e:
+            raise too_busy(e)
+        return await export_tempo_data(request, client)
+    
     try:
-        # Parse datetime strings
-        start_dt = dt.datetime.fromisoformat(request.start_time.replace('Z', '+00:00'))
-        end_dt = dt.datetime.fromisoformat(request.end_time.replace('Z', '+00:00'))
-        
-        # Create Harmony request
-        harmony_request = Request(
-            collection=Collection(id="C2930730944-LARC_CLOUD"),
-            temporal={
-                "start": start_dt,
-                "stop": end_dt,
-            },
-        )
-        
-        # Add spatial filter if provided
-        if request.bbox and len(request.bbox) == 4:
-            harmony_request.spatial = BBox(
-                request.bbox[0],  # west
-                request.bbox[1],  # south
-                request.bbox[2],  # east
-                request.bbox[3]   # north
-            )
-        
-        # Submit job
-        job_id = client.submit(harmony_request)
-        
-        # Wait for processing
-        client.wait_for_processing(job_id, show_progress=True)
-        
-        # Download results
-        results = client.download_all(job_id, directory="/tmp", overwrite=True)
-        result_files = [f.result() for f in results]
+        # Create Harmony request and download the granules; nothing is rendered, so nothing is admitted
+        scheduler.check("interactive")
+        harmony_request = build_harmony_request(request.start_time, request.end_time, request.bbox)
+        job_id, result_files = await asyncio.to_thread(fetch_tempo_granules, client, harmony_request)
         
         # Process data files - simplified version without xarray
         processed_data = []
@@ -561,7 +1397,7 @@ async def get_tempo_data(
                     data_info["requested_variables"] = request.variables
                 
                 processed_data.append(data_info)
-                
+            
             except Exception as e:
                 print(f"Error processing file {file_path}: {e}")
                 continue
@@ -575,13 +1411,67 @@ async def get_tempo_data(
             },
             message=f"Successfully processed {len(processed_data)} files"
         )
-        
+    
+    except SchedulerBusy as e:
+        raise too_busy(e)
     except Exception as e:
         return TempoDataResponse(
             success=False,
             message=f"Error fetching TEMPO data: {str(e)}"
         )
 
+async def export_tempo_data(request: TempoDataRequest, client: Client):
+    """
+    Stream the requested variables of TEMPO data as a binary array format
+    
+    Admitted as an interactive request once the granules are on disk, until the stream ends.
+    """
+    try:
+        variables = request.variables or [DEFAULT_VARIABLE]
+        harmony_request = build_harmony_request(
+            request.start_time, request.end_time, request.bbox, with_quality_flag(variables, request.max_quality_flag)
+        )
+        job_id, result_files = await asyncio.to_thread(fetch_tempo_granules, client, harmony_request)
+    except Exception as e:
+        return TempoDataResponse(
+            success=False,
+            message=f"Error fetching TEMPO data: {str(e)}"
+        )
+    
+    if not result_files:
+        return TempoDataResponse(
+            success=False,
+            message="No data files found for the specified parameters"
+        )
+    
+    try:
+        scheduler.admit("interactive")
+    except SchedulerBusy as e:
+        raise too_busy(e)
+    
+    media_type, extension = EXPORT_FORMATS[request.format]
+    chunks = stream_export(
+        request.format,
+        result_files,
+        variables=variables,
+        bbox=request.bbox,
+        start_time=request.start_time,
+        end_time=request.end_time,
+        max_quality_flag=request.max_quality_flag
+    )
+    
+    # A background task runs even when the client disconnects before the body is streamed
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="tempo_{job_id}.{extension}"',
+            "X-Harmony-Job-Id": job_id,
+            "X-Granule-Count": str(len(result_files))
+        },
+        background=BackgroundTask(scheduler.release, "interactive")
+    )
+
 @app.get("/tempo/collections")
 async def get_available_collections(
     client: Client = Depends(get_harmony_client),
@@ -608,229 +1498,272 @@ async def get_available_collections(
             detail=f"Error fetching collections: {str(e)}"
         )
 
-@app.post("/tempo/visualize")
-async def visualize_tempo_data(
-    request: VisualizationRequest,
-    client: Client = Depends(get_harmony_client),
-    token: str = Depends(verify_token)
-):
-    """
-    Create visualizations of TEMPO data
+def build_visualization_response(request: VisualizationRequest, client: Client,
+                                 priority: str = "interactive") -> TempoDataResponse:
+    """Fetch data and render a single visualization (served from cache when possible)"""
+    # Check cache first
+    request_data = request.dict()
+    cache_key = generate_cache_key(request_data, "visualize")
+    cached_result = get_from_cache(cache_key)
     
-    This endpoint fetches NASA TEMPO data and creates various visualizations
-    including maps, zonal means, and contour plots.
-    """
-    try:
-        # Check cache first
-        request_data = request.dict()
-        cache_key = generate_cache_key(request_data, "visualize")
-        cached_result = get_from_cache(cache_key)
-        
-        if cached_result:
-            return TempoDataResponse(**cached_result)
-        
-        # Parse datetime strings
-        start_dt = dt.datetime.fromisoformat(request.start_time.replace('Z', '+00:00'))
-        end_dt = dt.datetime.fromisoformat(request.end_time.replace('Z', '+00:00'))
-        
-        # Create Harmony request
-        harmony_request = Request(
-            collection=Collection(id=request.collection_id),
-            temporal={
-                "start": start_dt,
-                "stop": end_dt,
-            },
+    if cached_result:
+        return TempoDataResponse.model_construct(**cached_result)
+    
+    if request.plot_type not in PLOT_TYPE_NAMES:
+        return TempoDataResponse(
+            success=False,
+            message=f"Invalid plot type: {request.plot_type}. Use 'map', 'zonal_mean', 'contour' or 'gridded_map'"
         )
-        
-        # Add spatial filter if provided
-        if request.bbox and len(request.bbox) == 4:
-            harmony_request.spatial = BBox(
-                request.bbox[0],  # west
-                request.bbox[1],  # south
-                request.bbox[2],  # east
-                request.bbox[3]   # north
-            )
-        
-        # Add variables if specified
-        if request.variables:
-            harmony_request.variables = request.variables
-        
-        # Submit job
-        job_id = client.submit(harmony_request)
-        
-        # Wait for processing
-        client.wait_for_processing(job_id, show_progress=True)
-        
-        # Download results
-        results = client.download_all(job_id, directory="/tmp", overwrite=True)
-        result_files = [f.result() for f in results]
-        
-        if not result_files:
-            return TempoDataResponse(
-                success=False,
-                message="No data files found for the specified parameters"
-            )
-        
+    
+    harmony_request = build_harmony_request(
+        request.start_time, request.end_time, request.bbox,
+        with_quality_flag(request.variables, request.max_quality_flag), request.collection_id
+    )
+    job_id, result_files = fetch_tempo_granules(client, harmony_request)
+    
+    if not result_files:
+        return TempoDataResponse(
+            success=False,
+            message="No data files found for the specified parameters"
+        )
+    
+    # Admitted only now that the data is here, so waiting on Harmony holds no admission
+    with scheduler.admitted(priority):
         # Process the first data file for visualization
-        datatree = xr.open_datatree(result_files[0])
+        load_render_modules()
         
-        # Determine variable to plot
-        variable_name = "product/vertical_column"
-        if request.variables and request.variables[0]:
-            variable_name = request.variables[0]
+        # Determine variable to plot, then open the file with its arrays from the shared cache
+        variable_name = resolve_variable_name(request.variables)
+        datatree = open_granule(result_files[0], [variable_name])
+        datatree = quality_masker.mask_datatree(datatree, [variable_name], request.max_quality_flag)
+        datatree = swath_clipper.clip_datatree(datatree, request.bbox)
+        color_scale = color_scale_for(datatree, variable_name, request.bbox, request.start_time,
+                                      request.max_quality_flag)
         
         # Create visualization based on plot type
-        img_base64 = None
-        if request.plot_type == "map":
-            img_base64 = create_map_visualization(
-                datatree, 
-                variable_name, 
-                f"TEMPO {variable_name} Map"
-            )
-        elif request.plot_type == "zonal_mean":
-            img_base64 = create_zonal_mean_plot(
-                datatree, 
-                variable_name, 
-                f"TEMPO {variable_name} Zonal Mean"
-            )
-        elif request.plot_type == "contour":
-            img_base64 = create_contour_plot(
-                datatree, 
-                variable_name, 
-                f"TEMPO {variable_name} Contour"
-            )
-        else:
-            return TempoDataResponse(
-                success=False,
-                message=f"Invalid plot type: {request.plot_type}. Use 'map', 'zonal_mean', or 'contour'"
-            )
-        
-        if img_base64 is None:
-            return TempoDataResponse(
-                success=False,
-                message="Failed to create visualization"
-            )
-        
-        # Create response
-        response = TempoDataResponse(
-            success=True,
-            data={
-                "job_id": job_id,
-                "plot_type": request.plot_type,
-                "variable": variable_name,
-                "image_base64": img_base64,
-                "files_processed": len(result_files)
-            },
-            message=f"Successfully created {request.plot_type} visualization"
-        )
-        
-        # Store in cache
-        store_in_cache(cache_key, response.dict())
-        
-        return response
-        
-    except Exception as e:
+        img_base64 = scheduler.run(render_plot, datatree, request.plot_type, variable_name,
+                                   color_scale=color_scale, bbox=request.bbox, priority=priority)
+    
+    if img_base64 is None:
         return TempoDataResponse(
             success=False,
-            message=f"Error creating visualization: {str(e)}"
+            message="Failed to create visualization"
         )
+    
+    # Create response
+    response = full_visualization_response(job_id, request.plot_type, variable_name, img_base64, len(result_files))
+    
+    # Store in cache
+    store_in_cache(cache_key, response.dict())
+    
+    return response
 
-@app.post("/tempo/visualize/all")
-async def visualize_all_tempo_data(
-    request: VisualizationRequest,
-    client: Client = Depends(get_harmony_client),
-    token: str = Depends(verify_token)
-):
-    """
-    Create ALL visualizations of TEMPO data in a single request
+def full_visualization_response(job_id: str, plot_type: str, variable_name: str, img_base64: str,
+                                files_processed: int) -> TempoDataResponse:
+    """Response of a successful single visualization, as /tempo/visualize returns and caches it"""
+    return TempoDataResponse(
+        success=True,
+        data={
+            "job_id": job_id,
+            "plot_type": plot_type,
+            "variable": variable_name,
+            "image_base64": img_base64,
+            "files_processed": files_processed
+        },
+        message=f"Successfully created {plot_type} visualization"
+    )
+
+def render_full_visualization(render_job_id: str, cache_key: str, datatree, plot_type: str, variable_name: str,
+                              harmony_job_id: str, files_processed: int, color_scale=None, bbox=None) -> None:
+    """Render the full-quality image of a progressive request into its job and the response cache"""
+    process_single_visualization(datatree, plot_type, variable_name, render_job_id, color_scale, bbox)
     
-    This optimized endpoint fetches data once and generates all three
-    visualization types (map, zonal_mean, contour) from the same dataset.
+    job_data = get_job(render_job_id)
+    result = job_data["results"].get(plot_type) if job_data else None
+    if result and result.get("success"):
+        store_in_cache(cache_key, full_visualization_response(
+            harmony_job_id, plot_type, variable_name, result["image_base64"], files_processed
+        ).dict())
+
+def start_full_render_job(request: VisualizationRequest, cache_key: str, datatree, variable_name: str,
+                          harmony_job_id: str, files_processed: int, color_scale=None) -> str:
+    """Queue the full-quality render behind a preview; tracked like a parallel job
+    
+    Runs under the background admission its caller claimed, released once the render is done.
     """
+    render_job_id = str(uuid.uuid4())
+    
+    # The data is already downloaded, so the job starts past the Harmony share of its progress
+    state_store.set(JOB_STATE, render_job_id, {
+        "status": "processing",
+        "progress": HARMONY_PROGRESS_SHARE,
+        "completed_plots": [],
+        "failed_plots": [],
+        "plot_types": [request.plot_type],
+        "end_time": request.end_time,
+        "results": {},
+        "error": None,
+        "harmony_progress": 100,
+        "harmony_status": "successful",
+        "worker_host": WORKER_HOST,
+        "worker_pid": os.getpid()
+    }, ttl=JOB_STATE_TTL)
+    
+    with job_lock:
+        future = scheduler.submit(
+            render_full_visualization, render_job_id, cache_key, datatree, request.plot_type,
+            variable_name, harmony_job_id, files_processed, color_scale, request.bbox, priority="background"
+        )
+        # Registered so DELETE /tempo/visualize/{job_id} can drop the queued render
+        job_controls[render_job_id] = {
+            "task": None,
+            "futures": [future],
+            "harmony_job_id": harmony_job_id,
+            "holds_harmony_job": False,
+            "cancelling": False
+        }
+    
+    def forget_control(_):
+        with job_lock:
+            job_controls.pop(render_job_id, None)
+        scheduler.release("background")
+    
+    future.add_done_callback(forget_control)
+    return render_job_id
+
+def build_preview_response(request: VisualizationRequest, client: Client) -> TempoDataResponse:
+    """Render a fast preview now and queue the full-quality render as a job"""
+    request_data = request.dict()
+    cache_key = generate_cache_key(request_data, "visualize")
+    preview_key = generate_cache_key(request_data, "visualize_preview")
+    
+    # A repeat visit while the full render is still running gets the same preview and job
+    cached_preview = get_from_cache(preview_key)
+    if cached_preview:
+        render_job = get_job(cached_preview["data"]["render_job_id"])
+        if render_job is not None and render_job["status"] in ("queued", "processing"):
+            return TempoDataResponse.model_construct(**cached_preview)
+        if render_job is not None and render_job["status"] == "completed":
+            # Its full image has since been evicted, so this preview is stale: start over
+            state_store.delete(RESPONSE_CACHE, preview_key)
+            cached_preview = None
+    
+    harmony_request = build_harmony_request(
+        request.start_time, request.end_time, request.bbox,
+        with_quality_flag(request.variables, request.max_quality_flag), request.collection_id
+    )
+    job_id, result_files = fetch_tempo_granules(client, harmony_request)
+    
+    if not result_files:
+        return TempoDataResponse(
+            success=False,
+            message="No data files found for the specified parameters"
+        )
+    
+    # Admitted only now that the data is here, so waiting on Harmony holds no admission;
+    # the full render's admission is claimed before its preview and handed to the render job
+    scheduler.admit("background")
     try:
-        # Check cache first
-        request_data = request.dict()
-        cache_key = generate_cache_key(request_data, "visualize_all")
-        cached_result = get_from_cache(cache_key)
-        
-        if cached_result:
-            return TempoDataResponse(**cached_result)
-        
-        # Parse datetime strings
-        start_dt = dt.datetime.fromisoformat(request.start_time.replace('Z', '+00:00'))
-        end_dt = dt.datetime.fromisoformat(request.end_time.replace('Z', '+00:00'))
-        
-        # Create Harmony request
-        harmony_request = Request(
-            collection=Collection(id=request.collection_id),
-            temporal={
-                "start": start_dt,
-                "stop": end_dt,
-            },
+        with scheduler.admitted("interactive"):
+            # Process the first data file for visualization
+            load_render_modules()
+            
+            # Determine variable to plot, then open the file with its arrays from the shared cache
+            variable_name = resolve_variable_name(request.variables)
+            datatree = open_granule(result_files[0], [variable_name])
+            datatree = quality_masker.mask_datatree(datatree, [variable_name], request.max_quality_flag)
+            datatree = swath_clipper.clip_datatree(datatree, request.bbox)
+            color_scale = color_scale_for(datatree, variable_name, request.bbox, request.start_time,
+                                          request.max_quality_flag)
+            
+            if cached_preview:
+                preview_base64 = cached_preview["data"]["image_base64"]
+            else:
+                preview_base64 = scheduler.run(create_preview_visualization, datatree, request.plot_type, variable_name,
+                                               color_scale=color_scale, bbox=request.bbox)
+    except BaseException:
+        scheduler.release("background")
+        raise
+    
+    if preview_base64 is None:
+        scheduler.release("background")
+        return TempoDataResponse(
+            success=False,
+            message="Failed to create preview"
         )
-        
-        # Add spatial filter if provided
-        if request.bbox and len(request.bbox) == 4:
-            harmony_request.spatial = BBox(
-                request.bbox[0],  # west
-                request.bbox[1],  # south
-                request.bbox[2],  # east
-                request.bbox[3]   # north
-            )
-        
-        # Add variables if specified
-        if request.variables:
-            harmony_request.variables = request.variables
-        
-        # Submit job
-        job_id = client.submit(harmony_request)
-        
-        # Wait for processing
-        client.wait_for_processing(job_id, show_progress=True)
-        
-        # Download results
-        results = client.download_all(job_id, directory="/tmp", overwrite=True)
-        result_files = [f.result() for f in results]
-        
-        if not result_files:
-            return TempoDataResponse(
-                success=False,
-                message="No data files found for the specified parameters"
-            )
-        
+    
+    render_job_id = start_full_render_job(request, cache_key, datatree, variable_name, job_id, len(result_files),
+                                          color_scale)
+    
+    response = TempoDataResponse(
+        success=True,
+        data={
+            "job_id": job_id,
+            "plot_type": request.plot_type,
+            "variable": variable_name,
+            "image_base64": preview_base64,
+            "files_processed": len(result_files),
+            "preview": True,
+            "render_job_id": render_job_id
+        },
+        message=f"Preview ready; full {request.plot_type} visualization rendering in job {render_job_id}"
+    )
+    
+    # Cached apart from the full image, which replaces it once rendered
+    store_in_cache(preview_key, response.dict())
+    
+    return response
+
+def build_all_visualizations_response(request: VisualizationRequest, client: Client,
+                                      priority: str = "interactive") -> TempoDataResponse:
+    """Fetch data once and render all three plot types (served from cache when possible)"""
+    # Check cache first
+    request_data = request.dict()
+    cache_key = generate_cache_key(request_data, "visualize_all")
+    cached_result = get_from_cache(cache_key)
+    
+    if cached_result:
+        return TempoDataResponse.model_construct(**cached_result)
+    
+    harmony_request = build_harmony_request(
+        request.start_time, request.end_time, request.bbox,
+        with_quality_flag(request.variables, request.max_quality_flag), request.collection_id
+    )
+    job_id, result_files = fetch_tempo_granules(client, harmony_request)
+    
+    if not result_files:
+        return TempoDataResponse(
+            success=False,
+            message="No data files found for the specified parameters"
+        )
+    
+    # Admitted only now that the data is here, so waiting on Harmony holds no admission
+    with scheduler.admitted(priority):
         # Process the first data file for visualization
-        datatree = xr.open_datatree(result_files[0])
+        load_render_modules()
         
-        # Determine variable to plot
-        variable_name = "product/vertical_column"
-        if request.variables and request.variables[0]:
-            variable_name = request.variables[0]
+        # Determine variable to plot, then open the file with its arrays from the shared cache
+        variable_name = resolve_variable_name(request.variables)
+        datatree = open_granule(result_files[0], [variable_name])
+        datatree = quality_masker.mask_datatree(datatree, [variable_name], request.max_quality_flag)
+        datatree = swath_clipper.clip_datatree(datatree, request.bbox)
+        color_scale = color_scale_for(datatree, variable_name, request.bbox, request.start_time,
+                                      request.max_quality_flag)
         
-        # Generate all three visualizations from the same dataset
+        # Generate all three visualizations from the same dataset, on the same color scale
         visualizations = {}
-        plot_types = ["map", "zonal_mean", "contour"]
-        plot_names = ["Map", "Zonal Mean", "Contour"]
+        plot_types = list(ALL_PLOT_TYPES)
         
-        for plot_type, plot_name in zip(plot_types, plot_names):
+        futures = {
+            plot_type: scheduler.submit(render_plot, datatree, plot_type, variable_name,
+                                        color_scale=color_scale, bbox=request.bbox, priority=priority)
+            for plot_type in plot_types
+        }
+        
+        for plot_type in plot_types:
+            plot_name = PLOT_TYPE_NAMES[plot_type]
             try:
-                if plot_type == "map":
-                    img_base64 = create_map_visualization(
-                        datatree, 
-                        variable_name, 
-                        f"TEMPO {variable_name} {plot_name}"
-                    )
-                elif plot_type == "zonal_mean":
-                    img_base64 = create_zonal_mean_plot(
-                        datatree, 
-                        variable_name, 
-                        f"TEMPO {variable_name} {plot_name}"
-                    )
-                elif plot_type == "contour":
-                    img_base64 = create_contour_plot(
-                        datatree, 
-                        variable_name, 
-                        f"TEMPO {variable_name} {plot_name}"
-                    )
+                img_base64 = futures[plot_type].result()
                 
                 if img_base64:
                     visualizations[plot_type] = {
@@ -848,29 +1781,154 @@ async def visualize_all_tempo_data(
                     "error": f"Error generating {plot_name}: {str(e)}"
                 }
         
-        # Count successes
-        success_count = sum(1 for v in visualizations.values() if v["success"])
-        
-        # Create response
-        response = TempoDataResponse(
-            success=success_count > 0,
-            data={
-                "job_id": job_id,
-                "variable": variable_name,
-                "files_processed": len(result_files),
-                "visualizations": visualizations,
-                "success_count": success_count,
-                "total_count": len(plot_types),
-                "bbox": request.bbox
-            },
-            message=f"Generated {success_count}/{len(plot_types)} visualizations successfully"
+    # Count successes
+    success_count = sum(1 for v in visualizations.values() if v["success"])
+    
+    # Create response
+    response = TempoDataResponse(
+        success=success_count > 0,
+        data={
+            "job_id": job_id,
+            "variable": variable_name,
+            "files_processed": len(result_files),
+            "visualizations": visualizations,
+            "success_count": success_count,
+            "total_count": len(plot_types),
+            "bbox": request.bbox
+        },
+        message=f"Generated {success_count}/{len(plot_types)} visualizations successfully"
+    )
+    
+    # Store in cache
+    store_in_cache(cache_key, response.dict())
+    
+    return response
+
+def prefetch_visualization_request(target: Dict[str, Any], start_time: str, end_time: str) -> VisualizationRequest:
+    """Build the visualization request a prefetch target stands for"""
+    return VisualizationRequest(
+        start_time=start_time,
+        end_time=end_time,
+        bbox=target["bbox"],
+        variables=target["variables"],
+        plot_type=target["plot_type"],
+        max_quality_flag=target.get("max_quality_flag"),
+        collection_id=target["collection_id"]
+    )
+
+def prefetch_visualization(target: Dict[str, Any], start_time: str, end_time: str) -> bool:
+    """Fetch and render a prefetch target into the cache"""
+    client = harmony_client
+    if client is None:
+        return False
+    
+    request = prefetch_visualization_request(target, start_time, end_time)
+    if target["endpoint"] == "visualize_all":
+        response = build_all_visualizations_response(request, client, priority="prefetch")
+    else:
+        response = build_visualization_response(request, client, priority="prefetch")
+    
+    print(f"🔮 Prefetched {target['endpoint']} {target['plot_type']} for {start_time}: {response.message}")
+    return response.success
+
+def is_prefetch_cached(target: Dict[str, Any], start_time: str, end_time: str) -> bool:
+    """Check whether a prefetch target is already in the cache"""
+    request = prefetch_visualization_request(target, start_time, end_time)
+    return is_in_cache(generate_cache_key(request.dict(), target["endpoint"]))
+
+def has_interactive_requests() -> bool:
+    """Whether interactive visualization requests are currently running"""
+    return scheduler.active_requests("interactive") > 0
+
+prefetch_scheduler = PrefetchScheduler(
+    prefetch_fn=prefetch_visualization,
+    is_cached_fn=is_prefetch_cached,
+    is_busy_fn=has_interactive_requests,
+    poll_interval=PREFETCH_POLL_SECONDS,
+    window_minutes=PREFETCH_WINDOW_MINUTES,
+    max_targets=PREFETCH_MAX_TARGETS,
+    min_hits=PREFETCH_MIN_HITS,
+    concurrency=PREFETCH_CONCURRENCY,
+    retry_after=CACHE_TTL,
+    configured_targets=PREFETCH_TARGETS
+)
+
+@app.post("/tempo/visualize")
+async def visualize_tempo_data(
+    request: VisualizationRequest,
+    client: Client = Depends(get_harmony_client),
+    token: str = Depends(verify_token),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Create visualizations of TEMPO data
+    
+    This endpoint fetches NASA TEMPO data and creates various visualizations
+    including maps, zonal means, and contour plots. Successful responses carry
+    an ETag; a matching If-None-Match is answered with 304 Not Modified.
+    
+    With progressive=true a map or contour that is not cached yet comes back
+    as a low-resolution preview (data.preview); the full image is rendered in
+    job data.render_job_id and served from cache on the next request.
+    """
+    try:
+        prefetch_scheduler.record_request("visualize", request)
+        
+        # Cache hits are served as the stored bytes, without rebuilding the response model
+        cached_body = await asyncio.to_thread(get_cached_body, generate_cache_key(request.dict(), "visualize"))
+        if cached_body is not None:
+            return json_response(cached_body, if_none_match, accept_encoding, request.end_time)
+        
+        # Refuse early when busy; the request is admitted once its granules are here
+        scheduler.check("interactive")
+        if request.progressive and request.plot_type in PREVIEW_PLOT_TYPES:
+            response = await asyncio.to_thread(build_preview_response, request, client)
+            # Never stored by clients - the next request should get the full image
+            return json_response(dumps(response.dict()), if_none_match, accept_encoding, request.end_time,
+                                 cacheable=False)
+        
+        response = await asyncio.to_thread(build_visualization_response, request, client)
+        return model_response(response, if_none_match, accept_encoding, request.end_time)
+    
+    except SchedulerBusy as e:
+        raise too_busy(e)
+    except Exception as e:
+        return TempoDataResponse(
+            success=False,
+            message=f"Error creating visualization: {str(e)}"
         )
+
+@app.post("/tempo/visualize/all")
+async def visualize_all_tempo_data(
+    request: VisualizationRequest,
+    client: Client = Depends(get_harmony_client),
+    token: str = Depends(verify_token),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Create ALL visualizations of TEMPO data in a single request
+    
+    This optimized endpoint fetches data once and generates all three
+    visualization types (map, zonal_mean, contour) from the same dataset.
+    Honors If-None-Match like /tempo/visualize.
+    """
+    try:
+        prefetch_scheduler.record_request("visualize_all", request)
         
-        # Store in cache
-        store_in_cache(cache_key, response.dict())
-        
-        return response
+        # Cache hits are served as the stored bytes, without rebuilding the response model
+        cached_body = await asyncio.to_thread(get_cached_body, generate_cache_key(request.dict(), "visualize_all"))
+        if cached_body is not None:
+            return json_response(cached_body, if_none_match, accept_encoding, request.end_time)
         
+        # Refuse early when busy; the request is admitted once its granules are here
+        scheduler.check("interactive")
+        response = await asyncio.to_thread(build_all_visualizations_response, request, client)
+        return model_response(response, if_none_match, accept_encoding, request.end_time)
+    
+    except SchedulerBusy as e:
+        raise too_busy(e)
     except Exception as e:
         return TempoDataResponse(
             success=False,
@@ -880,7 +1938,6 @@ async def visualize_all_tempo_data(
 @app.post("/tempo/visualize/parallel")
 async def start_parallel_visualization(
     request: ParallelVisualizationRequest,
-    background_tasks: BackgroundTasks,
     client: Client = Depends(get_harmony_client),
     token: str = Depends(verify_token)
 ):
@@ -890,60 +1947,61 @@ async def start_parallel_visualization(
     This endpoint starts processing multiple plot types in parallel and returns
     a job ID that can be used to check status and get results.
     """
+    try:
+        scheduler.admit("background")
+    except SchedulerBusy as e:
+        raise too_busy(e)
+    
     try:
         # Generate unique job ID
         job_id = str(uuid.uuid4())
         
-        # Parse datetime strings
-        start_dt = dt.datetime.fromisoformat(request.start_time.replace('Z', '+00:00'))
-        end_dt = dt.datetime.fromisoformat(request.end_time.replace('Z', '+00:00'))
-        
         # Create Harmony request
-        harmony_request = Request(
-            collection=Collection(id=request.collection_id),
-            temporal={
-                "start": start_dt,
-                "stop": end_dt,
-            },
+        harmony_request = build_harmony_request(
+            request.start_time, request.end_time, request.bbox,
+            with_quality_flag(request.variables, request.max_quality_flag), request.collection_id
         )
         
-        # Add spatial filter if provided
-        if request.bbox and len(request.bbox) == 4:
-            harmony_request.spatial = BBox(
-                request.bbox[0],  # west
-                request.bbox[1],  # south
-                request.bbox[2],  # east
-                request.bbox[3]   # north
-            )
-        
-        # Add variables if specified
-        if request.variables:
-            harmony_request.variables = request.variables
-        
-        # Initialize job status
+        # Initialize job status - visible to every worker
+        await asyncio.to_thread(state_store.set, JOB_STATE, job_id, {
+            "status": "queued",
+            "progress": 0,
+            "completed_plots": [],
+            "failed_plots": [],
+            "plot_types": request.plot_types,
+            "end_time": request.end_time,
+            "results": {},
+            "error": None,
+            "harmony_progress": None,
+            "harmony_status": None,
+            "worker_host": WORKER_HOST,
+            "worker_pid": os.getpid()
+        }, ttl=JOB_STATE_TTL)
+        
+        # Submit Harmony job (or reuse one for an equivalent request)
+        harmony_job_id, _ = await asyncio.to_thread(submit_harmony_job, client, harmony_request)
+        use_harmony_job(harmony_job_id)
+        
+        # Start background processing; the task is kept so the job can be cancelled
         with job_lock:
-            job_results[job_id] = {
-                "status": "queued",
-                "progress": 0,
-                "completed_plots": [],
-                "failed_plots": [],
-                "plot_types": request.plot_types,
-                "results": {},
-                "error": None
+            job_controls[job_id] = {
+                "task": None,
+                "futures": [],
+                "harmony_job_id": harmony_job_id,
+                "holds_harmony_job": True,
+                "cancelling": False
             }
-        
-        # Submit Harmony job
-        harmony_job_id = client.submit(harmony_request)
-        
-        # Start background processing
-        background_tasks.add_task(
-            process_parallel_visualization,
+        job_controls[job_id]["task"] = asyncio.create_task(process_parallel_visualization(
             job_id,
+            harmony_request,
             harmony_job_id,
             request.plot_types,
             request.variables,
-            client
-        )
+            client,
+            request.max_quality_flag,
+            bbox=request.bbox,
+            start_time=request.start_time
+        ))
         
         return {
             "success": True,
@@ -952,47 +2010,627 @@ async def start_parallel_visualization(
             "status": "queued",
             "message": f"Started processing {len(request.plot_types)} visualization types"
         }
-        
+    
     except Exception as e:
+        scheduler.release("background")
         return {
             "success": False,
             "message": f"Error starting parallel visualization: {str(e)}"
         }
 
-async def process_parallel_visualization(job_id, harmony_job_id, plot_types, variables, client):
+def record_harmony_progress(job_id: str, progress: int, harmony_status: str,
+                            loop: asyncio.AbstractEventLoop) -> None:
+    """Reflect Harmony job progress in a parallel job's status; runs in a worker thread
+    
+    loop is the event loop running the job, where a cancellation made through
+    another worker is acted on.
+    """
+    def set_progress(job):
+        job["harmony_progress"] = progress
+        job["harmony_status"] = harmony_status
+        if job["status"] == "queued":
+            job["progress"] = int(progress * HARMONY_PROGRESS_SHARE / 100)
+    
+    job_data = update_job(job_id, set_progress)
+    
+    # Cancelled through another worker - stop the work running here
+    if job_data is not None and job_data["status"] == "cancelled":
+        try:
+            loop.call_soon_threadsafe(lambda: loop.create_task(cancel_job_locally(job_id)))
+        except RuntimeError as e:
+            print(f"⚠️  Could not stop cancelled job {job_id} in this worker: {e}")
+
+async def cancel_job_locally(job_id: str) -> Dict[str, Any]:
+    """Stop a cancelled parallel job's renders, downloads and Harmony job if this worker runs it"""
+    outcome = {
+        "renders_dropped": 0,
+        "downloads_dropped": 0,
+        "harmony_job_id": None,
+        "harmony_job_cancelled": False
+    }
+    with job_lock:
+        control = job_controls.get(job_id)
+        if control is None or control["cancelling"]:
+            return outcome
+        control["cancelling"] = True
+        futures = control["futures"]
+        task = control["task"]
+        harmony_job_id = control["harmony_job_id"]
+        release = control["holds_harmony_job"]
+        control["holds_harmony_job"] = False
+    
+    outcome["harmony_job_id"] = harmony_job_id
+    outcome["renders_dropped"] = scheduler.discard(futures)
+    if task is not None:
+        task.cancel()
+    
+    # Stop the upstream work only when no other request in this worker is waiting on it
+    if release and release_harmony_job(harmony_job_id) == 0:
+        outcome["downloads_dropped"] = download_manager.cancel_job(harmony_job_id)
+        job_data = await asyncio.to_thread(get_job, job_id)
+        harmony_done = job_data is not None and job_data["harmony_status"] in DONE_STATUSES
+        if not harmony_done and harmony_client is not None:
+            try:
+                await asyncio.to_thread(harmony_client.cancel, harmony_job_id)
+                outcome["harmony_job_cancelled"] = True
+            except Exception as e:
+                print(f"⚠️  Could not cancel Harmony job {harmony_job_id}: {e}")
+            await asyncio.to_thread(harmony_job_index.forget, harmony_job_id)
+    
+    return outcome
+
+async def process_parallel_visualization(job_id, harmony_request, harmony_job_id, plot_types, variables, client,
+                                         max_quality_flag=None, bbox=None, start_time=None):
     """Background task to process visualizations in parallel"""
     try:
-        # Wait for Harmony processing
-        client.wait_for_processing(harmony_job_id, show_progress=True)
-        
-        # Download results
-        results = client.download_all(harmony_job_id, directory="/tmp", overwrite=True)
-        result_files = [f.result() for f in results]
+        # Wait for the submitted Harmony job without holding a thread, then download results
+        loop = asyncio.get_running_loop()
+        on_progress = lambda progress, harmony_status: record_harmony_progress(job_id, progress, harmony_status, loop)
+        if job_watcher.running:
+            await job_watcher.wait(harmony_job_id, on_progress)
+        # Download from the job this request submitted (and DELETE cancels) rather than resubmitting
+        result_files = await asyncio.to_thread(
+            download_job_granules, client, harmony_job_id, on_progress, False
+        )
+        await asyncio.to_thread(cache_granules, harmony_request, harmony_job_id, result_files)
+        if await asyncio.to_thread(is_job_cancelled, job_id):
+            return
         
         if not result_files:
-            with job_lock:
-                if job_id in job_results:
-                    job_results[job_id]["status"] = "failed"
-                    job_results[job_id]["error"] = "No data files found for the specified parameters"
+            await asyncio.to_thread(mark_job_failed, job_id, "No data files found for the specified parameters")
             return
         
-        # Process the first data file for visualization
-        datatree = xr.open_datatree(result_files[0])
-        
-        # Determine variable to plot
-        variable_name = "product/vertical_column"
-        if variables and variables[0]:
-            variable_name = variables[0]
+        # Determine variable to plot, then open the first data file with its arrays from the shared cache
+        variable_name = resolve_variable_name(variables)
+        datatree = await asyncio.to_thread(open_batch_granule, result_files[0], [variable_name], max_quality_flag, bbox)
+        color_scale = await asyncio.to_thread(color_scale_for, datatree, variable_name, bbox, start_time,
+                                              max_quality_flag)
         
         # Process all visualizations in parallel
-        process_visualization_job(job_id, datatree, plot_types, variable_name)
-        
+        await asyncio.to_thread(process_visualization_job, job_id, datatree, plot_types, variable_name, color_scale, bbox)
+    
+    except asyncio.CancelledError:
+        print(f"🛑 Parallel job {job_id} cancelled")
     except Exception as e:
         print(f"Error in parallel processing: {e}")
+        await asyncio.to_thread(mark_job_failed, job_id, str(e))
+    finally:
+        scheduler.release("background")
         with job_lock:
-            if job_id in job_results:
-                job_results[job_id]["status"] = "failed"
-                job_results[job_id]["error"] = str(e)
+            control = job_controls.pop(job_id, None)
+            holds_harmony_job = control is not None and control["holds_harmony_job"]
+        if holds_harmony_job:
+            release_harmony_job(harmony_job_id)
+
+def plan_batch_visualization(request: BatchVisualizationRequest) -> List[Dict[str, Any]]:
+    """Plan a batch: one Harmony job per distinct time window, skipping items already cached"""
+    windows = []
+    seen_windows = set()
+    variables = list(dict.fromkeys(request.variables))
+    plot_types = list(dict.fromkeys(request.plot_types))
+    
+    for time_window in request.time_windows:
+        window_key = (time_window.start_time, time_window.end_time)
+        if window_key in seen_windows:
+            continue
+        seen_windows.add(window_key)
+        
+        window = {
+            "start_time": time_window.start_time,
+            "end_time": time_window.end_time,
+            "cached_items": [],
+            "pending_items": []
+        }
+        
+        for variable_name in variables:
+            for plot_type in plot_types:
+                # Each item shares its cache entry with the equivalent /tempo/visualize request
+                single_request = VisualizationRequest(
+                    start_time=time_window.start_time,
+                    end_time=time_window.end_time,
+                    bbox=request.bbox,
+                    variables=[variable_name],
+                    plot_type=plot_type,
+                    max_quality_flag=request.max_quality_flag,
+                    collection_id=request.collection_id
+                )
+                item = {
+                    "start_time": time_window.start_time,
+                    "end_time": time_window.end_time,
+                    "variable": variable_name,
+                    "plot_type": plot_type,
+                    "cache_key": generate_cache_key(single_request.dict(), "visualize")
+                }
+                
+                if is_in_cache(item["cache_key"]):
+                    window["cached_items"].append(item)
+                else:
+                    window["pending_items"].append(item)
+        
+        # A single Harmony job fetches every variable still needed for this window
+        window["variables"] = list(dict.fromkeys(item["variable"] for item in window["pending_items"]))
+        windows.append(window)
+    
+    return windows
+
+def batch_item_result(item: Dict[str, Any], success: bool, **fields) -> Dict[str, Any]:
+    """Build one NDJSON result line of a batch visualization"""
+    return {
+        "type": "result",
+        "start_time": item["start_time"],
+        "end_time": item["end_time"],
+        "variable": item["variable"],
+        "plot_type": item["plot_type"],
+        "success": success,
+        **fields
+    }
+
+def open_batch_granule(file_path: str, variables: List[str], max_quality_flag: Optional[int] = None,
+                       bbox: Optional[List[float]] = None):
+    """Open a granule once with the arrays every render of the batch will need decoded, cut to the bbox"""
+    load_render_modules()
+    datatree = quality_masker.mask_datatree(open_granule(file_path, variables), variables, max_quality_flag)
+    return swath_clipper.clip_datatree(datatree, bbox)
+
+async def stream_batch_visualization(windows: List[Dict[str, Any]], request: BatchVisualizationRequest, client: Client):
+    """Fetch each time window once and stream renders as NDJSON lines as they complete"""
+    started = time.time()
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    planned_cached = [item for window in windows for item in window["cached_items"]]
+    total_items = len(planned_cached) + sum(len(window["pending_items"]) for window in windows)
+    
+    # Read cached items before announcing the plan, so it counts the Harmony jobs really submitted
+    windows_by_key = {(w["start_time"], w["end_time"]): w for w in windows}
+    cached_lines = []
+    for item in planned_cached:
+        cached_result = await asyncio.to_thread(get_from_cache, item["cache_key"])
+        if cached_result and cached_result.get("success"):
+            cached_lines.append(json.dumps(batch_item_result(
+                item, True, cached=True, image_base64=cached_result["data"]["image_base64"]
+            )) + "\n")
+        else:
+            # Expired since planning - render it along with the rest of its window
+            window = windows_by_key[(item["start_time"], item["end_time"])]
+            window["pending_items"].append(item)
+            if item["variable"] not in window["variables"]:
+                window["variables"].append(item["variable"])
+    pending_windows = [window for window in windows if window["pending_items"]]
+    pending_count = sum(len(window["pending_items"]) for window in pending_windows)
+    
+    yield json.dumps({
+        "type": "plan",
+        "total_items": total_items,
+        "cached_items": len(cached_lines),
+        "harmony_jobs": len(pending_windows),
+        "time_windows": len(windows)
+    }) + "\n"
+    
+    # Cached items go out first
+    success_count = len(cached_lines)
+    for line in cached_lines:
+        yield line
+    
+    async def render_item(item, datatree, job_id, files_processed, color_scale):
+        # Every failure is reported on this item's own line; errors escaping would fail the whole window
+        try:
+            img_base64 = await scheduler.run_async(
+                render_plot, datatree, item["plot_type"], item["variable"], color_scale=color_scale, bbox=request.bbox,
+                priority="background"
+            )
+            if img_base64 is None:
+                await queue.put(batch_item_result(item, False, error=f"Failed to generate {item['plot_type']} visualization"))
+                return
+            
+            await asyncio.to_thread(store_in_cache, item["cache_key"], TempoDataResponse(
+                success=True,
+                data={
+                    "job_id": job_id,
+                    "plot_type": item["plot_type"],
+                    "variable": item["variable"],
+                    "image_base64": img_base64,
+                    "files_processed": files_processed
+                },
+                message=f"Successfully created {item['plot_type']} visualization"
+            ).dict())
+        except Exception as e:
+            await queue.put(batch_item_result(item, False, error=str(e)))
+            return
+        
+        await queue.put(batch_item_result(item, True, cached=False, job_id=job_id, image_base64=img_base64))
+    
+    async def process_window(window):
+        items = window["pending_items"]
+        try:
+            harmony_request = build_harmony_request(
+                window["start_time"], window["end_time"], request.bbox,
+                with_quality_flag(window["variables"], request.max_quality_flag), request.collection_id
+            )
+            job_id, result_files = await asyncio.to_thread(fetch_tempo_granules, client, harmony_request)
+            
+            if not result_files:
+                for item in items:
+                    await queue.put(batch_item_result(item, False, error="No data files found for the specified parameters"))
+                return
+            
+            # Open the granule once and fan the renders out over the worker pool
+            datatree = await asyncio.to_thread(
+                open_batch_granule, result_files[0], window["variables"], request.max_quality_flag, request.bbox
+            )
+            window_scales = {
+                variable_name: await asyncio.to_thread(
+                    color_scale_for, datatree, variable_name, request.bbox, window["start_time"], request.max_quality_flag
+                )
+                for variable_name in window["variables"]
+            }
+            await asyncio.gather(*(
+                render_item(item, datatree, job_id, len(result_files), window_scales[item["variable"]]) for item in items
+            ))
+        except Exception as e:
+            for item in items:
+                await queue.put(batch_item_result(item, False, error=str(e)))
+    
+    tasks = [asyncio.create_task(process_window(window)) for window in pending_windows]
+    try:
+        for _ in range(pending_count):
+            result = await queue.get()
+            if result["success"]:
+                success_count += 1
+            yield json.dumps(result) + "\n"
+    finally:
+        # Client went away - stop waiting on the remaining windows
+        for task in tasks:
+            task.cancel()
+    
+    yield json.dumps({
+        "type": "summary",
+        "success_count": success_count,
+        "total_count": total_items,
+        "elapsed_seconds": round(time.time() - started, 2)
+    }) + "\n"
+
+@app.post("/tempo/visualize/batch")
+async def visualize_batch(
+    request: BatchVisualizationRequest,
+    client: Client = Depends(get_harmony_client),
+    token: str = Depends(verify_token)
+):
+    """
+    Create visualizations for a matrix of variables x plot types x time windows
+    
+    Each distinct time window is fetched with a single Harmony job covering all
+    requested variables, its granule is opened once and the renders run in
+    parallel. Results stream back as newline-delimited JSON as they complete.
+    """
+    invalid_plot_types = [p for p in request.plot_types if p not in PLOT_TYPE_NAMES]
+    if invalid_plot_types:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid plot types: {invalid_plot_types}. Use 'map', 'zonal_mean', 'contour' or 'gridded_map'"
+        )
+    
+    if not request.time_windows or not request.variables or not request.plot_types:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="time_windows, variables and plot_types must not be empty"
+        )
+    
+    # Sized from the request alone, so an oversized batch is refused before any planning
+    total_items = len({(w.start_time, w.end_time) for w in request.time_windows}) \
+        * len(set(request.variables)) * len(set(request.plot_types))
+    if total_items > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch of {total_items} visualizations exceeds the limit of {BATCH_MAX_ITEMS}"
+        )
+    
+    windows = await asyncio.to_thread(plan_batch_visualization, request)
+    
+    try:
+        scheduler.admit("background")
+    except SchedulerBusy as e:
+        raise too_busy(e)
+    
+    # A background task runs even when the client disconnects before the body is streamed
+    return StreamingResponse(
+        stream_batch_visualization(windows, request, client),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(scheduler.release, "background")
+    )
+
+@app.post("/tempo/animate")
+async def animate_tempo_data(
+    request: AnimationRequest,
+    client: Client = Depends(get_harmony_client),
+    token: str = Depends(verify_token),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Create a time-series animation of TEMPO data
+    
+    Fetches every scan in the time range with a single Harmony job and renders
+    one frame per scan in parallel worker processes, using a fixed color scale
+    and a basemap that is built once per worker. Returns the GIF, WebP or MP4.
+    """
+    if request.format not in supported_formats():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format: {request.format}. Use one of {supported_formats()}"
+        )
+    
+    # Check cache first: it only references the file, which DataStorage holds
+    cache_key = generate_cache_key(request.dict(), "animate")
+    animation_name = f"{cache_key}.{request.format}"
+    cached_result = await asyncio.to_thread(get_from_cache, cache_key)
+    if cached_result:
+        content = await asyncio.to_thread(data_storage.load_animation, animation_name)
+        if content is not None:
+            return http_cache.conditional(Response(
+                content=content,
+                media_type=ANIMATION_FORMATS[request.format],
+                headers={"X-Animation-Frames": str(cached_result["frames"])}
+            ), if_none_match, request.end_time)
+        # The file was garbage collected; render it again
+        await asyncio.to_thread(state_store.delete, RESPONSE_CACHE, cache_key)
+    
+    try:
+        # Refuse early when busy; the request is admitted once its granules are here
+        scheduler.check("interactive")
+        harmony_request = build_harmony_request(
+            request.start_time, request.end_time, request.bbox, [request.variable], request.collection_id
+        )
+        job_id, result_files = await asyncio.to_thread(fetch_tempo_granules, client, harmony_request)
+        
+        with scheduler.admitted("interactive"):
+            # Without explicit limits, frames use the same color scale as the still images of that day
+            vmin, vmax = request.vmin, request.vmax
+            shared_scale = None
+            if vmin is None and request.variable != QUALITY_FLAG_VARIABLE:
+                shared_scale = await asyncio.to_thread(color_scales.get, request.variable, request.bbox,
+                                                       request.start_time)
+                if shared_scale is not None:
+                    vmin, vmax = shared_scale.vmin, shared_scale.vmax
+            
+            # Holds a scheduler worker while the frame processes run, so animations queue behind renders
+            content, info = await scheduler.run_async(
+                render_animation,
+                result_files,
+                request.variable,
+                output_format=request.format,
+                fps=request.fps,
+                bbox=request.bbox,
+                vmin=vmin,
+                vmax=vmax,
+                natural_earth_dir=NATURAL_EARTH_DIR,
+                workers=ANIMATION_WORKERS,
+                max_frames=ANIMATION_MAX_FRAMES,
+                array_cache=array_cache,
+                clip_margin=BBOX_CLIP_MARGIN
+            )
+    except SchedulerBusy as e:
+        raise too_busy(e)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating animation: {str(e)}"
+        )
+    
+    # Limits fitted over every frame become the day's shared scale
+    if request.vmin is None and shared_scale is None and request.variable != QUALITY_FLAG_VARIABLE:
+        await asyncio.to_thread(color_scales.put, request.variable, request.bbox, request.start_time,
+                                info["vmin"], info["vmax"])
+    
+    if await asyncio.to_thread(data_storage.save_animation, animation_name, content):
+        await asyncio.to_thread(store_in_cache, cache_key, {"animation": animation_name, "frames": info["frames"]})
+    
+    return http_cache.conditional(Response(
+        content=content,
+        media_type=ANIMATION_FORMATS[request.format],
+        headers={
+            "X-Animation-Frames": str(info["frames"]),
+            "X-Harmony-Job-Id": job_id
+        }
+    ), if_none_match, request.end_time)
+
+@app.post("/tempo/point", response_model=TempoDataResponse)
+async def query_tempo_points(
+    request: PointQueryRequest,
+    client: Client = Depends(get_harmony_client),
+    token: str = Depends(verify_token)
+):
+    """
+    Sample TEMPO data at lat/lon points over a time range
+    
+    Returns a time series per point with the nearest (or inverse-distance weighted)
+    pixel values and their quality flag. Each granule's spatial index is built once
+    and cached, so repeated queries against the same granules are answered without
+    touching the files again.
+    """
+    if request.method not in POINT_METHODS:
+        return TempoDataResponse(
+            success=False,
+            message=f"Invalid method: {request.method}. Use 'nearest' or 'idw'"
+        )
+    if not request.points or len(request.points) > POINT_QUERY_MAX_POINTS:
+        return TempoDataResponse(
+            success=False,
+            message=f"Provide between 1 and {POINT_QUERY_MAX_POINTS} points"
+        )
+    if any(len(point) != 2 or not -90 <= point[0] <= 90 or not -180 <= point[1] <= 180 for point in request.points):
+        return TempoDataResponse(
+            success=False,
+            message="Points must be [latitude, longitude] pairs"
+        )
+    
+    try:
+        bbox = request.bbox or points_bbox(request.points, request.max_distance_km)
+        harmony_request = build_harmony_request(
+            request.start_time, request.end_time, bbox,
+            with_quality_flag(request.variables, request.max_quality_flag), request.collection_id
+        )
+        # Refuse early when busy; the request is admitted once its granules are here
+        scheduler.check("interactive")
+        job_id, result_files = await asyncio.to_thread(fetch_tempo_granules, client, harmony_request)
+        
+        if not result_files:
+            return TempoDataResponse(
+                success=False,
+                message="No data files found for the specified parameters"
+            )
+        
+        with scheduler.admitted("interactive"):
+            points = await scheduler.run_async(
+                point_index_cache.query,
+                result_files,
+                request.points,
+                request.variables,
+                method=request.method,
+                max_distance_km=request.max_distance_km,
+                max_quality_flag=request.max_quality_flag,
+                start_time=request.start_time,
+                end_time=request.end_time
+            )
+    except SchedulerBusy as e:
+        raise too_busy(e)
+    except Exception as e:
+        return TempoDataResponse(
+            success=False,
+            message=f"Error querying TEMPO data: {str(e)}"
+        )
+    
+    matched = sum(1 for point in points if point["series"])
+    return TempoDataResponse(
+        success=True,
+        data={
+            "job_id": job_id,
+            "method": request.method,
+            "files_processed": len(result_files),
+            "points": points
+        },
+        message=f"Found data for {matched}/{len(points)} points",
+        job_id=job_id
+    )
+
+def build_region_statistics_response(request: RegionStatisticsRequest, client: Client) -> TempoDataResponse:
+    """Fetch data and compute region statistics (served from cache when possible)"""
+    # Check cache first
+    cache_key = generate_cache_key(request.dict(), "statistics")
+    cached_result = get_from_cache(cache_key)
+    
+    if cached_result:
+        return TempoDataResponse.model_construct(**cached_result)
+    
+    bbox = request.bbox or (polygon_bbox(request.polygon) if request.polygon else None)
+    
+    # Same Harmony request as a visualization of this region, so the granules are shared
+    harmony_request = build_harmony_request(
+        request.start_time, request.end_time, bbox,
+        with_quality_flag(request.variables, request.max_quality_flag), request.collection_id
+    )
+    job_id, result_files = fetch_tempo_granules(client, harmony_request)
+    
+    if not result_files:
+        return TempoDataResponse(
+            success=False,
+            message="No data files found for the specified parameters"
+        )
+    
+    # Admitted only now that the data is here, so waiting on Harmony holds no admission
+    with scheduler.admitted("interactive"):
+        statistics = scheduler.run(
+            compute_region_statistics,
+            result_files,
+            request.variables,
+            bbox=bbox,
+            polygon=request.polygon,
+            max_quality_flag=request.max_quality_flag,
+            percentiles=request.percentiles,
+            bins=request.bins
+        )
+    
+    response = TempoDataResponse(
+        success=True,
+        data={
+            "job_id": job_id,
+            "files_processed": len(result_files),
+            **statistics
+        },
+        message=f"Computed statistics over {statistics['region_pixels']} pixels",
+        job_id=job_id
+    )
+    
+    # Store in cache
+    store_in_cache(cache_key, response.dict())
+    
+    return response
+
+@app.post("/tempo/statistics", response_model=TempoDataResponse)
+async def region_statistics(
+    request: RegionStatisticsRequest,
+    client: Client = Depends(get_harmony_client),
+    token: str = Depends(verify_token),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Compute summary statistics of TEMPO data over a region
+    
+    Returns mean, std, min, max, percentiles, a histogram and the valid-pixel
+    fraction of each variable over a bbox or polygon, optionally masked by
+    quality flag, without rendering anything.
+    """
+    if request.polygon is not None and (len(request.polygon) < 3 or any(len(v) != 2 for v in request.polygon)):
+        return TempoDataResponse(
+            success=False,
+            message="Polygon must have at least 3 [longitude, latitude] vertices"
+        )
+    if any(not 0 <= p <= 100 for p in request.percentiles):
+        return TempoDataResponse(
+            success=False,
+            message="Percentiles must be between 0 and 100"
+        )
+    
+    cached_body = await asyncio.to_thread(get_cached_body, generate_cache_key(request.dict(), "statistics"))
+    if cached_body is not None:
+        return json_response(cached_body, if_none_match, accept_encoding, request.end_time)
+    
+    try:
+        # Refuse early when busy; the request is admitted once its granules are here
+        scheduler.check("interactive")
+        response = await asyncio.to_thread(build_region_statistics_response, request, client)
+        return model_response(response, if_none_match, accept_encoding, request.end_time)
+    except SchedulerBusy as e:
+        raise too_busy(e)
+    except Exception as e:
+        return TempoDataResponse(
+            success=False,
+            message=f"Error computing statistics: {str(e)}"
+        )
 
 @app.get("/tempo/visualize/status/{job_id}")
 async def get_job_status(
@@ -1001,25 +2639,30 @@ async def get_job_status(
 ):
     """Get the status of a parallel visualization job"""
     try:
-        with job_lock:
-            if job_id not in job_results:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Job not found"
-                )
-            
-            job_data = job_results[job_id]
-            
-            return JobStatus(
-                job_id=job_id,
-                status=job_data["status"],
-                progress=job_data["progress"],
-                completed_plots=job_data["completed_plots"],
-                failed_plots=job_data["failed_plots"],
-                results=job_data["results"] if job_data["status"] in ["completed", "processing"] else None,
-                error=job_data["error"]
+        job_data = await asyncio.to_thread(get_job, job_id)
+        if job_data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
             )
-            
+        
+        # The worker running the job was restarted - it will never finish
+        if job_data["status"] in ("queued", "processing") and not is_worker_alive(job_data):
+            await asyncio.to_thread(mark_job_failed, job_id, "Worker process running the job exited")
+            job_data = await asyncio.to_thread(get_job, job_id) or job_data
+        
+        return JobStatus(
+            job_id=job_id,
+            status=job_data["status"],
+            progress=job_data["progress"],
+            completed_plots=job_data["completed_plots"],
+            failed_plots=job_data["failed_plots"],
+            results=job_data["results"] if job_data["status"] in ["completed", "processing", "cancelled"] else None,
+            error=job_data["error"],
+            harmony_progress=job_data.get("harmony_progress"),
+            harmony_status=job_data.get("harmony_status")
+        )
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -1031,34 +2674,37 @@ async def get_job_status(
 @app.get("/tempo/visualize/results/{job_id}")
 async def get_job_results(
     job_id: str,
-    token: str = Depends(verify_token)
+    token: str = Depends(verify_token),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
 ):
-    """Get the results of a completed parallel visualization job"""
+    """Get the results of a completed parallel visualization job (ETag / If-None-Match aware)"""
     try:
-        with job_lock:
-            if job_id not in job_results:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Job not found"
-                )
-            
-            job_data = job_results[job_id]
-            
-            if job_data["status"] != "completed":
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Job not completed. Current status: {job_data['status']}"
-                )
-            
-            return {
-                "success": True,
-                "job_id": job_id,
-                "results": job_data["results"],
-                "completed_plots": job_data["completed_plots"],
-                "failed_plots": job_data["failed_plots"],
-                "message": f"Retrieved {len(job_data['completed_plots'])} completed visualizations"
-            }
-            
+        job_data = await asyncio.to_thread(get_job, job_id)
+        if job_data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+        
+        if job_data["status"] not in ("completed", "cancelled"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Job not completed. Current status: {job_data['status']}"
+            )
+        
+        results = {
+            "success": True,
+            "job_id": job_id,
+            "results": job_data["results"],
+            "completed_plots": job_data["completed_plots"],
+            "failed_plots": job_data["failed_plots"],
+            "message": f"Retrieved {len(job_data['completed_plots'])} completed visualizations"
+        }
+        # A cancelled job's partial results can still change until its renders stop
+        end_time = job_data.get("end_time") if job_data["status"] == "completed" else None
+        return json_response(dumps(results), if_none_match, accept_encoding, end_time)
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -1067,70 +2713,168 @@ async def get_job_results(
             detail=f"Error getting job results: {str(e)}"
         )
 
+@app.delete("/tempo/visualize/{job_id}")
+async def cancel_visualization_job(
+    job_id: str,
+    keep_results: bool = False,
+    token: str = Depends(verify_token)
+):
+    """
+    Cancel a parallel visualization job
+    
+    Queued renders are dropped and running ones finish without being recorded.
+    The Harmony job is cancelled and its downloads aborted unless another request
+    still depends on it. Plots completed before cancellation are kept only with
+    keep_results=true. Deleting a finished job frees its results. A job run by
+    another worker process is stopped by that worker at its next checkpoint.
+    """
+    outcome = {}
+    
+    def cancel(job):
+        outcome["previous_status"] = job["status"]
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return
+        outcome["completed_plots"] = [p for p, r in job["results"].items() if r.get("success")]
+        job["status"] = "cancelled"
+        job["error"] = "Cancelled by request"
+        if not keep_results:
+            job["results"] = {}
+    
+    job_data = await asyncio.to_thread(update_job, job_id, cancel)
+    if job_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    if outcome["previous_status"] in ("completed", "failed", "cancelled"):
+        await asyncio.to_thread(state_store.delete, JOB_STATE, job_id)
+        return {
+            "success": True,
+            "job_id": job_id,
+            "status": outcome["previous_status"],
+            "message": f"Job already {outcome['previous_status']}; its results were deleted"
+        }
+    
+    local_outcome = await cancel_job_locally(job_id)
+    completed_plots = outcome["completed_plots"]
+    
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": "cancelled",
+        "completed_plots": completed_plots,
+        "kept_results": keep_results,
+        **local_outcome,
+        "message": f"Cancelled job with {len(completed_plots)}/{len(job_data['plot_types'])} plots completed"
+    }
+
 @app.get("/tempo/visualize/image/{job_id}")
 async def get_visualization_image(
     job_id: str,
     plot_type: str = "map",
-    variable: str = "product/vertical_column",
-    client: Client = Depends(get_harmony_client),
-    token: str = Depends(verify_token)
+    token: str = Depends(verify_token),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Get visualization image as PNG
     
-    This endpoint returns the visualization as a PNG image that can be
-    displayed directly in a web browser or frontend application.
+    Returns one rendered plot of a parallel job as a PNG that can be displayed
+    directly in a web browser or frontend application. The ETag is derived from
+    the image, so repeat requests with If-None-Match get 304 Not Modified.
     """
-    try:
-        # This is a simplified version - in practice you'd store/cache the images
-        # For now, we'll return a placeholder or error
+    job_data = await asyncio.to_thread(get_job, job_id)
+    if job_data is None:
         raise HTTPException(
-            status_code=status.HTTP_501_NOT_IMPLEMENTED,
-            detail="Direct image endpoint not yet implemented. Use /tempo/visualize to get base64 encoded images."
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
         )
-        
-    except Exception as e:
+    
+    result = job_data["results"].get(plot_type)
+    if not result or not result.get("success"):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error retrieving image: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No {plot_type} image for this job. Current status: {job_data['status']}"
         )
+    
+    return http_cache.conditional(
+        Response(content=base64.b64decode(result["image_base64"]), media_type="image/png"),
+        if_none_match,
+        job_data.get("end_time")
+    )
 
 @app.get("/cache/status")
 async def get_cache_status(token: str = Depends(verify_token)):
     """Get cache status and statistics"""
-    with cache_lock:
-        current_time = time.time()
-        active_items = sum(1 for item in cache.values() if current_time - item["timestamp"] < CACHE_TTL)
-        expired_items = len(cache) - active_items
-        
-        return {
-            "cache_size": len(cache),
-            "active_items": active_items,
-            "expired_items": expired_items,
-            "max_size": CACHE_MAX_SIZE,
-            "ttl_seconds": CACHE_TTL,
-            "cache_hit_rate": "N/A"  # Could be implemented with hit/miss counters
-        }
+    cache_size = await asyncio.to_thread(state_store.count, RESPONSE_CACHE, include_expired=True)
+    active_items = await asyncio.to_thread(state_store.count, RESPONSE_CACHE)
+    
+    return {
+        "cache_size": cache_size,
+        "active_items": active_items,
+        "expired_items": cache_size - active_items,
+        "max_size": CACHE_MAX_SIZE,
+        "ttl_seconds": CACHE_TTL,
+        "cache_hit_rate": "N/A",  # Could be implemented with hit/miss counters
+        "regrid_index_cache": regridder.get_stats(),
+        "point_index_cache": point_index_cache.get_stats(),
+        "quality_mask_cache": quality_masker.get_stats(),
+        "array_cache": {
+            **array_cache.get_stats(),
+            "gc": array_cache_gc.get_stats() if array_cache_gc is not None else None
+        },
+        "color_scales": await asyncio.to_thread(color_scales.get_stats),
+        "bbox_clip": swath_clipper.get_stats(),
+        "figure_templates": figure_pool.get_stats(),
+        "shared_state": await asyncio.to_thread(state_store.get_stats),
+        "http_cache": http_cache.get_stats(),
+        "response_encoding": response_encoder.get_stats(),
+        "data_storage": await asyncio.to_thread(data_storage.get_storage_stats),
+        "persistent_cache": await asyncio.to_thread(persistent_cache.get_stats),
+        "storage_gc": storage_gc.get_stats()
+    }
 
 @app.post("/cache/clear")
 async def clear_cache(token: str = Depends(verify_token)):
     """Clear all cached data"""
-    with cache_lock:
-        cache.clear()
-        return {"message": "Cache cleared successfully", "cleared_items": len(cache)}
+    cleared_items = await asyncio.to_thread(state_store.clear, RESPONSE_CACHE)
+    return {"message": "Cache cleared successfully", "cleared_items": cleared_items}
 
 @app.post("/cache/cleanup")
 async def cleanup_cache(token: str = Depends(verify_token)):
     """Remove expired items from cache"""
-    with cache_lock:
-        before_count = len(cache)
-        clear_expired_cache()
-        after_count = len(cache)
-        return {
-            "message": "Cache cleanup completed",
-            "removed_items": before_count - after_count,
-            "remaining_items": after_count
-        }
+    removed_items = await asyncio.to_thread(clear_expired_cache)
+    await asyncio.to_thread(state_store.cleanup_expired, JOB_STATE)
+    # One bounded GC pass; anything left over is picked up by the background task
+    storage = await storage_gc.collect()
+    return {
+        "message": "Cache cleanup completed",
+        "removed_items": removed_items,
+        "remaining_items": await asyncio.to_thread(state_store.count, RESPONSE_CACHE),
+        "storage_gc": storage
+    }
+
+@app.get("/prefetch/status")
+async def get_prefetch_status(token: str = Depends(verify_token)):
+    """Get prefetch scheduler status and hot targets"""
+    return {
+        "enabled": PREFETCH_ENABLED,
+        **prefetch_scheduler.get_stats()
+    }
+
+@app.get("/scheduler/status")
+async def get_scheduler_status(token: str = Depends(verify_token)):
+    """Get render scheduler queue depth, queue wait times and admission counts per priority class"""
+    return scheduler.get_stats()
+
+@app.get("/downloads/status")
+async def get_download_status(token: str = Depends(verify_token)):
+    """Get granule download statistics, per-file throughput, the Harmony job index and job polling"""
+    return {
+        **download_manager.get_stats(),
+        "harmony_jobs": await asyncio.to_thread(harmony_job_index.get_stats),
+        "harmony_polling": job_watcher.get_stats()
+    }
 
 if __name__ == "__main__":
     import uvicorn
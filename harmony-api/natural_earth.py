@@ -0,0 +1,39 @@
+"""
+Natural Earth Module for Harmony API
+Local Natural Earth cache for the map renderers; importing it has no side effects
+"""
+
+import os
+import sys
+import logging
+
+DEFAULT_NATURAL_EARTH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "natural_earth")
+# Scale of every Natural Earth feature we draw. Pinned rather than left to the automatic
+# choice of cfeature.STATES, which picks 10m (never preloaded, so downloaded mid-render) for small bboxes
+NATURAL_EARTH_SCALE = "50m"
+
+def preload_natural_earth(data_dir: str = DEFAULT_NATURAL_EARTH_DIR) -> bool:
+    """Make sure the Natural Earth shapefiles used by the map renderers are in data_dir"""
+    import cartopy
+    import cartopy.feature as cfeature
+    
+    cartopy.config["data_dir"] = data_dir
+    
+    features = [cfeature.STATES.with_scale(NATURAL_EARTH_SCALE), cfeature.COASTLINE.with_scale(NATURAL_EARTH_SCALE)]
+    
+    loaded = 0
+    for feature in features:
+        try:
+            # Reading the geometries downloads the shapefile into data_dir if needed
+            next(iter(feature.geometries()), None)
+            loaded += 1
+        except Exception as e:
+            logging.warning(f"Could not preload Natural Earth {feature.name} ({feature.scale}): {e}")
+    
+    logging.info(f"Natural Earth cache ready: {loaded}/{len(features)} datasets in {data_dir}")
+    return loaded == len(features)
+
+if __name__ == "__main__":
+    # Used at image build time, where importing main would create its caches and databases
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sys.exit(0 if preload_natural_earth(os.getenv("NATURAL_EARTH_DIR", DEFAULT_NATURAL_EARTH_DIR)) else 1)
@@ -5,13 +5,16 @@ Handles persistent caching and data storage for VPS deployment
 
 import os
 import json
+import time
 import pickle
 import sqlite3
+import tempfile
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import threading
 import hashlib
 import logging
+from contextlib import contextmanager
 
 class PersistentCache:
     """Persistent cache with SQLite backend for VPS deployment"""
@@ -187,132 +190,551 @@ class PersistentCache:
             except Exception as e:
                 logging.error(f"Error getting cache stats: {e}")
                 return {"error": str(e)}
+    
+    def disk_usage(self) -> int:
+        """Bytes held by live cache pages (freed pages are reused, so they do not count)"""
+        with sqlite3.connect(self.db_path) as conn:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            return (page_count - free_pages) * page_size
+    
+    def oldest_access(self) -> Optional[float]:
+        """Unix time of the least recently used entry"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT CAST(strftime('%s', MIN(last_accessed)) AS REAL) FROM cache").fetchone()
+            return row[0]
+    
+    def _delete_batch(self, where: str, params: tuple, limit: int) -> Tuple[int, int]:
+        with self.lock:
+            with sqlite3.connect(self.db_path) as conn:
+                rows = conn.execute(
+                    f"SELECT key, length(value) FROM cache WHERE {where} ORDER BY last_accessed ASC LIMIT ?",
+                    params + (limit,)
+                ).fetchall()
+                conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key, _ in rows])
+                return len(rows), sum(size or 0 for _, size in rows)
+    
+    def evict_lru(self, limit: int) -> Tuple[int, int]:
+        """Delete up to limit least recently used entries; returns entries and bytes freed"""
+        return self._delete_batch("1 = 1", (), limit)
+    
+    def expire_batch(self, limit: int) -> Tuple[int, int]:
+        """Delete up to limit entries past their TTL; returns entries and bytes freed"""
+        # created_at is CURRENT_TIMESTAMP (UTC text), so compare against SQLite's own clock
+        return self._delete_batch("created_at < datetime('now', ?)", (f"-{self.ttl_hours} hours",), limit)
 
 class DataStorage:
-    """Persistent data storage for processed queries and visualizations"""
+    """
+    Persistent data storage for processed queries and visualizations
+    
+    Payloads are content-addressed: each distinct payload is written once to
+    blobs/<aa>/<bb>/<sha256>, sharded so no directory grows unbounded, and any number
+    of entries (job visualizations, metadata, query results) reference it. An SQLite
+    index (index.db) maps entries to blobs with sizes and timestamps, so stats and
+    age-based cleanup never walk the directories. Rendered animations are kept here
+    too, rather than in the response cache, as they run to megabytes.
+    """
+    
+    CATEGORIES = ("visualizations", "queries", "metadata", "animations")
+    LAYOUT_VERSION = 2
+    LOCK_STRIPES = 64
     
-    def __init__(self, data_dir: str = "/app/data"):
+    def __init__(self, data_dir: str = "/app/data", migration_batch: int = 500):
         self.data_dir = data_dir
-        self.lock = threading.RLock()
+        self.migration_batch = migration_batch
+        self.db_path = os.path.join(data_dir, "index.db")
+        self.blobs_dir = os.path.join(data_dir, "blobs")
+        self.tmp_dir = os.path.join(data_dir, "tmp")
+        self.local = threading.local()
+        # Writes to the same entry name serialize on one stripe; unrelated names rarely share one
+        self.key_locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self.stats_lock = threading.Lock()
+        self.stats = {"writes": 0, "deduplicated_writes": 0, "bytes_written": 0, "bytes_deduplicated": 0}
         
         # Ensure data directory exists
         os.makedirs(data_dir, exist_ok=True)
         
-        # Create subdirectories
+        # Create subdirectories (category directories only hold files from the flat layout)
         self.visualizations_dir = os.path.join(data_dir, "visualizations")
         self.queries_dir = os.path.join(data_dir, "queries")
         self.metadata_dir = os.path.join(data_dir, "metadata")
         
-        for dir_path in [self.visualizations_dir, self.queries_dir, self.metadata_dir]:
+        for dir_path in [self.visualizations_dir, self.queries_dir, self.metadata_dir, self.blobs_dir, self.tmp_dir]:
             os.makedirs(dir_path, exist_ok=True)
+        
+        self._init_database()
+        self._cleanup_stale_temp_files()
+        self._migrate_legacy_layout()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; autocommit so transactions are explicit"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+    
+    def _init_database(self):
+        """Initialize SQLite index of entries and the blobs they reference"""
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                category TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (category, name)
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created_at)
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_entries_digest ON entries(digest)
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS storage_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+    
+    @contextmanager
+    def _transaction(self):
+        """Write transaction on this thread's connection, held across processes"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    
+    def _key_lock(self, category: str, name: str) -> threading.Lock:
+        return self.key_locks[hash((category, name)) % self.LOCK_STRIPES]
+    
+    def _layout_version(self) -> int:
+        row = self._connect().execute(
+            "SELECT value FROM storage_meta WHERE key = 'layout_version'"
+        ).fetchone()
+        return int(row[0]) if row else 1
+    
+    def _category_dir(self, category: str) -> str:
+        if category not in self.CATEGORIES:
+            raise ValueError(f"Unknown storage category: {category}")
+        return os.path.join(self.data_dir, category)
+    
+    def blob_path(self, digest: str) -> str:
+        """Sharded on-disk path of a blob: blobs/<aa>/<bb>/<digest>"""
+        return os.path.join(self.blobs_dir, digest[:2], digest[2:4], digest)
+    
+    def path_for(self, category: str, name: str) -> Optional[str]:
+        """On-disk path holding an entry's payload, or None if it is not stored"""
+        row = self._connect().execute(
+            "SELECT digest FROM entries WHERE category = ? AND name = ?", (category, name)
+        ).fetchone()
+        return self.blob_path(row[0]) if row else None
+    
+    def _write_temp(self, data: bytes) -> str:
+        """Write data to a fsync'ed temp file on the same volume, ready to be renamed into place"""
+        fd, temp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return temp_path
+    
+    def _release_blob(self, conn: sqlite3.Connection, digest: str) -> int:
+        """Delete a blob no entry references any more; must run inside a transaction"""
+        if conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return 0
+        row = conn.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        try:
+            os.remove(self.blob_path(digest))
+        except FileNotFoundError:
+            pass
+        return row[0] if row else 0
+    
+    def _write(self, category: str, name: str, data: bytes) -> str:
+        """
+        Store data under (category, name), atomically and at most once per distinct payload
+        
+        New payloads go to a temp file that is renamed into place inside the index
+        transaction, so readers and crashes only ever see complete blobs. The transaction
+        also keeps a concurrent cleanup from deleting a blob that is being re-referenced.
+        """
+        self._category_dir(category)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        
+        with self._key_lock(category, name):
+            known = self._connect().execute(
+                "SELECT 1 FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone() is not None
+            temp_path = None if known and os.path.exists(path) else self._write_temp(data)
+            
+            try:
+                now = time.time()
+                with self._transaction() as conn:
+                    if temp_path is None and conn.execute(
+                        "SELECT 1 FROM blobs WHERE digest = ?", (digest,)
+                    ).fetchone() is None:
+                        # Released between the check and the transaction; write it after all
+                        temp_path = self._write_temp(data)
+                    
+                    if temp_path is not None:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        os.replace(temp_path, path)
+                        temp_path = None
+                        conn.execute(
+                            "INSERT OR IGNORE INTO blobs (digest, size, created_at) VALUES (?, ?, ?)",
+                            (digest, len(data), now)
+                        )
+                        deduplicated = False
+                    else:
+                        deduplicated = True
+                    
+                    previous = conn.execute(
+                        "SELECT digest FROM entries WHERE category = ? AND name = ?", (category, name)
+                    ).fetchone()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO entries (category, name, size, created_at, accessed_at, digest) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (category, name, len(data), now, now, digest)
+                    )
+                    if previous and previous[0] != digest:
+                        self._release_blob(conn, previous[0])
+            finally:
+                if temp_path is not None:
+                    os.unlink(temp_path)
+        
+        with self.stats_lock:
+            self.stats["writes"] += 1
+            if deduplicated:
+                self.stats["deduplicated_writes"] += 1
+                self.stats["bytes_deduplicated"] += len(data)
+            else:
+                self.stats["bytes_written"] += len(data)
+        return path
+    
+    def _read(self, category: str, name: str) -> Optional[bytes]:
+        path = self.path_for(category, name)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Removed by a concurrent cleanup
+            return None
+        
+        self._connect().execute(
+            "UPDATE entries SET accessed_at = ? WHERE category = ? AND name = ?",
+            (time.time(), category, name)
+        )
+        return data
+    
+    def _remove(self, category: str, name: str) -> int:
+        """Delete an entry, and its blob if nothing else references it, returning the bytes freed"""
+        with self._key_lock(category, name):
+            with self._transaction() as conn:
+                row = conn.execute(
+                    "SELECT digest FROM entries WHERE category = ? AND name = ?", (category, name)
+                ).fetchone()
+                conn.execute("DELETE FROM entries WHERE category = ? AND name = ?", (category, name))
+                return self._release_blob(conn, row[0]) if row else 0
+    
+    def _cleanup_stale_temp_files(self, max_age_seconds: float = 3600):
+        """Remove temp files left behind by a crash mid-write"""
+        cutoff = time.time() - max_age_seconds
+        with os.scandir(self.tmp_dir) as it:
+            for entry in it:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+    
+    def _migrate_legacy_layout(self):
+        """
+        Move files from the flat layout (version 1) into content-addressed blobs
+        
+        Version 1 kept <category>/<name> files, so every file left directly under a
+        category directory is legacy. Each file is indexed before it is deleted, so a
+        migration interrupted by a restart simply picks up the files still on disk.
+        """
+        if self._layout_version() >= self.LAYOUT_VERSION:
+            return
+        
+        migrated = 0
+        for category in self.CATEGORIES:
+            batch = []
+            category_dir = self._category_dir(category)
+            names = sorted(os.listdir(category_dir)) if os.path.isdir(category_dir) else []
+            for name in names:
+                path = os.path.join(category_dir, name)
+                if not os.path.isfile(path):
+                    continue
+                batch.append((name, path))
+                if len(batch) >= self.migration_batch:
+                    migrated += self._migrate_batch(category, batch)
+                    batch = []
+            if batch:
+                migrated += self._migrate_batch(category, batch)
+        
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO storage_meta (key, value) VALUES ('layout_version', ?)",
+                (str(self.LAYOUT_VERSION),)
+            )
+        if migrated:
+            logging.info(f"Migrated {migrated} files in {self.data_dir} to content-addressed storage")
+    
+    def _migrate_batch(self, category: str, batch: list) -> int:
+        migrated = 0
+        for name, old_path in batch:
+            try:
+                stat = os.stat(old_path)
+                with open(old_path, 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                # Another worker migrating the same volume got there first
+                continue
+            
+            self._write(category, name, data)
+            # Keep the original write time so age-based cleanup still sees it
+            self._connect().execute(
+                "UPDATE entries SET created_at = ?, accessed_at = ? WHERE category = ? AND name = ?",
+                (stat.st_mtime, max(stat.st_mtime, stat.st_atime), category, name)
+            )
+            try:
+                os.remove(old_path)
+            except FileNotFoundError:
+                pass
+            migrated += 1
+        return migrated
+    
+    def repair_index(self) -> Dict[str, int]:
+        """
+        Reconcile the index with the blobs on disk
+        
+        Drops entries whose blob has gone missing and deletes blob files no entry
+        references (e.g. left by a crash between the rename and the commit).
+        """
+        conn = self._connect()
+        missing = [digest for (digest,) in conn.execute("SELECT digest FROM blobs").fetchall()
+                   if not os.path.exists(self.blob_path(digest))]
+        with self._transaction() as conn:
+            for digest in missing:
+                conn.execute("DELETE FROM entries WHERE digest = ?", (digest,))
+                conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        
+        orphaned = 0
+        for root, _, files in os.walk(self.blobs_dir):
+            for digest in files:
+                if conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is not None:
+                    continue
+                # Confirm under the write lock - a write may be about to commit this blob
+                with self._transaction() as conn:
+                    if conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is None:
+                        try:
+                            os.remove(os.path.join(root, digest))
+                            orphaned += 1
+                        except FileNotFoundError:
+                            pass
+        return {"missing_blobs": len(missing), "orphaned_blobs": orphaned}
     
     def save_visualization(self, job_id: str, plot_type: str, image_data: bytes, metadata: Dict[str, Any]) -> str:
         """Save visualization image and metadata"""
-        with self.lock:
-            try:
-                # Save image
-                image_path = os.path.join(self.visualizations_dir, f"{job_id}_{plot_type}.png")
-                with open(image_path, 'wb') as f:
-                    f.write(image_data)
-                
-                # Save metadata
-                metadata_path = os.path.join(self.metadata_dir, f"{job_id}_{plot_type}.json")
-                with open(metadata_path, 'w') as f:
-                    json.dump(metadata, f, indent=2)
-                
-                return image_path
-            except Exception as e:
-                logging.error(f"Error saving visualization {job_id}_{plot_type}: {e}")
-                return None
+        try:
+            # Save image
+            image_path = self._write("visualizations", f"{job_id}_{plot_type}.png", image_data)
+            
+            # Save metadata
+            self._write("metadata", f"{job_id}_{plot_type}.json", json.dumps(metadata, indent=2).encode())
+            
+            return image_path
+        except Exception as e:
+            logging.error(f"Error saving visualization {job_id}_{plot_type}: {e}")
+            return None
     
     def load_visualization(self, job_id: str, plot_type: str) -> Optional[bytes]:
         """Load visualization image"""
-        with self.lock:
-            try:
-                image_path = os.path.join(self.visualizations_dir, f"{job_id}_{plot_type}.png")
-                if os.path.exists(image_path):
-                    with open(image_path, 'rb') as f:
-                        return f.read()
-                return None
-            except Exception as e:
-                logging.error(f"Error loading visualization {job_id}_{plot_type}: {e}")
-                return None
+        try:
+            return self._read("visualizations", f"{job_id}_{plot_type}.png")
+        except Exception as e:
+            logging.error(f"Error loading visualization {job_id}_{plot_type}: {e}")
+            return None
+    
+    def load_visualization_metadata(self, job_id: str, plot_type: str) -> Optional[Dict[str, Any]]:
+        """Load the metadata saved alongside a visualization"""
+        try:
+            data = self._read("metadata", f"{job_id}_{plot_type}.json")
+            return json.loads(data) if data is not None else None
+        except Exception as e:
+            logging.error(f"Error loading visualization metadata {job_id}_{plot_type}: {e}")
+            return None
     
     def save_query_result(self, query_hash: str, result: Dict[str, Any]) -> str:
         """Save query result for future reference"""
-        with self.lock:
-            try:
-                query_path = os.path.join(self.queries_dir, f"{query_hash}.json")
-                with open(query_path, 'w') as f:
-                    json.dump(result, f, indent=2)
-                return query_path
-            except Exception as e:
-                logging.error(f"Error saving query result {query_hash}: {e}")
-                return None
+        try:
+            return self._write("queries", f"{query_hash}.json", json.dumps(result, indent=2).encode())
+        except Exception as e:
+            logging.error(f"Error saving query result {query_hash}: {e}")
+            return None
     
     def load_query_result(self, query_hash: str) -> Optional[Dict[str, Any]]:
         """Load query result"""
-        with self.lock:
-            try:
-                query_path = os.path.join(self.queries_dir, f"{query_hash}.json")
-                if os.path.exists(query_path):
-                    with open(query_path, 'r') as f:
-                        return json.load(f)
-                return None
-            except Exception as e:
-                logging.error(f"Error loading query result {query_hash}: {e}")
-                return None
+        try:
+            data = self._read("queries", f"{query_hash}.json")
+            return json.loads(data) if data is not None else None
+        except Exception as e:
+            logging.error(f"Error loading query result {query_hash}: {e}")
+            return None
     
-    def cleanup_old_data(self, days: int = 30):
-        """Clean up data older than specified days"""
-        with self.lock:
-            try:
-                cutoff_time = datetime.now() - timedelta(days=days)
-                
-                for directory in [self.visualizations_dir, self.queries_dir, self.metadata_dir]:
-                    for filename in os.listdir(directory):
-                        file_path = os.path.join(directory, filename)
-                        if os.path.isfile(file_path):
-                            file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                            if file_time < cutoff_time:
-                                os.remove(file_path)
-                                logging.info(f"Cleaned up old file: {file_path}")
-            except Exception as e:
-                logging.error(f"Error cleaning up old data: {e}")
+    def save_animation(self, name: str, content: bytes) -> Optional[str]:
+        """Save a rendered animation (GIF, WebP or MP4)"""
+        try:
+            return self._write("animations", name, content)
+        except Exception as e:
+            logging.error(f"Error saving animation {name}: {e}")
+            return None
+    
+    def load_animation(self, name: str) -> Optional[bytes]:
+        """Load a rendered animation"""
+        try:
+            return self._read("animations", name)
+        except Exception as e:
+            logging.error(f"Error loading animation {name}: {e}")
+            return None
+    
+    def has_entry(self, category: str, name: str) -> bool:
+        """Whether an entry is stored, answered from the index"""
+        row = self._connect().execute(
+            "SELECT 1 FROM entries WHERE category = ? AND name = ?", (category, name)
+        ).fetchone()
+        return row is not None
+    
+    def entries_older_than(self, days: float, category: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Oldest entries written more than `days` ago, from the index"""
+        cutoff = time.time() - days * 86400
+        query = "SELECT category, name, size, created_at, accessed_at FROM entries WHERE created_at < ?"
+        params: list = [cutoff]
+        if category is not None:
+            query += " AND category = ?"
+            params.append(category)
+        query += " ORDER BY created_at ASC LIMIT ?"
+        params.append(limit)
+        
+        rows = self._connect().execute(query, params).fetchall()
+        return [
+            {"category": row[0], "name": row[1], "size": row[2], "created_at": row[3], "accessed_at": row[4]}
+            for row in rows
+        ]
+    
+    def expire_batch(self, days: float, limit: int) -> Tuple[int, int]:
+        """Delete up to limit entries written more than `days` ago; returns entries and bytes freed"""
+        expired = self.entries_older_than(days, limit=limit)
+        freed = 0
+        for entry in expired:
+            freed += self._remove(entry["category"], entry["name"])
+            logging.info(f"Cleaned up old file: {entry['category']}/{entry['name']}")
+        return len(expired), freed
+    
+    def evict_lru(self, limit: int) -> Tuple[int, int]:
+        """Delete up to limit least recently read entries; returns entries and bytes freed"""
+        rows = self._connect().execute(
+            "SELECT category, name FROM entries ORDER BY accessed_at ASC LIMIT ?", (limit,)
+        ).fetchall()
+        freed = sum(self._remove(category, name) for category, name in rows)
+        return len(rows), freed
+    
+    def oldest_access(self) -> Optional[float]:
+        """Unix time of the least recently read entry"""
+        return self._connect().execute("SELECT MIN(accessed_at) FROM entries").fetchone()[0]
+    
+    def disk_usage(self) -> int:
+        """Bytes on disk: every blob once, plus the index's live pages"""
+        conn = self._connect()
+        blob_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return blob_size + (page_count - free_pages) * page_size
+    
+    def cleanup_old_data(self, days: int = 30, batch_size: int = 500) -> int:
+        """Clean up data older than specified days, one short index transaction per entry"""
+        removed = 0
+        try:
+            while True:
+                count, _ = self.expire_batch(days, batch_size)
+                if not count:
+                    break
+                removed += count
+        except Exception as e:
+            logging.error(f"Error cleaning up old data: {e}")
+        return removed
     
     def get_storage_stats(self) -> Dict[str, Any]:
         """Get storage statistics"""
-        with self.lock:
-            try:
-                stats = {
-                    "total_files": 0,
-                    "total_size_mb": 0,
-                    "visualizations": 0,
-                    "queries": 0,
-                    "metadata": 0
-                }
-                
-                for directory, key in [
-                    (self.visualizations_dir, "visualizations"),
-                    (self.queries_dir, "queries"),
-                    (self.metadata_dir, "metadata")
-                ]:
-                    if os.path.exists(directory):
-                        files = os.listdir(directory)
-                        stats[key] = len(files)
-                        stats["total_files"] += len(files)
-                        
-                        for filename in files:
-                            file_path = os.path.join(directory, filename)
-                            if os.path.isfile(file_path):
-                                stats["total_size_mb"] += os.path.getsize(file_path)
-                
-                stats["total_size_mb"] = round(stats["total_size_mb"] / (1024 * 1024), 2)
-                return stats
-            except Exception as e:
-                logging.error(f"Error getting storage stats: {e}")
-                return {"error": str(e)}
-
-# Global instances
-persistent_cache = PersistentCache()
-data_storage = DataStorage()
+        try:
+            stats = {
+                "total_files": 0,
+                "total_size_mb": 0,
+                "visualizations": 0,
+                "queries": 0,
+                "metadata": 0,
+                "animations": 0
+            }
+            
+            rows = self._connect().execute(
+                "SELECT category, COUNT(*), COALESCE(SUM(size), 0), MIN(created_at), MAX(created_at) "
+                "FROM entries GROUP BY category"
+            ).fetchall()
+            oldest, newest = None, None
+            for category, count, size, category_oldest, category_newest in rows:
+                stats[category] = count
+                stats["total_files"] += count
+                stats["total_size_mb"] += size
+                oldest = category_oldest if oldest is None else min(oldest, category_oldest)
+                newest = category_newest if newest is None else max(newest, category_newest)
+            
+            # Entries sharing a payload count once on disk
+            blob_count, blob_size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+            logical_size = stats["total_size_mb"]
+            stats["total_size_mb"] = round(blob_size / (1024 * 1024), 2)
+            stats["logical_size_mb"] = round(logical_size / (1024 * 1024), 2)
+            stats["blobs"] = blob_count
+            stats["dedup_ratio"] = round(logical_size / blob_size, 2) if blob_size else None
+            stats["oldest_entry"] = datetime.fromtimestamp(oldest).isoformat() if oldest else None
+            stats["newest_entry"] = datetime.fromtimestamp(newest).isoformat() if newest else None
+            stats["layout_version"] = self._layout_version()
+            with self.stats_lock:
+                stats.update(self.stats)
+            return stats
+        except Exception as e:
+            logging.error(f"Error getting storage stats: {e}")
+            return {"error": str(e)}
@@ -0,0 +1,269 @@
+"""
+Point Query Module for Harmony API
+Answers lat/lon point and time-series queries from cached per-granule spatial indexes
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from animation import GRANULE_NAME_PATTERN
+from quality_mask import QUALITY_FLAG_VARIABLE
+
+EARTH_RADIUS_KM = 6371.0
+POINT_METHODS = ("nearest", "idw")
+IDW_NEIGHBORS = 4
+
+def to_unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Lat/lon in degrees to 3-D unit vectors, so chord distance is monotonic in great-circle distance"""
+    lat_rad = np.radians(lat)
+    lon_rad = np.radians(lon)
+    cos_lat = np.cos(lat_rad)
+    return np.column_stack([cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad)])
+
+def km_to_chord(distance_km: float) -> float:
+    return 2.0 * np.sin(min(distance_km / EARTH_RADIUS_KM, np.pi) / 2.0)
+
+def chord_to_km(chord: np.ndarray) -> np.ndarray:
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+
+def granule_start_time(datatree, file_path: str) -> Optional[str]:
+    """Nominal start time of a granule from its attributes or its file name"""
+    start = datatree.attrs.get("time_coverage_start")
+    if start:
+        return str(start).replace("Z", "")
+    
+    match = GRANULE_NAME_PATTERN.search(os.path.basename(file_path))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%dT%H%M%S").isoformat()
+    return None
+
+class GranuleIndex:
+    """KD-tree over one granule's valid pixels plus the variables decoded for it so far"""
+    
+    def __init__(self, file_path: str):
+        import xarray as xr
+        from scipy.spatial import cKDTree
+        
+        self.file_path = file_path
+        self.lock = threading.Lock()
+        self.arrays: Dict[str, Optional[np.ndarray]] = {}
+        
+        datatree = xr.open_datatree(file_path)
+        try:
+            lat = np.asarray(datatree["geolocation/latitude"], dtype=np.float64)
+            lon = np.asarray(datatree["geolocation/longitude"], dtype=np.float64)
+            self.shape = lat.shape
+            
+            # Per-scanline times when the granule has them, otherwise the granule start time
+            self.row_times = None
+            try:
+                times = datatree["geolocation/time"].values
+                if np.issubdtype(times.dtype, np.datetime64) and times.ndim == 1 and times.shape[0] == lat.shape[0]:
+                    self.row_times = times
+            except KeyError:
+                pass
+            self.start_time = granule_start_time(datatree, file_path)
+        finally:
+            datatree.close()
+        
+        # Only finite pixels go into the tree; positions map back to flat pixel indices
+        lat_flat = lat.ravel()
+        lon_flat = lon.ravel()
+        self.valid = np.flatnonzero(np.isfinite(lat_flat) & np.isfinite(lon_flat))
+        self.tree = cKDTree(to_unit_vectors(lat_flat[self.valid], lon_flat[self.valid])) if self.valid.size else None
+    
+    @property
+    def nbytes(self) -> int:
+        arrays = sum(a.nbytes for a in self.arrays.values() if a is not None)
+        tree = self.valid.size * 3 * 8 * 2 if self.tree is not None else 0  # Points plus node index (approx.)
+        return arrays + tree + self.valid.nbytes
+    
+    def get_array(self, variable_name: str) -> Optional[np.ndarray]:
+        """Flat float array of a variable, decoded once and kept with the index"""
+        with self.lock:
+            if variable_name in self.arrays:
+                return self.arrays[variable_name]
+        
+        import xarray as xr
+        
+        datatree = xr.open_datatree(self.file_path)
+        try:
+            try:
+                da = datatree[variable_name]
+            except KeyError:
+                da = None
+            if da is None or da.shape != self.shape:
+                logging.warning(f"Variable {variable_name} not on the pixel grid of {os.path.basename(self.file_path)}")
+                values = None
+            else:
+                values = np.asarray(da, dtype=np.float64).ravel()
+        finally:
+            datatree.close()
+        
+        with self.lock:
+            self.arrays[variable_name] = values
+        return values
+    
+    def pixel_times(self, pixels: np.ndarray) -> List[Optional[str]]:
+        if self.row_times is None:
+            return [self.start_time] * len(pixels)
+        rows = pixels // self.shape[1]
+        return [str(t)[:19] for t in self.row_times[rows].astype("datetime64[s]")]
+    
+    def query(self, points: np.ndarray, variables: List[str], method: str = "nearest",
+              max_distance_km: float = 10.0, max_quality_flag: Optional[int] = None) -> List[Optional[Dict[str, Any]]]:
+        """Values at many (lat, lon) points in one vectorized tree query; None where no pixel is in range"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(points)
+        if self.tree is None or not len(points):
+            return results
+        
+        k = IDW_NEIGHBORS if method == "idw" else 1
+        chords, positions = self.tree.query(
+            to_unit_vectors(points[:, 0], points[:, 1]),
+            k=k,
+            distance_upper_bound=km_to_chord(max_distance_km)
+        )
+        chords = chords.reshape(len(points), k)
+        positions = positions.reshape(len(points), k)
+        
+        # Neighbours out of range come back as inf / tree size
+        in_range = np.isfinite(chords)
+        pixels = np.where(in_range, self.valid[np.minimum(positions, self.valid.size - 1)], 0)
+        
+        quality = self.get_array(QUALITY_FLAG_VARIABLE)
+        if quality is not None and max_quality_flag is not None:
+            in_range &= quality[pixels] <= max_quality_flag
+        
+        found = in_range.any(axis=1)
+        if not found.any():
+            return results
+        
+        distances = chord_to_km(chords)
+        # Inverse-distance weights; an exact hit takes all the weight
+        weights = np.where(in_range, 1.0 / np.maximum(distances, 1e-6) ** 2, 0.0)
+        nearest = np.argmax(in_range, axis=1)  # Neighbours are sorted by distance
+        rows = np.arange(len(points))
+        nearest_pixels = pixels[rows, nearest]
+        
+        values = {}
+        for variable_name in variables:
+            data = self.get_array(variable_name)
+            if data is None:
+                continue
+            neighbour_values = data[pixels]
+            if method == "idw":
+                usable = np.isfinite(neighbour_values) & in_range
+                w = np.where(usable, weights, 0.0)
+                total = w.sum(axis=1)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    values[variable_name] = np.where(total > 0, (w * np.where(usable, neighbour_values, 0.0)).sum(axis=1) / total, np.nan)
+            else:
+                values[variable_name] = neighbour_values[rows, nearest]
+        
+        times = self.pixel_times(nearest_pixels)
+        granule = os.path.basename(self.file_path)
+        for i in np.flatnonzero(found):
+            results[i] = {
+                "time": times[i],
+                "granule": granule,
+                "distance_km": round(float(distances[i, nearest[i]]), 3),
+                "quality_flag": int(quality[nearest_pixels[i]]) if quality is not None and np.isfinite(quality[nearest_pixels[i]]) else None,
+                "values": {
+                    name.split("/")[-1]: (float(v[i]) if np.isfinite(v[i]) else None)
+                    for name, v in values.items()
+                }
+            }
+        return results
+
+class PointIndexCache:
+    """LRU cache of granule spatial indexes keyed by file path and modification time"""
+    
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.indexes: "OrderedDict[tuple, GranuleIndex]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+    
+    def get(self, file_path: str) -> GranuleIndex:
+        key = (file_path, os.path.getmtime(file_path))
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is not None:
+                self.indexes.move_to_end(key)
+                self.stats["hits"] += 1
+                return index
+            self.stats["misses"] += 1
+        
+        index = GranuleIndex(file_path)
+        
+        with self.lock:
+            self.indexes[key] = index
+            while len(self.indexes) > self.max_entries:
+                self.indexes.popitem(last=False)
+        return index
+    
+    def query(self, file_paths: List[str], points: List[List[float]], variables: List[str],
+              method: str = "nearest", max_distance_km: float = 10.0,
+              max_quality_flag: Optional[int] = None,
+              start_time: Optional[str] = None, end_time: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Time series at each (lat, lon) point across all granules, ordered by time"""
+        if method not in POINT_METHODS:
+            raise ValueError(f"Invalid method: {method}. Use 'nearest' or 'idw'")
+        
+        coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        series: List[List[Dict[str, Any]]] = [[] for _ in range(len(coords))]
+        start = start_time.replace("Z", "") if start_time else None
+        end = end_time.replace("Z", "") if end_time else None
+        
+        for file_path in file_paths:
+            try:
+                index = self.get(file_path)
+                matches = index.query(coords, variables, method, max_distance_km, max_quality_flag)
+            except Exception as e:
+                logging.error(f"Error querying granule {file_path}: {e}")
+                continue
+            
+            for i, match in enumerate(matches):
+                if match is None:
+                    continue
+                # Per-scanline times can fall outside the window even when the granule overlaps it
+                if match["time"] and ((start and match["time"] < start) or (end and match["time"] > end)):
+                    continue
+                series[i].append(match)
+        
+        return [
+            {
+                "latitude": float(lat),
+                "longitude": float(lon),
+                "series": sorted(s, key=lambda m: m["time"] or "")
+            }
+            for (lat, lon), s in zip(coords, series)
+        ]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **self.stats,
+                "cached_granules": len(self.indexes),
+                "cached_mb": round(sum(i.nbytes for i in self.indexes.values()) / (1024 * 1024), 2)
+            }
+
+def points_bbox(points: List[List[float]], margin_km: float) -> List[float]:
+    """Bounding box [west, south, east, north] around (lat, lon) points plus a margin"""
+    coords = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    margin = margin_km / 111.0  # Degrees of latitude; generous enough for longitude at TEMPO latitudes
+    return [
+        float(max(coords[:, 1].min() - margin * 2, -180.0)),
+        float(max(coords[:, 0].min() - margin, -90.0)),
+        float(min(coords[:, 1].max() + margin * 2, 180.0)),
+        float(min(coords[:, 0].max() + margin, 90.0))
+    ]
+
+# Global instance
+point_index_cache = PointIndexCache()
@@ -0,0 +1,272 @@
+"""
+Prefetch Module for Harmony API
+Warms the response cache for popular regions as new TEMPO scans become available
+"""
+
+import asyncio
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+CMR_GRANULES_URL = "https://cmr.earthdata.nasa.gov/search/granules.json"
+
+class PrefetchScheduler:
+    """Background scheduler that fetches and renders hot (region, variable, plot_type) targets"""
+    
+    def __init__(
+        self,
+        prefetch_fn: Callable[[Dict[str, Any], str, str], bool],
+        is_cached_fn: Callable[[Dict[str, Any], str, str], bool],
+        is_busy_fn: Callable[[], bool],
+        collection_id: str = "C2930730944-LARC_CLOUD",
+        poll_interval: int = 300,
+        window_minutes: int = 60,
+        max_targets: int = 5,
+        min_hits: int = 2,
+        concurrency: int = 1,
+        retry_after: int = 3600,
+        configured_targets: Optional[List[Dict[str, Any]]] = None,
+        cmr_url: str = CMR_GRANULES_URL,
+        popularity_window: int = 86400,
+        max_learned_targets: int = 10000
+    ):
+        self.prefetch_fn = prefetch_fn
+        self.is_cached_fn = is_cached_fn
+        self.is_busy_fn = is_busy_fn
+        self.collection_id = collection_id
+        self.poll_interval = poll_interval
+        self.window_minutes = window_minutes
+        self.max_targets = max_targets
+        self.min_hits = min_hits
+        self.concurrency = max(1, concurrency)
+        self.retry_after = retry_after
+        self.configured_targets = [self._normalize_target(t) for t in (configured_targets or [])]
+        self.cmr_url = cmr_url
+        # Targets are learned from this many seconds of traffic; older and excess ones are forgotten
+        self.popularity_window = popularity_window
+        self.max_learned_targets = max_learned_targets
+        self.lock = threading.Lock()
+        
+        # Dedicated pool so prefetch never occupies the interactive render workers
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="prefetch")
+        
+        # Learned targets: target key -> {"target", "hits", "last_seen"}, least recently seen first
+        self.request_counts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # (target key, window start) -> time of last attempt
+        self.attempts: Dict[tuple, float] = {}
+        
+        self.stats = {
+            "polls": 0,
+            "latest_scan": None,
+            "last_poll": None,
+            "last_error": None,
+            "prefetched": 0,
+            "skipped_cached": 0,
+            "failed": 0,
+            "deferred_busy": 0
+        }
+    
+    @staticmethod
+    def _normalize_target(target: Dict[str, Any]) -> Dict[str, Any]:
+        """Normalize a target so equivalent requests share one key"""
+        variables = target.get("variables")
+        if variables is None and target.get("variable"):
+            variables = [target["variable"]]
+        
+        return {
+            "endpoint": target.get("endpoint", "visualize"),
+            "bbox": [float(v) for v in target["bbox"]] if target.get("bbox") else None,
+            "variables": list(variables) if variables else None,
+            "plot_type": target.get("plot_type", "map"),
+            "max_quality_flag": int(target["max_quality_flag"]) if target.get("max_quality_flag") is not None else None,
+            "collection_id": target.get("collection_id", "C2930730944-LARC_CLOUD")
+        }
+    
+    @staticmethod
+    def _target_key(target: Dict[str, Any]) -> str:
+        return json.dumps(target, sort_keys=True)
+    
+    def record_request(self, endpoint: str, request: Any) -> None:
+        """Count an interactive request so popular targets are learned"""
+        try:
+            target = self._normalize_target({
+                "endpoint": endpoint,
+                "bbox": request.bbox,
+                "variables": request.variables,
+                "plot_type": request.plot_type,
+                "max_quality_flag": request.max_quality_flag,
+                "collection_id": request.collection_id
+            })
+        except Exception as e:
+            logging.error(f"Error recording prefetch target: {e}")
+            return
+        
+        key = self._target_key(target)
+        with self.lock:
+            entry = self.request_counts.setdefault(key, {"target": target, "hits": 0, "last_seen": 0})
+            entry["hits"] += 1
+            entry["last_seen"] = time.time()
+            self.request_counts.move_to_end(key)
+            while len(self.request_counts) > self.max_learned_targets:
+                self.request_counts.popitem(last=False)
+    
+    def _prune_request_counts(self) -> None:
+        """Forget targets not requested within the popularity window"""
+        cutoff = time.time() - self.popularity_window
+        with self.lock:
+            while self.request_counts:
+                key, entry = next(iter(self.request_counts.items()))
+                if entry["last_seen"] >= cutoff:
+                    break
+                del self.request_counts[key]
+    
+    def hot_targets(self) -> List[Dict[str, Any]]:
+        """Configured targets followed by the most requested learned targets"""
+        targets = list(self.configured_targets)
+        seen = {self._target_key(t) for t in targets}
+        cutoff = time.time() - self.popularity_window
+        
+        with self.lock:
+            learned = sorted(
+                (e for e in self.request_counts.values()
+                 if e["hits"] >= self.min_hits and e["last_seen"] >= cutoff),
+                key=lambda e: (e["hits"], e["last_seen"]),
+                reverse=True
+            )
+        
+        for entry in learned:
+            if len(targets) >= self.max_targets:
+                break
+            key = self._target_key(entry["target"])
+            if key not in seen:
+                targets.append(entry["target"])
+                seen.add(key)
+        
+        return targets[:max(self.max_targets, len(self.configured_targets))]
+    
+    async def latest_scan_time(self) -> Optional[datetime]:
+        """Ask CMR for the start time of the newest granule in the collection"""
+        params = {
+            "collection_concept_id": self.collection_id,
+            "sort_key[]": "-start_date",
+            "page_size": 1
+        }
+        async with httpx.AsyncClient(timeout=30) as http:
+            response = await http.get(self.cmr_url, params=params)
+            response.raise_for_status()
+            entries = response.json().get("feed", {}).get("entry", [])
+        
+        if not entries:
+            return None
+        
+        start = datetime.fromisoformat(entries[0]["time_start"].replace("Z", "+00:00"))
+        if start.tzinfo is not None:
+            # API request times are naive UTC
+            start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        return start
+    
+    def latest_complete_window(self, latest_scan: datetime) -> tuple:
+        """Most recent window that newer data has already moved past"""
+        minutes = self.window_minutes
+        window_end = latest_scan.replace(second=0, microsecond=0)
+        window_end -= timedelta(minutes=(window_end.hour * 60 + window_end.minute) % minutes)
+        window_start = window_end - timedelta(minutes=minutes)
+        return (
+            window_start.strftime("%Y-%m-%dT%H:%M:%S"),
+            window_end.strftime("%Y-%m-%dT%H:%M:%S")
+        )
+    
+    async def prefetch_window(self, start_time: str, end_time: str) -> None:
+        """Fetch and render every hot target for one time window"""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def prefetch_target(target):
+            key = (self._target_key(target), start_time)
+            
+            with self.lock:
+                last_attempt = self.attempts.get(key)
+            if last_attempt and time.time() - last_attempt < self.retry_after:
+                return
+            
+            # The cache lookup reads SQLite - keep it off the event loop
+            if await asyncio.to_thread(self.is_cached_fn, target, start_time, end_time):
+                self.stats["skipped_cached"] += 1
+                return
+            
+            async with semaphore:
+                # Interactive requests always go first
+                while self.is_busy_fn():
+                    self.stats["deferred_busy"] += 1
+                    await asyncio.sleep(5)
+                
+                with self.lock:
+                    self.attempts[key] = time.time()
+                
+                try:
+                    ok = await loop.run_in_executor(self.executor, self.prefetch_fn, target, start_time, end_time)
+                except Exception as e:
+                    logging.error(f"Prefetch failed for {target}: {e}")
+                    ok = False
+                
+                if ok:
+                    self.stats["prefetched"] += 1
+                else:
+                    self.stats["failed"] += 1
+        
+        await asyncio.gather(*(prefetch_target(t) for t in self.hot_targets()))
+    
+    def _prune_attempts(self) -> None:
+        cutoff = time.time() - max(self.retry_after, 86400)
+        with self.lock:
+            for key in [k for k, t in self.attempts.items() if t < cutoff]:
+                del self.attempts[key]
+    
+    async def run(self) -> None:
+        """Poll for new scans forever, prefetching hot targets for each new window"""
+        while True:
+            try:
+                self.stats["polls"] += 1
+                self.stats["last_poll"] = datetime.utcnow().isoformat()
+                
+                latest_scan = await self.latest_scan_time()
+                if latest_scan is not None:
+                    self.stats["latest_scan"] = latest_scan.isoformat()
+                    start_time, end_time = self.latest_complete_window(latest_scan)
+                    await self.prefetch_window(start_time, end_time)
+                
+                self._prune_attempts()
+                self._prune_request_counts()
+                self.stats["last_error"] = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                logging.error(f"Prefetch poll failed: {e}")
+            
+            await asyncio.sleep(self.poll_interval)
+    
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get prefetch scheduler statistics"""
+        with self.lock:
+            learned_targets = len(self.request_counts)
+        
+        return {
+            **self.stats,
+            "poll_interval_seconds": self.poll_interval,
+            "window_minutes": self.window_minutes,
+            "concurrency": self.concurrency,
+            "configured_targets": len(self.configured_targets),
+            "learned_targets": learned_targets,
+            "hot_targets": self.hot_targets()
+        }
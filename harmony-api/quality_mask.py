@@ -0,0 +1,126 @@
+"""
+Quality Mask Module for Harmony API
+Masks TEMPO pixels by main_data_quality_flag, reading each granule's flags only once
+"""
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+QUALITY_FLAG_VARIABLE = "product/main_data_quality_flag"
+
+def with_quality_flag(variables: Optional[List[str]], max_quality_flag: Optional[int]) -> Optional[List[str]]:
+    """Variables to request from Harmony so the quality flag is available when masking"""
+    if max_quality_flag is None or not variables or QUALITY_FLAG_VARIABLE in variables:
+        return variables
+    return list(variables) + [QUALITY_FLAG_VARIABLE]
+
+class QualityMasker:
+    """Per-granule cache of decoded quality flags and the masks derived from them"""
+    
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # (source, mtime) -> {"flags": array or None, "masks": {threshold: array}}
+        self.entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "unmasked_variables": 0}
+    
+    @staticmethod
+    def _entry_key(datatree) -> Optional[tuple]:
+        source = datatree.encoding.get("source")
+        if source is None:
+            return None
+        try:
+            return source, os.path.getmtime(source)
+        except OSError:
+            return None
+    
+    def _get_entry(self, datatree) -> Dict[str, Any]:
+        key = self._entry_key(datatree)
+        if key is not None:
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry
+                self.stats["misses"] += 1
+        
+        try:
+            flags = np.asarray(datatree[QUALITY_FLAG_VARIABLE])
+        except KeyError:
+            logging.warning(f"Granule {datatree.encoding.get('source')} has no {QUALITY_FLAG_VARIABLE}")
+            flags = None
+        entry = {"flags": flags, "masks": {}}
+        
+        if key is not None:
+            with self.lock:
+                self.entries[key] = entry
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return entry
+    
+    def get_flags(self, datatree) -> Optional[np.ndarray]:
+        """Decoded quality flags of a granule (None if it has none)"""
+        return self._get_entry(datatree)["flags"]
+    
+    def get_mask(self, datatree, max_quality_flag: int) -> Optional[np.ndarray]:
+        """Boolean mask of pixels with quality flag <= max_quality_flag"""
+        entry = self._get_entry(datatree)
+        if entry["flags"] is None:
+            return None
+        
+        with self.lock:
+            mask = entry["masks"].get(max_quality_flag)
+        if mask is None:
+            mask = entry["flags"] <= max_quality_flag
+            with self.lock:
+                entry["masks"][max_quality_flag] = mask
+        return mask
+    
+    def mask_datatree(self, datatree, variable_names: List[str], max_quality_flag: Optional[int]):
+        """Copy of the datatree with low-quality pixels of the given variables set to NaN"""
+        if max_quality_flag is None:
+            return datatree
+        
+        mask = self.get_mask(datatree, max_quality_flag)
+        if mask is None:
+            return datatree
+        
+        masked = datatree.copy()
+        for variable_name in variable_names:
+            if variable_name == QUALITY_FLAG_VARIABLE:
+                continue
+            try:
+                da = datatree[variable_name]
+            except KeyError:
+                continue
+            if da.shape != mask.shape:
+                # Rendered as is - make sure the unfiltered output does not go unnoticed
+                logging.warning(
+                    f"Not masking {variable_name} of {datatree.encoding.get('source')}: shape {da.shape} "
+                    f"differs from {QUALITY_FLAG_VARIABLE} {mask.shape}"
+                )
+                with self.lock:
+                    self.stats["unmasked_variables"] += 1
+                continue
+            masked[variable_name] = da.where(mask)
+        return masked
+    
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                **self.stats,
+                "cached_granules": len(self.entries),
+                "cached_mb": round(sum(
+                    (e["flags"].nbytes if e["flags"] is not None else 0) + sum(m.nbytes for m in e["masks"].values())
+                    for e in self.entries.values()
+                ) / (1024 * 1024), 2)
+            }
+
+# Global instance
+quality_masker = QualityMasker()
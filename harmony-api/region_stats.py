@@ -0,0 +1,114 @@
+"""
+Region Statistics Module for Harmony API
+Computes summary statistics and histograms of TEMPO variables over a bbox or polygon without rendering
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from data_export import column_name, iter_granule_subsets
+
+DEFAULT_PERCENTILES = [5, 25, 50, 75, 95]
+DEFAULT_HISTOGRAM_BINS = 20
+
+def polygon_bbox(polygon: List[List[float]]) -> List[float]:
+    """Bounding box [west, south, east, north] of a polygon given as [longitude, latitude] vertices"""
+    vertices = np.asarray(polygon, dtype=np.float64)
+    return [
+        float(vertices[:, 0].min()),
+        float(vertices[:, 1].min()),
+        float(vertices[:, 0].max()),
+        float(vertices[:, 1].max())
+    ]
+
+def polygon_mask(polygon: List[List[float]], lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    """Which (lon, lat) pixels fall inside the polygon"""
+    from matplotlib.path import Path
+    
+    return Path(np.asarray(polygon, dtype=np.float64)).contains_points(np.column_stack([lon, lat]))
+
+def summarize(values: np.ndarray, region_pixels: int, percentiles: List[float], bins: int) -> Dict[str, Any]:
+    """Summary statistics and histogram of the finite values of one variable"""
+    valid = values[np.isfinite(values)]
+    summary = {
+        "region_pixels": region_pixels,
+        "valid_pixels": int(valid.size),
+        "valid_fraction": round(valid.size / region_pixels, 4) if region_pixels else 0.0
+    }
+    if not valid.size:
+        summary.update({"mean": None, "std": None, "min": None, "max": None, "percentiles": {}, "histogram": None})
+        return summary
+    
+    percentile_values = np.percentile(valid, percentiles) if percentiles else []
+    counts, edges = np.histogram(valid, bins=bins)
+    summary.update({
+        "mean": float(valid.mean()),
+        "std": float(valid.std()),
+        "min": float(valid.min()),
+        "max": float(valid.max()),
+        "percentiles": {f"p{p:g}": float(v) for p, v in zip(percentiles, percentile_values)},
+        "histogram": {
+            "counts": counts.tolist(),
+            "bin_edges": edges.tolist()
+        }
+    })
+    return summary
+
+def compute_region_statistics(file_paths: List[str], variables: List[str], bbox: Optional[List[float]] = None,
+                              polygon: Optional[List[List[float]]] = None,
+                              max_quality_flag: Optional[int] = None,
+                              percentiles: Optional[List[float]] = None,
+                              bins: int = DEFAULT_HISTOGRAM_BINS) -> Dict[str, Any]:
+    """Statistics of every variable over the region, reading each granule once"""
+    percentiles = DEFAULT_PERCENTILES if percentiles is None else percentiles
+    if polygon and not bbox:
+        bbox = polygon_bbox(polygon)
+    
+    collected: Dict[str, List[np.ndarray]] = {name: [] for name in variables}
+    region_pixels = 0
+    quality_pixels = 0
+    granules_used = 0
+    
+    # Low-quality pixels are flagged rather than dropped so the valid fraction is relative to the whole region
+    subsets = iter_granule_subsets(
+        file_paths, variables=variables, bbox=bbox, max_quality_flag=max_quality_flag, quality_column=True
+    )
+    for _, columns in subsets:
+        keep = polygon_mask(polygon, columns["longitude"], columns["latitude"]) if polygon else None
+        if keep is not None:
+            columns = {name: values[keep] for name, values in columns.items()}
+        count = len(columns["latitude"])
+        if not count:
+            continue
+        
+        granules_used += 1
+        region_pixels += count
+        
+        good = columns.get("quality_ok")
+        quality_pixels += int(good.sum()) if good is not None else count
+        
+        for name in variables:
+            values = columns.get(column_name(name))
+            if values is None:
+                continue
+            values = values.astype(np.float64)
+            if good is not None:
+                values = np.where(good, values, np.nan)
+            collected[name].append(values)
+    
+    statistics = {}
+    for name in variables:
+        if not collected[name]:
+            logging.warning(f"Variable {name} not found in any granule")
+            statistics[name] = summarize(np.empty(0), region_pixels, percentiles, bins)
+            continue
+        statistics[name] = summarize(np.concatenate(collected[name]), region_pixels, percentiles, bins)
+    
+    return {
+        "granules": granules_used,
+        "region_pixels": region_pixels,
+        "quality_pixels": quality_pixels,
+        "statistics": statistics
+    }
@@ -0,0 +1,232 @@
+"""
+Regridding Module for Harmony API
+Maps TEMPO swath pixels (mirror_step x xtrack) onto a regular lat/lon grid
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+@dataclass(frozen=True)
+class GridSpec:
+    """Regular lat/lon grid given by its bounds [west, south, east, north] and cell size in degrees"""
+    west: float
+    south: float
+    east: float
+    north: float
+    resolution: float
+    
+    @classmethod
+    def from_bbox(cls, bbox: List[float], resolution: float) -> "GridSpec":
+        return cls(float(bbox[0]), float(bbox[1]), float(bbox[2]), float(bbox[3]), float(resolution))
+    
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(rows, columns) - rows run south to north"""
+        ny = max(1, int(np.ceil(round((self.north - self.south) / self.resolution, 6))))
+        nx = max(1, int(np.ceil(round((self.east - self.west) / self.resolution, 6))))
+        return ny, nx
+    
+    @property
+    def lon_centers(self) -> np.ndarray:
+        return self.west + (np.arange(self.shape[1]) + 0.5) * self.resolution
+    
+    @property
+    def lat_centers(self) -> np.ndarray:
+        return self.south + (np.arange(self.shape[0]) + 0.5) * self.resolution
+    
+    @property
+    def extent(self) -> List[float]:
+        """Extent in matplotlib/cartopy order [west, east, south, north]"""
+        ny, nx = self.shape
+        return [self.west, self.west + nx * self.resolution, self.south, self.south + ny * self.resolution]
+
+@dataclass
+class RegridIndex:
+    """Precomputed pixel -> cell mapping for one swath geometry on one grid"""
+    grid: GridSpec
+    method: str
+    source_shape: Tuple[int, ...]
+    # "bin": flat source pixel indices and the flat cell each one falls into
+    pixels: Optional[np.ndarray] = None
+    cells: Optional[np.ndarray] = None
+    # "nearest": for every cell the flat index of the nearest pixel (-1 if none within range)
+    nearest: Optional[np.ndarray] = None
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.pixels, self.cells, self.nearest) if a is not None)
+
+class Regridder:
+    """Regrids swath variables with index maps computed once per (geometry, grid, method)"""
+    
+    METHODS = ("bin", "nearest")
+    
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.indexes: "OrderedDict[tuple, RegridIndex]" = OrderedDict()
+        self.geometry_keys: Dict[tuple, str] = {}
+        self.stats = {"hits": 0, "misses": 0}
+    
+    @staticmethod
+    def geometry_key(lat: np.ndarray, lon: np.ndarray) -> str:
+        """Content hash of a swath's geolocation arrays"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(lat.shape).encode())
+        digest.update(np.ascontiguousarray(lat).tobytes())
+        digest.update(np.ascontiguousarray(lon).tobytes())
+        return digest.hexdigest()
+    
+    def datatree_geometry(self, datatree) -> Tuple[np.ndarray, np.ndarray, str]:
+        """Geolocation arrays of a granule and their geometry key (hashed once per file)"""
+        lat = np.asarray(datatree["geolocation/latitude"])
+        lon = np.asarray(datatree["geolocation/longitude"])
+        
+        source = datatree.encoding.get("source")
+        if source is None:
+            return lat, lon, self.geometry_key(lat, lon)
+        
+        file_key = (source, lat.shape)
+        with self.lock:
+            key = self.geometry_keys.get(file_key)
+        if key is None:
+            key = self.geometry_key(lat, lon)
+            with self.lock:
+                self.geometry_keys[file_key] = key
+                while len(self.geometry_keys) > self.max_entries * 4:
+                    self.geometry_keys.pop(next(iter(self.geometry_keys)))
+        return lat, lon, key
+    
+    def _build_index(self, lat: np.ndarray, lon: np.ndarray, grid: GridSpec, method: str,
+                     max_distance: Optional[float]) -> RegridIndex:
+        ny, nx = grid.shape
+        lat_flat = lat.ravel()
+        lon_flat = lon.ravel()
+        
+        if method == "bin":
+            valid = np.isfinite(lat_flat) & np.isfinite(lon_flat)
+            rows = np.floor((lat_flat - grid.south) / grid.resolution)
+            cols = np.floor((lon_flat - grid.west) / grid.resolution)
+            valid &= (rows >= 0) & (rows < ny) & (cols >= 0) & (cols < nx)
+            
+            pixels = np.flatnonzero(valid)
+            cells = rows[pixels].astype(np.int64) * nx + cols[pixels].astype(np.int64)
+            return RegridIndex(grid, method, lat.shape, pixels=pixels, cells=cells)
+        
+        from scipy.spatial import cKDTree
+        
+        valid = np.flatnonzero(np.isfinite(lat_flat) & np.isfinite(lon_flat))
+        nearest = np.full(ny * nx, -1, dtype=np.int64)
+        if valid.size:
+            tree = cKDTree(np.column_stack([lon_flat[valid], lat_flat[valid]]))
+            grid_lon, grid_lat = np.meshgrid(grid.lon_centers, grid.lat_centers)
+            limit = max_distance if max_distance is not None else grid.resolution * 1.5
+            distances, positions = tree.query(
+                np.column_stack([grid_lon.ravel(), grid_lat.ravel()]),
+                distance_upper_bound=limit
+            )
+            found = np.isfinite(distances)
+            nearest[found] = valid[positions[found]]
+        return RegridIndex(grid, method, lat.shape, nearest=nearest)
+    
+    def get_index(self, lat: np.ndarray, lon: np.ndarray, grid: GridSpec, method: str = "bin",
+                  geometry_key: Optional[str] = None, max_distance: Optional[float] = None) -> RegridIndex:
+        """Index map for a swath geometry on a grid, computed on first use and cached"""
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown regrid method: {method}. Use 'bin' or 'nearest'")
+        
+        if geometry_key is None:
+            geometry_key = self.geometry_key(lat, lon)
+        key = (geometry_key, grid, method, max_distance)
+        
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is not None:
+                self.indexes.move_to_end(key)
+                self.stats["hits"] += 1
+                return index
+            self.stats["misses"] += 1
+        
+        index = self._build_index(lat, lon, grid, method, max_distance)
+        
+        with self.lock:
+            self.indexes[key] = index
+            while len(self.indexes) > self.max_entries:
+                self.indexes.popitem(last=False)
+        return index
+    
+    @staticmethod
+    def accumulate(data: np.ndarray, index: RegridIndex) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-cell sums and counts of finite pixel values (binning only)"""
+        ncells = index.grid.shape[0] * index.grid.shape[1]
+        values = np.asarray(data, dtype=np.float64).ravel()[index.pixels]
+        finite = np.isfinite(values)
+        cells = index.cells[finite]
+        sums = np.bincount(cells, weights=values[finite], minlength=ncells)
+        counts = np.bincount(cells, minlength=ncells)
+        return sums, counts
+    
+    def apply(self, data: np.ndarray, index: RegridIndex) -> np.ndarray:
+        """Regrid one variable with a precomputed index - a single vectorized gather"""
+        if np.shape(data) != index.source_shape:
+            raise ValueError(f"Data shape {np.shape(data)} does not match swath shape {index.source_shape}")
+        
+        ny, nx = index.grid.shape
+        if index.method == "nearest":
+            flat = np.asarray(data, dtype=np.float32).ravel()
+            found = index.nearest >= 0
+            out = np.full(ny * nx, np.nan, dtype=np.float32)
+            out[found] = flat[index.nearest[found]]
+            return out.reshape(ny, nx)
+        
+        sums, counts = self.accumulate(data, index)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        return mean.astype(np.float32).reshape(ny, nx)
+    
+    def regrid(self, datatree, variable_names: List[str], grid: GridSpec, method: str = "bin") -> Dict[str, np.ndarray]:
+        """Regrid several variables of a granule, sharing one index map"""
+        lat, lon, geometry_key = self.datatree_geometry(datatree)
+        index = self.get_index(lat, lon, grid, method, geometry_key=geometry_key)
+        return {name: self.apply(np.asarray(datatree[name]), index) for name in variable_names}
+    
+    def composite(self, datatrees, variable_name: str, grid: GridSpec) -> np.ndarray:
+        """Mean of several granules on one grid (e.g. all granules of a scan or an hour)"""
+        ny, nx = grid.shape
+        total_sums = np.zeros(ny * nx)
+        total_counts = np.zeros(ny * nx, dtype=np.int64)
+        
+        for datatree in datatrees:
+            lat, lon, geometry_key = self.datatree_geometry(datatree)
+            index = self.get_index(lat, lon, grid, "bin", geometry_key=geometry_key)
+            sums, counts = self.accumulate(np.asarray(datatree[variable_name]), index)
+            total_sums += sums
+            total_counts += counts
+        
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(total_counts > 0, total_sums / np.maximum(total_counts, 1), np.nan)
+        return mean.astype(np.float32).reshape(ny, nx)
+    
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                **self.stats,
+                "cached_indexes": len(self.indexes),
+                "cached_index_mb": round(sum(i.nbytes for i in self.indexes.values()) / (1024 * 1024), 2)
+            }
+
+def grid_for_data(lat: np.ndarray, lon: np.ndarray, resolution: float) -> GridSpec:
+    """Grid snapped to the resolution that covers all finite pixels"""
+    west = np.floor(np.nanmin(lon) / resolution) * resolution
+    south = np.floor(np.nanmin(lat) / resolution) * resolution
+    east = np.ceil(np.nanmax(lon) / resolution) * resolution
+    north = np.ceil(np.nanmax(lat) / resolution) * resolution
+    return GridSpec(float(west), float(south), float(east), float(north), resolution)
+
+# Global instance
+regridder = Regridder()
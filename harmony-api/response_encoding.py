@@ -0,0 +1,139 @@
+"""
+Response Encoding Module for Harmony API
+Fast JSON serialization and gzip / brotli content negotiation for large responses
+"""
+
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+def _json_default(value):
+    """Encode numpy scalars and arrays that end up in responses"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(value: Any) -> bytes:
+    """Serialize to compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode()
+
+def supported_encodings() -> list:
+    """Content codings this server can produce, most preferred first"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported content coding from an Accept-Encoding header (None for identity)"""
+    if not accept_encoding:
+        return None
+    
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if coding:
+            weights[coding] = weight
+    
+    best, best_weight = None, 0.0
+    for coding in supported_encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+class ResponseEncoder:
+    """Compresses response bodies, keeping compressed variants of recent ETags in memory"""
+    
+    def __init__(self, min_size: int = 1024, max_cache_mb: float = 64, gzip_level: int = 6, brotli_quality: int = 5):
+        self.min_size = min_size
+        self.max_cache_bytes = int(max_cache_mb * 1024 * 1024)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.lock = threading.Lock()
+        # (etag, coding) -> compressed body
+        self.variants: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self.cached_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "bytes_in": 0, "bytes_out": 0}
+    
+    def _compress(self, body: bytes, coding: str) -> bytes:
+        if coding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+    
+    def _compressed(self, body: bytes, coding: str, etag: Optional[str]) -> bytes:
+        key = (etag, coding)
+        if etag is not None:
+            with self.lock:
+                compressed = self.variants.get(key)
+                if compressed is not None:
+                    self.variants.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return compressed
+        
+        compressed = self._compress(body, coding)
+        
+        with self.lock:
+            self.stats["misses"] += 1
+            self.stats["bytes_in"] += len(body)
+            self.stats["bytes_out"] += len(compressed)
+            if etag is not None and len(compressed) <= self.max_cache_bytes and key not in self.variants:
+                self.variants[key] = compressed
+                self.cached_bytes += len(compressed)
+                while self.cached_bytes > self.max_cache_bytes:
+                    _, evicted = self.variants.popitem(last=False)
+                    self.cached_bytes -= len(evicted)
+        return compressed
+    
+    def encode(self, response: Response, accept_encoding: Optional[str]) -> Response:
+        """Return the response compressed with the client's preferred coding, if worthwhile"""
+        if response.status_code == 304 or len(response.body) < self.min_size:
+            return response
+        
+        response.headers["Vary"] = "Accept-Encoding"
+        coding = negotiate_encoding(accept_encoding)
+        if coding is None:
+            return response
+        
+        etag = response.headers.get("etag")
+        compressed = self._compressed(response.body, coding, etag)
+        
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+        headers["Content-Encoding"] = coding
+        if etag is not None and not etag.startswith("W/"):
+            # The compressed bytes differ from the identity body the ETag was computed from
+            headers["etag"] = "W/" + etag
+        return Response(content=compressed, status_code=response.status_code, headers=headers)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **self.stats,
+                "encodings": supported_encodings(),
+                "json_encoder": "orjson" if orjson is not None else "json",
+                "cached_variants": len(self.variants),
+                "cached_mb": round(self.cached_bytes / (1024 * 1024), 2),
+                "max_cache_mb": round(self.max_cache_bytes / (1024 * 1024), 2),
+                "compression_ratio": round(self.stats["bytes_out"] / self.stats["bytes_in"], 3) if self.stats["bytes_in"] else None
+            }
@@ -0,0 +1,229 @@
+"""
+Scheduler Module for Harmony API
+Priority-ordered render workers with admission control on the requests in flight ahead of new work
+"""
+
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+# Lower value runs first
+PRIORITIES = {"interactive": 0, "background": 1, "prefetch": 2}
+
+class SchedulerBusy(Exception):
+    """Work was refused because it could not be started in reasonable time"""
+    
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class WorkScheduler:
+    """Shared worker pool that runs interactive work before background parallel jobs and prefetch"""
+    
+    def __init__(self, workers: int = 4, max_active: Optional[Dict[str, int]] = None, history: int = 200):
+        self.workers = max(1, workers)
+        # Admission is refused once this many admitted requests of the class or a higher one are
+        # in flight. These are global caps: every caller shares the one API token, so there is no
+        # per-client identity to divide them by
+        self.max_active = max_active or {}
+        self.condition = threading.Condition()
+        self.queue = []
+        self.sequence = itertools.count()
+        self.stopped = False
+        
+        # Average task duration, used to estimate Retry-After
+        self.service_seconds = 5.0
+        
+        self.classes: Dict[str, Dict[str, Any]] = {
+            priority: {
+                "queued": 0,
+                "running": 0,
+                "admitted": 0,
+                "completed": 0,
+                "failed": 0,
+                "rejected": 0,
+                "waits": deque(maxlen=history),
+                "max_wait": 0.0
+            }
+            for priority in PRIORITIES
+        }
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"render-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+    
+    def _check_priority(self, priority: str) -> None:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+    
+    def _admitted_ahead(self, priority: str) -> int:
+        """Admitted requests whose work runs before new work of this priority"""
+        rank = PRIORITIES[priority]
+        return sum(stats["admitted"] for name, stats in self.classes.items() if PRIORITIES[name] <= rank)
+    
+    def _retry_after(self, requests: int) -> int:
+        return max(1, math.ceil((requests + 1) * self.service_seconds / self.workers))
+    
+    def _refuse_if_busy(self, priority: str) -> None:
+        stats = self.classes[priority]
+        limit = self.max_active.get(priority)
+        ahead = self._admitted_ahead(priority)
+        if limit is not None and ahead >= limit:
+            stats["rejected"] += 1
+            raise SchedulerBusy(
+                f"Server busy: {ahead} requests in progress ahead of {priority} work",
+                self._retry_after(ahead)
+            )
+    
+    def check(self, priority: str) -> None:
+        """Raise SchedulerBusy if a request of this priority would be refused now, without admitting it
+        
+        Lets a request that must first wait on something else (e.g. a Harmony job) fail fast,
+        then be admitted only for the work it runs here.
+        """
+        self._check_priority(priority)
+        with self.condition:
+            self._refuse_if_busy(priority)
+    
+    def admit(self, priority: str) -> None:
+        """Accept a request of the given priority or raise SchedulerBusy; pair with release()"""
+        self._check_priority(priority)
+        with self.condition:
+            self._refuse_if_busy(priority)
+            self.classes[priority]["admitted"] += 1
+    
+    def release(self, priority: str) -> None:
+        """Mark an admitted request finished"""
+        with self.condition:
+            self.classes[priority]["admitted"] -= 1
+    
+    @contextmanager
+    def admitted(self, priority: str):
+        self.admit(priority)
+        try:
+            yield
+        finally:
+            self.release(priority)
+    
+    def active_requests(self, priority: str) -> int:
+        """Admitted requests of a priority that have not finished"""
+        with self.condition:
+            return self.classes[priority]["admitted"]
+    
+    def submit(self, fn: Callable, *args, priority: str = "interactive", **kwargs) -> Future:
+        """Queue a task; it runs once no higher-priority task is waiting"""
+        self._check_priority(priority)
+        future = Future()
+        with self.condition:
+            if self.stopped:
+                raise RuntimeError("Scheduler is shut down")
+            heapq.heappush(self.queue, (
+                PRIORITIES[priority], next(self.sequence), time.monotonic(), priority, future, fn, args, kwargs
+            ))
+            self.classes[priority]["queued"] += 1
+            self.condition.notify()
+        return future
+    
+    def run(self, fn: Callable, *args, priority: str = "interactive", **kwargs) -> Any:
+        """Run a task on the scheduler and wait for its result (from a non-worker thread)"""
+        return self.submit(fn, *args, priority=priority, **kwargs).result()
+    
+    async def run_async(self, fn: Callable, *args, priority: str = "interactive", **kwargs) -> Any:
+        """Await a task run on the scheduler without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, priority=priority, **kwargs))
+    
+    def discard(self, futures) -> int:
+        """Remove tasks that have not started from the queue; returns the number removed"""
+        targets = {id(future) for future in futures}
+        with self.condition:
+            kept = []
+            removed = 0
+            for entry in self.queue:
+                if id(entry[4]) in targets and entry[4].cancel():
+                    self.classes[entry[3]]["queued"] -= 1
+                    removed += 1
+                else:
+                    kept.append(entry)
+            heapq.heapify(kept)
+            self.queue = kept
+        return removed
+    
+    def _worker(self) -> None:
+        while True:
+            with self.condition:
+                while not self.queue and not self.stopped:
+                    self.condition.wait()
+                if self.stopped and not self.queue:
+                    return
+                _, _, queued_at, priority, future, fn, args, kwargs = heapq.heappop(self.queue)
+                
+                stats = self.classes[priority]
+                stats["queued"] -= 1
+                if not future.set_running_or_notify_cancel():
+                    continue
+                wait = time.monotonic() - queued_at
+                stats["waits"].append(wait)
+                stats["max_wait"] = max(stats["max_wait"], wait)
+                stats["running"] += 1
+            
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                logging.error(f"{priority} task {getattr(fn, '__name__', fn)} failed: {e}")
+                future.set_exception(e)
+                succeeded = False
+            else:
+                future.set_result(result)
+                succeeded = True
+            
+            elapsed = time.monotonic() - started
+            with self.condition:
+                stats["running"] -= 1
+                stats["completed" if succeeded else "failed"] += 1
+                self.service_seconds = 0.9 * self.service_seconds + 0.1 * elapsed
+    
+    def shutdown(self) -> None:
+        """Stop the workers, cancelling tasks that have not started"""
+        with self.condition:
+            self.stopped = True
+            while self.queue:
+                entry = heapq.heappop(self.queue)
+                self.classes[entry[3]]["queued"] -= 1
+                entry[4].cancel()
+            self.condition.notify_all()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-class queue depth, queue wait times and admission counts"""
+        with self.condition:
+            classes = {}
+            for priority, stats in self.classes.items():
+                waits = sorted(stats["waits"])
+                classes[priority] = {
+                    "queued": stats["queued"],
+                    "running": stats["running"],
+                    "active_requests": stats["admitted"],
+                    "completed": stats["completed"],
+                    "failed": stats["failed"],
+                    "rejected": stats["rejected"],
+                    "max_active": self.max_active.get(priority),
+                    "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else None,
+                    "p95_wait_seconds": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else None,
+                    "max_wait_seconds": round(stats["max_wait"], 3)
+                }
+            
+            return {
+                "workers": self.workers,
+                "avg_task_seconds": round(self.service_seconds, 3),
+                "classes": classes
+            }
@@ -0,0 +1,411 @@
+"""
+Shared State Module for Harmony API
+Key-value store for response cache and job state shared by all uvicorn worker processes
+"""
+
+import os
+import copy
+import json
+import time
+import sqlite3
+import threading
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows - single worker only
+    fcntl = None
+
+def _json_default(value):
+    """Encode numpy scalars and arrays that end up in responses"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class StateStore(ABC):
+    """
+    Namespaced key-value store with per-entry TTL
+    
+    Values are JSON documents. update() is atomic across every process using
+    the store, so it is the only safe way to modify an entry in place. A network
+    KV store (e.g. Redis) can be plugged in by implementing the same methods.
+    """
+    
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        ...
+    
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+    
+    @abstractmethod
+    def get_raw(self, namespace: str, key: str) -> Optional[bytes]:
+        """The stored JSON document as bytes, without decoding it"""
+    
+    @abstractmethod
+    def set_raw(self, namespace: str, key: str, data: bytes, ttl: Optional[float] = None) -> None:
+        """Store an already serialized JSON document"""
+    
+    @abstractmethod
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any]) -> Optional[Any]:
+        """Apply fn to the live value and store what it returns (or the mutated value if None)"""
+    
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        ...
+    
+    def contains(self, namespace: str, key: str) -> bool:
+        return self.get(namespace, key) is not None
+    
+    @abstractmethod
+    def count(self, namespace: str, include_expired: bool = False) -> int:
+        ...
+    
+    @abstractmethod
+    def evict(self, namespace: str, max_entries: int) -> int:
+        """Remove the oldest entries until at most max_entries remain"""
+    
+    @abstractmethod
+    def cleanup_expired(self, namespace: Optional[str] = None) -> int:
+        ...
+    
+    @abstractmethod
+    def clear(self, namespace: str) -> int:
+        ...
+    
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        ...
+
+class MemoryStateStore(StateStore):
+    """In-process store - for a single worker, or as a stand-in in development"""
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        # namespace -> key -> (value, created_at, expires_at)
+        self.namespaces: Dict[str, "OrderedDict[str, tuple]"] = {}
+    
+    def _live(self, namespace: str, key: str) -> Optional[tuple]:
+        entries = self.namespaces.get(namespace, {})
+        entry = entries.get(key)
+        if entry is not None and entry[2] is not None and entry[2] <= time.time():
+            del entries[key]
+            return None
+        return entry
+    
+    @staticmethod
+    def _decode(value: Any) -> Any:
+        # Raw entries are kept as the bytes they were stored as
+        return json.loads(value) if isinstance(value, bytes) else copy.deepcopy(value)
+    
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self.lock:
+            entry = self._live(namespace, key)
+            return self._decode(entry[0]) if entry else None
+    
+    def get_raw(self, namespace: str, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self._live(namespace, key)
+        if entry is None:
+            return None
+        if isinstance(entry[0], bytes):
+            return entry[0]
+        return json.dumps(entry[0], default=_json_default).encode()
+    
+    def set_raw(self, namespace: str, key: str, data: bytes, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        with self.lock:
+            entries = self.namespaces.setdefault(namespace, OrderedDict())
+            entries.pop(key, None)
+            entries[key] = (bytes(data), now, now + ttl if ttl else None)
+    
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        with self.lock:
+            entries = self.namespaces.setdefault(namespace, OrderedDict())
+            entries.pop(key, None)
+            entries[key] = (copy.deepcopy(value), now, now + ttl if ttl else None)
+    
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any]) -> Optional[Any]:
+        with self.lock:
+            entry = self._live(namespace, key)
+            if entry is None:
+                return None
+            value = self._decode(entry[0])
+            result = fn(value)
+            value = value if result is None else result
+            self.namespaces[namespace][key] = (value, entry[1], entry[2])
+            return copy.deepcopy(value)
+    
+    def delete(self, namespace: str, key: str) -> bool:
+        with self.lock:
+            return self.namespaces.get(namespace, {}).pop(key, None) is not None
+    
+    def count(self, namespace: str, include_expired: bool = False) -> int:
+        now = time.time()
+        with self.lock:
+            entries = self.namespaces.get(namespace, {})
+            if include_expired:
+                return len(entries)
+            return sum(1 for entry in entries.values() if entry[2] is None or entry[2] > now)
+    
+    def evict(self, namespace: str, max_entries: int) -> int:
+        with self.lock:
+            entries = self.namespaces.get(namespace, OrderedDict())
+            removed = 0
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+                removed += 1
+            return removed
+    
+    def cleanup_expired(self, namespace: Optional[str] = None) -> int:
+        now = time.time()
+        removed = 0
+        with self.lock:
+            for name, entries in self.namespaces.items():
+                if namespace is not None and name != namespace:
+                    continue
+                for key in [k for k, e in entries.items() if e[2] is not None and e[2] <= now]:
+                    del entries[key]
+                    removed += 1
+        return removed
+    
+    def clear(self, namespace: str) -> int:
+        with self.lock:
+            entries = self.namespaces.pop(namespace, {})
+            return len(entries)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "backend": "memory",
+                "namespaces": {name: len(entries) for name, entries in self.namespaces.items()}
+            }
+
+class SQLiteStateStore(StateStore):
+    """SQLite-backed store shared by every worker process on one host"""
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.local = threading.local()
+        
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._init_database()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread; autocommit so transactions are explicit"""
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+    
+    def _init_database(self):
+        """Initialize SQLite table for shared state"""
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS shared_state (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_shared_state_created ON shared_state(namespace, created_at)
+        """)
+    
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM shared_state WHERE namespace = ? AND key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+        except Exception as e:
+            logging.error(f"Error reading {namespace}/{key}: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+    
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO shared_state (namespace, key, value, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, default=_json_default), now, now + ttl if ttl else None)
+            )
+        except Exception as e:
+            logging.error(f"Error writing {namespace}/{key}: {e}")
+    
+    def get_raw(self, namespace: str, key: str) -> Optional[bytes]:
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM shared_state WHERE namespace = ? AND key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+        except Exception as e:
+            logging.error(f"Error reading {namespace}/{key}: {e}")
+            return None
+        if row is None:
+            return None
+        return row[0] if isinstance(row[0], bytes) else row[0].encode()
+    
+    def set_raw(self, namespace: str, key: str, data: bytes, ttl: Optional[float] = None) -> None:
+        now = time.time()
+        try:
+            # Stored as a BLOB so reads hand back the bytes without re-encoding
+            self._connect().execute(
+                "INSERT OR REPLACE INTO shared_state (namespace, key, value, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, sqlite3.Binary(data), now, now + ttl if ttl else None)
+            )
+        except Exception as e:
+            logging.error(f"Error writing {namespace}/{key}: {e}")
+    
+    def update(self, namespace: str, key: str, fn: Callable[[Any], Any]) -> Optional[Any]:
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front so concurrent updates serialize
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value FROM shared_state WHERE namespace = ? AND key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            
+            value = json.loads(row[0])
+            result = fn(value)
+            value = value if result is None else result
+            conn.execute(
+                "UPDATE shared_state SET value = ? WHERE namespace = ? AND key = ?",
+                (json.dumps(value, default=_json_default), namespace, key)
+            )
+            conn.execute("COMMIT")
+            return value
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def delete(self, namespace: str, key: str) -> bool:
+        try:
+            cursor = self._connect().execute(
+                "DELETE FROM shared_state WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+            return cursor.rowcount > 0
+        except Exception as e:
+            logging.error(f"Error deleting {namespace}/{key}: {e}")
+            return False
+    
+    def count(self, namespace: str, include_expired: bool = False) -> int:
+        query = "SELECT COUNT(*) FROM shared_state WHERE namespace = ?"
+        params = [namespace]
+        if not include_expired:
+            query += " AND (expires_at IS NULL OR expires_at > ?)"
+            params.append(time.time())
+        try:
+            return self._connect().execute(query, params).fetchone()[0]
+        except Exception as e:
+            logging.error(f"Error counting {namespace}: {e}")
+            return 0
+    
+    def evict(self, namespace: str, max_entries: int) -> int:
+        try:
+            cursor = self._connect().execute(
+                "DELETE FROM shared_state WHERE namespace = ? AND key IN ("
+                "  SELECT key FROM shared_state WHERE namespace = ? ORDER BY created_at DESC LIMIT -1 OFFSET ?"
+                ")",
+                (namespace, namespace, max_entries)
+            )
+            return cursor.rowcount
+        except Exception as e:
+            logging.error(f"Error evicting {namespace}: {e}")
+            return 0
+    
+    def cleanup_expired(self, namespace: Optional[str] = None) -> int:
+        query = "DELETE FROM shared_state WHERE expires_at IS NOT NULL AND expires_at <= ?"
+        params = [time.time()]
+        if namespace is not None:
+            query += " AND namespace = ?"
+            params.append(namespace)
+        try:
+            return self._connect().execute(query, params).rowcount
+        except Exception as e:
+            logging.error(f"Error cleaning up shared state: {e}")
+            return 0
+    
+    def clear(self, namespace: str) -> int:
+        try:
+            return self._connect().execute(
+                "DELETE FROM shared_state WHERE namespace = ?", (namespace,)
+            ).rowcount
+        except Exception as e:
+            logging.error(f"Error clearing {namespace}: {e}")
+            return 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        try:
+            counts = dict(self._connect().execute(
+                "SELECT namespace, COUNT(*) FROM shared_state GROUP BY namespace"
+            ).fetchall())
+        except Exception as e:
+            logging.error(f"Error getting shared state stats: {e}")
+            counts = {}
+        
+        return {
+            "backend": "sqlite",
+            "namespaces": counts,
+            "db_path": self.db_path,
+            "db_size_mb": round(os.path.getsize(self.db_path) / (1024 * 1024), 2) if os.path.exists(self.db_path) else 0
+        }
+
+def create_state_store(backend: str, cache_dir: str) -> StateStore:
+    """State store for the configured backend ("sqlite" or "memory")"""
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        return SQLiteStateStore(os.path.join(cache_dir, "shared_state.db"))
+    raise ValueError(f"Unknown state backend: {backend}")
+
+class LeaderLock:
+    """Exclusive lock file so host-wide background work runs in only one worker"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.handle = None
+    
+    def acquire(self) -> bool:
+        """Try to become the leader; never blocks"""
+        if self.handle is not None:
+            return True
+        if fcntl is None:
+            return True
+        
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        handle = open(self.path, "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self.handle = handle
+        return True
+    
+    def release(self) -> None:
+        if self.handle is not None:
+            if fcntl is not None:
+                fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
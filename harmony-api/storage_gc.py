@@ -0,0 +1,281 @@
+"""
+Storage GC Module for Harmony API
+Incremental background garbage collection with a byte quota across the data and cache volumes
+"""
+
+import asyncio
+import time
+import threading
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+class GCSource(ABC):
+    """One kind of on-disk data the collector can measure and evict in small batches"""
+    
+    name = "source"
+    
+    @abstractmethod
+    def usage_bytes(self) -> int:
+        ...
+    
+    @abstractmethod
+    def oldest_access(self) -> Optional[float]:
+        """Unix time of the least recently used item, or None when empty"""
+    
+    @abstractmethod
+    def expire(self, limit: int) -> Tuple[int, int]:
+        """Remove up to limit items past their retention; returns items and bytes freed"""
+    
+    @abstractmethod
+    def evict(self, limit: int) -> Tuple[int, int]:
+        """Remove up to limit least recently used items; returns items and bytes freed"""
+
+class DataStorageSource(GCSource):
+    """Visualizations, metadata, query results and animations in DataStorage"""
+    
+    name = "data_storage"
+    
+    def __init__(self, storage, retention_days: float):
+        self.storage = storage
+        self.retention_days = retention_days
+    
+    def usage_bytes(self) -> int:
+        return self.storage.disk_usage()
+    
+    def oldest_access(self) -> Optional[float]:
+        return self.storage.oldest_access()
+    
+    def expire(self, limit: int) -> Tuple[int, int]:
+        return self.storage.expire_batch(self.retention_days, limit)
+    
+    def evict(self, limit: int) -> Tuple[int, int]:
+        return self.storage.evict_lru(limit)
+
+class PersistentCacheSource(GCSource):
+    """Entries of the SQLite PersistentCache"""
+    
+    name = "persistent_cache"
+    
+    def __init__(self, cache):
+        self.cache = cache
+    
+    def usage_bytes(self) -> int:
+        return self.cache.disk_usage()
+    
+    def oldest_access(self) -> Optional[float]:
+        return self.cache.oldest_access()
+    
+    def expire(self, limit: int) -> Tuple[int, int]:
+        return self.cache.expire_batch(limit)
+    
+    def evict(self, limit: int) -> Tuple[int, int]:
+        return self.cache.evict_lru(limit)
+
+class GranuleSource(GCSource):
+    """Downloaded granules, one directory per Harmony job"""
+    
+    name = "granules"
+    
+    def __init__(self, download_manager, max_age: float, min_idle: float,
+                 in_use: Callable[[], Iterable[str]] = lambda: ()):
+        self.download_manager = download_manager
+        self.max_age = max_age
+        # Never evict a job used this recently - another worker may be reading its files
+        self.min_idle = min_idle
+        self.in_use = in_use
+    
+    def usage_bytes(self) -> int:
+        return sum(job["bytes"] for job in self.download_manager.job_usage())
+    
+    def oldest_access(self) -> Optional[float]:
+        keep = set(self.in_use())
+        cutoff = time.time() - self.min_idle
+        for job in self.download_manager.job_usage():
+            if job["last_used"] >= cutoff:
+                break
+            if job["job_id"] not in keep:
+                return job["last_used"]
+        return None
+    
+    def expire(self, limit: int) -> Tuple[int, int]:
+        return self.download_manager.remove_idle(limit, max(self.max_age, self.min_idle), self.in_use())
+    
+    def evict(self, limit: int) -> Tuple[int, int]:
+        return self.download_manager.remove_idle(limit, self.min_idle, self.in_use())
+
+class ArrayCacheSource(GCSource):
+    """Decoded arrays in the shared (tmpfs) directory, including files left by dead or restarted workers"""
+    
+    name = "array_cache"
+    
+    def __init__(self, array_cache, max_age: float):
+        self.array_cache = array_cache
+        self.max_age = max_age
+    
+    def usage_bytes(self) -> int:
+        return self.array_cache.shared_usage()
+    
+    def oldest_access(self) -> Optional[float]:
+        return self.array_cache.oldest_shared_access()
+    
+    def expire(self, limit: int) -> Tuple[int, int]:
+        return self.array_cache.remove_shared(limit, time.time() - self.max_age)
+    
+    def evict(self, limit: int) -> Tuple[int, int]:
+        return self.array_cache.remove_shared(limit)
+
+class StorageGC:
+    """
+    Keeps the data and cache volumes under a byte quota
+    
+    Each pass expires items past their retention, then, while total usage is above
+    the quota, evicts the least recently used items across all sources until usage
+    is back under quota * target_ratio. Work is done in batches of batch_size items,
+    each in a worker thread and holding only the source's own short locks, and a pass
+    stops after max_batches so request handling never waits on a long sweep; the next
+    pass continues where it left off.
+    """
+    
+    def __init__(self, sources: List[GCSource], quota_bytes: int = 0, interval: float = 300,
+                 batch_size: int = 200, max_batches: int = 20, target_ratio: float = 0.9):
+        self.sources = sources
+        self.quota_bytes = quota_bytes  # 0 disables the quota; retention still applies
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.target_ratio = target_ratio
+        self.lock = threading.Lock()
+        self.running = False
+        self.usage: Dict[str, int] = {}
+        self.stats = {
+            "passes": 0,
+            "batches": 0,
+            "expired_items": 0,
+            "evicted_items": 0,
+            "bytes_freed": 0,
+            "errors": 0,
+            "last_pass_at": None,
+            "last_pass_seconds": None
+        }
+    
+    def _record(self, kind: str, items: int, freed: int) -> None:
+        with self.lock:
+            self.stats["batches"] += 1
+            self.stats[f"{kind}_items"] += items
+            self.stats["bytes_freed"] += freed
+    
+    def _measure(self) -> Dict[str, int]:
+        usage = {}
+        for source in self.sources:
+            try:
+                usage[source.name] = source.usage_bytes()
+            except Exception as e:
+                logging.error(f"Error measuring {source.name} disk usage: {e}")
+                usage[source.name] = 0
+        with self.lock:
+            self.usage = dict(usage)
+        return usage
+    
+    def _lru_source(self) -> Optional[GCSource]:
+        """The source holding the least recently used item overall"""
+        oldest, chosen = None, None
+        for source in self.sources:
+            try:
+                accessed = source.oldest_access()
+            except Exception as e:
+                logging.error(f"Error reading {source.name} access times: {e}")
+                continue
+            if accessed is not None and (oldest is None or accessed < oldest):
+                oldest, chosen = accessed, source
+        return chosen
+    
+    async def _batch(self, fn: Callable[[int], Tuple[int, int]]) -> Tuple[int, int]:
+        result = await asyncio.to_thread(fn, self.batch_size)
+        # Let queued requests run between batches
+        await asyncio.sleep(0)
+        return result
+    
+    async def collect(self) -> Dict[str, Any]:
+        """Run one bounded pass; returns what it freed"""
+        started = time.perf_counter()
+        batches = 0
+        expired, evicted, freed = 0, 0, 0
+        
+        for source in self.sources:
+            while batches < self.max_batches:
+                try:
+                    items, size = await self._batch(source.expire)
+                except Exception as e:
+                    logging.error(f"Error expiring {source.name}: {e}")
+                    with self.lock:
+                        self.stats["errors"] += 1
+                    break
+                batches += 1
+                self._record("expired", items, size)
+                expired += items
+                freed += size
+                if items < self.batch_size:
+                    break
+        
+        if self.quota_bytes:
+            usage = sum((await asyncio.to_thread(self._measure)).values())
+            if usage > self.quota_bytes:
+                target = self.quota_bytes * self.target_ratio
+                while usage > target and batches < self.max_batches:
+                    source = await asyncio.to_thread(self._lru_source)
+                    if source is None:
+                        break
+                    try:
+                        items, size = await self._batch(source.evict)
+                    except Exception as e:
+                        logging.error(f"Error evicting from {source.name}: {e}")
+                        with self.lock:
+                            self.stats["errors"] += 1
+                        break
+                    batches += 1
+                    self._record("evicted", items, size)
+                    evicted += items
+                    freed += size
+                    if not items:
+                        break
+                    usage -= size
+        
+        await asyncio.to_thread(self._measure)
+        with self.lock:
+            self.stats["passes"] += 1
+            self.stats["last_pass_at"] = time.time()
+            self.stats["last_pass_seconds"] = round(time.perf_counter() - started, 3)
+        return {"expired_items": expired, "evicted_items": evicted, "bytes_freed": freed, "batches": batches}
+    
+    async def run(self) -> None:
+        """Collect every interval until cancelled"""
+        self.running = True
+        try:
+            while True:
+                try:
+                    result = await self.collect()
+                    if result["bytes_freed"]:
+                        logging.info(f"Storage GC freed {result['bytes_freed']} bytes "
+                                     f"({result['expired_items']} expired, {result['evicted_items']} evicted)")
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.error(f"Storage GC pass failed: {e}")
+                    with self.lock:
+                        self.stats["errors"] += 1
+                await asyncio.sleep(self.interval)
+        finally:
+            self.running = False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = sum(self.usage.values())
+            return {
+                **self.stats,
+                "running": self.running,
+                "quota_mb": round(self.quota_bytes / (1024 * 1024), 2) if self.quota_bytes else None,
+                "usage_mb": {name: round(size / (1024 * 1024), 2) for name, size in self.usage.items()},
+                "total_usage_mb": round(total / (1024 * 1024), 2),
+                "quota_used": round(total / self.quota_bytes, 3) if self.quota_bytes else None
+            }
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Unit tests for caching /tempo/animate results: files in DataStorage, a reference in the response cache
+
+Run with: python -m pytest -q test_animation_cache.py
+"""
+
+from typing import List
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conftest import AUTH
+from persistent_storage import DataStorage
+from scheduler import WorkScheduler
+
+REQUEST = {"start_time": "2024-05-01T13:00:00", "end_time": "2024-05-01T15:00:00",
+           "format": "gif", "vmin": 0.0, "vmax": 1.0}
+GIF = b"GIF89a" + bytes(range(256)) * 64
+
+class Animator:
+    """Stands in for Harmony and the frame renderer"""
+    
+    def __init__(self):
+        self.fetches: List[str] = []
+        self.renders = 0
+    
+    def fetch(self, client, harmony_request, *args, **kwargs):
+        self.fetches.append(harmony_request)
+        return "harmony-job-1", ["first.nc", "second.nc"]
+    
+    def render(self, file_paths, variable_name, **kwargs):
+        self.renders += 1
+        return GIF, {"frames": len(file_paths), "vmin": kwargs["vmin"], "vmax": kwargs["vmax"]}
+
+@pytest.fixture
+def animator(monkeypatch, tmp_path):
+    animator = Animator()
+    scheduler = WorkScheduler(workers=1)
+    monkeypatch.setattr(main, "scheduler", scheduler)
+    monkeypatch.setattr(main, "harmony_client", object())
+    monkeypatch.setattr(main, "data_storage", DataStorage(str(tmp_path)))
+    monkeypatch.setattr(main, "fetch_tempo_granules", animator.fetch)
+    monkeypatch.setattr(main, "render_animation", animator.render)
+    monkeypatch.setattr(main, "supported_formats", lambda: ["gif"])
+    main.state_store.clear(main.RESPONSE_CACHE)
+    yield animator
+    scheduler.shutdown()
+
+def animate():
+    return TestClient(main.app).post("/tempo/animate", json=REQUEST, headers=AUTH)
+
+def cache_key() -> str:
+    return main.generate_cache_key(main.AnimationRequest(**REQUEST).dict(), "animate")
+
+def test_response_cache_holds_only_a_reference(animator):
+    response = animate()
+    
+    assert response.status_code == 200
+    assert response.content == GIF
+    entry = main.state_store.get_raw(main.RESPONSE_CACHE, cache_key())
+    assert len(entry) < 200
+    assert main.get_from_cache(cache_key()) == {"animation": f"{cache_key()}.gif", "frames": 2}
+    assert main.data_storage.load_animation(f"{cache_key()}.gif") == GIF
+
+def test_repeat_request_is_served_from_storage(animator):
+    first = animate()
+    
+    second = animate()
+    
+    assert second.content == GIF
+    assert second.headers["X-Animation-Frames"] == "2"
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert animator.renders == 1
+    assert len(animator.fetches) == 1
+
+def test_collected_animation_is_rendered_again(animator):
+    animate()
+    main.data_storage.evict_lru(10)
+    
+    response = animate()
+    
+    assert response.content == GIF
+    assert animator.renders == 2
+    assert main.data_storage.load_animation(f"{cache_key()}.gif") == GIF
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the decoded array cache, its shared directory and the sweep bounding it
+
+Run with: python -m pytest -q test_array_cache.py
+"""
+
+import asyncio
+import multiprocessing
+import os
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+from array_cache import DecodedArrayCache, SharedArray, STALE_TEMP_SECONDS
+from storage_gc import ArrayCacheSource, StorageGC
+
+ARRAY = np.arange(1000, dtype="float64")
+
+def fail_loader():
+    raise AssertionError("array should have come from the cache")
+
+def decode_in_process(shared_dir: str, source: str) -> None:
+    DecodedArrayCache(max_mb=1, shared_dir=shared_dir).get(source, "column", loader=lambda: ARRAY)
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "granule.nc"
+    path.write_bytes(b"granule")
+    return str(path)
+
+@pytest.fixture
+def shared_dir(tmp_path):
+    return str(tmp_path / "arrays")
+
+def age(path: str, seconds: float) -> None:
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+def test_decodes_once_per_process(source):
+    cache = DecodedArrayCache(max_mb=1)
+    calls = []
+    
+    first = cache.get(source, "column", loader=lambda: calls.append(1) or ARRAY)
+    second = cache.get(source, "column", loader=fail_loader)
+    
+    assert calls == [1]
+    assert second is first
+    assert not first.flags.writeable
+    assert cache.get_stats()["hits"] == 1
+
+def test_reused_from_another_process(source, shared_dir):
+    process = multiprocessing.get_context("spawn").Process(target=decode_in_process, args=(shared_dir, source))
+    process.start()
+    process.join(60)
+    assert process.exitcode == 0
+    
+    cache = DecodedArrayCache(max_mb=1, shared_dir=shared_dir)
+    array = cache.get(source, "column", loader=fail_loader)
+    
+    assert isinstance(array, np.memmap)
+    np.testing.assert_array_equal(array, ARRAY)
+    assert cache.get_stats()["shared_hits"] == 1
+
+def test_shared_handle_maps_the_file(source, shared_dir):
+    cache = DecodedArrayCache(max_mb=1, shared_dir=shared_dir)
+    cache.get(source, "column", loader=lambda: ARRAY)
+    
+    handle = pickle.loads(pickle.dumps(cache.get_shared(source, "column")))
+    
+    assert isinstance(handle, SharedArray)
+    np.testing.assert_array_equal(handle.load(), ARRAY)
+
+def test_remove_shared_sweeps_unused_and_leftover_files(source, shared_dir):
+    cache = DecodedArrayCache(max_mb=1, shared_dir=shared_dir)
+    cache.get(source, "old", loader=lambda: ARRAY)
+    cache.get(source, "recent", loader=lambda: ARRAY)
+    old_path, recent_path = (entry[1] for entry in cache.entries.values())
+    leftover = os.path.join(shared_dir, "crashed.tmp")
+    writing = os.path.join(shared_dir, "writing.tmp")
+    for path in (leftover, writing):
+        with open(path, "wb") as f:
+            f.write(b"x" * 100)
+    age(old_path, 7200)
+    age(leftover, STALE_TEMP_SECONDS + 60)
+    old_size = os.path.getsize(old_path)
+    
+    removed, freed = cache.remove_shared(100, unused_since=time.time() - 3600)
+    
+    assert removed == 2
+    assert freed == old_size + 100
+    assert sorted(os.listdir(shared_dir)) == sorted([os.path.basename(recent_path), "writing.tmp"])
+    # The swept array is no longer served from this process either
+    assert cache.get_stats()["cached_arrays"] == 1
+
+def test_hits_keep_shared_files_fresh(source, shared_dir):
+    cache = DecodedArrayCache(max_mb=1, shared_dir=shared_dir)
+    cache.get(source, "column", loader=lambda: ARRAY)
+    path = next(iter(cache.entries.values()))[1]
+    age(path, 7200)
+    
+    cache.get(source, "column", loader=fail_loader)
+    
+    assert cache.remove_shared(100, unused_since=time.time() - 3600) == (0, 0)
+
+def test_gc_bounds_shared_directory_across_processes(source, shared_dir):
+    # Two workers each within their own bound, together over the shared quota
+    first = DecodedArrayCache(max_mb=1, shared_dir=shared_dir)
+    second = DecodedArrayCache(max_mb=1, shared_dir=shared_dir)
+    for i in range(4):
+        first.get(source, f"first-{i}", loader=lambda: ARRAY)
+        second.get(source, f"second-{i}", loader=lambda: ARRAY)
+    for i, (_, path) in enumerate(first.entries.values()):
+        age(path, 100 - i)
+    file_size = os.path.getsize(next(iter(first.entries.values()))[1])
+    
+    gc = StorageGC([ArrayCacheSource(first, max_age=3600)], quota_bytes=6 * file_size,
+                   batch_size=1, target_ratio=0.75)
+    result = asyncio.run(gc.collect())
+    
+    # 8 files down to the 4.5 file target, least recently used first
+    assert result["evicted_items"] == 4
+    assert first.shared_usage() <= 4.5 * file_size
+    assert first.get_stats()["cached_arrays"] == 0
+    assert all(os.path.exists(path) for _, path in second.entries.values())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Unit tests for /tempo/visualize/batch: the NDJSON plan, result and summary lines, limits and admission
+
+Run with: python -m pytest -q test_batch_visualization.py
+"""
+
+import json
+from typing import List
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conftest import AUTH
+from scheduler import WorkScheduler
+
+WINDOWS = [
+    {"start_time": "2024-05-01T13:00:00", "end_time": "2024-05-01T14:00:00"},
+    {"start_time": "2024-05-01T14:00:00", "end_time": "2024-05-01T15:00:00"}
+]
+VARIABLE = "product/vertical_column"
+
+class Harmony:
+    """Stands in for Harmony and the renderers"""
+    
+    def __init__(self):
+        self.fetches: List[str] = []
+        self.failing_plot_types: List[str] = []
+    
+    def fetch(self, client, harmony_request, *args, **kwargs):
+        self.fetches.append(harmony_request)
+        return f"harmony-job-{len(self.fetches)}", ["granule.nc"]
+    
+    def render(self, datatree, plot_type, variable_name, **kwargs):
+        return None if plot_type in self.failing_plot_types else f"{plot_type}-image"
+
+@pytest.fixture
+def harmony(monkeypatch):
+    harmony = Harmony()
+    scheduler = WorkScheduler(workers=2, max_active={"background": 1})
+    monkeypatch.setattr(main, "scheduler", scheduler)
+    monkeypatch.setattr(main, "harmony_client", object())
+    monkeypatch.setattr(main, "fetch_tempo_granules", harmony.fetch)
+    monkeypatch.setattr(main, "open_batch_granule", lambda *args: object())
+    monkeypatch.setattr(main, "color_scale_for", lambda *args: None)
+    monkeypatch.setattr(main, "render_plot", harmony.render)
+    main.state_store.clear(main.RESPONSE_CACHE)
+    yield harmony
+    scheduler.shutdown()
+
+def batch(**fields):
+    body = {"time_windows": WINDOWS, "variables": [VARIABLE], "plot_types": ["map", "contour"], **fields}
+    return TestClient(main.app).post("/tempo/visualize/batch", json=body, headers=AUTH)
+
+def lines(response) -> List[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def cache_item(window: dict, plot_type: str) -> None:
+    request = main.VisualizationRequest(**window, variables=[VARIABLE], plot_type=plot_type)
+    main.store_in_cache(main.generate_cache_key(request.dict(), "visualize"), main.full_visualization_response(
+        "harmony-job-0", plot_type, VARIABLE, "cached-image", 1
+    ).dict())
+
+def test_streams_plan_results_and_summary(harmony):
+    cache_item(WINDOWS[0], "map")
+    
+    response = batch()
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    plan, *results, summary = lines(response)
+    assert plan == {"type": "plan", "total_items": 4, "cached_items": 1, "harmony_jobs": 2, "time_windows": 2}
+    # The cached item comes first, then renders as they complete
+    assert results[0]["cached"] and results[0]["image_base64"] == "cached-image"
+    assert sorted((r["start_time"], r["plot_type"]) for r in results) == [
+        (w["start_time"], p) for w in WINDOWS for p in ("contour", "map")
+    ]
+    assert all(r["success"] for r in results)
+    assert summary["type"] == "summary"
+    assert (summary["success_count"], summary["total_count"]) == (4, 4)
+    assert len(harmony.fetches) == 2
+
+def test_rendered_items_are_cached_for_single_requests(harmony):
+    batch()
+    
+    request = main.VisualizationRequest(**WINDOWS[1], variables=[VARIABLE], plot_type="contour")
+    cached = main.get_from_cache(main.generate_cache_key(request.dict(), "visualize"))
+    
+    assert cached["data"]["image_base64"] == "contour-image"
+
+def test_failed_render_is_reported_on_its_line(harmony):
+    harmony.failing_plot_types = ["contour"]
+    
+    plan, *results, summary = lines(batch())
+    
+    failed = [r for r in results if not r["success"]]
+    assert [r["plot_type"] for r in failed] == ["contour", "contour"]
+    assert failed[0]["error"] == "Failed to generate contour visualization"
+    assert summary["success_count"] == 2
+
+def test_oversized_batch_is_refused_before_planning(harmony, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 3)
+    monkeypatch.setattr(main, "plan_batch_visualization", lambda request: pytest.fail("batch was planned"))
+    
+    response = batch()
+    
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Batch of 4 visualizations exceeds the limit of 3"
+
+def test_invalid_plot_type_is_a_bad_request(harmony):
+    assert batch(plot_types=["map", "surface"]).status_code == 400
+
+def test_admission_is_released_after_streaming(harmony):
+    for _ in range(2):
+        assert batch().status_code == 200
+    
+    assert main.scheduler.active_requests("background") == 0
+
+def test_busy_scheduler_refuses_batch(harmony):
+    main.scheduler.admit("background")
+    
+    response = batch()
+    
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert harmony.fetches == []
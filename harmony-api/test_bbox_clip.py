@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Unit tests for cutting swaths down to the requested bounding box
+
+Run with: python -m pytest -q test_bbox_clip.py
+"""
+
+import numpy as np
+import xarray as xr
+
+from bbox_clip import SwathClipper, map_extent, swath_window, valid_bbox
+
+DEFAULT_EXTENT = [-150, -40, 14, 65]
+
+def swath(rows: int = 40, cols: int = 60):
+    """Regular lat/lon swath covering 20-59N, 130-71W"""
+    lat, lon = np.meshgrid(np.arange(20.0, 20.0 + rows), np.arange(-130.0, -130.0 + cols), indexing="ij")
+    return lat, lon
+
+def swath_datatree(source=None):
+    lat, lon = swath()
+    tree = xr.DataTree.from_dict({
+        "/geolocation": xr.Dataset({
+            "latitude": (("mirror_step", "xtrack"), lat),
+            "longitude": (("mirror_step", "xtrack"), lon)
+        }),
+        "/product": xr.Dataset({"vertical_column": (("mirror_step", "xtrack"), lat + lon)})
+    })
+    if source is not None:
+        tree.encoding["source"] = source
+    return tree
+
+def test_valid_bbox_and_extent():
+    assert valid_bbox([-100, 30, -90, 40])
+    assert not valid_bbox(None)
+    assert not valid_bbox([-90, 30, -100, 40])
+    assert not valid_bbox([-100, 30, -90])
+    assert map_extent([-100, 30, -90, 40], DEFAULT_EXTENT) == [-100, -90, 30, 40]
+    assert map_extent([-200, -95, 190, 95], DEFAULT_EXTENT) == [-180, 180, -90, 90]
+    assert map_extent(None, DEFAULT_EXTENT) == DEFAULT_EXTENT
+
+def test_swath_window_covers_bbox_and_margin():
+    lat, lon = swath()
+    rows, cols = swath_window(lat, lon, [-100, 30, -90, 40], margin=1.0)
+    
+    assert (lat[rows, cols].min(), lat[rows, cols].max()) == (29, 41)
+    assert (lon[rows, cols].min(), lon[rows, cols].max()) == (-101, -89)
+
+def test_swath_window_nothing_to_cut():
+    lat, lon = swath()
+    assert swath_window(lat, lon, None) is None
+    assert swath_window(lat, lon, [-180, -90, 180, 90]) is None
+    # No pixel inside - the swath is kept whole rather than rendering nothing
+    assert swath_window(lat, lon, [0, 0, 10, 10]) is None
+
+def test_clip_datatree_cuts_every_swath_variable(tmp_path):
+    source = tmp_path / "granule.nc"
+    source.write_bytes(b"")
+    clipper = SwathClipper(margin=0.0)
+    
+    clipped = clipper.clip_datatree(swath_datatree(str(source)), [-100, 30, -90, 40])
+    
+    assert clipped["geolocation/latitude"].shape == (11, 11)
+    assert clipped["product/vertical_column"].shape == (11, 11)
+    # A window must never be mistaken for the whole granule by per-granule caches
+    assert "source" not in clipped.encoding
+    
+    clipper.clip_datatree(swath_datatree(str(source)), [-100, 30, -90, 40])
+    stats = clipper.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["clipped"] == 2
+    assert stats["kept_ratio"] == round(121 / 2400, 4)
+
+def test_clip_datatree_without_usable_bbox_keeps_tree():
+    clipper = SwathClipper()
+    tree = swath_datatree()
+    assert clipper.clip_datatree(tree, None) is tree
+    assert clipper.get_stats()["unclipped"] == 1
+
+def test_window_cache_is_bounded(tmp_path):
+    source = tmp_path / "granule.nc"
+    source.write_bytes(b"")
+    clipper = SwathClipper(max_entries=3)
+    for west in range(-120, -100, 2):
+        clipper.get_window(swath_datatree(str(source)), [west, 30, west + 5, 40])
+    assert len(clipper.windows) == 3
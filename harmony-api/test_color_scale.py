@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Unit tests for robust color scale limits and the shared per-region scale cache
+
+Run with: python -m pytest -q test_color_scale.py
+"""
+
+import numpy as np
+
+from color_scale import ColorScale, ColorScaleService, RobustLimits
+from shared_state import MemoryStateStore
+
+BBOX = [-110.2, 30.1, -90.4, 45.3]
+DAY = "2023-12-30T19:00:00"
+
+def robust_limits(*arrays):
+    limits = RobustLimits(2, 98, max_samples=1000)
+    for array in arrays:
+        limits.add(array)
+    return limits.limits()
+
+def test_robust_limits_ignore_outliers_and_nans():
+    data = np.linspace(0, 100, 10001)
+    data[:5] = np.nan
+    data[-1] = 1e9
+    
+    vmin, vmax = robust_limits(data[:5000], data[5000:])
+    
+    assert 1 < vmin < 3
+    assert 97 < vmax < 99
+
+def test_robust_limits_edge_cases():
+    assert RobustLimits().limits() == (0.0, 1.0)
+    assert robust_limits(np.full(10, np.nan)) == (0.0, 1.0)
+    vmin, vmax = robust_limits(np.full(10, 5.0))
+    assert vmin == 5.0 and vmax > vmin
+
+def test_scale_levels_and_round_trip():
+    scale = ColorScale(0.0, 10.0, n_levels=5)
+    assert list(scale.levels) == [0, 2, 4, 6, 8, 10]
+    assert ColorScale.from_dict(scale.to_dict()) == scale
+
+def test_scale_computed_once_per_region_and_day():
+    service = ColorScaleService(MemoryStateStore(), region_precision=1.0)
+    calls = []
+    
+    def arrays():
+        calls.append(1)
+        return [np.arange(100.0)]
+    
+    first = service.scale_for("no2", BBOX, DAY, arrays)
+    # Nearby bbox and another scan of the same day share the scale
+    second = service.scale_for("no2", [-110.0, 30.0, -90.0, 45.0], "2023-12-30T21:00:00", arrays)
+    
+    assert first == second
+    assert len(calls) == 1
+    assert service.get_stats()["hits"] == 1
+
+def test_scale_keyed_by_variable_day_and_quality_filter():
+    service = ColorScaleService(MemoryStateStore())
+    service.put("no2", BBOX, DAY, 0, 10)
+    
+    assert service.get("no2", BBOX, DAY) == ColorScale(0, 10)
+    assert service.get("hcho", BBOX, DAY) is None
+    assert service.get("no2", BBOX, "2023-12-31T19:00:00") is None
+    assert service.get("no2", BBOX, DAY, max_quality_flag=0) is None
+    
+    service.put("no2", BBOX, DAY, 2, 5, max_quality_flag=0)
+    assert service.get("no2", BBOX, DAY, max_quality_flag=0) == ColorScale(2, 5)
+    assert service.get("no2", BBOX, DAY) == ColorScale(0, 10)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Unit tests for subsetting granules and streaming them as Arrow, NPY and Zarr
+
+Run with: python -m pytest -q test_data_export.py
+"""
+
+import io
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from data_export import check_export_format, stream_export, subset_granule
+
+# 4 scanlines x 5 pixels, latitude rising by scanline and longitude by pixel
+LAT, LON = np.meshgrid(np.arange(30.0, 34.0), np.arange(-100.0, -95.0), indexing="ij")
+COLUMN = np.arange(20.0).reshape(4, 5)
+FLAGS = np.tile(np.array([0, 0, 1, 2, 0], dtype="int8"), (4, 1))
+TIMES = np.array(["2024-05-01T13:00", "2024-05-01T13:10", "2024-05-01T13:20", "2024-05-01T13:30"],
+                 dtype="datetime64[ns]")
+
+def write_granule(path: str, offset: float = 0.0) -> str:
+    xr.DataTree.from_dict({
+        "/geolocation": xr.Dataset({
+            "latitude": (("mirror_step", "xtrack"), LAT),
+            "longitude": (("mirror_step", "xtrack"), LON),
+            "time": (("mirror_step",), TIMES)
+        }),
+        "/product": xr.Dataset({
+            "vertical_column": (("mirror_step", "xtrack"), COLUMN + offset),
+            "main_data_quality_flag": (("mirror_step", "xtrack"), FLAGS)
+        })
+    }).to_netcdf(path)
+    return path
+
+@pytest.fixture
+def granules(tmp_path):
+    return [write_granule(str(tmp_path / "first.nc")), write_granule(str(tmp_path / "second.nc"), offset=100.0)]
+
+def export(output_format: str, file_paths, **kwargs) -> bytes:
+    return b"".join(stream_export(output_format, file_paths, **kwargs))
+
+def test_subset_by_bbox_and_time(granules):
+    columns = subset_granule(granules[0], ["product/vertical_column"], bbox=[-99, 31, -97, 32],
+                             start_time="2024-05-01T13:15:00", end_time="2024-05-01T13:30:00")
+    
+    # Only the third scanline is inside both the box and the time window
+    np.testing.assert_array_equal(columns["latitude"], [32.0, 32.0, 32.0])
+    np.testing.assert_array_equal(columns["longitude"], [-99.0, -98.0, -97.0])
+    np.testing.assert_array_equal(columns["vertical_column"], [11.0, 12.0, 13.0])
+
+def test_subset_drops_or_flags_low_quality_pixels(granules):
+    dropped = subset_granule(granules[0], ["product/vertical_column"], bbox=[-100, 30, -96, 30],
+                             max_quality_flag=0)
+    flagged = subset_granule(granules[0], ["product/vertical_column"], bbox=[-100, 30, -96, 30],
+                             max_quality_flag=0, quality_column=True)
+    
+    np.testing.assert_array_equal(dropped["vertical_column"], [0.0, 1.0, 4.0])
+    np.testing.assert_array_equal(flagged["vertical_column"], [0.0, 1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_array_equal(flagged["quality_ok"], [True, True, False, False, True])
+
+def test_subset_outside_bbox_is_empty(granules):
+    assert subset_granule(granules[0], ["product/vertical_column"], bbox=[0, 0, 1, 1]) is None
+
+def test_check_export_format():
+    assert check_export_format("npy") is None
+    assert "Invalid format" in check_export_format("csv")
+
+def test_arrow_round_trip(granules):
+    pa = pytest.importorskip("pyarrow")
+    
+    table = pa.ipc.open_stream(export("arrow", granules, bbox=[-100, 30, -96, 30])).read_all()
+    
+    assert table.column_names == ["granule", "latitude", "longitude", "vertical_column"]
+    assert table.column("granule").to_pylist() == [0] * 5 + [1] * 5
+    assert table.column("vertical_column").to_pylist() == [0.0, 1.0, 2.0, 3.0, 4.0,
+                                                           100.0, 101.0, 102.0, 103.0, 104.0]
+    metadata = json.loads(table.schema.metadata[b"tempo"])
+    assert metadata["granules"] == ["first.nc", "second.nc"]
+    assert metadata["bbox"] == [-100, 30, -96, 30]
+
+def test_arrow_streams_one_batch_per_chunk(granules):
+    pa = pytest.importorskip("pyarrow")
+    
+    chunks = list(stream_export("arrow", granules[:1]))
+    reader = pa.ipc.open_stream(b"".join(chunks))
+    
+    assert len(chunks) > 1
+    assert sum(batch.num_rows for batch in reader) == 20
+
+def test_arrow_without_pixels_is_a_valid_empty_stream(granules):
+    pa = pytest.importorskip("pyarrow")
+    
+    table = pa.ipc.open_stream(export("arrow", granules, bbox=[0, 0, 1, 1])).read_all()
+    
+    assert table.num_rows == 0
+    assert table.column_names == ["granule", "latitude", "longitude"]
+
+def test_npz_round_trip(granules):
+    data = export("npy", granules, bbox=[-100, 33, -96, 33], max_quality_flag=0)
+    
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert json.loads(archive.read("metadata.json"))["max_quality_flag"] == 0
+    arrays = np.load(io.BytesIO(data))
+    np.testing.assert_array_equal(arrays["g0000_c0000_vertical_column"], [15.0, 16.0, 19.0])
+    np.testing.assert_array_equal(arrays["g0001_c0000_vertical_column"], [115.0, 116.0, 119.0])
+    np.testing.assert_array_equal(arrays["g0001_c0000_latitude"], [33.0, 33.0, 33.0])
+
+def test_zarr_round_trip(granules, tmp_path, monkeypatch):
+    zarr = pytest.importorskip("zarr")
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    path = tmp_path / "export.zarr.zip"
+    
+    path.write_bytes(export("zarr", granules, bbox=[-100, 30, -96, 30]))
+    
+    root = zarr.open_group(store=zarr.storage.ZipStore(str(path), mode="r"), mode="r")
+    assert root.attrs["granules"] == ["first.nc", "second.nc"]
+    np.testing.assert_array_equal(root["granule_0001/vertical_column"][:], [100.0, 101.0, 102.0, 103.0, 104.0])
+    # The intermediate store is removed once streamed
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("tempo_export_")]
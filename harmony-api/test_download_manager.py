@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Unit tests for granule downloads: resume, completed partial files and verification
+
+Run with: python -m pytest -q test_download_manager.py
+"""
+
+import hashlib
+import os
+from typing import Dict, List, Optional
+
+import pytest
+import requests
+
+from download_manager import (DownloadCancelled, DownloadError, DownloadManager, EarthdataSession, LOCK_SUFFIX,
+                              PARTIAL_SUFFIX, download_filename)
+
+CONTENT = b"0123456789" * 10
+
+class FakeResponse:
+    """Streamed response serving a byte range of an object"""
+    
+    def __init__(self, status_code: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+    
+    def iter_content(self, chunk_size: int):
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+class FakeSession:
+    """Serves CONTENT honouring Range requests, like S3"""
+    
+    def __init__(self, content: bytes = CONTENT, etag: Optional[str] = None, honour_range: bool = True):
+        self.content = content
+        self.etag = etag
+        self.honour_range = honour_range
+        self.requests: List[Dict[str, str]] = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def get(self, url, stream=False, headers=None, timeout=None):
+        headers = headers or {}
+        self.requests.append(headers)
+        base = {"ETag": f'"{self.etag}"'} if self.etag else {}
+        size = len(self.content)
+        
+        offset = int(headers["Range"][6:-1]) if "Range" in headers and self.honour_range else 0
+        if offset >= size and offset:
+            return FakeResponse(416, headers={**base, "Content-Range": f"bytes */{size}"})
+        if offset:
+            return FakeResponse(206, self.content[offset:], {
+                **base,
+                "Content-Range": f"bytes {offset}-{size - 1}/{size}",
+                "Content-Length": str(size - offset)
+            })
+        return FakeResponse(200, self.content, {**base, "Content-Length": str(size)})
+
+class Sessions:
+    """Hands the manager the session under test for every download"""
+    
+    def __init__(self):
+        self.session = FakeSession()
+    
+    def __call__(self):
+        return self.session
+
+@pytest.fixture
+def sessions():
+    return Sessions()
+
+@pytest.fixture
+def manager(tmp_path, sessions):
+    manager = DownloadManager(str(tmp_path), max_workers=2, retries=1, chunk_size=16, session_factory=sessions)
+    yield manager
+    manager.shutdown()
+
+def write_partial(manager: DownloadManager, content: bytes) -> str:
+    directory = manager.job_dir("job")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "granule.nc" + PARTIAL_SUFFIX), "wb") as f:
+        f.write(content)
+    return directory
+
+def test_downloads_job_into_its_directory(manager, sessions):
+    session = sessions.session = FakeSession(etag=hashlib.md5(CONTENT).hexdigest())
+    files = manager.download_job(None, "job", ["https://x/a.nc", "https://x/b.nc"])
+    
+    assert files == [os.path.join(manager.job_dir("job"), name) for name in ("a.nc", "b.nc")]
+    for path in files:
+        with open(path, "rb") as f:
+            assert f.read() == CONTENT
+    # Neither partial nor lock files are left behind
+    assert sorted(os.listdir(manager.job_dir("job"))) == ["a.nc", "b.nc"]
+    assert manager.get_stats()["downloads"] == 2
+
+def test_existing_file_is_reused(manager, sessions):
+    session = sessions.session = FakeSession()
+    manager.download_job(None, "job", ["https://x/a.nc"])
+    manager.download_job(None, "job", ["https://x/a.nc"])
+    
+    assert len(session.requests) == 1
+    assert manager.get_stats()["reused"] == 1
+
+def test_resumes_partial_download(manager, sessions):
+    directory = write_partial(manager, CONTENT[:40])
+    session = sessions.session = FakeSession(etag=hashlib.md5(CONTENT).hexdigest())
+    
+    path = manager.download_file("https://x/granule.nc", directory)
+    
+    assert session.requests == [{"Range": "bytes=40-"}]
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+    stats = manager.get_stats()
+    assert stats["resumed"] == 1
+    assert stats["recent"][-1]["resumed_from"] == 40
+    assert stats["recent"][-1]["bytes"] == 60
+
+def test_restarts_when_range_is_ignored(manager, sessions):
+    directory = write_partial(manager, b"stale bytes")
+    session = sessions.session = FakeSession(honour_range=False)
+    
+    path = manager.download_file("https://x/granule.nc", directory)
+    
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+    assert manager.get_stats()["resumed"] == 0
+
+def test_completed_partial_file_is_finalized_on_416(manager, sessions):
+    directory = write_partial(manager, CONTENT)
+    session = sessions.session = FakeSession(etag=hashlib.md5(CONTENT).hexdigest())
+    
+    path = manager.download_file("https://x/granule.nc", directory)
+    
+    assert len(session.requests) == 1
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(path + PARTIAL_SUFFIX)
+    assert manager.get_stats()["failed"] == 0
+
+def test_oversized_partial_file_is_discarded_on_416(manager):
+    directory = write_partial(manager, CONTENT + b"extra")
+    
+    with pytest.raises(DownloadError):
+        manager.download_file("https://x/granule.nc", directory)
+    
+    # The next attempt starts from scratch
+    assert not os.path.exists(os.path.join(directory, "granule.nc" + PARTIAL_SUFFIX))
+    path = manager.download_file("https://x/granule.nc", directory)
+    with open(path, "rb") as f:
+        assert f.read() == CONTENT
+
+def test_checksum_mismatch_discards_download(manager, sessions):
+    directory = manager.job_dir("job")
+    os.makedirs(directory)
+    session = sessions.session = FakeSession(etag=hashlib.md5(b"other content").hexdigest())
+    
+    with pytest.raises(DownloadError, match="Checksum mismatch"):
+        manager.download_file("https://x/granule.nc", directory)
+    
+    assert not os.path.exists(os.path.join(directory, "granule.nc"))
+    assert not os.path.exists(os.path.join(directory, "granule.nc" + PARTIAL_SUFFIX))
+    assert manager.get_stats()["failed"] == 1
+
+def test_failed_download_keeps_lock_file(manager, sessions):
+    directory = manager.job_dir("job")
+    os.makedirs(directory)
+    session = sessions.session = FakeSession(etag=hashlib.md5(b"other content").hexdigest())
+    
+    with pytest.raises(DownloadError):
+        manager.download_file("https://x/granule.nc", directory)
+    
+    # Only a finished file makes its lock file unnecessary
+    if os.name == "posix":
+        assert os.path.exists(os.path.join(directory, "granule.nc" + LOCK_SUFFIX))
+
+def test_cancelled_job_stops_downloading(manager):
+    directory = manager.job_dir("job")
+    os.makedirs(directory)
+    manager.cancel_job("job")
+    
+    with pytest.raises(DownloadCancelled):
+        manager.download_file("https://x/granule.nc", directory)
+    assert manager.get_stats()["cancelled"] == 1
+
+def test_filename_is_the_last_url_segment():
+    assert download_filename("https://harmony.earthdata.nasa.gov/service-results/b/j/TEMPO%20L2.nc?x=1") == "TEMPO L2.nc"
+
+@pytest.mark.parametrize("origin, target, kept", [
+    ("https://harmony.earthdata.nasa.gov/results/a.nc", "https://urs.earthdata.nasa.gov/oauth/authorize", True),
+    ("https://urs.earthdata.nasa.gov/oauth/authorize", "https://harmony.earthdata.nasa.gov/redirect", True),
+    ("https://harmony.earthdata.nasa.gov/redirect", "https://bucket.s3.amazonaws.com/a.nc", False),
+    ("https://harmony.earthdata.nasa.gov/results/a.nc", "https://harmony.earthdata.nasa.gov/results/b.nc", True)
+])
+def test_credentials_only_follow_redirects_through_earthdata_login(origin, target, kept):
+    session = EarthdataSession(("user", "secret"))
+    response = requests.Response()
+    response.request = session.prepare_request(requests.Request("GET", origin))
+    redirected = session.prepare_request(requests.Request("GET", target))
+    assert "Authorization" in redirected.headers
+    
+    session.rebuild_auth(redirected, response)
+    
+    assert ("Authorization" in redirected.headers) == kept
+
+def test_default_sessions_use_configured_credentials(tmp_path):
+    manager = DownloadManager(str(tmp_path))
+    manager.set_credentials("user", "secret")
+    
+    with manager.session_factory() as session:
+        assert isinstance(session, EarthdataSession)
+        assert session.auth == ("user", "secret")
+    manager.shutdown()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Unit tests for FigureTemplatePool: reset and reuse of templates, pool bounds and concurrent borrowing
+
+Run with: python -m pytest -q test_figure_pool.py
+"""
+
+import threading
+
+import pytest
+
+pytest.importorskip("matplotlib")
+
+from matplotlib.colors import to_hex
+
+from figure_pool import FigureTemplatePool
+
+def setup_axes(fig):
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_xlim(0, 10)
+    ax.set_ylim(0, 5)
+    ax.set_xlabel("longitude")
+    return ax
+
+def borrow(pool, kind="line", extent=None, colorbar_shrink=None):
+    return pool.template(kind, (4, 3), setup_axes, extent=extent, colorbar_shrink=colorbar_shrink)
+
+def test_template_is_cleared_and_reused():
+    pool = FigureTemplatePool()
+    with borrow(pool, colorbar_shrink=0.8) as first:
+        base = set(first.ax.get_children())
+        image = first.ax.imshow([[0, 1], [2, 3]], extent=(20, 30, 10, 15))
+        first.colorbar(image)
+        first.ax.plot([1, 2], [3, 4])
+        first.ax.set_title("first render")
+        first.ax.set_xlabel("data")
+        first.ax.invert_yaxis()
+    
+    with borrow(pool, colorbar_shrink=0.8) as second:
+        assert second is first
+        assert set(second.ax.get_children()) == base
+        assert second.ax.get_title() == ""
+        assert second.ax.get_xlabel() == "longitude"
+        assert second.ax.get_xlim() == (0, 10) and second.ax.get_ylim() == (0, 5)
+        assert not second.cax.images and not second.cax.collections
+        # The color cycle starts over instead of continuing from the first render
+        assert to_hex(second.ax.plot([0, 1])[0].get_color()) == "#1f77b4"
+        assert second.to_png(dpi=20).startswith(b"\x89PNG")
+    
+    stats = pool.get_stats()
+    assert (stats["templates_built"], stats["templates_reused"]) == (1, 1)
+
+def test_failed_render_discards_its_template():
+    pool = FigureTemplatePool()
+    with pytest.raises(RuntimeError):
+        with borrow(pool) as broken:
+            raise RuntimeError("render failed")
+    
+    with borrow(pool) as fresh:
+        assert fresh is not broken
+    assert pool.get_stats()["templates_discarded"] == 1
+
+def test_idle_templates_per_key_are_bounded():
+    pool = FigureTemplatePool(max_idle_per_key=2)
+    with borrow(pool), borrow(pool), borrow(pool):
+        pass
+    
+    stats = pool.get_stats()
+    assert stats["templates_built"] == 3
+    assert stats["idle_templates"] == {"line/(4, 3)": 2}
+    assert stats["templates_discarded"] == 1
+
+def test_least_recently_used_keys_are_dropped():
+    pool = FigureTemplatePool(max_keys=2)
+    for extent in ([0, 1, 0, 1], [0, 2, 0, 2], [0, 3, 0, 3]):
+        with borrow(pool, kind="map", extent=extent):
+            pass
+    
+    assert list(pool.get_stats()["idle_templates"]) == ["map/(4, 3)/(0, 2, 0, 2)", "map/(4, 3)/(0, 3, 0, 3)"]
+    assert pool.get_stats()["templates_discarded"] == 1
+
+def test_concurrent_renders_never_share_a_template():
+    pool = FigureTemplatePool(max_idle_per_key=4)
+    holders = {}
+    lock = threading.Lock()
+    errors = []
+    barrier = threading.Barrier(4)
+    
+    def render(worker: int):
+        try:
+            for _ in range(5):
+                with borrow(pool) as template:
+                    with lock:
+                        # No other thread may hold this template right now
+                        assert id(template) not in holders
+                        holders[id(template)] = worker
+                    barrier.wait(5)
+                    template.ax.plot([0, worker])
+                    with lock:
+                        del holders[id(template)]
+        except Exception as e:
+            errors.append(e)
+            barrier.abort()
+    
+    threads = [threading.Thread(target=render, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    
+    assert errors == []
+    stats = pool.get_stats()
+    # All four held a template at once, so exactly four were built and then reused
+    assert stats["templates_built"] == 4
+    assert stats["templates_reused"] == 16
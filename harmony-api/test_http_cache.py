@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Unit tests for ETag / If-None-Match handling and Cache-Control of rendered outputs
+
+Run with: python -m pytest -q test_http_cache.py
+"""
+
+import datetime as dt
+
+from fastapi.responses import Response
+
+from http_cache import HTTPCachePolicy, compute_etag, etag_matches, parse_end_time
+
+OLD_SCAN = "2023-12-30T22:45:00"
+
+def recent_scan() -> str:
+    return (dt.datetime.now(dt.timezone.utc) - dt.timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S")
+
+def test_etag_is_stable_and_content_addressed():
+    assert compute_etag(b"image") == compute_etag(b"image")
+    assert compute_etag(b"image") != compute_etag(b"other")
+    assert compute_etag(b"image").startswith('"') and compute_etag(b"image").endswith('"')
+
+def test_etag_matching():
+    etag = compute_etag(b"image")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"stale", {etag}', etag)
+    assert etag_matches("W/" + etag, etag)
+    assert etag_matches(etag, "W/" + etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"stale"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+
+def test_parse_end_time():
+    assert parse_end_time("2023-12-30T22:45:00") == dt.datetime(2023, 12, 30, 22, 45, tzinfo=dt.timezone.utc)
+    assert parse_end_time("2023-12-30T22:45:00Z") == parse_end_time("2023-12-30T22:45:00")
+    assert parse_end_time("yesterday") is None
+    assert parse_end_time(None) is None
+
+def test_cache_control_by_age():
+    policy = HTTPCachePolicy(immutable_after_hours=48, immutable_max_age=600, recent_max_age=0)
+    assert policy.cache_control(OLD_SCAN) == "public, max-age=600, immutable"
+    assert policy.cache_control(recent_scan()) == "no-cache"
+    assert policy.cache_control(None) == "no-cache"
+    
+    short_lived = HTTPCachePolicy(recent_max_age=30)
+    assert short_lived.cache_control(recent_scan()) == "public, max-age=30, must-revalidate"
+
+def test_conditional_adds_headers():
+    policy = HTTPCachePolicy()
+    response = policy.conditional(Response(content=b"image", media_type="image/png"), None, OLD_SCAN)
+    
+    assert response.status_code == 200
+    assert response.body == b"image"
+    assert response.headers["ETag"] == compute_etag(b"image")
+    assert response.headers["Cache-Control"].endswith("immutable")
+
+def test_matching_if_none_match_gets_304():
+    policy = HTTPCachePolicy()
+    etag = compute_etag(b"image")
+    response = policy.conditional(Response(content=b"image", media_type="image/png"), etag, OLD_SCAN)
+    
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["ETag"] == etag
+    assert "Cache-Control" in response.headers
+    
+    stale = policy.conditional(Response(content=b"image v2", media_type="image/png"), etag, OLD_SCAN)
+    assert stale.status_code == 200
+    
+    stats = policy.get_stats()
+    assert stats["responses"] == 2
+    assert stats["not_modified"] == 1
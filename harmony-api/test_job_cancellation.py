@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Unit tests for cancelling parallel visualization jobs through DELETE /tempo/visualize/{job_id}
+
+Run with: python -m pytest -q test_job_cancellation.py
+"""
+
+import asyncio
+import os
+import threading
+from typing import List
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conftest import AUTH
+from job_watcher import HarmonyJobWatcher
+from scheduler import WorkScheduler
+
+HARMONY_JOB = "harmony-job-1"
+
+class FakeTask:
+    def __init__(self):
+        self.cancelled = False
+    
+    def cancel(self):
+        self.cancelled = True
+
+class FakeHarmonyClient:
+    def __init__(self):
+        self.cancelled: List[str] = []
+    
+    def cancel(self, job_id):
+        self.cancelled.append(job_id)
+    
+    def progress(self, job_id):
+        return 40, "running", ""
+
+@pytest.fixture
+def server(monkeypatch):
+    scheduler = WorkScheduler(workers=1)
+    harmony = FakeHarmonyClient()
+    calls = {"downloads_cancelled": [], "forgotten": []}
+    monkeypatch.setattr(main, "scheduler", scheduler)
+    monkeypatch.setattr(main, "harmony_client", harmony)
+    monkeypatch.setattr(main.download_manager, "cancel_job",
+                        lambda job_id: calls["downloads_cancelled"].append(job_id) or 2)
+    monkeypatch.setattr(main.harmony_job_index, "forget", calls["forgotten"].append)
+    main.job_controls.clear()
+    main.harmony_job_users.clear()
+    main.state_store.clear(main.JOB_STATE)
+    yield {"client": TestClient(main.app), "scheduler": scheduler, "harmony": harmony, **calls}
+    scheduler.shutdown()
+    main.job_controls.clear()
+    main.harmony_job_users.clear()
+
+def block_worker(scheduler: WorkScheduler) -> threading.Event:
+    """Occupy the only render worker until the returned event is set"""
+    started, release = threading.Event(), threading.Event()
+    
+    def hold():
+        started.set()
+        release.wait(5)
+    
+    scheduler.submit(hold, priority="prefetch")
+    assert started.wait(5)
+    return release
+
+def start_job(server, job_id="job-1", status="processing", harmony_status="running"):
+    """Register a job the way start_parallel_visualization does, with one plot done and two queued"""
+    main.state_store.set(main.JOB_STATE, job_id, {
+        "status": status,
+        "progress": 33,
+        "completed_plots": ["map"],
+        "failed_plots": [],
+        "plot_types": ["map", "contour", "histogram"],
+        "end_time": "2024-05-01T14:00:00",
+        "results": {"map": {"success": True, "image_base64": "aW1hZ2U="}},
+        "error": None,
+        "harmony_progress": 100,
+        "harmony_status": harmony_status,
+        "worker_host": main.WORKER_HOST,
+        "worker_pid": os.getpid()
+    })
+    if status != "processing":
+        return None
+    
+    main.use_harmony_job(HARMONY_JOB)
+    task = FakeTask()
+    main.job_controls[job_id] = {
+        "task": task,
+        "futures": [server["scheduler"].submit(lambda: None, priority="background") for _ in range(2)],
+        "harmony_job_id": HARMONY_JOB,
+        "holds_harmony_job": True,
+        "cancelling": False
+    }
+    return task
+
+def test_unknown_job_is_not_found(server):
+    response = server["client"].delete("/tempo/visualize/missing", headers=AUTH)
+    
+    assert response.status_code == 404
+
+def test_requires_token(server):
+    start_job(server, status="completed")
+    
+    response = server["client"].delete("/tempo/visualize/job-1")
+    
+    assert response.status_code in (401, 403)
+    assert main.get_job("job-1") is not None
+
+def test_cancels_renders_downloads_and_harmony_job(server):
+    release = block_worker(server["scheduler"])
+    task = start_job(server)
+    
+    response = server["client"].delete("/tempo/visualize/job-1", headers=AUTH)
+    release.set()
+    
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "cancelled"
+    assert body["completed_plots"] == ["map"]
+    assert body["renders_dropped"] == 2
+    assert body["downloads_dropped"] == 2
+    assert body["harmony_job_id"] == HARMONY_JOB
+    assert body["harmony_job_cancelled"]
+    assert task.cancelled
+    assert server["harmony"].cancelled == [HARMONY_JOB]
+    assert server["downloads_cancelled"] == [HARMONY_JOB]
+    assert server["forgotten"] == [HARMONY_JOB]
+    assert main.harmony_job_users == {}
+    
+    job = main.get_job("job-1")
+    assert job["status"] == "cancelled"
+    assert job["results"] == {}
+
+def test_keep_results(server):
+    start_job(server)
+    
+    response = server["client"].delete("/tempo/visualize/job-1?keep_results=true", headers=AUTH)
+    
+    assert response.json()["kept_results"]
+    assert list(main.get_job("job-1")["results"]) == ["map"]
+
+def test_shared_harmony_job_keeps_running(server):
+    task = start_job(server)
+    # Another request in this worker waits on the same Harmony job
+    main.use_harmony_job(HARMONY_JOB)
+    
+    body = server["client"].delete("/tempo/visualize/job-1", headers=AUTH).json()
+    
+    assert task.cancelled
+    assert not body["harmony_job_cancelled"]
+    assert body["downloads_dropped"] == 0
+    assert server["harmony"].cancelled == []
+    assert server["downloads_cancelled"] == []
+    assert main.harmony_job_users == {HARMONY_JOB: 1}
+
+def test_finished_harmony_job_is_not_cancelled(server):
+    start_job(server, harmony_status="successful")
+    
+    body = server["client"].delete("/tempo/visualize/job-1", headers=AUTH).json()
+    
+    # Its downloads stop, but the completed Harmony job stays reusable
+    assert body["downloads_dropped"] == 2
+    assert not body["harmony_job_cancelled"]
+    assert server["harmony"].cancelled == []
+    assert server["forgotten"] == []
+
+def test_cancelling_twice_is_harmless(server):
+    start_job(server)
+    server["client"].delete("/tempo/visualize/job-1", headers=AUTH)
+    
+    response = server["client"].delete("/tempo/visualize/job-1", headers=AUTH)
+    
+    # The second request finds the job cancelled and frees it
+    assert response.json()["status"] == "cancelled"
+    assert main.get_job("job-1") is None
+    assert server["harmony"].cancelled == [HARMONY_JOB]
+
+@pytest.mark.parametrize("status", ["completed", "failed"])
+def test_finished_job_is_deleted(server, status):
+    start_job(server, status=status)
+    
+    response = server["client"].delete("/tempo/visualize/job-1", headers=AUTH)
+    
+    assert response.status_code == 200
+    assert response.json()["status"] == status
+    assert main.get_job("job-1") is None
+    assert server["harmony"].cancelled == []
+
+def test_cancellation_through_another_worker_stops_the_wait(server):
+    start_job(server)
+    # Another worker's DELETE only marks the shared job state
+    main.update_job("job-1", lambda job: job.update(status="cancelled"))
+    
+    async def poll_once():
+        watcher = HarmonyJobWatcher(lambda: server["harmony"])
+        watcher.wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        on_progress = lambda progress, harmony_status: main.record_harmony_progress(
+            "job-1", progress, harmony_status, loop
+        )
+        task = asyncio.create_task(watcher.wait(HARMONY_JOB, on_progress))
+        main.job_controls["job-1"]["task"] = task
+        await asyncio.sleep(0)
+        
+        await watcher._poll(HARMONY_JOB)
+        for _ in range(100):
+            if task.done() and server["harmony"].cancelled:
+                break
+            await asyncio.sleep(0.01)
+        return task
+    
+    task = asyncio.run(poll_once())
+    
+    assert task.cancelled()
+    assert server["downloads_cancelled"] == [HARMONY_JOB]
+    assert server["harmony"].cancelled == [HARMONY_JOB]
+    assert main.get_job("job-1")["harmony_progress"] == 40
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the persistent Harmony job index and its reuse rules
+
+Run with: python -m pytest -q test_job_index.py
+"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from job_index import HarmonyJobIndex
+
+HOUR = 3600
+
+@pytest.fixture
+def index(tmp_path):
+    return HarmonyJobIndex(str(tmp_path / "harmony_jobs.db"), ttl_hours=24, data_latency_hours=1,
+                           open_window_ttl_seconds=600)
+
+def closed_window() -> float:
+    """Stop of a time window whose data has all arrived"""
+    return time.time() - 2 * HOUR
+
+def age(index: HarmonyJobIndex, job_id: str, seconds: float) -> None:
+    """Pretend a job was submitted this long ago (keeping its window relative to submission)"""
+    with sqlite3.connect(index.db_path) as conn:
+        conn.execute(
+            "UPDATE harmony_jobs SET created_at = created_at - ?, window_stop = window_stop - ? WHERE job_id = ?",
+            (seconds, seconds, job_id)
+        )
+
+def test_reuses_running_and_successful_jobs(index):
+    index.record_submitted("key", "job-1", closed_window())
+    assert index.lookup("key")["job_id"] == "job-1"
+    
+    index.record_results("job-1", ["s3://a.nc"])
+    reused = index.lookup("key")
+    assert reused["status"] == "successful"
+    assert reused["result_urls"] == ["s3://a.nc"]
+    assert index.get_stats()["reused"] == 2
+
+@pytest.mark.parametrize("job_status", ["complete_with_errors", "failed", "canceled"])
+def test_never_reuses_unclean_jobs(index, job_status):
+    index.record_submitted("key", "job-1", closed_window())
+    index.record_results("job-1", ["s3://a.nc"], job_status)
+    
+    assert index.lookup("key") is None
+    assert index.get_job("job-1")["status"] == job_status
+    assert index.get_stats()["reused"] == 0
+
+def test_closed_window_job_expires_after_ttl(index):
+    index.record_submitted("key", "job-1", closed_window())
+    age(index, "job-1", 23 * HOUR)
+    assert index.lookup("key") is not None
+    
+    age(index, "job-1", 2 * HOUR)
+    assert index.lookup("key") is None
+    # Expired jobs are dropped from the index
+    assert index.get_job("job-1") is None
+
+def test_open_window_job_reused_briefly(index):
+    # Submitted while granules of its window could still arrive
+    index.record_submitted("key", "job-1", time.time())
+    age(index, "job-1", 500)
+    assert index.lookup("key") is not None
+    
+    age(index, "job-1", 200)
+    assert index.lookup("key") is None
+
+def test_job_without_window_counts_as_open(index):
+    index.record_submitted("key", "job-1")
+    
+    assert index.reuse_ttl(None, time.time()) == 600
+    age(index, "job-1", 700)
+    assert index.lookup("key") is None
+
+def test_cleanup_expired(index):
+    index.record_submitted("open", "job-open", time.time())
+    index.record_submitted("closed", "job-closed", closed_window())
+    age(index, "job-open", 700)
+    age(index, "job-closed", 700)
+    
+    index.cleanup_expired()
+    
+    assert index.get_job("job-open") is None
+    assert index.get_job("job-closed") is not None
+
+def test_forget(index):
+    index.record_submitted("key", "job-1", closed_window())
+    index.forget("job-1")
+    
+    assert index.lookup("key") is None
+
+def test_reuse_count_is_exact_under_concurrency(index):
+    index.record_submitted("key", "job-1", closed_window())
+    
+    threads = [threading.Thread(target=lambda: [index.lookup("key") for _ in range(50)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert index.get_stats()["reused"] == 200
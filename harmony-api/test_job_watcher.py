@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Harmony job watcher: backoff, completion, failures and cancellation
+
+Run with: python -m pytest -q test_job_watcher.py
+"""
+
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+import pytest
+
+from job_watcher import HarmonyJobError, HarmonyJobWatcher
+
+class HTTPError(Exception):
+    """Stand-in for requests.HTTPError carrying a response status"""
+    
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.response = type("Response", (), {"status_code": status_code})()
+
+class FakeClient:
+    """Replays a scripted sequence of progress results (or errors) per job"""
+    
+    def __init__(self, scripts: Dict[str, List]):
+        self.scripts = scripts
+        self.calls: Dict[str, int] = {}
+        self.gate: Optional[threading.Event] = None
+    
+    def progress(self, job_id: str):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls[job_id] = self.calls.get(job_id, 0) + 1
+        script = self.scripts[job_id]
+        result = script.pop(0) if len(script) > 1 else script[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def make_watcher(client: FakeClient, **kwargs) -> HarmonyJobWatcher:
+    options = {"min_interval": 0.01, "max_interval": 0.05, "backoff": 2.0}
+    options.update(kwargs)
+    return HarmonyJobWatcher(lambda: client, **options)
+
+async def run_with(watcher: HarmonyJobWatcher, coro):
+    task = asyncio.create_task(watcher.run())
+    await asyncio.sleep(0)
+    try:
+        return await asyncio.wait_for(coro, timeout=5)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+def test_wait_reports_progress_until_done():
+    client = FakeClient({"job": [(10, "running", ""), (60, "running", ""), (100, "successful", "")]})
+    watcher = make_watcher(client)
+    seen = []
+    
+    status = asyncio.run(run_with(watcher, watcher.wait("job", lambda p, s: seen.append((p, s)))))
+    
+    assert status == "successful"
+    assert seen == [(10, "running"), (60, "running"), (100, "successful")]
+    assert watcher.stats["completed"] == 1
+    assert watcher.jobs == {}
+
+def test_failed_job_raises():
+    client = FakeClient({"job": [(0, "failed", "no granules")]})
+    watcher = make_watcher(client)
+    
+    with pytest.raises(HarmonyJobError, match="no granules"):
+        asyncio.run(run_with(watcher, watcher.wait("job")))
+
+def test_backs_off_while_idle_and_resets_on_progress():
+    client = FakeClient({"job": [(10, "running", ""), (10, "running", ""), (10, "running", ""), (20, "running", "")]})
+    watcher = make_watcher(client, max_interval=1.0)
+    
+    async def scenario():
+        watcher.wakeup = asyncio.Event()
+        waiter = asyncio.create_task(watcher.wait("job"))
+        await asyncio.sleep(0)
+        intervals = []
+        for _ in range(4):
+            await watcher._poll("job")
+            intervals.append(watcher.jobs["job"]["interval"])
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return intervals
+    
+    assert asyncio.run(scenario()) == [0.01, 0.02, 0.04, 0.01]
+
+def test_transient_errors_are_retried():
+    client = FakeClient({"job": [RuntimeError("timeout"), RuntimeError("timeout"), (100, "successful", "")]})
+    watcher = make_watcher(client, max_poll_errors=3)
+    
+    assert asyncio.run(run_with(watcher, watcher.wait("job"))) == "successful"
+    assert watcher.stats["poll_errors"] == 2
+
+def test_persistent_errors_fail_the_job():
+    client = FakeClient({"job": [RuntimeError("service unavailable")]})
+    watcher = make_watcher(client, max_poll_errors=3)
+    
+    with pytest.raises(HarmonyJobError, match="cannot be polled"):
+        asyncio.run(run_with(watcher, watcher.wait("job")))
+    assert client.calls["job"] == 3
+
+def test_unretryable_http_status_fails_immediately():
+    client = FakeClient({"job": [HTTPError(404)]})
+    watcher = make_watcher(client)
+    
+    with pytest.raises(HarmonyJobError):
+        asyncio.run(run_with(watcher, watcher.wait("job")))
+    assert client.calls["job"] == 1
+
+def test_throttling_is_retried():
+    client = FakeClient({"job": [HTTPError(429), (100, "successful", "")]})
+    watcher = make_watcher(client)
+    
+    assert asyncio.run(run_with(watcher, watcher.wait("job"))) == "successful"
+
+def test_cancelling_during_a_poll_keeps_watching_other_jobs():
+    client = FakeClient({"gone": [(100, "successful", "")], "other": [(50, "running", ""), (100, "successful", "")]})
+    watcher = make_watcher(client)
+    client.gate = threading.Event()
+    
+    async def scenario():
+        gone = asyncio.create_task(watcher.wait("gone"))
+        other = asyncio.create_task(watcher.wait("other"))
+        # Cancel while both polls are blocked in their worker threads
+        await asyncio.sleep(0.05)
+        gone.cancel()
+        await asyncio.gather(gone, return_exceptions=True)
+        client.gate.set()
+        return await other
+    
+    assert asyncio.run(run_with(watcher, scenario())) == "successful"
+    assert "gone" not in watcher.jobs
+
+def test_wait_sync_from_worker_thread():
+    client = FakeClient({"job": [(100, "successful", "")]})
+    watcher = make_watcher(client)
+    
+    async def scenario():
+        return await asyncio.to_thread(watcher.wait_sync, "job", None, 5)
+    
+    assert asyncio.run(run_with(watcher, scenario())) == "successful"
+
+def test_wait_sync_requires_running_watcher():
+    watcher = make_watcher(FakeClient({}))
+    
+    with pytest.raises(RuntimeError, match="not running"):
+        watcher.wait_sync("job")
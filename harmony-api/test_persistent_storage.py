@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Unit tests for DataStorage: the index, content-addressed deduplication and migration from the flat layout
+
+Run with: python -m pytest -q test_persistent_storage.py
+"""
+
+import os
+import time
+
+from persistent_storage import DataStorage
+
+def blob_files(storage):
+    return [os.path.join(root, name) for root, _, files in os.walk(storage.blobs_dir) for name in files]
+
+def test_index_answers_lookups_stats_and_age_queries(tmp_path):
+    storage = DataStorage(str(tmp_path))
+    path = storage.save_visualization("job", "map", b"png", {"plot_type": "map"})
+    storage.save_query_result("q", {"n": 1})
+    # Backdate the image as if written ten days ago
+    storage._connect().execute(
+        "UPDATE entries SET created_at = ? WHERE name = 'job_map.png'", (time.time() - 10 * 86400,)
+    )
+    
+    digest = os.path.basename(path)
+    assert os.path.relpath(path, storage.blobs_dir) == os.path.join(digest[:2], digest[2:4], digest)
+    assert storage.has_entry("visualizations", "job_map.png")
+    assert storage.load_visualization_metadata("job", "map") == {"plot_type": "map"}
+    assert [entry["name"] for entry in storage.entries_older_than(5)] == ["job_map.png"]
+    stats = storage.get_storage_stats()
+    assert (stats["total_files"], stats["visualizations"], stats["metadata"], stats["queries"]) == (3, 1, 1, 1)
+    assert stats["layout_version"] == DataStorage.LAYOUT_VERSION
+    
+    assert storage.cleanup_old_data(days=5) == 1
+    assert not storage.has_entry("visualizations", "job_map.png")
+    assert not os.path.exists(path)
+    assert storage.get_storage_stats()["total_files"] == 2
+
+def test_identical_payloads_share_one_blob(tmp_path):
+    storage = DataStorage(str(tmp_path))
+    result = {"no2": [1.5, 2.5]}
+    
+    first = storage.save_query_result("a", result)
+    second = storage.save_query_result("b", result)
+    
+    assert first == second
+    assert len(blob_files(storage)) == 1
+    assert storage.load_query_result("a") == storage.load_query_result("b") == result
+    stats = storage.get_storage_stats()
+    assert stats["queries"] == 2
+    assert stats["blobs"] == 1
+    assert storage.stats["deduplicated_writes"] == 1
+
+def test_blob_removed_with_its_last_entry(tmp_path):
+    storage = DataStorage(str(tmp_path))
+    storage.save_query_result("a", {"value": 1})
+    storage.save_query_result("b", {"value": 1})
+    path = storage.path_for("queries", "a.json")
+    
+    assert storage.evict_lru(1)[0] == 1
+    assert os.path.exists(path)
+    
+    items, freed = storage.evict_lru(1)
+    assert items == 1 and freed > 0
+    assert not os.path.exists(path)
+    assert blob_files(storage) == []
+
+def test_overwrite_releases_previous_blob(tmp_path):
+    storage = DataStorage(str(tmp_path))
+    old_path = storage.save_query_result("a", {"value": 1})
+    new_path = storage.save_query_result("a", {"value": 2})
+    
+    assert old_path != new_path
+    assert not os.path.exists(old_path)
+    assert storage.load_query_result("a") == {"value": 2}
+
+def test_migrates_flat_v1_files(tmp_path):
+    written_at = time.time() - 10 * 86400
+    for category, name, data in [("visualizations", "job_map.png", b"png"), ("queries", "q.json", b'{"n": 1}')]:
+        os.makedirs(tmp_path / category, exist_ok=True)
+        path = tmp_path / category / name
+        path.write_bytes(data)
+        os.utime(path, (written_at, written_at))
+    
+    storage = DataStorage(str(tmp_path))
+    
+    assert storage._layout_version() == DataStorage.LAYOUT_VERSION
+    assert storage.load_visualization("job", "map") == b"png"
+    assert storage.load_query_result("q") == {"n": 1}
+    assert not (tmp_path / "visualizations" / "job_map.png").exists()
+    # Migrated entries keep their original write time for age-based cleanup
+    assert {entry["name"] for entry in storage.entries_older_than(5)} == {"job_map.png", "q.json"}
+
+def test_migration_ignores_nested_directories(tmp_path):
+    shard = tmp_path / "queries" / "ab"
+    os.makedirs(shard)
+    (tmp_path / "queries" / "q.json").write_bytes(b'{"n": 1}')
+    (shard / "nested.json").write_bytes(b"{}")
+    
+    storage = DataStorage(str(tmp_path))
+    
+    # Only flat files are legacy entries
+    assert storage.load_query_result("q") == {"n": 1}
+    assert not storage.has_entry("queries", "nested.json")
+    assert storage.get_storage_stats()["queries"] == 1
+
+def test_migration_runs_once(tmp_path):
+    os.makedirs(tmp_path / "queries")
+    (tmp_path / "queries" / "q.json").write_bytes(b"{}")
+    DataStorage(str(tmp_path))
+    
+    # Files appearing under a category directory later are not picked up again
+    (tmp_path / "queries" / "late.json").write_bytes(b"{}")
+    storage = DataStorage(str(tmp_path))
+    
+    assert storage.has_entry("queries", "q.json")
+    assert not storage.has_entry("queries", "late.json")
+
+def test_repair_index_reconciles_blobs(tmp_path):
+    storage = DataStorage(str(tmp_path))
+    kept = storage.save_query_result("kept", {"value": 1})
+    lost = storage.save_query_result("lost", {"value": 2})
+    os.remove(lost)
+    # A blob renamed into place by a write that crashed before its commit
+    orphan = storage.blob_path("ab" * 32)
+    os.makedirs(os.path.dirname(orphan))
+    with open(orphan, "wb") as f:
+        f.write(b"{}")
+    
+    assert storage.repair_index() == {"missing_blobs": 1, "orphaned_blobs": 1}
+    assert blob_files(storage) == [kept]
+    assert storage.has_entry("queries", "kept.json")
+    assert not storage.has_entry("queries", "lost.json")
+    assert storage.repair_index() == {"missing_blobs": 0, "orphaned_blobs": 0}
+
+def test_animations_are_stored_as_blobs(tmp_path):
+    storage = DataStorage(str(tmp_path))
+    content = b"GIF89a" + b"\x00" * 1024
+    
+    path = storage.save_animation("key.gif", content)
+    
+    assert path == storage.path_for("animations", "key.gif")
+    assert storage.load_animation("key.gif") == content
+    assert storage.load_animation("other.gif") is None
+    assert storage.get_storage_stats()["animations"] == 1
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Unit tests for point queries: geometry helpers, granule indexes and their cache
+
+Run with: python -m pytest -q test_point_query.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from point_query import GranuleIndex, PointIndexCache, chord_to_km, km_to_chord, points_bbox, to_unit_vectors
+
+VARIABLE = "product/vertical_column"
+# 4 scanlines x 5 pixels on a 1 degree grid, latitude rising by scanline and longitude by pixel
+LAT, LON = np.meshgrid(np.arange(30.0, 34.0), np.arange(-100.0, -95.0), indexing="ij")
+COLUMN = np.arange(20.0).reshape(4, 5)
+FLAGS = np.tile(np.array([0, 0, 1, 0, 0], dtype="int8"), (4, 1))
+TIMES = np.array(["2024-05-01T13:00", "2024-05-01T13:10", "2024-05-01T13:20", "2024-05-01T13:30"],
+                 dtype="datetime64[ns]")
+
+def write_granule(path: str, offset: float = 0.0) -> str:
+    xr.DataTree.from_dict({
+        "/geolocation": xr.Dataset({
+            "latitude": (("mirror_step", "xtrack"), LAT),
+            "longitude": (("mirror_step", "xtrack"), LON),
+            "time": (("mirror_step",), TIMES)
+        }),
+        "/product": xr.Dataset({
+            "vertical_column": (("mirror_step", "xtrack"), COLUMN + offset),
+            "main_data_quality_flag": (("mirror_step", "xtrack"), FLAGS)
+        })
+    }).to_netcdf(path)
+    return path
+
+@pytest.fixture
+def granule(tmp_path):
+    return write_granule(str(tmp_path / "granule.nc"))
+
+@pytest.fixture
+def opens(monkeypatch):
+    """Paths opened with xarray, to show what the index cache saves"""
+    opened = []
+    open_datatree = xr.open_datatree
+    monkeypatch.setattr(xr, "open_datatree", lambda path: opened.append(path) or open_datatree(path))
+    return opened
+
+def query(index: GranuleIndex, lat: float, lon: float, **kwargs):
+    return index.query(np.array([[lat, lon]]), [VARIABLE], **kwargs)[0]
+
+def test_unit_vector_chords_match_great_circle_distance():
+    # One degree of latitude is about 111.2 km anywhere
+    a, b = to_unit_vectors(np.array([40.0, 41.0]), np.array([-100.0, -100.0]))
+    assert chord_to_km(np.linalg.norm(a - b)) == pytest.approx(111.19, abs=0.05)
+    assert np.linalg.norm(a) == pytest.approx(1.0)
+
+def test_km_chord_round_trip():
+    for distance in [0.0, 1.0, 10.0, 500.0]:
+        assert chord_to_km(km_to_chord(distance)) == pytest.approx(distance, abs=1e-6)
+
+def test_points_bbox_adds_margin_and_clamps():
+    west, south, east, north = points_bbox([[35.0, -100.0], [36.0, -98.0]], margin_km=111.0)
+    assert (west, south, east, north) == pytest.approx((-102.0, 34.0, -96.0, 37.0))
+    assert points_bbox([[89.9, 179.9]], margin_km=111.0)[2:] == [180.0, 90.0]
+
+def test_nearest_pixel_lookup(granule):
+    index = GranuleIndex(granule)
+    
+    exact = query(index, 31.0, -99.0)
+    near = query(index, 32.05, -96.0)
+    
+    assert exact["values"] == {"vertical_column": 6.0}
+    assert exact["distance_km"] == pytest.approx(0.0, abs=1e-3)
+    assert exact["time"] == "2024-05-01T13:10:00"
+    assert exact["quality_flag"] == 0
+    assert exact["granule"] == "granule.nc"
+    # 0.05 degrees of latitude from the last pixel of the third scanline
+    assert near["values"] == {"vertical_column": 14.0}
+    assert near["distance_km"] == pytest.approx(5.56, abs=0.01)
+    assert near["time"] == "2024-05-01T13:20:00"
+
+def test_points_out_of_range_or_masked_find_nothing(granule):
+    index = GranuleIndex(granule)
+    
+    assert query(index, 45.0, -98.0) is None
+    # The only pixel within 10 km is flagged
+    assert query(index, 31.0, -98.0, max_quality_flag=0) is None
+    assert query(index, 31.0, -98.0, max_quality_flag=1)["values"] == {"vertical_column": 7.0}
+
+def test_idw_interpolates_between_pixels(granule):
+    index = GranuleIndex(granule)
+    
+    # Half way along a scanline between values 5 and 6; the next scanlines are over 100 km away
+    between = query(index, 31.0, -99.5, method="idw", max_distance_km=60.0)
+    # An exact hit takes (almost) all the weight
+    on_pixel = query(index, 31.0, -99.0, method="idw", max_distance_km=200.0)
+    
+    assert between["values"]["vertical_column"] == pytest.approx(5.5)
+    assert between["distance_km"] == pytest.approx(47.6, abs=0.2)
+    assert on_pixel["values"]["vertical_column"] == pytest.approx(6.0, abs=1e-6)
+
+def test_idw_skips_masked_neighbours(granule):
+    index = GranuleIndex(granule)
+    
+    # Between columns two (flagged) and three: only column three is used
+    result = query(index, 31.0, -97.5, method="idw", max_distance_km=60.0, max_quality_flag=0)
+    
+    assert result["values"]["vertical_column"] == pytest.approx(8.0)
+
+def test_index_is_cached_and_reused_for_the_same_granule(granule, opens):
+    cache = PointIndexCache()
+    
+    first = cache.query([granule], [[31.0, -99.0]], [VARIABLE])
+    opened_once = len(opens)
+    second = cache.query([granule], [[32.0, -96.0]], [VARIABLE])
+    
+    assert first[0]["series"][0]["values"] == {"vertical_column": 6.0}
+    assert second[0]["series"][0]["values"] == {"vertical_column": 14.0}
+    # Geolocation, the variable and the quality flags were each read once, by the first query
+    assert opened_once == 3
+    assert len(opens) == 3
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["cached_granules"]) == (1, 1, 1)
+
+def test_rewritten_granule_gets_a_new_index(granule):
+    cache = PointIndexCache()
+    first = cache.get(granule)
+    
+    write_granule(granule, offset=100.0)
+    os.utime(granule, (os.path.getmtime(granule) + 10,) * 2)
+    second = cache.get(granule)
+    
+    assert second is not first
+    assert query(second, 31.0, -99.0)["values"] == {"vertical_column": 106.0}
+
+def test_cache_keeps_the_most_recent_granules(tmp_path):
+    cache = PointIndexCache(max_entries=1)
+    first = write_granule(str(tmp_path / "first.nc"))
+    second = write_granule(str(tmp_path / "second.nc"), offset=100.0)
+    
+    cache.get(first)
+    cache.get(second)
+    cache.get(first)
+    
+    assert cache.get_stats()["misses"] == 3
+    assert cache.get_stats()["cached_granules"] == 1
+
+def test_time_series_across_granules(tmp_path):
+    cache = PointIndexCache()
+    granules = [write_granule(str(tmp_path / "first.nc")), write_granule(str(tmp_path / "second.nc"), offset=100.0)]
+    
+    result = cache.query(granules, [[30.0, -100.0], [33.0, -96.0]], [VARIABLE],
+                         start_time="2024-05-01T13:15:00Z")
+    
+    # The first point's scanline is before the window; the second point is found in both granules
+    assert result[0]["series"] == []
+    assert [match["values"]["vertical_column"] for match in result[1]["series"]] == [19.0, 119.0]
+    assert result[1]["latitude"] == 33.0
+
+def test_invalid_method_is_rejected(granule):
+    with pytest.raises(ValueError):
+        PointIndexCache().query([granule], [[31.0, -99.0]], [VARIABLE], method="bilinear")
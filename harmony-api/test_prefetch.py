@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the prefetch scheduler: target learning, windows and prefetch passes
+
+Run with: python -m pytest -q test_prefetch.py
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from prefetch import PrefetchScheduler
+
+def visualize_request(bbox=(-100, 30, -90, 40), plot_type="map", max_quality_flag=None):
+    return SimpleNamespace(bbox=list(bbox), variables=["product/vertical_column"], plot_type=plot_type,
+                           max_quality_flag=max_quality_flag, collection_id="C2930730944-LARC_CLOUD")
+
+def make_scheduler(prefetched: List[tuple] = None, cached=lambda *args: False, busy=lambda: False, **kwargs):
+    prefetched = prefetched if prefetched is not None else []
+    
+    def prefetch(target, start_time, end_time):
+        prefetched.append((target["plot_type"], start_time, end_time))
+        return True
+    
+    options = {"min_hits": 2, "max_targets": 2}
+    options.update(kwargs)
+    return PrefetchScheduler(prefetch, cached, busy, **options)
+
+@pytest.fixture
+def scheduler():
+    scheduler = make_scheduler()
+    yield scheduler
+    scheduler.shutdown()
+
+def test_learns_targets_requested_often_enough(scheduler):
+    for _ in range(3):
+        scheduler.record_request("visualize", visualize_request(plot_type="contour"))
+    scheduler.record_request("visualize", visualize_request(plot_type="map"))
+    
+    targets = scheduler.hot_targets()
+    
+    assert [t["plot_type"] for t in targets] == ["contour"]
+    assert targets[0]["bbox"] == [-100.0, 30.0, -90.0, 40.0]
+
+def test_most_requested_targets_win(scheduler):
+    for plot_type, hits in (("map", 2), ("contour", 4), ("gridded_map", 3)):
+        for _ in range(hits):
+            scheduler.record_request("visualize", visualize_request(plot_type=plot_type))
+    
+    assert [t["plot_type"] for t in scheduler.hot_targets()] == ["contour", "gridded_map"]
+
+def test_quality_filter_is_part_of_the_target(scheduler):
+    for flag in (None, None, 0, 0):
+        scheduler.record_request("visualize", visualize_request(max_quality_flag=flag))
+    
+    assert sorted(str(t["max_quality_flag"]) for t in scheduler.hot_targets()) == ["0", "None"]
+
+def test_configured_targets_come_first():
+    scheduler = make_scheduler(configured_targets=[{"bbox": [-80, 35, -70, 45], "variable": "product/vertical_column"}])
+    for _ in range(2):
+        scheduler.record_request("visualize", visualize_request(plot_type="contour"))
+    
+    targets = scheduler.hot_targets()
+    
+    assert targets[0]["bbox"] == [-80.0, 35.0, -70.0, 45.0]
+    assert targets[0]["variables"] == ["product/vertical_column"]
+    assert [t["plot_type"] for t in targets] == ["map", "contour"]
+    scheduler.shutdown()
+
+def test_learned_targets_are_bounded_and_expire():
+    scheduler = make_scheduler(max_learned_targets=2, popularity_window=60)
+    for west in range(3):
+        scheduler.record_request("visualize", visualize_request(bbox=(west, 0, west + 1, 1)))
+    assert scheduler.get_stats()["learned_targets"] == 2
+    
+    for entry in scheduler.request_counts.values():
+        entry["last_seen"] = time.time() - 120
+    scheduler._prune_request_counts()
+    assert scheduler.get_stats()["learned_targets"] == 0
+    scheduler.shutdown()
+
+def test_latest_complete_window(scheduler):
+    assert scheduler.latest_complete_window(datetime(2024, 5, 1, 14, 37, 12)) == \
+        ("2024-05-01T13:00:00", "2024-05-01T14:00:00")
+
+def test_prefetch_window_skips_cached_and_retries_later():
+    prefetched = []
+    cached_plot_types = {"contour"}
+    scheduler = make_scheduler(prefetched, cached=lambda target, *_: target["plot_type"] in cached_plot_types)
+    for plot_type in ("map", "map", "contour", "contour"):
+        scheduler.record_request("visualize", visualize_request(plot_type=plot_type))
+    
+    asyncio.run(scheduler.prefetch_window("2024-05-01T13:00:00", "2024-05-01T14:00:00"))
+    # A second pass over the same window does not retry before retry_after
+    asyncio.run(scheduler.prefetch_window("2024-05-01T13:00:00", "2024-05-01T14:00:00"))
+    
+    assert prefetched == [("map", "2024-05-01T13:00:00", "2024-05-01T14:00:00")]
+    stats = scheduler.get_stats()
+    assert stats["prefetched"] == 1
+    assert stats["skipped_cached"] == 2
+    scheduler.shutdown()
+
+def test_failed_prefetch_is_counted():
+    def fail(*args):
+        raise RuntimeError("Harmony unavailable")
+    
+    scheduler = PrefetchScheduler(fail, lambda *args: False, lambda: False,
+                                  configured_targets=[{"bbox": [-80, 35, -70, 45]}])
+    asyncio.run(scheduler.prefetch_window("2024-05-01T13:00:00", "2024-05-01T14:00:00"))
+    
+    assert scheduler.get_stats()["failed"] == 1
+    scheduler.shutdown()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Unit tests for progressive /tempo/visualize requests: preview now, full image from a render job
+
+Run with: python -m pytest -q test_progressive_preview.py
+"""
+
+import threading
+import time
+from typing import List
+
+import numpy as np
+import pytest
+import xarray as xr
+from fastapi.testclient import TestClient
+
+import main
+from conftest import AUTH
+from scheduler import WorkScheduler
+
+REQUEST = {"start_time": "2024-05-01T13:00:00", "end_time": "2024-05-01T14:00:00",
+           "plot_type": "contour", "progressive": True}
+PREVIEW, FULL = "cHJldmlldw==", "ZnVsbA=="
+
+def make_datatree():
+    lat, lon = np.meshgrid(np.arange(30.0, 34.0), np.arange(-100.0, -95.0), indexing="ij")
+    return xr.DataTree.from_dict({
+        "/geolocation": xr.Dataset({
+            "latitude": (("mirror_step", "xtrack"), lat),
+            "longitude": (("mirror_step", "xtrack"), lon)
+        }),
+        "/product": xr.Dataset({"vertical_column": (("mirror_step", "xtrack"), np.arange(20.0).reshape(4, 5))})
+    })
+
+class Renderer:
+    """Stands in for Harmony and the renderers; full renders wait until released"""
+    
+    def __init__(self):
+        self.fetches: List[str] = []
+        self.previews: List[str] = []
+        self.full_renders: List[str] = []
+        self.admitted_while_fetching: List[int] = []
+        self.admitted_while_rendering: List[int] = []
+        self.release = threading.Event()
+        self.preview_image = PREVIEW
+    
+    def fetch(self, client, harmony_request, *args, **kwargs):
+        self.fetches.append("harmony-job-1")
+        self.admitted_while_fetching.append(main.scheduler.active_requests("interactive"))
+        return "harmony-job-1", ["granule.nc"]
+    
+    def preview(self, datatree, plot_type, variable_name, **kwargs):
+        self.previews.append(plot_type)
+        return self.preview_image
+    
+    def render(self, datatree, plot_type, variable_name, **kwargs):
+        assert self.release.wait(5)
+        self.admitted_while_rendering.append(main.scheduler.active_requests("interactive"))
+        self.full_renders.append(plot_type)
+        return FULL
+
+@pytest.fixture
+def renderer(monkeypatch):
+    renderer = Renderer()
+    scheduler = WorkScheduler(workers=1)
+    monkeypatch.setattr(main, "scheduler", scheduler)
+    monkeypatch.setattr(main, "harmony_client", object())
+    monkeypatch.setattr(main, "fetch_tempo_granules", renderer.fetch)
+    monkeypatch.setattr(main, "load_render_modules", lambda: None)
+    monkeypatch.setattr(main, "open_granule", lambda file_path, variables: make_datatree())
+    monkeypatch.setattr(main, "color_scale_for", lambda *args: None)
+    monkeypatch.setattr(main, "create_preview_visualization", renderer.preview)
+    monkeypatch.setattr(main, "render_plot", renderer.render)
+    main.state_store.clear(main.RESPONSE_CACHE)
+    main.state_store.clear(main.JOB_STATE)
+    main.job_controls.clear()
+    yield renderer
+    renderer.release.set()
+    scheduler.shutdown()
+    main.job_controls.clear()
+
+def visualize(**fields):
+    return TestClient(main.app).post("/tempo/visualize", json={**REQUEST, **fields}, headers=AUTH)
+
+def render_future(job_id: str):
+    """Future of a queued full render; its control entry is dropped once the render is done"""
+    return main.job_controls[job_id]["futures"][0]
+
+def test_preview_then_full_image(renderer):
+    response = visualize()
+    
+    assert response.status_code == 200
+    assert "no-store" in response.headers["Cache-Control"]
+    data = response.json()["data"]
+    assert data["preview"]
+    assert data["image_base64"] == PREVIEW
+    assert main.get_job(data["render_job_id"])["status"] == "processing"
+    
+    future = render_future(data["render_job_id"])
+    renderer.release.set()
+    future.result(5)
+    job = main.get_job(data["render_job_id"])
+    assert job["status"] == "completed"
+    assert job["results"]["contour"]["image_base64"] == FULL
+    assert data["render_job_id"] not in main.job_controls
+    
+    # The next request is served the full image from the response cache
+    full = visualize().json()["data"]
+    assert "preview" not in full
+    assert full["image_base64"] == FULL
+    assert renderer.fetches == ["harmony-job-1"]
+    assert renderer.full_renders == ["contour"]
+
+def test_repeat_visit_shares_the_running_render(renderer):
+    first = visualize().json()["data"]
+    second = visualize().json()["data"]
+    
+    assert second["render_job_id"] == first["render_job_id"]
+    assert renderer.fetches == ["harmony-job-1"]
+    assert renderer.previews == ["contour"]
+
+def finish_render(renderer, job_id: str) -> None:
+    """Let a queued full render run, then wait for its admission to be released"""
+    future = render_future(job_id)
+    renderer.release.set()
+    future.result(5)
+    renderer.release.clear()
+    for _ in range(100):
+        if main.scheduler.active_requests("background") == 0:
+            break
+        time.sleep(0.01)
+
+def test_full_render_runs_under_background_admission(renderer):
+    data = visualize().json()["data"]
+    
+    # The preview's interactive admission is gone; the queued render holds a background one
+    assert main.scheduler.active_requests("interactive") == 0
+    assert main.scheduler.active_requests("background") == 1
+    
+    finish_render(renderer, data["render_job_id"])
+    assert main.scheduler.active_requests("background") == 0
+    assert main.scheduler.get_stats()["classes"]["background"]["completed"] == 1
+
+def test_busy_scheduler_refuses_preview_without_rendering(renderer, monkeypatch):
+    busy = WorkScheduler(workers=1, max_active={"background": 0})
+    monkeypatch.setattr(main, "scheduler", busy)
+    
+    response = visualize()
+    busy.shutdown()
+    
+    assert response.status_code == 429
+    assert renderer.previews == []
+    assert busy.active_requests("interactive") == 0
+
+def test_completed_preview_with_evicted_full_image_starts_over(renderer):
+    first = visualize().json()["data"]
+    finish_render(renderer, first["render_job_id"])
+    # The full image is evicted while the preview entry survives
+    request = main.VisualizationRequest(**REQUEST)
+    main.state_store.delete(main.RESPONSE_CACHE, main.generate_cache_key(request.dict(), "visualize"))
+    
+    second = visualize().json()["data"]
+    
+    # A fresh preview and render job replace the stale ones
+    assert second["render_job_id"] != first["render_job_id"]
+    assert renderer.previews == ["contour", "contour"]
+    finish_render(renderer, second["render_job_id"])
+    assert renderer.full_renders == ["contour", "contour"]
+    assert main.get_from_cache(main.generate_cache_key(request.dict(), "visualize"))["data"]["image_base64"] == FULL
+
+def test_cancelled_render_is_restarted_with_the_cached_preview(renderer):
+    first = visualize().json()["data"]
+    cancelled = TestClient(main.app).delete(f"/tempo/visualize/{first['render_job_id']}", headers=AUTH).json()
+    
+    second = visualize().json()["data"]
+    future = render_future(second["render_job_id"])
+    renderer.release.set()
+    future.result(5)
+    
+    # The running render finishes without recording; a fresh one replaces it
+    assert cancelled["renders_dropped"] == 0
+    assert second["render_job_id"] != first["render_job_id"]
+    assert second["image_base64"] == PREVIEW
+    assert renderer.previews == ["contour"]
+    assert main.get_job(first["render_job_id"])["results"] == {}
+    assert main.get_job(second["render_job_id"])["status"] == "completed"
+
+def test_failed_preview_starts_no_render(renderer):
+    renderer.preview_image = None
+    
+    body = visualize().json()
+    
+    assert not body["success"]
+    assert body["message"] == "Failed to create preview"
+    assert main.state_store.count(main.JOB_STATE) == 0
+
+@pytest.mark.parametrize("fields", [{"progressive": False}, {"plot_type": "zonal_mean"}])
+def test_full_render_without_preview(renderer, fields, monkeypatch):
+    def build_visualization_response(request, client):
+        return main.full_visualization_response("harmony-job-1", request.plot_type, "product/vertical_column", FULL, 1)
+    
+    monkeypatch.setattr(main, "build_visualization_response", build_visualization_response)
+    
+    data = visualize(**fields).json()["data"]
+    
+    assert "preview" not in data
+    assert renderer.previews == []
+
+def test_harmony_wait_holds_no_admission(renderer):
+    renderer.release.set()
+    
+    data = visualize(progressive=False).json()["data"]
+    
+    assert data["image_base64"] == FULL
+    assert renderer.admitted_while_fetching == [0]
+    assert renderer.admitted_while_rendering == [1]
+    assert main.scheduler.active_requests("interactive") == 0
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Unit tests for quality-flag masking
+
+Run with: python -m pytest -q test_quality_mask.py
+"""
+
+import logging
+
+import numpy as np
+import xarray as xr
+
+from quality_mask import QUALITY_FLAG_VARIABLE, QualityMasker, with_quality_flag
+
+def make_datatree():
+    product = xr.Dataset({
+        "vertical_column": (("y", "x"), np.arange(4.0).reshape(2, 2)),
+        "main_data_quality_flag": (("y", "x"), np.array([[0, 1], [2, 0]])),
+        "profile": (("z",), np.arange(3.0))
+    })
+    return xr.DataTree.from_dict({"/product": product})
+
+def test_with_quality_flag():
+    assert with_quality_flag(["a"], None) == ["a"]
+    assert with_quality_flag(["a"], 0) == ["a", QUALITY_FLAG_VARIABLE]
+    assert with_quality_flag(["a", QUALITY_FLAG_VARIABLE], 0) == ["a", QUALITY_FLAG_VARIABLE]
+
+def test_masks_low_quality_pixels():
+    masked = QualityMasker().mask_datatree(make_datatree(), ["product/vertical_column"], 0)
+    
+    values = np.asarray(masked["product/vertical_column"])
+    assert values[0, 0] == 0.0 and values[1, 1] == 3.0
+    assert np.isnan(values[0, 1]) and np.isnan(values[1, 0])
+
+def test_mismatched_shape_is_reported(caplog):
+    masker = QualityMasker()
+    
+    with caplog.at_level(logging.WARNING):
+        masked = masker.mask_datatree(make_datatree(), ["product/profile"], 0)
+    
+    np.testing.assert_array_equal(masked["product/profile"], np.arange(3.0))
+    assert "Not masking product/profile" in caplog.text
+    assert masker.get_stats()["unmasked_variables"] == 1
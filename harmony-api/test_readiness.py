@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the render warmup and the /ready probe that reports it
+
+Run with: python -m pytest -q test_readiness.py
+"""
+
+import threading
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+class Template:
+    def to_png(self, dpi):
+        return b"png"
+
+@pytest.fixture
+def warmup(monkeypatch):
+    monkeypatch.setattr(main, "warmup_state", {
+        "status": "pending", "started_at": None, "completed_at": None, "duration_seconds": None, "error": None
+    })
+    monkeypatch.setattr(main, "load_render_modules", lambda: None)
+    monkeypatch.setattr(main, "preload_natural_earth", lambda data_dir: True)
+    monkeypatch.setattr(main, "map_template", contextmanager(lambda: (yield Template())))
+
+def ready():
+    return TestClient(main.app).get("/ready")
+
+def test_not_ready_before_warmup(warmup):
+    response = ready()
+    
+    assert response.status_code == 503
+    assert response.json()["status"] == "pending"
+    assert not response.json()["ready"]
+
+def test_ready_after_warmup(warmup):
+    main.warm_up_rendering()
+    
+    response = ready()
+    
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] and body["status"] == "ready"
+    assert body["warmup"]["completed_at"] is not None
+
+def test_failed_warmup_stays_unavailable(warmup, monkeypatch):
+    def broken_template():
+        raise RuntimeError("no fonts")
+    
+    monkeypatch.setattr(main, "map_template", broken_template)
+    main.warm_up_rendering()
+    
+    response = ready()
+    
+    assert response.status_code == 503
+    assert response.json()["status"] == "failed"
+    assert response.json()["warmup"]["error"] == "no fonts"
+
+def test_render_modules_load_once_across_threads(monkeypatch):
+    matplotlib = pytest.importorskip("matplotlib")
+    pytest.importorskip("cartopy")
+    monkeypatch.setattr(main, "render_modules_loaded", False)
+    monkeypatch.setattr(main, "label_from_attrs", None)
+    backends = []
+    use = matplotlib.use
+    monkeypatch.setattr(matplotlib, "use", lambda backend: backends.append(backend) or use(backend))
+    
+    threads = [threading.Thread(target=main.load_render_modules) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    
+    assert backends == ["Agg"]
+    assert main.render_modules_loaded
+    assert main.label_from_attrs is not None and main.plt is not None
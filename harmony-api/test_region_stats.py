@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Unit tests for region statistics helpers
+
+Run with: python -m pytest -q test_region_stats.py
+"""
+
+import numpy as np
+import pytest
+
+from region_stats import polygon_bbox, polygon_mask, summarize
+
+TRIANGLE = [[-100, 30], [-90, 30], [-100, 40]]
+
+def test_polygon_bbox():
+    assert polygon_bbox(TRIANGLE) == [-100, 30, -90, 40]
+
+def test_polygon_mask():
+    lon = np.array([-99.0, -91.0, -95.0, -80.0])
+    lat = np.array([31.0, 39.0, 34.0, 35.0])
+    assert list(polygon_mask(TRIANGLE, lon, lat)) == [True, False, True, False]
+
+def test_summarize_ignores_missing_values():
+    values = np.array([1.0, 2.0, 3.0, 4.0, np.nan, np.inf])
+    summary = summarize(values, region_pixels=8, percentiles=[50], bins=3)
+    
+    assert summary["valid_pixels"] == 4
+    assert summary["valid_fraction"] == 0.5
+    assert summary["mean"] == pytest.approx(2.5)
+    assert summary["min"] == 1.0 and summary["max"] == 4.0
+    assert summary["percentiles"] == {"p50": pytest.approx(2.5)}
+    assert sum(summary["histogram"]["counts"]) == 4
+    assert len(summary["histogram"]["bin_edges"]) == 4
+
+def test_summarize_without_valid_values():
+    summary = summarize(np.array([np.nan]), region_pixels=0, percentiles=[5, 95], bins=10)
+    
+    assert summary["valid_pixels"] == 0
+    assert summary["valid_fraction"] == 0.0
+    assert summary["mean"] is None
+    assert summary["histogram"] is None
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Unit tests for swath-to-grid regridding with cached index maps
+
+Run with: python -m pytest -q test_regrid.py
+"""
+
+import numpy as np
+import pytest
+
+from regrid import GridSpec, Regridder, grid_for_data
+
+def swath():
+    """4 x 4 swath with pixel centers at 30.25..31.75N, 100.25..98.75W"""
+    lat, lon = np.meshgrid(30.25 + 0.5 * np.arange(4), -100.25 + 0.5 * np.arange(4), indexing="ij")
+    return lat, lon
+
+def test_grid_spec_geometry():
+    grid = GridSpec.from_bbox([-101, 30, -99, 32], 1.0)
+    assert grid.shape == (2, 2)
+    assert list(grid.lon_centers) == [-100.5, -99.5]
+    assert list(grid.lat_centers) == [30.5, 31.5]
+    assert grid.extent == [-101, -99, 30, 32]
+    assert GridSpec.from_bbox([0, 0, 1, 1], 0.3).shape == (4, 4)
+
+def test_grid_for_data_covers_all_pixels():
+    lat, lon = swath()
+    lat[0, 0] = np.nan
+    grid = grid_for_data(lat, lon, 0.5)
+    assert (grid.west, grid.south, grid.east, grid.north) == (-100.5, 30.0, -98.5, 32.0)
+
+def test_bin_averages_pixels_per_cell():
+    lat, lon = swath()
+    data = np.arange(16, dtype=np.float64).reshape(4, 4)
+    data[0, 0] = np.nan
+    grid = GridSpec.from_bbox([-101, 30, -99, 32], 1.0)
+    regridder = Regridder()
+    
+    out = regridder.apply(data, regridder.get_index(lat, lon, grid, "bin"))
+    
+    # Columns are [-101, -100) and [-100, -99); the pixels at -98.75 fall outside and NaN pixels do not count
+    assert out.shape == (2, 2)
+    assert out[0, 0] == pytest.approx(4)
+    assert out[0, 1] == pytest.approx(np.mean([1, 2, 5, 6]))
+    assert out[1, 0] == pytest.approx(np.mean([8, 12]))
+    assert out[1, 1] == pytest.approx(np.mean([9, 10, 13, 14]))
+
+def test_nearest_fills_cells_within_range():
+    lat, lon = swath()
+    data = np.arange(16, dtype=np.float32).reshape(4, 4)
+    grid = GridSpec.from_bbox([-101, 30, -97, 32], 1.0)
+    regridder = Regridder()
+    
+    out = regridder.apply(data, regridder.get_index(lat, lon, grid, "nearest", max_distance=0.5))
+    
+    assert np.isfinite(out[:, :2]).all()
+    # The easternmost column is more than 0.5 degrees from every pixel
+    assert np.isnan(out[:, 3]).all()
+
+def test_index_cached_per_geometry_grid_and_method():
+    lat, lon = swath()
+    grid = GridSpec.from_bbox([-101, 30, -99, 32], 1.0)
+    regridder = Regridder(max_entries=2)
+    
+    first = regridder.get_index(lat, lon, grid, "bin")
+    assert regridder.get_index(lat.copy(), lon.copy(), grid, "bin") is first
+    regridder.get_index(lat, lon, grid, "nearest")
+    regridder.get_index(lat, lon, GridSpec.from_bbox([-101, 30, -99, 32], 0.5), "bin")
+    
+    stats = regridder.get_stats()
+    assert stats["hits"] == 1 and stats["misses"] == 3
+    assert stats["cached_indexes"] == 2
+
+def test_rejects_unknown_method_and_mismatched_data():
+    lat, lon = swath()
+    grid = GridSpec.from_bbox([-101, 30, -99, 32], 1.0)
+    regridder = Regridder()
+    
+    with pytest.raises(ValueError):
+        regridder.get_index(lat, lon, grid, "bilinear")
+    with pytest.raises(ValueError):
+        regridder.apply(np.zeros((3, 3)), regridder.get_index(lat, lon, grid))
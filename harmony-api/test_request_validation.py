@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Unit tests for request model validation: 400 for failed cross-field checks, 422 otherwise
+
+Run with: python -m pytest -q test_request_validation.py
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conftest import AUTH
+
+WINDOW = {"start_time": "2024-05-01T13:00:00", "end_time": "2024-05-01T14:00:00"}
+
+class UnusedHarmonyClient:
+    def __getattr__(self, name):
+        raise AssertionError("an invalid request must not reach Harmony")
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "harmony_client", UnusedHarmonyClient())
+    return TestClient(main.app)
+
+def animate(client, **fields):
+    return client.post("/tempo/animate", json={**WINDOW, **fields}, headers=AUTH)
+
+@pytest.mark.parametrize("limits, message", [
+    ({"vmin": 0.0}, "vmin and vmax must be given together"),
+    ({"vmax": 1.0}, "vmin and vmax must be given together"),
+    ({"vmin": 2.0, "vmax": 1.0}, "vmin (2.0) must be less than vmax (1.0)"),
+    ({"vmin": 1.0, "vmax": 1.0}, "vmin (1.0) must be less than vmax (1.0)")
+])
+def test_color_limit_checks_are_bad_requests(client, limits, message):
+    response = animate(client, **limits)
+    
+    assert response.status_code == 400
+    assert response.json() == {"detail": message}
+
+@pytest.mark.parametrize("fields", [
+    {"fps": 0},
+    {"fps": 31},
+    {"vmin": "low", "vmax": 1.0},
+    {"start_time": None}
+])
+def test_field_errors_stay_unprocessable(client, fields):
+    response = animate(client, **fields)
+    
+    assert response.status_code == 422
+    assert isinstance(response.json()["detail"], list)
+
+def test_missing_field_is_unprocessable(client):
+    response = client.post("/tempo/animate", json={"end_time": WINDOW["end_time"]}, headers=AUTH)
+    
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "start_time"]
+
+def test_unsupported_format_is_a_bad_request(client):
+    response = animate(client, format="avi")
+    
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Unsupported format: avi")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Unit tests for JSON serialization and Accept-Encoding negotiation of large responses
+
+Run with: python -m pytest -q test_response_encoding.py
+"""
+
+import gzip
+import json
+
+import numpy as np
+from fastapi.responses import Response
+
+import response_encoding
+from response_encoding import ResponseEncoder, dumps, negotiate_encoding, supported_encodings
+
+BODY = json.dumps({"image_base64": "A" * 4096}).encode()
+
+def test_dumps_handles_numpy_values():
+    value = {"mean": np.float32(1.5), "counts": np.arange(3), "ok": True}
+    assert json.loads(dumps(value)) == {"mean": 1.5, "counts": [0, 1, 2], "ok": True}
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(response_encoding, "brotli", None)
+    assert supported_encodings() == ["gzip"]
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("GZIP;q=0.5") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("deflate") is None
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding("*;q=0") is None
+    assert negotiate_encoding("br") is None
+
+def test_negotiate_prefers_brotli_when_available(monkeypatch):
+    monkeypatch.setattr(response_encoding, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5") == "gzip"
+    assert negotiate_encoding("gzip, br;q=0") == "gzip"
+
+def test_encode_compresses_and_weakens_etag(monkeypatch):
+    monkeypatch.setattr(response_encoding, "brotli", None)
+    encoder = ResponseEncoder(min_size=1024)
+    response = Response(content=BODY, media_type="application/json", headers={"ETag": '"abc"'})
+    
+    encoded = encoder.encode(response, "gzip")
+    
+    assert gzip.decompress(encoded.body) == BODY
+    assert encoded.headers["Content-Encoding"] == "gzip"
+    assert encoded.headers["Vary"] == "Accept-Encoding"
+    assert encoded.headers["ETag"] == 'W/"abc"'
+    assert int(encoded.headers["Content-Length"]) == len(encoded.body)
+
+def test_encode_leaves_small_or_identity_responses(monkeypatch):
+    monkeypatch.setattr(response_encoding, "brotli", None)
+    encoder = ResponseEncoder(min_size=1024)
+    
+    small = Response(content=b"{}", media_type="application/json")
+    assert encoder.encode(small, "gzip") is small
+    
+    identity = encoder.encode(Response(content=BODY, media_type="application/json"), None)
+    assert identity.body == BODY
+    assert "Content-Encoding" not in identity.headers
+    assert identity.headers["Vary"] == "Accept-Encoding"
+    
+    not_modified = Response(status_code=304)
+    assert encoder.encode(not_modified, "gzip") is not_modified
+
+def test_compressed_variants_are_reused_per_etag(monkeypatch):
+    monkeypatch.setattr(response_encoding, "brotli", None)
+    encoder = ResponseEncoder(min_size=1024)
+    
+    for _ in range(3):
+        encoder.encode(Response(content=BODY, media_type="application/json", headers={"ETag": '"abc"'}), "gzip")
+    # Without an ETag there is nothing to key the variant on
+    encoder.encode(Response(content=BODY, media_type="application/json"), "gzip")
+    
+    stats = encoder.get_stats()
+    assert stats["misses"] == 2
+    assert stats["hits"] == 2
+    assert stats["cached_variants"] == 1
+
+def test_variant_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(response_encoding, "brotli", None)
+    encoder = ResponseEncoder(min_size=0, max_cache_mb=0.0001)
+    
+    for i in range(20):
+        body = json.dumps({"i": i, "pad": "x" * 200}).encode()
+        encoder.encode(Response(content=body, headers={"ETag": f'"{i}"'}), "gzip")
+    
+    assert encoder.cached_bytes <= encoder.max_cache_bytes
+    assert len(encoder.variants) < 20
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the priority work scheduler and its admission control
+
+Run with: python -m pytest -q test_scheduler.py
+"""
+
+import asyncio
+import threading
+from typing import List
+
+import pytest
+
+from scheduler import SchedulerBusy, WorkScheduler
+
+@pytest.fixture
+def scheduler():
+    scheduler = WorkScheduler(workers=1)
+    yield scheduler
+    scheduler.shutdown()
+
+def block_worker(scheduler: WorkScheduler) -> threading.Event:
+    """Occupy the only worker until the returned event is set"""
+    started, release = threading.Event(), threading.Event()
+    
+    def hold():
+        started.set()
+        release.wait(5)
+    
+    scheduler.submit(hold, priority="prefetch")
+    assert started.wait(5)
+    return release
+
+def test_runs_higher_priority_first(scheduler):
+    release = block_worker(scheduler)
+    order: List[str] = []
+    
+    futures = [
+        scheduler.submit(order.append, priority, priority=priority)
+        for priority in ("prefetch", "background", "interactive", "background")
+    ]
+    release.set()
+    for future in futures:
+        future.result(5)
+    
+    assert order == ["interactive", "background", "background", "prefetch"]
+
+def test_run_async_returns_result(scheduler):
+    assert asyncio.run(scheduler.run_async(sum, [1, 2, 3], priority="background")) == 6
+
+def test_failed_task_raises_and_is_counted(scheduler):
+    with pytest.raises(ZeroDivisionError):
+        scheduler.run(lambda: 1 / 0)
+    assert scheduler.get_stats()["classes"]["interactive"]["failed"] == 1
+
+def test_unknown_priority_is_rejected(scheduler):
+    with pytest.raises(ValueError):
+        scheduler.admit("urgent")
+
+def test_admission_counts_requests_ahead(scheduler):
+    scheduler.max_active = {"interactive": 2, "background": 3}
+    scheduler.admit("interactive")
+    scheduler.admit("interactive")
+    
+    with pytest.raises(SchedulerBusy) as busy:
+        scheduler.admit("interactive")
+    # Background work also waits behind the interactive requests in flight
+    scheduler.admit("background")
+    with pytest.raises(SchedulerBusy):
+        scheduler.admit("background")
+    
+    assert busy.value.retry_after >= 1
+    stats = scheduler.get_stats()["classes"]
+    assert stats["interactive"]["rejected"] == 1
+    assert stats["background"]["rejected"] == 1
+    assert stats["background"]["active_requests"] == 1
+
+def test_queued_tasks_do_not_count_against_admission(scheduler):
+    scheduler.max_active = {"interactive": 1}
+    release = block_worker(scheduler)
+    # One admitted request with many renders queued
+    with scheduler.admitted("interactive"):
+        for _ in range(10):
+            scheduler.submit(lambda: None, priority="interactive")
+    release.set()
+    
+    scheduler.admit("interactive")
+
+def test_check_does_not_admit(scheduler):
+    scheduler.max_active = {"interactive": 1}
+    scheduler.check("interactive")
+    scheduler.check("interactive")
+    assert scheduler.active_requests("interactive") == 0
+    
+    scheduler.admit("interactive")
+    with pytest.raises(SchedulerBusy):
+        scheduler.check("interactive")
+    assert scheduler.active_requests("interactive") == 1
+
+def test_retry_after_grows_with_queue(scheduler):
+    scheduler.service_seconds = 2.0
+    assert scheduler._retry_after(0) == 2
+    assert scheduler._retry_after(9) == 20
+    scheduler.service_seconds = 0.01
+    assert scheduler._retry_after(0) == 1
+
+def test_release_accounting_returns_to_zero(scheduler):
+    scheduler.max_active = {"background": 1}
+    for _ in range(3):
+        scheduler.admit("background")
+        scheduler.release("background")
+    
+    assert scheduler.active_requests("background") == 0
+
+def test_admitted_context_releases_on_error(scheduler):
+    scheduler.max_active = {"interactive": 1}
+    with pytest.raises(RuntimeError):
+        with scheduler.admitted("interactive"):
+            raise RuntimeError("render failed")
+    
+    assert scheduler.active_requests("interactive") == 0
+    with scheduler.admitted("interactive"):
+        pass
+
+def test_discard_drops_only_queued_tasks(scheduler):
+    release = block_worker(scheduler)
+    ran: List[int] = []
+    futures = [scheduler.submit(ran.append, i, priority="background") for i in range(3)]
+    
+    assert scheduler.discard(futures[:2]) == 2
+    release.set()
+    futures[2].result(5)
+    
+    assert ran == [2]
+    assert futures[0].cancelled() and futures[1].cancelled()
+    assert scheduler.get_stats()["classes"]["background"]["queued"] == 0
+
+def test_shutdown_cancels_queued_tasks():
+    scheduler = WorkScheduler(workers=1)
+    release = block_worker(scheduler)
+    future = scheduler.submit(lambda: None)
+    
+    scheduler.shutdown()
+    release.set()
+    
+    assert future.cancelled()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(lambda: None)
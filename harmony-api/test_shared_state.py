@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared state stores and the leader lock
+
+Run with: python -m pytest -q test_shared_state.py
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from shared_state import LeaderLock, MemoryStateStore, SQLiteStateStore, create_state_store
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return create_state_store(request.param, str(tmp_path))
+
+def increment(value):
+    value["count"] += 1
+
+def increment_in_process(db_path: str, times: int) -> None:
+    store = SQLiteStateStore(db_path)
+    for _ in range(times):
+        store.update("jobs", "counter", increment)
+
+def test_create_state_store(tmp_path):
+    assert isinstance(create_state_store("memory", str(tmp_path)), MemoryStateStore)
+    assert isinstance(create_state_store("sqlite", str(tmp_path)), SQLiteStateStore)
+    with pytest.raises(ValueError):
+        create_state_store("redis", str(tmp_path))
+
+def test_set_get_delete(store):
+    store.set("cache", "a", {"x": [1, 2]})
+    
+    assert store.get("cache", "a") == {"x": [1, 2]}
+    assert store.contains("cache", "a")
+    assert store.get("other", "a") is None
+    assert store.delete("cache", "a")
+    assert not store.delete("cache", "a")
+    assert store.get("cache", "a") is None
+
+def test_get_returns_a_copy(store):
+    store.set("cache", "a", {"x": 1})
+    store.get("cache", "a")["x"] = 2
+    
+    assert store.get("cache", "a") == {"x": 1}
+
+def test_raw_round_trip(store):
+    store.set_raw("cache", "raw", b'{"x": 1}')
+    store.set("cache", "doc", {"y": 2})
+    
+    assert store.get_raw("cache", "raw") == b'{"x": 1}'
+    assert store.get("cache", "raw") == {"x": 1}
+    assert json.loads(store.get_raw("cache", "doc")) == {"y": 2}
+    assert store.get_raw("cache", "missing") is None
+
+def test_entries_expire(store):
+    store.set("cache", "short", 1, ttl=0.05)
+    store.set("cache", "long", 2, ttl=60)
+    store.set("cache", "forever", 3)
+    time.sleep(0.1)
+    
+    assert store.get("cache", "short") is None
+    assert store.update("cache", "short", increment) is None
+    assert store.count("cache") == 2
+    assert store.cleanup_expired("cache") <= 1
+    assert store.count("cache", include_expired=True) == 2
+
+def test_update_mutates_or_replaces(store):
+    store.set("jobs", "j", {"count": 0})
+    
+    assert store.update("jobs", "j", increment) == {"count": 1}
+    assert store.update("jobs", "j", lambda value: {"count": value["count"] * 10}) == {"count": 10}
+    assert store.get("jobs", "j") == {"count": 10}
+    assert store.update("jobs", "missing", increment) is None
+
+def test_update_error_leaves_value(store):
+    store.set("jobs", "j", {"count": 0})
+    
+    def fail(value):
+        value["count"] = 99
+        raise RuntimeError("boom")
+    
+    with pytest.raises(RuntimeError):
+        store.update("jobs", "j", fail)
+    assert store.get("jobs", "j") == {"count": 0}
+
+def test_evict_keeps_newest(store):
+    for i in range(5):
+        store.set("cache", f"k{i}", i)
+        time.sleep(0.002)
+    
+    assert store.evict("cache", 2) == 3
+    assert [store.get("cache", f"k{i}") for i in range(5)] == [None, None, None, 3, 4]
+
+def test_clear_and_stats(store):
+    store.set("cache", "a", 1)
+    store.set("jobs", "b", 2)
+    
+    assert store.get_stats()["namespaces"] == {"cache": 1, "jobs": 1}
+    assert store.clear("cache") == 1
+    assert store.count("cache") == 0
+    assert store.count("jobs") == 1
+
+def test_update_is_atomic_across_threads(store):
+    store.set("jobs", "counter", {"count": 0})
+    
+    threads = [
+        threading.Thread(target=lambda: [store.update("jobs", "counter", increment) for _ in range(50)])
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert store.get("jobs", "counter") == {"count": 200}
+
+def test_update_is_atomic_across_processes(tmp_path):
+    db_path = str(tmp_path / "shared_state.db")
+    SQLiteStateStore(db_path).set("jobs", "counter", {"count": 0})
+    
+    processes = [
+        multiprocessing.get_context("spawn").Process(target=increment_in_process, args=(db_path, 50))
+        for _ in range(2)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+    
+    # A second connection sees every increment from both processes
+    assert SQLiteStateStore(db_path).get("jobs", "counter") == {"count": 100}
+
+@pytest.mark.skipif(os.name != "posix", reason="leader lock needs fcntl")
+def test_leader_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "prefetch.lock")
+    first, second = LeaderLock(path), LeaderLock(path)
+    
+    assert first.acquire()
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the incremental storage garbage collector and its quota
+
+Run with: python -m pytest -q test_storage_gc.py
+"""
+
+import asyncio
+from typing import List, Optional, Tuple
+
+import pytest
+
+from persistent_storage import DataStorage
+from storage_gc import DataStorageSource, GCSource, StorageGC
+
+class ItemSource(GCSource):
+    """In-memory source of (last_access, size, expired) items"""
+    
+    def __init__(self, name: str, items: List[Tuple[float, int, bool]]):
+        self.name = name
+        self.items = sorted(items)
+    
+    def usage_bytes(self) -> int:
+        return sum(size for _, size, _ in self.items)
+    
+    def oldest_access(self) -> Optional[float]:
+        return self.items[0][0] if self.items else None
+    
+    def expire(self, limit: int) -> Tuple[int, int]:
+        expired = [item for item in self.items if item[2]][:limit]
+        for item in expired:
+            self.items.remove(item)
+        return len(expired), sum(size for _, size, _ in expired)
+    
+    def evict(self, limit: int) -> Tuple[int, int]:
+        evicted, self.items = self.items[:limit], self.items[limit:]
+        return len(evicted), sum(size for _, size, _ in evicted)
+
+def test_source_must_implement_interface():
+    class Partial(GCSource):
+        def usage_bytes(self) -> int:
+            return 0
+    
+    with pytest.raises(TypeError):
+        Partial()
+
+def test_expires_without_quota():
+    source = ItemSource("a", [(1, 10, True), (2, 10, False), (3, 10, True)])
+    result = asyncio.run(StorageGC([source]).collect())
+    
+    assert result["expired_items"] == 2
+    assert result["evicted_items"] == 0
+    assert source.usage_bytes() == 10
+
+def test_evicts_least_recently_used_across_sources():
+    old = ItemSource("old", [(1, 100, False), (2, 100, False), (10, 100, False)])
+    new = ItemSource("new", [(5, 100, False), (6, 100, False)])
+    gc = StorageGC([old, new], quota_bytes=400, batch_size=1, target_ratio=0.75)
+    
+    result = asyncio.run(gc.collect())
+    
+    # 500 bytes down to the 300 byte target, oldest items first
+    assert result["evicted_items"] == 2
+    assert [item[0] for item in old.items] == [10]
+    assert [item[0] for item in new.items] == [5, 6]
+    assert gc.get_stats()["usage_mb"] == {"old": 0.0, "new": 0.0}
+
+def test_pass_is_bounded_by_max_batches():
+    source = ItemSource("a", [(i, 10, False) for i in range(100)])
+    gc = StorageGC([source], quota_bytes=100, batch_size=5, max_batches=3)
+    
+    result = asyncio.run(gc.collect())
+    
+    # One expiry batch, then two eviction batches
+    assert result["batches"] == 3
+    assert result["evicted_items"] == 10
+    # The next pass continues where this one stopped
+    assert asyncio.run(gc.collect())["evicted_items"] == 10
+    assert source.oldest_access() == 20
+
+def test_failing_source_does_not_stop_the_pass():
+    class Broken(ItemSource):
+        def expire(self, limit: int) -> Tuple[int, int]:
+            raise OSError("disk gone")
+    
+    healthy = ItemSource("healthy", [(1, 10, True)])
+    gc = StorageGC([Broken("broken", []), healthy])
+    
+    result = asyncio.run(gc.collect())
+    
+    assert result["expired_items"] == 1
+    assert gc.get_stats()["errors"] == 1
+
+def test_data_storage_source_evicts_to_quota(tmp_path):
+    storage = DataStorage(str(tmp_path))
+    for i in range(10):
+        storage.save_query_result(f"q{i}", {"i": i, "pad": "x" * 4000})
+    source = DataStorageSource(storage, retention_days=30)
+    quota = source.usage_bytes() - 10000
+    
+    result = asyncio.run(StorageGC([source], quota_bytes=quota, batch_size=2).collect())
+    
+    assert result["expired_items"] == 0
+    assert result["evicted_items"] >= 2
+    assert source.usage_bytes() <= quota
+    assert storage.load_query_result("q9") is not None